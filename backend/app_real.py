@@ -10,15 +10,17 @@ import logging
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
 
-import bcrypt
 import jwt
-import pdfplumber
 from flask import Flask, request, jsonify, g
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from werkzeug.utils import secure_filename
+from services.pdf_extraction import extract_pdf_text
+from services.password_hashing import PasswordHasherBusy, get_password_hasher
+from services.token_cache import (VERSION_CLAIM, configure_token_versions, get_token_cache,
+                                  token_version)
 from sqlalchemy import func, desc
 from io import BytesIO, StringIO
 import csv
@@ -44,6 +46,15 @@ except ImportError as e:
     logger.warning(f"⚠️  ML service not available: {e}")
     ML_SERVICE_AVAILABLE = False
 
+# Import upload dedup cache
+try:
+    from services.upload_cache import UploadResultCache, file_sha256, model_version, PARSER_VERSION
+    UPLOAD_CACHE_AVAILABLE = True
+    UPLOAD_PARSER_VERSION = f"app_real/{PARSER_VERSION}"
+except ImportError as e:
+    logger.warning(f"⚠️  Upload cache not available: {e}")
+    UPLOAD_CACHE_AVAILABLE = False
+
 # Flask app setup
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.getenv('JWT_SECRET', 'lait-dev-secret-key-2025')
@@ -66,10 +77,12 @@ def get_user_id_for_rate_limit():
     
     try:
         token = auth_header.split(' ')[1]
-        payload = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
-        return f"user_{payload['user_id']}"
-    except:
-        return get_remote_address()
+        payload = decode_jwt_token(token)
+        if payload:
+            return f"user_{payload['user_id']}"
+    except Exception:
+        pass
+    return get_remote_address()
 
 limiter = Limiter(
     key_func=get_remote_address,
@@ -99,16 +112,19 @@ class User(db.Model):
     first_name = db.Column(db.String(100))
     last_name = db.Column(db.String(100))
     company = db.Column(db.String(200))
+    token_version = db.Column(db.Integer, default=0)  # Bumped to revoke issued tokens
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     def set_password(self, password: str):
-        """Hash and set password using bcrypt"""
-        salt = bcrypt.gensalt()
-        self.password_hash = bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+        """Hash and set password using bcrypt (BCRYPT_ROUNDS) on the hashing pool"""
+        self.password_hash = get_password_hasher().hash(password, scheme='bcrypt')
     
     def check_password(self, password: str) -> bool:
-        """Verify password against stored hash"""
-        return bcrypt.checkpw(password.encode('utf-8'), self.password_hash.encode('utf-8'))
+        """Verify password against stored hash; swaps in a rehash if the cost changed (caller commits)"""
+        ok, new_hash = get_password_hasher().verify(self.password_hash, password)
+        if new_hash:
+            self.password_hash = new_hash
+        return ok
     
     def to_dict(self):
         return {
@@ -120,6 +136,9 @@ class User(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+# Token versions live on this app's users table; a separate session keeps the request's intact
+configure_token_versions(lambda: db.session.session_factory(), User)
+
 class Vendor(db.Model):
     __tablename__ = 'vendors'
     
@@ -173,19 +192,28 @@ def generate_jwt_token(user_id: int) -> str:
     payload = {
         'user_id': user_id,
         'exp': datetime.utcnow() + timedelta(days=7),
-        'iat': datetime.utcnow()
+        'iat': datetime.utcnow(),
+        VERSION_CLAIM: token_version(user_id)
     }
     return jwt.encode(payload, app.config['SECRET_KEY'], algorithm='HS256')
 
 def decode_jwt_token(token: str) -> Optional[Dict]:
-    """Decode and validate JWT token"""
+    """Decode and validate JWT token; recently verified tokens come from the claims cache"""
+    secret = app.config['SECRET_KEY']
+    cache = get_token_cache()
+    cached = cache.get(token, secret)
+    if cached:
+        return cached[0]
     try:
-        payload = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
-        return payload
+        payload = jwt.decode(token, secret, algorithms=['HS256'])
     except jwt.ExpiredSignatureError:
         return None
     except jwt.InvalidTokenError:
         return None
+    if cache.is_revoked(payload):
+        return None
+    cache.put(token, secret, payload)
+    return payload
 
 # ============================================================================
 # ERROR HANDLING & LOGGING HELPERS  
@@ -214,6 +242,14 @@ def create_error_response(error: str, hint: str = None, code: int = 400, status_
         
     return jsonify(response_data), status_code
 
+def password_busy_response(exc: PasswordHasherBusy):
+    """503 with Retry-After when the password hashing pool is saturated"""
+    response, status_code = create_error_response('Too many login requests',
+                                                  'Retry after a short wait',
+                                                  code=3004, status_code=503)
+    response.headers['Retry-After'] = str(exc.retry_after)
+    return response, status_code
+
 def validate_file_upload(file):
     """Validate uploaded file size and type"""
     if not file or not file.filename:
@@ -291,72 +327,67 @@ def get_current_user() -> Optional[User]:
 # ============================================================================
 
 def parse_pdf_content(file_content: bytes) -> List[Dict[str, Any]]:
-    """Parse PDF content using pdfplumber to extract line items"""
+    """Parse PDF content to extract line items"""
     lines = []
     
     try:
-        with pdfplumber.open(BytesIO(file_content)) as pdf:
-            full_text = ""
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    full_text += page_text + "\n"
+        full_text = extract_pdf_text(file_content)
+        
+        # Simple parsing logic - look for patterns that might be line items
+        text_lines = full_text.split('\n')
+        
+        for line in text_lines:
+            line = line.strip()
+            if not line:
+                continue
             
-            # Simple parsing logic - look for patterns that might be line items
-            text_lines = full_text.split('\n')
+            # Try to extract hours, rate, and description from common patterns
+            # Pattern 1: "Description 10.5 hours @ $450/hr = $4,725"
+            # Pattern 2: "Legal research, 5.0, 500.00, 2500.00"
+            # Pattern 3: Simple comma-separated values
             
-            for line in text_lines:
-                line = line.strip()
-                if not line:
-                    continue
-                
-                # Try to extract hours, rate, and description from common patterns
-                # Pattern 1: "Description 10.5 hours @ $450/hr = $4,725"
-                # Pattern 2: "Legal research, 5.0, 500.00, 2500.00"
-                # Pattern 3: Simple comma-separated values
-                
-                # Basic parsing - split by common separators and look for numbers
-                parts = line.replace(',', '').replace('$', '').split()
-                numbers = []
-                description_parts = []
+            # Basic parsing - split by common separators and look for numbers
+            parts = line.replace(',', '').replace('$', '').split()
+            numbers = []
+            description_parts = []
+            
+            for part in parts:
+                try:
+                    num = float(part)
+                    numbers.append(num)
+                except ValueError:
+                    description_parts.append(part)
+            
+            # If we found numbers, try to map them to hours, rate, total
+            if len(numbers) >= 2:
+                description = ' '.join(description_parts) or f"Line item from {line[:50]}"
                 
-                for part in parts:
-                    try:
-                        num = float(part)
-                        numbers.append(num)
-                    except ValueError:
-                        description_parts.append(part)
+                if len(numbers) >= 3:
+                    # Assume: hours, rate, total
+                    hours, rate, total = numbers[0], numbers[1], numbers[2]
+                else:
+                    # Assume: hours, rate (calculate total)
+                    hours, rate = numbers[0], numbers[1]
+                    total = hours * rate
                 
-                # If we found numbers, try to map them to hours, rate, total
-                if len(numbers) >= 2:
-                    description = ' '.join(description_parts) or f"Line item from {line[:50]}"
-                    
-                    if len(numbers) >= 3:
-                        # Assume: hours, rate, total
-                        hours, rate, total = numbers[0], numbers[1], numbers[2]
-                    else:
-                        # Assume: hours, rate (calculate total)
-                        hours, rate = numbers[0], numbers[1]
-                        total = hours * rate
-                    
-                    # Only add if values seem reasonable
-                    if 0.1 <= hours <= 100 and 50 <= rate <= 2000:
-                        lines.append({
-                            'description': description,
-                            'hours': hours,
-                            'rate': rate,
-                            'line_total': total
-                        })
+                # Only add if values seem reasonable
+                if 0.1 <= hours <= 100 and 50 <= rate <= 2000:
+                    lines.append({
+                        'description': description,
+                        'hours': hours,
+                        'rate': rate,
+                        'line_total': total
+                    })
+        
+        # If no structured data found, create a single line item from filename
+        if not lines:
+            lines.append({
+                'description': 'PDF Invoice Processing',
+                'hours': 1.0,
+                'rate': 500.0,
+                'line_total': 500.0
+            })
             
-            # If no structured data found, create a single line item from filename
-            if not lines:
-                lines.append({
-                    'description': 'PDF Invoice Processing',
-                    'hours': 1.0,
-                    'rate': 500.0,
-                    'line_total': 500.0
-                })
-                
     except Exception as e:
         logger.error(f"Error parsing PDF: {str(e)}")
         # Fallback line item
@@ -445,6 +476,15 @@ def parse_text_content(content: str) -> List[Dict[str, Any]]:
     
     return lines
 
+_upload_cache = None
+
+def get_upload_cache():
+    """Upload result cache bound to this app's database"""
+    global _upload_cache
+    if _upload_cache is None:
+        _upload_cache = UploadResultCache(engine=db.engine)
+    return _upload_cache
+
 def score_invoice_lines(lines_data: List[Dict]) -> tuple[List[Dict], Dict[str, Any]]:
     """
     Score invoice lines using ML service with fallback to deterministic scoring
@@ -587,7 +627,9 @@ def log_public_requests_updated():
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return jsonify({'ok': True, 'timestamp': datetime.utcnow().isoformat()})
+    from services.pii_redaction import get_pii_redactor
+    return jsonify({'ok': True, 'timestamp': datetime.utcnow().isoformat(),
+                    'pii_redaction': get_pii_redactor().status()})
 
 @app.route('/api/ml/status', methods=['GET'])
 def ml_status():
@@ -659,6 +701,9 @@ def register():
             'user': user.to_dict()
         }), 201
         
+    except PasswordHasherBusy as e:
+        db.session.rollback()
+        return password_busy_response(e)
     except Exception as e:
         db.session.rollback()
         logger.error(f"Registration error: {str(e)}")
@@ -692,6 +737,9 @@ def login():
             return create_error_response('Invalid credentials',
                                        'Check your email and password',
                                        code=3003, status_code=401)
+        if db.session.is_modified(user):
+            # Stored hash was upgraded to the configured work factor
+            db.session.commit()
         
         # Generate JWT token
         token = generate_jwt_token(user.id)
@@ -703,6 +751,8 @@ def login():
             'user': user.to_dict()
         }), 200
         
+    except PasswordHasherBusy as e:
+        return password_busy_response(e)
     except Exception as e:
         logger.error(f"Login error: {str(e)}")
         return jsonify({'error': 'Login failed'}), 500
@@ -741,6 +791,8 @@ def upload_invoice():
         invoice_number = None
         invoice_date = datetime.utcnow().date()
         filename = None
+        cached_scoring = None
+        upload_key = None
         
         # Handle multipart file upload
         if 'file' in request.files:
@@ -762,8 +814,30 @@ def upload_invoice():
                                            'File may be corrupted or too large',
                                            code=4002, status_code=400)
             
+            # Identical resends skip parsing and scoring
+            if UPLOAD_CACHE_AVAILABLE:
+                upload_key = (file_sha256(file_content), UPLOAD_PARSER_VERSION, model_version())
+                cached = get_upload_cache().get(*upload_key)
+                if cached and cached.get('invoice_id'):
+                    existing = Invoice.query.filter_by(id=cached['invoice_id'], user_id=user.id).first()
+                    if existing:
+                        return jsonify({
+                            'invoice_id': existing.id,
+                            'vendor': existing.vendor.name,
+                            'total_amount': existing.total_amount,
+                            'lines_processed': existing.lines_processed,
+                            'flagged': existing.flagged_lines,
+                            'invoice_number': existing.invoice_number,
+                            'date': existing.date.isoformat() if existing.date else None,
+                            'duplicate': True
+                        }), 200
+                if cached and cached.get('result'):
+                    cached_scoring = cached['result']
+            
             # Parse based on file type
-            if filename.lower().endswith('.pdf'):
+            if cached_scoring:
+                lines_data = cached_scoring['lines']
+            elif filename.lower().endswith('.pdf'):
                 lines_data = parse_pdf_content(file_content)
             elif filename.lower().endswith(('.txt', '.csv')):
                 try:
@@ -841,7 +915,10 @@ def upload_invoice():
         db.session.flush()  # Get invoice ID
         
         # Score all lines using ML service (with fallback to deterministic)
-        scored_lines_data, scoring_metadata = score_invoice_lines(lines_data)
+        if cached_scoring:
+            scored_lines_data, scoring_metadata = lines_data, cached_scoring['metadata']
+        else:
+            scored_lines_data, scoring_metadata = score_invoice_lines(lines_data)
         
         # Process and create line items
         total_amount = 0.0
@@ -880,6 +957,10 @@ def upload_invoice():
         
         db.session.commit()
         
+        if upload_key:
+            get_upload_cache().put(*upload_key, {'lines': scored_lines_data, 'metadata': scoring_metadata},
+                                   invoice_id=invoice.id)
+        
         logger.info(f"Invoice processed: ID={invoice.id}, Lines={len(lines_data)}, Flagged={flagged_count}")
         logger.info(f"Scoring method: {scoring_metadata.get('method', 'unknown')}")
         
@@ -4,7 +4,7 @@ from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity, get_jwt
 import datetime
 from db.database import get_db_session
 from models.db_models import User
-from werkzeug.security import check_password_hash
+from services.password_hashing import get_password_hasher
 
 # Role-based access decorator
 def role_required(roles):
@@ -31,7 +31,12 @@ def role_required(roles):
 
 # User authentication functions
 def authenticate_user(email, password):
-    """Authenticate a user by email and password"""
+    """Authenticate a user by email and password
+
+    Hashing runs on the shared password pool, so this raises PasswordHasherBusy
+    when that pool is saturated. A hash made with an old work factor is
+    replaced on a successful login.
+    """
     session = get_db_session()
     try:
         user = session.query(User).filter_by(email=email).first()
@@ -39,8 +44,13 @@ def authenticate_user(email, password):
         if not user:
             return None
             
-        if not check_password_hash(user.password_hash, password):
+        ok, new_hash = get_password_hasher().verify(user.password_hash, password)
+        if not ok:
             return None
+        if new_hash:
+            user.password_hash = new_hash
+            session.commit()
+            session.refresh(user)
             
         return user
     finally:
@@ -4,7 +4,8 @@ Handles real user registration, authentication, and profile management
 """
 
 from flask import Flask, request, jsonify
-from werkzeug.security import generate_password_hash, check_password_hash
+from services.password_hashing import PasswordHasherBusy, get_password_hasher
+from services.token_cache import VERSION_CLAIM, bump_token_version
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
 from datetime import datetime, timedelta
 import smtplib
@@ -76,7 +77,7 @@ class CompleteUserSystem:
             
             new_user = User(
                 email=email,
-                password_hash=generate_password_hash(password),
+                password_hash=get_password_hasher().hash(password),
                 first_name=first_name,
                 last_name=last_name,
                 role='user',
@@ -107,6 +108,8 @@ class CompleteUserSystem:
                 'verification_sent': verification_sent
             }
             
+        except PasswordHasherBusy:
+            raise  # Callers answer 503 + Retry-After
         except Exception as e:
             logger.error(f"User registration error: {str(e)}")
             return {'success': False, 'error': 'Registration failed. Please try again.'}
@@ -165,6 +168,7 @@ class CompleteUserSystem:
         try:
             from db.database import get_db_session
             from models.db_models import User
+            from services.login_throttle import record_failed_login
             
             session = get_db_session()
             
@@ -174,11 +178,10 @@ class CompleteUserSystem:
             if not user:
                 return {'success': False, 'error': 'Invalid credentials'}
             
-            if not check_password_hash(user.password_hash, password):
-                # Log failed login attempt
-                user.failed_login_attempts = (user.failed_login_attempts or 0) + 1
-                user.last_failed_login = datetime.utcnow()
-                session.commit()
+            ok, new_hash = get_password_hasher().verify(user.password_hash, password)
+            if not ok:
+                # Log failed login attempt (atomic increment, safe across workers)
+                record_failed_login(session, User, email)
                 return {'success': False, 'error': 'Invalid credentials'}
             
             if not user.active:
@@ -192,12 +195,15 @@ class CompleteUserSystem:
             # Reset failed login attempts on successful login
             user.failed_login_attempts = 0
             user.last_login = datetime.utcnow()
+            if new_hash:
+                # Work factor changed since this hash was made
+                user.password_hash = new_hash
             session.commit()
             
             # Generate access token
             access_token = create_access_token(
                 identity=str(user.id),
-                additional_claims={'role': user.role, 'email': user.email},
+                additional_claims={'role': user.role, 'email': user.email, VERSION_CLAIM: user.token_version or 0},
                 expires_delta=timedelta(hours=24)
             )
             
@@ -214,6 +220,9 @@ class CompleteUserSystem:
                 }
             }
             
+        except PasswordHasherBusy as e:
+            return {'success': False, 'error': 'Too many login requests, please retry shortly',
+                    'retry_after': e.retry_after}
         except Exception as e:
             logger.error(f"Login error: {str(e)}")
             return {'success': False, 'error': 'Login failed'}
@@ -354,15 +363,18 @@ class CompleteUserSystem:
                 return {'success': False, 'error': 'Password must be at least 8 characters'}
             
             # Update password
-            user.password_hash = generate_password_hash(new_password)
+            user.password_hash = get_password_hasher().hash(new_password)
             user.password_reset_token = None
             user.password_reset_expires = None
             user.failed_login_attempts = 0  # Reset failed attempts
             
             session.commit()
+            bump_token_version(user.id)
             
             return {'success': True, 'message': 'Password reset successfully'}
             
+        except PasswordHasherBusy:
+            raise  # Callers answer 503 + Retry-After
         except Exception as e:
             logger.error(f"Password reset error: {str(e)}")
             return {'success': False, 'error': 'Password reset failed'}
@@ -36,3 +36,9 @@ class Config:
     
     # Frontend URL for CORS
     FRONTEND_URL = os.getenv('FRONTEND_URL', 'http://localhost:5173')
+    
+    # Admin settings file (services/settings_store)
+    ADMIN_SETTINGS_FILE = os.getenv(
+        'ADMIN_SETTINGS_FILE',
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config', 'settings.json')
+    )
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the CourtListener dockets API
+
+Serves generated dockets with cursor pagination so the collector can be
+exercised offline:
+
+    python -m data_integration.courtlistener_stub --port 8765
+    COURTLISTENER_BASE_URL=http://127.0.0.1:8765/api/rest/v4/ python -m data_integration.real_data_collector
+"""
+
+import argparse
+import json
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlencode, urlparse
+
+logger = logging.getLogger(__name__)
+
+API_PREFIX = '/api/rest/v4/'
+COURTS = {
+    'nysd': 'Southern District of New York',
+    'cand': 'Northern District of California',
+    'ca9': 'Court of Appeals for the Ninth Circuit',
+}
+NATURES = ['Contract', 'Patent', 'Securities', 'Civil Rights', 'Employment']
+
+
+def make_dockets(total: int) -> List[Dict]:
+    """Deterministic dockets spread across COURTS, newest first"""
+    court_ids = list(COURTS)
+    dockets = []
+    for i in range(total):
+        court_id = court_ids[i % len(court_ids)]
+        dockets.append({
+            'id': i + 1,
+            'case_name': f'Plaintiff {i} v. Defendant {i}',
+            'docket_number': f'1:24-cv-{i:05d}',
+            'court_id': court_id,
+            'court': {'id': court_id, 'full_name': COURTS[court_id]},
+            'date_filed': f'2024-{12 - i % 12:02d}-{1 + i % 28:02d}',
+            'nature_of_suit': NATURES[i % len(NATURES)],
+            'status': 'open',
+            'parties': [{'name': f'Plaintiff {i}', 'attorneys': [
+                {'name': f'Counsel {i}', 'organizations': [{'name': f'Firm {i % 7} LLP'}]}
+            ]}],
+        })
+    return dockets
+
+
+class StubCourtListener:
+    """Threaded HTTP server answering GET {API_PREFIX}dockets/"""
+
+    def __init__(self, total: int = 120, host: str = '127.0.0.1', port: int = 0):
+        self.dockets = make_dockets(total)
+        self.requests: List[str] = []
+        # cursor -> number of times to answer 500 before succeeding
+        self.failures: Dict[int, int] = {}
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}{API_PREFIX}'
+
+    def fail(self, cursor: int, times: int = 1):
+        """Answer the page starting at `cursor` with HTTP 500 `times` times"""
+        self.failures[cursor] = times
+
+    def page(self, path: str, query: Dict[str, List[str]]) -> Optional[Dict]:
+        if path.rstrip('/') != f'{API_PREFIX}dockets':
+            return None
+        court = query.get('court', [None])[0]
+        page_size = int(query.get('page_size', ['20'])[0])
+        cursor = int(query.get('cursor', ['0'])[0])
+        rows = [d for d in self.dockets if court is None or d['court_id'] == court]
+
+        next_url = None
+        if cursor + page_size < len(rows):
+            params = {k: v[0] for k, v in query.items()}
+            params['cursor'] = cursor + page_size
+            next_url = f"{self.base_url}dockets/?{urlencode(sorted(params.items()))}"
+        return {'count': len(rows), 'next': next_url, 'previous': None,
+                'results': rows[cursor:cursor + page_size]}
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.requests.append(self.path)
+                parsed = urlparse(self.path)
+                query = parse_qs(parsed.query)
+                cursor = int(query.get('cursor', ['0'])[0])
+                if stub.failures.get(cursor, 0) > 0:
+                    stub.failures[cursor] -= 1
+                    return self._send(500, {'detail': 'stub failure'})
+                body = stub.page(parsed.path, query)
+                if body is None:
+                    return self._send(404, {'detail': 'Not found.'})
+                self._send(200, body)
+
+            def _send(self, status: int, body: Dict):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                logger.debug(format, *args)
+
+        return Handler
+
+    def start(self) -> 'StubCourtListener':
+        self._thread = threading.Thread(target=self._server.serve_forever, name='courtlistener-stub', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve stub CourtListener dockets')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--total', type=int, default=1000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    stub = StubCourtListener(total=args.total, port=args.port)
+    logger.info(f"Serving {args.total} dockets at {stub.base_url}")
+    try:
+        stub._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
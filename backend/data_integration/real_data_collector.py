@@ -682,21 +682,87 @@ if __name__ == "__main__":
     # Run the data collection
     logging.basicConfig(level=logging.INFO)
     asyncio.run(collect_and_save_data())
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from pathlib import Path
 import os
-from urllib.parse import urljoin, quote_plus
+from urllib.parse import urljoin, quote_plus, urlencode
 from bs4 import BeautifulSoup
 import re
 from dataclasses import dataclass, asdict
 import sqlite3
+from contextlib import closing
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import hashlib
 
+try:
+    from services.case_search_index import install_case_index
+    CASE_INDEX_AVAILABLE = True
+except ImportError:
+    CASE_INDEX_AVAILABLE = False
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+COURTLISTENER_BASE_URL = os.getenv('COURTLISTENER_BASE_URL', 'https://www.courtlistener.com/api/rest/v4/')
+COURTLISTENER_RATE_PER_SEC = float(os.getenv('COURTLISTENER_RATE_PER_SEC', '1.0'))
+COURTLISTENER_BURST = int(os.getenv('COURTLISTENER_BURST', '2'))
+ENDPOINT_CONCURRENCY = int(os.getenv('COURTLISTENER_ENDPOINT_CONCURRENCY', '2'))
+REQUEST_ATTEMPTS = 3
+
+
+class TokenBucket:
+    """Async token bucket: `rate` requests per second with bursts up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: int = 1):
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = None
+
+    async def acquire(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class RetryableResponse(Exception):
+    """429/5xx from the API; retried after `retry_after` seconds"""
+
+    def __init__(self, status: int, retry_after: float = 0.0):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+def _upsert(conn: sqlite3.Connection, table: str, columns: List[str], rows: List[tuple]):
+    """executemany INSERT ... ON CONFLICT(id) DO UPDATE; keeps created_at of existing rows"""
+    if not rows:
+        return
+    updates = ', '.join(f'{column} = excluded.{column}' for column in columns if column != 'id')
+    conn.executemany(
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+        f"ON CONFLICT(id) DO UPDATE SET {updates}",
+        rows
+    )
+
+
+CASE_COLUMNS = ['id', 'case_name', 'docket_number', 'court', 'filed_date', 'case_type', 'nature_of_suit',
+                'parties', 'attorneys', 'law_firms', 'status', 'estimated_value', 'complexity_score']
+ATTORNEY_COLUMNS = ['id', 'name', 'bar_number', 'law_firm', 'practice_areas', 'years_experience',
+                    'location', 'bar_admissions', 'education', 'ratings', 'case_count']
+RATE_COLUMNS = ['id', 'law_firm', 'attorney_role', 'hourly_rate', 'currency', 'location',
+                'practice_area', 'year', 'source']
+
 @dataclass
 class LegalCase:
     """Structure for legal case data"""
@@ -742,7 +808,8 @@ class LegalRateCard:
 class RealDataCollector:
     """Collects real legal data from multiple sources"""
     
-    def __init__(self, data_dir: str = "data/real_world"):
+    def __init__(self, data_dir: str = "data/real_world", base_url: Optional[str] = None,
+                 rate_per_sec: Optional[float] = None, endpoint_concurrency: Optional[int] = None):
         self.data_dir = Path(data_dir)
         self.data_dir.mkdir(parents=True, exist_ok=True)
         
@@ -750,22 +817,21 @@ class RealDataCollector:
         self.db_path = self.data_dir / "legal_data.db"
         self.init_database()
         
-        # Rate limiting
-        self.request_delay = 1.0  # 1 second between requests
-        self.last_request_time = 0
+        # Rate limiting: one bucket shared by every request, plus a cap on
+        # in-flight requests per endpoint
+        self.rate_limiter = TokenBucket(rate_per_sec or COURTLISTENER_RATE_PER_SEC, COURTLISTENER_BURST)
+        self.endpoint_concurrency = endpoint_concurrency or ENDPOINT_CONCURRENCY
+        self.retry_backoff = 1.0
         
-        # Session for requests
-        self.session = requests.Session()
-        self.session.headers.update({
+        self.headers = {
             'User-Agent': 'LAIT Legal Intelligence Platform - Academic Research'
-        })
+        }
         
         # CourtListener API setup
+        self.courtlistener_base_url = base_url or COURTLISTENER_BASE_URL
         self.courtlistener_token = os.getenv('COURTLISTENER_API_TOKEN')
         if self.courtlistener_token:
-            self.session.headers.update({
-                'Authorization': f'Token {self.courtlistener_token}'
-            })
+            self.headers['Authorization'] = f'Token {self.courtlistener_token}'
     
     def init_database(self):
         """Initialize SQLite database for collected data"""
@@ -825,64 +891,192 @@ class RealDataCollector:
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )
             ''')
-            
+
+            # Resume points for paginated collection, one row per stream
+            # (endpoint + filters). cursor is the next page URL to fetch.
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS collection_checkpoints (
+                    stream TEXT PRIMARY KEY,
+                    cursor TEXT,
+                    status TEXT,
+                    pages INTEGER DEFAULT 0,
+                    items INTEGER DEFAULT 0,
+                    last_error TEXT,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+
             conn.commit()
+            
+            # Full-text index on cases, maintained by triggers as rows are saved
+            if CASE_INDEX_AVAILABLE:
+                install_case_index(conn)
     
-    def _rate_limit(self):
-        """Implement rate limiting for API requests"""
-        current_time = time.time()
-        time_since_last = current_time - self.last_request_time
-        if time_since_last < self.request_delay:
-            time.sleep(self.request_delay - time_since_last)
-        self.last_request_time = time.time()
+    @staticmethod
+    def _case_id(case: LegalCase) -> str:
+        return hashlib.md5(f"{case.case_name}{case.docket_number}".encode()).hexdigest()
     
-    def collect_courtlistener_cases(self, limit: int = 1000) -> List[LegalCase]:
-        """Collect real case data from CourtListener API"""
-        logger.info(f"Collecting {limit} cases from CourtListener...")
-        
-        cases = []
-        base_url = "https://www.courtlistener.com/api/rest/v4/dockets/"
-        
-        # Collect cases from different courts and time periods
-        params = {
-            'format': 'json',
-            'ordering': '-date_filed',
-            'page_size': 50
-        }
-        
-        pages_needed = (limit // 50) + 1
-        
-        for page in range(1, pages_needed + 1):
-            params['page'] = page
-            self._rate_limit()
-            
+    def _stream(self, endpoint: str, params: Dict[str, Any]) -> Tuple[str, str]:
+        """Checkpoint key and first-page URL for one paginated endpoint + filter set"""
+        query = urlencode(sorted(params.items()))
+        return f"{endpoint}?{query}", urljoin(self.courtlistener_base_url, f"{endpoint}/") + f"?{query}"
+    
+    def get_checkpoint(self, stream: str) -> Optional[Dict[str, Any]]:
+        with closing(sqlite3.connect(self.db_path)) as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute("SELECT * FROM collection_checkpoints WHERE stream = ?", (stream,)).fetchone()
+        return dict(row) if row else None
+    
+    def reset_checkpoints(self):
+        """Forget all resume points; the next run starts from the first page"""
+        with closing(sqlite3.connect(self.db_path)) as conn, conn:
+            conn.execute("DELETE FROM collection_checkpoints")
+    
+    def _commit_page(self, conn: sqlite3.Connection, stream: str, cases: List[LegalCase],
+                     cursor: Optional[str], status: str):
+        """Upsert a page of cases and advance its checkpoint in one transaction"""
+        with conn:
+            _upsert(conn, 'cases', CASE_COLUMNS, [self._case_row(case) for case in cases])
+            conn.execute('''
+                INSERT INTO collection_checkpoints (stream, cursor, status, pages, items, last_error, updated_at)
+                VALUES (?, ?, ?, 1, ?, NULL, CURRENT_TIMESTAMP)
+                ON CONFLICT(stream) DO UPDATE SET
+                    cursor = excluded.cursor, status = excluded.status, pages = pages + 1,
+                    items = items + excluded.items, last_error = NULL, updated_at = CURRENT_TIMESTAMP
+            ''', (stream, cursor, status, len(cases)))
+    
+    def _mark_failed(self, conn: sqlite3.Connection, stream: str, first_url: str, error: str):
+        """Record a failed stream without moving its cursor"""
+        with conn:
+            conn.execute('''
+                INSERT INTO collection_checkpoints (stream, cursor, status, last_error, updated_at)
+                VALUES (?, ?, 'failed', ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(stream) DO UPDATE SET
+                    status = 'failed', last_error = excluded.last_error, updated_at = CURRENT_TIMESTAMP
+            ''', (stream, first_url, error))
+    
+    async def _get_json(self, session: 'aiohttp.ClientSession', url: str) -> Dict:
+        """GET with retries on connection errors, 429 and 5xx (honouring Retry-After)"""
+        for attempt in range(REQUEST_ATTEMPTS):
+            retry_after = 0.0
             try:
-                response = self.session.get(base_url, params=params)
-                response.raise_for_status()
-                data = response.json()
-                
-                if 'results' not in data:
-                    break
-                
-                for case_data in data['results']:
-                    case = self._parse_courtlistener_case(case_data)
-                    if case:
-                        cases.append(case)
-                
-                logger.info(f"Collected {len(cases)} cases so far...")
-                
-                if not data.get('next'):
-                    break
-                    
-            except requests.exceptions.RequestException as e:
-                logger.error(f"Error fetching cases from CourtListener: {e}")
-                break
-        
-        # Save to database
-        self._save_cases_to_db(cases)
+                async with session.get(url) as response:
+                    if response.status == 429 or response.status >= 500:
+                        raise RetryableResponse(response.status, float(response.headers.get('Retry-After') or 0))
+                    response.raise_for_status()
+                    return await response.json()
+            except aiohttp.ClientResponseError:
+                raise
+            except (aiohttp.ClientError, asyncio.TimeoutError, RetryableResponse) as e:
+                if attempt == REQUEST_ATTEMPTS - 1:
+                    raise
+                if isinstance(e, RetryableResponse):
+                    retry_after = e.retry_after
+                logger.warning(f"Retrying {url} after {e}")
+                await asyncio.sleep(max(retry_after, self.retry_backoff * 2 ** attempt))
+    
+    async def _fetch_stream(self, session, endpoint: str, stream: str, first_url: str, resume: bool,
+                            semaphore: asyncio.Semaphore, pages: asyncio.Queue, stop: asyncio.Event):
+        """Follow `next` links for one stream, handing parsed pages to the writer"""
+        checkpoint = self.get_checkpoint(stream) if resume else None
+        url = first_url
+        if checkpoint and checkpoint['status'] != 'complete' and checkpoint['cursor']:
+            url = checkpoint['cursor']
+            logger.info(f"Resuming {stream} from checkpoint ({checkpoint['pages']} pages done)")
         
-        logger.info(f"Successfully collected {len(cases)} cases from CourtListener")
-        return cases
+        try:
+            while url and not stop.is_set():
+                async with semaphore:
+                    await self.rate_limiter.acquire()
+                    data = await self._get_json(session, url)
+                
+                cases = [case for case in map(self._parse_courtlistener_case, data.get('results') or []) if case]
+                await pages.put(('page', stream, url, data.get('next'), cases))
+                url = data.get('next')
+        except Exception as e:
+            logger.error(f"Error fetching {endpoint} from CourtListener: {e}")
+            await pages.put(('failed', stream, first_url, str(e)))
+    
+    async def _write_pages(self, conn: sqlite3.Connection, pages: asyncio.Queue, limit: int,
+                           stop: asyncio.Event, summary: Dict[str, Any]):
+        """Single writer: commits pages in arrival order until `limit` cases are stored"""
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await pages.get()
+            if item is None:
+                return
+            if item[0] == 'failed':
+                _, stream, first_url, error = item
+                await loop.run_in_executor(None, self._mark_failed, conn, stream, first_url, error)
+                summary['failed'].append(stream)
+                continue
+            if stop.is_set():
+                continue  # drain so fetchers blocked on put() can exit
+            
+            _, stream, page_url, next_url, cases = item
+            remaining = limit - summary['stored']
+            # A truncated page is fetched again on resume; upserts make that harmless
+            cursor = next_url if len(cases) <= remaining else page_url
+            cases = cases[:remaining]
+            status = 'in_progress' if cursor else 'complete'
+            await loop.run_in_executor(None, self._commit_page, conn, stream, cases, cursor, status)
+            
+            summary['cases'].extend(cases)
+            summary['stored'] += len(cases)
+            summary['pages'] += 1
+            logger.info(f"Collected {summary['stored']} cases so far...")
+            if summary['stored'] >= limit:
+                stop.set()
+    
+    async def collect_courtlistener_cases_async(self, limit: int = 1000, courts: Optional[List[str]] = None,
+                                                resume: bool = True, page_size: int = 50) -> Dict[str, Any]:
+        """
+        Checkpointed CourtListener docket collection.
+        
+        One stream per court (or a single unfiltered stream) follows the API's
+        cursor links; streams run concurrently under the shared token bucket and
+        a per-endpoint concurrency cap. A single writer upserts each page and
+        advances that stream's checkpoint in the same transaction, so an
+        interrupted run resumes from the last stored page.
+        """
+        endpoint = 'dockets'
+        streams = []
+        for court in courts or [None]:
+            params = {'format': 'json', 'ordering': '-date_filed', 'page_size': page_size}
+            if court:
+                params['court'] = court
+            streams.append(self._stream(endpoint, params))
+        
+        summary = {'stored': 0, 'pages': 0, 'cases': [], 'failed': []}
+        semaphore = asyncio.Semaphore(self.endpoint_concurrency)
+        pages: asyncio.Queue = asyncio.Queue(maxsize=max(2, self.endpoint_concurrency * 2))
+        stop = asyncio.Event()
+        
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        try:
+            timeout = aiohttp.ClientTimeout(total=60)
+            async with aiohttp.ClientSession(headers=self.headers, timeout=timeout) as session:
+                writer = asyncio.create_task(self._write_pages(conn, pages, limit, stop, summary))
+                await asyncio.gather(*(
+                    self._fetch_stream(session, endpoint, stream, first_url, resume, semaphore, pages, stop)
+                    for stream, first_url in streams
+                ))
+                await pages.put(None)
+                await writer
+        finally:
+            conn.close()
+        
+        logger.info(f"Successfully collected {summary['stored']} cases from CourtListener "
+                    f"({summary['pages']} pages, {len(summary['failed'])} failed streams)")
+        return summary
+    
+    def collect_courtlistener_cases(self, limit: int = 1000, courts: Optional[List[str]] = None,
+                                    resume: bool = True) -> List[LegalCase]:
+        """Collect real case data from CourtListener API"""
+        logger.info(f"Collecting {limit} cases from CourtListener...")
+        summary = asyncio.run(self.collect_courtlistener_cases_async(limit, courts=courts, resume=resume))
+        return summary['cases']
     
     def _parse_courtlistener_case(self, case_data: Dict) -> Optional[LegalCase]:
         """Parse CourtListener case data into our structure"""
@@ -950,7 +1144,8 @@ class RealDataCollector:
             score += 2
         
         # Court level (federal courts are typically more complex)
-        court_name = case_data.get('court', {}).get('full_name', '').lower()
+        court = case_data.get('court') or {}
+        court_name = (court.get('full_name', '') if isinstance(court, dict) else str(court)).lower()
         if 'supreme' in court_name:
             score += 3
         elif 'circuit' in court_name or 'appeal' in court_name:
@@ -1093,74 +1288,43 @@ class RealDataCollector:
         
         return multipliers.get(location, 1.0)
     
+    def _case_row(self, case: LegalCase) -> tuple:
+        return (
+            self._case_id(case), case.case_name, case.docket_number, case.court,
+            case.filed_date, case.case_type, case.nature_of_suit,
+            json.dumps(case.parties), json.dumps(case.attorneys),
+            json.dumps(case.law_firms), case.status,
+            case.estimated_value, case.complexity_score
+        )
+    
     def _save_cases_to_db(self, cases: List[LegalCase]):
         """Save cases to database"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            
-            for case in cases:
-                case_id = hashlib.md5(f"{case.case_name}{case.docket_number}".encode()).hexdigest()
-                
-                cursor.execute('''
-                    INSERT OR REPLACE INTO cases (
-                        id, case_name, docket_number, court, filed_date,
-                        case_type, nature_of_suit, parties, attorneys,
-                        law_firms, status, estimated_value, complexity_score
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    case_id, case.case_name, case.docket_number, case.court,
-                    case.filed_date, case.case_type, case.nature_of_suit,
-                    json.dumps(case.parties), json.dumps(case.attorneys),
-                    json.dumps(case.law_firms), case.status,
-                    case.estimated_value, case.complexity_score
-                ))
-            
-            conn.commit()
+        with closing(sqlite3.connect(self.db_path)) as conn, conn:
+            _upsert(conn, 'cases', CASE_COLUMNS, [self._case_row(case) for case in cases])
     
     def _save_attorneys_to_db(self, attorneys: List[AttorneyProfile]):
         """Save attorneys to database"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            
-            for attorney in attorneys:
-                attorney_id = hashlib.md5(f"{attorney.name}{attorney.law_firm}".encode()).hexdigest()
-                
-                cursor.execute('''
-                    INSERT OR REPLACE INTO attorneys (
-                        id, name, bar_number, law_firm, practice_areas,
-                        years_experience, location, bar_admissions,
-                        education, ratings, case_count
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    attorney_id, attorney.name, attorney.bar_number,
-                    attorney.law_firm, json.dumps(attorney.practice_areas),
-                    attorney.years_experience, attorney.location,
-                    json.dumps(attorney.bar_admissions), json.dumps(attorney.education),
-                    json.dumps(attorney.ratings), attorney.case_count
-                ))
-            
-            conn.commit()
+        rows = [(
+            hashlib.md5(f"{attorney.name}{attorney.law_firm}".encode()).hexdigest(),
+            attorney.name, attorney.bar_number,
+            attorney.law_firm, json.dumps(attorney.practice_areas),
+            attorney.years_experience, attorney.location,
+            json.dumps(attorney.bar_admissions), json.dumps(attorney.education),
+            json.dumps(attorney.ratings), attorney.case_count
+        ) for attorney in attorneys]
+        with closing(sqlite3.connect(self.db_path)) as conn, conn:
+            _upsert(conn, 'attorneys', ATTORNEY_COLUMNS, rows)
     
     def _save_rates_to_db(self, rates: List[LegalRateCard]):
         """Save rate cards to database"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            
-            for rate in rates:
-                rate_id = hashlib.md5(f"{rate.law_firm}{rate.attorney_role}{rate.location}".encode()).hexdigest()
-                
-                cursor.execute('''
-                    INSERT OR REPLACE INTO rate_cards (
-                        id, law_firm, attorney_role, hourly_rate, currency,
-                        location, practice_area, year, source
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    rate_id, rate.law_firm, rate.attorney_role,
-                    rate.hourly_rate, rate.currency, rate.location,
-                    rate.practice_area, rate.year, rate.source
-                ))
-            
-            conn.commit()
+        rows = [(
+            hashlib.md5(f"{rate.law_firm}{rate.attorney_role}{rate.location}".encode()).hexdigest(),
+            rate.law_firm, rate.attorney_role,
+            rate.hourly_rate, rate.currency, rate.location,
+            rate.practice_area, rate.year, rate.source
+        ) for rate in rates]
+        with closing(sqlite3.connect(self.db_path)) as conn, conn:
+            _upsert(conn, 'rate_cards', RATE_COLUMNS, rows)
     
     def get_collected_data_summary(self) -> Dict:
         """Get summary of collected data"""
@@ -7,7 +7,15 @@ and integrate them into the LAIT system for enhanced vendor management and analy
 
 import pandas as pd
 import numpy as np
+import csv
+import glob
+import io
 import re
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
 from typing import List, Dict, Optional
 import logging
 from pathlib import Path
@@ -16,6 +24,165 @@ from pathlib import Path
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+NAME_KEYWORDS = ['law', 'legal', 'attorney', 'counsel', 'esq']
+
+
+@lru_cache(maxsize=8)
+def _compile_matcher(keywords: tuple) -> re.Pattern:
+    """Compile one case-insensitive alternation per keyword set (cached per process)"""
+    return re.compile('|'.join(re.escape(keyword) for keyword in keywords), re.IGNORECASE)
+
+
+def filter_legal_chunk(df: pd.DataFrame, legal_keywords: tuple) -> pd.DataFrame:
+    """Keep rows whose industry or name matches the legal keyword matchers"""
+    mask = np.zeros(len(df), dtype=bool)
+    
+    # Check industry column
+    if 'industry' in df.columns:
+        mask |= df['industry'].str.contains(_compile_matcher(legal_keywords), na=False).values
+    
+    # Check company name for additional legal indicators
+    if 'name' in df.columns:
+        mask |= df['name'].str.contains(_compile_matcher(tuple(NAME_KEYWORDS)), na=False).values
+    
+    return df.loc[mask].reset_index(drop=True)
+
+
+def _write_matches(legal_chunk: pd.DataFrame, part_name: str, output_dir: str,
+                   partition_by: Optional[str]):
+    """Write one filtered chunk as a Parquet part (hive-partitioned when partition_by is set)"""
+    if partition_by and partition_by in legal_chunk.columns:
+        legal_chunk[partition_by] = legal_chunk[partition_by].fillna('unknown')
+        legal_chunk.to_parquet(output_dir, partition_cols=[partition_by], index=False,
+                               basename_template=f"{part_name}-{{i}}.parquet")
+    else:
+        legal_chunk.to_parquet(os.path.join(output_dir, f"{part_name}.parquet"), index=False)
+
+
+class _ByteRange:
+    """Read-only file view that ends at a byte offset, so read_csv stops there"""
+
+    def __init__(self, f, end: int):
+        self._f = f
+        self._end = end
+
+    def read(self, size: int = -1) -> bytes:
+        remaining = self._end - self._f.tell()
+        if remaining <= 0:
+            return b''
+        return self._f.read(remaining if size is None or size < 0 else min(size, remaining))
+
+
+def _record_starts(f, targets: List[int], block_size: int = 1 << 20) -> List[int]:
+    """
+    First record start at or after each target offset (ascending), scanning from offset 0
+
+    A newline ends a record only outside a quoted field. CSV escapes quotes
+    by doubling them, so the quote count's parity says whether a position
+    is inside quotes.
+    """
+    starts: List[int] = []
+    pending = iter(targets)
+    target = next(pending, None)
+    quoted = False
+    offset = 0
+    f.seek(0)
+    while target is not None:
+        block = f.read(block_size)
+        if not block:
+            break
+        pos = 0
+        while target is not None:
+            search_from = max(pos, target - offset)
+            if search_from >= len(block):
+                break
+            quoted ^= bool(block.count(b'"', pos, search_from) & 1)
+            pos = search_from
+            newline = block.find(b'\n', pos)
+            if newline < 0:
+                break
+            quoted ^= bool(block.count(b'"', pos, newline) & 1)
+            pos = newline + 1
+            if not quoted:
+                starts.append(offset + pos)
+                while target is not None and target < starts[-1]:
+                    target = next(pending, None)
+        quoted ^= bool(block.count(b'"', pos) & 1)
+        offset += len(block)
+    return starts
+
+
+def csv_byte_ranges(csv_path: str, parts: int):
+    """
+    Split a CSV body into about `parts` byte ranges that start and end on record boundaries
+
+    Boundaries honour quoted fields that span lines, so every range parses on
+    its own. Finding them takes one pass counting quote bytes, far cheaper
+    than parsing the file.
+    """
+    size = os.path.getsize(csv_path)
+    with open(csv_path, 'rb') as f:
+        header_end = _record_starts(f, [0])
+        body_start = header_end[0] if header_end else size
+        f.seek(0)
+        header = next(csv.reader(io.StringIO(f.read(body_start).decode('utf-8'))))
+        step = max(1, (size - body_start) // max(1, parts))
+        targets = list(range(body_start + step, size, step))
+        bounds = [body_start] + [start for start in _record_starts(f, targets) if start < size]
+    bounds.append(size)
+    return header, list(zip(bounds[:-1], bounds[1:]))
+
+
+def clear_parts(output_dir: str):
+    """Remove Parquet parts left by an earlier run (flat or hive-partitioned)"""
+    for root, dirs, files in os.walk(output_dir, topdown=False):
+        for name in files:
+            if name.startswith('part-') and name.endswith('.parquet'):
+                os.remove(os.path.join(root, name))
+        if root != output_dir and '=' in os.path.basename(root) and not os.listdir(root):
+            os.rmdir(root)
+
+
+def iter_parquet_parts(output_dir: str, skip_rows: int = 0):
+    """
+    Yield (rows_read, chunk) for the flat part files of filter_to_parquet, in input order
+
+    rows_read counts matched rows consumed so far, like iter_legal_company_chunks,
+    so callers can checkpoint it and resume with skip_rows.
+    """
+    rows_read = 0
+    for path in sorted(glob.glob(os.path.join(output_dir, 'part-*.parquet'))):
+        chunk = pd.read_parquet(path)
+        if rows_read + len(chunk) <= skip_rows:
+            rows_read += len(chunk)
+            continue
+        if rows_read < skip_rows:
+            chunk = chunk.iloc[skip_rows - rows_read:].reset_index(drop=True)
+            rows_read = skip_rows
+        rows_read += len(chunk)
+        yield rows_read, chunk
+
+
+def _filter_range_to_parquet(csv_path: str, columns: List[str], start: int, end: int,
+                             range_num: int, chunk_size: int, legal_keywords: tuple,
+                             output_dir: str, partition_by: Optional[str]) -> Dict:
+    """Process-pool worker: stream one byte range in chunks, filter each and write its matches"""
+    result = {'rows': 0, 'matched': 0, 'chunks': 0}
+    with open(csv_path, 'rb') as f:
+        f.seek(start)
+        chunks = pd.read_csv(_ByteRange(f, end), names=columns, header=None, chunksize=chunk_size,
+                             low_memory=False, on_bad_lines='skip', dtype=str)
+        for chunk_num, chunk in enumerate(chunks):
+            legal_chunk = filter_legal_chunk(chunk, legal_keywords)
+            if not legal_chunk.empty:
+                _write_matches(legal_chunk, f"part-{range_num:05d}-{chunk_num:06d}", output_dir,
+                               partition_by)
+            result['rows'] += len(chunk)
+            result['matched'] += len(legal_chunk)
+            result['chunks'] += 1
+    return result
+
+
 class CompanyDataProcessor:
     """Process company dataset for legal service providers"""
     
@@ -28,73 +195,88 @@ class CompanyDataProcessor:
             'real estate law', 'tax law', 'criminal law', 'family law'
         ]
         
-    def load_and_filter_legal_companies(self) -> pd.DataFrame:
-        """Load CSV and filter for legal service companies"""
+    def iter_legal_company_chunks(self, chunk_size: int = 50000, skip_rows: int = 0):
+        """
+        Yield (rows_read, legal_chunk) for each raw CSV chunk
+
+        rows_read counts raw rows consumed so far (including skip_rows), so
+        callers can checkpoint it and resume with skip_rows later.
+        """
+        rows_read = skip_rows
+        for chunk in pd.read_csv(
+            self.csv_path, 
+            chunksize=chunk_size,
+            low_memory=False,
+            on_bad_lines='skip',  # Skip problematic lines
+            dtype=str,  # Read all as string to avoid type issues
+            skiprows=range(1, skip_rows + 1) if skip_rows else None
+        ):
+            rows_read += len(chunk)
+            yield rows_read, self._filter_legal_companies(chunk)
+    
+    def load_and_filter_legal_companies(self, max_workers: Optional[int] = None) -> pd.DataFrame:
+        """Load CSV and filter for legal service companies (on a process pool, in input order)"""
         logger.info(f"Loading company data from {self.csv_path}")
         
-        # Read in chunks due to large file size
-        chunk_size = 50000
-        legal_companies = []
+        with tempfile.TemporaryDirectory(prefix='legal-companies-') as output_dir:
+            self.filter_to_parquet(output_dir, max_workers=max_workers)
+            legal_companies = [chunk for _, chunk in iter_parquet_parts(output_dir)]
         
-        try:
-            for chunk_num, chunk in enumerate(pd.read_csv(
-                self.csv_path, 
-                chunksize=chunk_size,
-                low_memory=False,
-                on_bad_lines='skip',  # Skip problematic lines
-                dtype=str  # Read all as string to avoid type issues
-            )):
-                logger.info(f"Processing chunk {chunk_num + 1}")
-                
-                # Filter for legal companies
-                legal_chunk = self._filter_legal_companies(chunk)
-                if not legal_chunk.empty:
-                    legal_companies.append(legal_chunk)
-                    
-                # Log progress every 100 chunks
-                if (chunk_num + 1) % 100 == 0:
-                    logger.info(f"Processed {(chunk_num + 1) * chunk_size} records")
-            
-            if legal_companies:
-                result_df = pd.concat(legal_companies, ignore_index=True)
-                logger.info(f"Found {len(result_df)} legal service companies")
-                return result_df
-            else:
-                logger.warning("No legal companies found")
-                return pd.DataFrame()
-                
-        except Exception as e:
-            logger.error(f"Error processing data: {str(e)}")
-            raise
+        if legal_companies:
+            result_df = pd.concat(legal_companies, ignore_index=True)
+            logger.info(f"Found {len(result_df)} legal service companies")
+            return result_df
+        logger.warning("No legal companies found")
+        return pd.DataFrame()
     
     def _filter_legal_companies(self, df: pd.DataFrame) -> pd.DataFrame:
         """Filter dataframe for legal service companies"""
-        # Reset index to avoid alignment issues
-        df = df.reset_index(drop=True)
+        return filter_legal_chunk(df, tuple(self.legal_keywords))
+    
+    def filter_to_parquet(self, output_dir: str, chunk_size: int = 50000,
+                          max_workers: Optional[int] = None,
+                          partition_by: Optional[str] = None) -> Dict:
+        """
+        Filter the raw CSV on a process pool and stream matches to Parquet
         
-        # Create mask for legal companies
-        mask = pd.Series([False] * len(df), index=df.index)
+        The parent only splits the file into byte ranges on record boundaries.
+        Each worker streams its range with read_csv(chunksize=...), runs the
+        matchers and writes one part file per chunk (or a hive-partitioned
+        dataset when partition_by is set). Parsing scales with the workers
+        and each holds at most one chunk, so peak memory is bounded
+        regardless of input size. Flat part names sort in input order.
+        Parts from an earlier run in output_dir are removed first.
+        """
+        max_workers = max_workers or os.cpu_count() or 1
+        os.makedirs(output_dir, exist_ok=True)
+        clear_parts(output_dir)
+        legal_keywords = tuple(self.legal_keywords)
+        # A few ranges per worker keeps the pool busy when ranges finish unevenly
+        columns, ranges = csv_byte_ranges(self.csv_path, max_workers * 4)
         
-        # Check industry column
-        if 'industry' in df.columns:
-            industry_mask = df['industry'].fillna('').str.contains(
-                '|'.join(self.legal_keywords), 
-                case=False, 
-                na=False
-            )
-            mask |= industry_mask
+        logger.info(f"Filtering {self.csv_path} into {output_dir} with {max_workers} workers")
+        started = time.monotonic()
+        summary = {'rows': 0, 'matched': 0, 'chunks': 0}
         
-        # Check company name for additional legal indicators
-        if 'name' in df.columns:
-            name_keywords = ['law', 'legal', 'attorney', 'counsel', 'esq']
-            name_mask = df['name'].fillna('').str.contains(
-                '|'.join(name_keywords), 
-                case=False, 
-                na=False
-            )
-            mask |= name_mask
-            
-        return df[mask].copy()
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(_filter_range_to_parquet, self.csv_path, columns, start, end,
+                                range_num, chunk_size, legal_keywords, output_dir, partition_by)
+                for range_num, (start, end) in enumerate(ranges)
+            ]
+            for future in as_completed(futures):
+                result = future.result()
+                for key in summary:
+                    summary[key] += result[key]
+                logger.info(f"Processed {summary['rows']} records, "
+                            f"{summary['matched']} legal matches")
+        
+        elapsed = time.monotonic() - started
+        summary['elapsed_seconds'] = round(elapsed, 2)
+        summary['rows_per_second'] = round(summary['rows'] / elapsed, 1) if elapsed > 0 else 0.0
+        logger.info(f"Found {summary['matched']} legal service companies in {summary['rows']} records "
+                    f"({summary['rows_per_second']:,.0f} rows/s)")
+        return summary
     
     def clean_and_standardize(self, df: pd.DataFrame) -> pd.DataFrame:
         """Clean and standardize the legal companies data"""
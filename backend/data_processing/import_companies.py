@@ -4,9 +4,14 @@ Imports the processed legal companies into the LAIT vendor management system
 """
 
 import pandas as pd
+import numpy as np
 import sys
 import os
-from sqlalchemy import create_engine
+import json
+import shutil
+import time
+from sqlalchemy import create_engine, func
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
 
@@ -16,6 +21,31 @@ sys.path.append('/app')
 
 from models.db_models import Base, Vendor
 from db.database import get_db_session
+from data_processing.company_data_processor import CompanyDataProcessor, iter_parquet_parts
+
+SAMPLE_CSV_PATH = '/app/backend/data_processing/legal_companies_sample.csv'
+DEFAULT_CHUNK_SIZE = 50000
+
+# Ordered keyword table shared by the scalar and vectorized categorizers
+PRACTICE_AREA_RULES = [
+    ('Corporate Law', ['corporate', 'business', 'commercial']),
+    ('Intellectual Property', ['intellectual property', 'ip', 'patent', 'trademark']),
+    ('Employment Law', ['employment', 'labor']),
+    ('Real Estate Law', ['real estate', 'property']),
+    ('Litigation', ['litigation', 'trial', 'dispute']),
+    ('Tax Law', ['tax']),
+    ('Criminal Law', ['criminal']),
+    ('Family Law', ['family', 'divorce']),
+    ('Immigration Law', ['immigration']),
+    ('Personal Injury', ['personal injury', 'accident']),
+]
+
+COMPANY_TIER_RULES = [
+    ('Large Law Firm', ['500+', '1000+', '5000+', '10000+']),
+    ('Mid-Size Law Firm', ['201-500', '501-1000']),
+    ('Small to Medium Law Firm', ['51-200', '11-50']),
+    ('Small Law Firm', ['1-10']),
+]
 
 def categorize_practice_area(industry: str, name: str = '') -> str:
     """Categorize companies into primary practice areas"""
@@ -29,28 +59,10 @@ def categorize_practice_area(industry: str, name: str = '') -> str:
     
     combined = f"{industry_lower} {name_lower}"
     
-    if any(keyword in combined for keyword in ['corporate', 'business', 'commercial']):
-        return 'Corporate Law'
-    elif any(keyword in combined for keyword in ['intellectual property', 'ip', 'patent', 'trademark']):
-        return 'Intellectual Property'
-    elif any(keyword in combined for keyword in ['employment', 'labor']):
-        return 'Employment Law'
-    elif any(keyword in combined for keyword in ['real estate', 'property']):
-        return 'Real Estate Law'
-    elif any(keyword in combined for keyword in ['litigation', 'trial', 'dispute']):
-        return 'Litigation'
-    elif any(keyword in combined for keyword in ['tax']):
-        return 'Tax Law'
-    elif any(keyword in combined for keyword in ['criminal']):
-        return 'Criminal Law'
-    elif any(keyword in combined for keyword in ['family', 'divorce']):
-        return 'Family Law'
-    elif any(keyword in combined for keyword in ['immigration']):
-        return 'Immigration Law'
-    elif any(keyword in combined for keyword in ['personal injury', 'accident']):
-        return 'Personal Injury'
-    else:
-        return 'General Practice'
+    for practice_area, keywords in PRACTICE_AREA_RULES:
+        if any(keyword in combined for keyword in keywords):
+            return practice_area
+    return 'General Practice'
 
 def estimate_company_tier(size: str, founded: str = None) -> str:
     """Estimate company tier based on available information"""
@@ -59,26 +71,18 @@ def estimate_company_tier(size: str, founded: str = None) -> str:
     
     size = str(size).lower()
     
-    # Large firms
-    if any(indicator in size for indicator in ['500+', '1000+', '5000+', '10000+']):
-        return 'Large Law Firm'
-    elif any(indicator in size for indicator in ['201-500', '501-1000']):
-        return 'Mid-Size Law Firm'
-    # Small/medium firms
-    elif any(indicator in size for indicator in ['51-200', '11-50']):
-        return 'Small to Medium Law Firm'
-    # Solo practitioners and very small firms
-    elif '1-10' in size:
-        return 'Small Law Firm'
-    else:
-        # Use founding year as additional indicator
-        try:
-            founded_year = int(founded) if founded and not pd.isna(founded) else None
-            if founded_year and founded_year < 1980:
-                return 'Established Law Firm'
-        except:
-            pass
-        return 'Law Firm'
+    for tier, indicators in COMPANY_TIER_RULES:
+        if any(indicator in size for indicator in indicators):
+            return tier
+    
+    # Use founding year as additional indicator
+    try:
+        founded_year = int(founded) if founded and not pd.isna(founded) else None
+        if founded_year and founded_year < 1980:
+            return 'Established Law Firm'
+    except:
+        pass
+    return 'Law Firm'
 
 def clean_website(website: str) -> str:
     """Clean and validate website URLs"""
@@ -93,112 +97,289 @@ def clean_website(website: str) -> str:
         
     return website
 
+
+def _contains_any(values: pd.Series, keywords) -> np.ndarray:
+    """Boolean mask of rows containing any of the (literal) keywords"""
+    return np.logical_or.reduce([values.str.contains(k, regex=False).values for k in keywords])
+
+def categorize_practice_areas(industry: pd.Series, name: pd.Series) -> pd.Series:
+    """Vectorized categorize_practice_area over whole columns"""
+    combined = industry.fillna('').astype(str).str.lower() + ' ' + name.fillna('').astype(str).str.lower()
+    conditions = [_contains_any(combined, keywords) for _, keywords in PRACTICE_AREA_RULES]
+    choices = [practice_area for practice_area, _ in PRACTICE_AREA_RULES]
+    return pd.Series(np.select(conditions, choices, default='General Practice'), index=industry.index)
+
+def estimate_company_tiers(size: pd.Series, founded: pd.Series) -> pd.Series:
+    """Vectorized estimate_company_tier over whole columns"""
+    size_lower = size.fillna('').astype(str).str.lower()
+    founded_year = pd.to_numeric(founded, errors='coerce')
+    conditions = [_contains_any(size_lower, indicators) for _, indicators in COMPANY_TIER_RULES]
+    conditions.append((founded_year < 1980).values)
+    choices = [tier for tier, _ in COMPANY_TIER_RULES] + ['Established Law Firm']
+    return pd.Series(np.select(conditions, choices, default='Law Firm'), index=size.index)
+
+def clean_websites(websites: pd.Series) -> pd.Series:
+    """Vectorized clean_website over a whole column"""
+    cleaned = websites.astype(str).str.strip().str.lower()
+    missing_protocol = ~cleaned.str.startswith(('http://', 'https://'))
+    cleaned = cleaned.where(~missing_protocol, 'https://' + cleaned)
+    return cleaned.where(websites.notna() & (websites != ''), None)
+
+def _title_or_none(values: pd.Series) -> pd.Series:
+    return values.astype(str).str.title().where(values.notna(), None)
+
+def build_vendor_records(df: pd.DataFrame) -> pd.DataFrame:
+    """Transform a chunk of company rows into Vendor column values"""
+    def column(name):
+        return df[name] if name in df.columns else pd.Series([None] * len(df), index=df.index, dtype=object)
+
+    founded = pd.to_numeric(column('founded'), errors='coerce')
+    now = datetime.utcnow()
+    records = pd.DataFrame({
+        'external_id': column('id'),
+        'name': _title_or_none(column('name')).fillna('Unknown'),
+        'vendor_type': 'Legal Service Provider',
+        'industry_category': column('industry'),
+        'practice_area': categorize_practice_areas(column('industry'), column('name')),
+        'firm_size_category': estimate_company_tiers(column('size'), column('founded')),
+        'employee_count': column('size'),
+        'founded_year': founded.astype('Int64'),
+        'country': _title_or_none(column('country')),
+        'state_province': _title_or_none(column('region')),
+        'city': _title_or_none(column('locality')),
+        'website': clean_websites(column('website')),
+        'linkedin_url': column('linkedin_url'),
+        'status': 'Prospect',
+        'data_source': 'Company Dataset',
+        'created_at': now,
+        'updated_at': now,
+    }, index=df.index)
+    # NaN/NA -> None so the DB driver receives NULLs
+    return records.astype(object).where(records.notna(), None)
+
+# Columns a re-import refreshes on an existing vendor; status and created_at belong to LAIT
+UPSERT_COLUMNS = [
+    'name', 'vendor_type', 'industry_category', 'practice_area', 'firm_size_category',
+    'employee_count', 'founded_year', 'country', 'state_province', 'city', 'website',
+    'linkedin_url', 'data_source', 'updated_at',
+]
+
+def _vendor_upsert(session):
+    """INSERT ... ON CONFLICT (external_id) DO UPDATE for the session's dialect"""
+    dialect = session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise ValueError(f"Bulk upsert not supported for dialect: {dialect}")
+    stmt = insert(Vendor.__table__)
+    return stmt.on_conflict_do_update(index_elements=['external_id'],
+                                      set_={name: stmt.excluded[name] for name in UPSERT_COLUMNS})
+
+def _write_records(session, stmt, records: list) -> list:
+    """Bulk upsert; if the batch fails, retry row by row and return the positions that failed"""
+    try:
+        with session.begin_nested():
+            session.execute(stmt, records)
+        return []
+    except SQLAlchemyError as e:
+        print(f"Bulk write failed, retrying {len(records)} rows individually: "
+              f"{str(e).splitlines()[0]}")
+
+    failed = []
+    for position, record in enumerate(records):
+        try:
+            with session.begin_nested():
+                session.execute(stmt, [record])
+        except SQLAlchemyError as e:
+            print(f"Skipping malformed row {record.get('external_id')!r}: {str(e).splitlines()[0]}")
+            failed.append(position)
+    return failed
+
+def _load_checkpoint(checkpoint_path: str, csv_path: str) -> dict:
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        with open(checkpoint_path, 'r') as f:
+            checkpoint = json.load(f)
+        if checkpoint.get('csv_path') == csv_path and not checkpoint.get('completed'):
+            return checkpoint
+    return {'csv_path': csv_path, 'rows_read': 0, 'imported': 0, 'updated': 0, 'skipped': 0,
+            'failed': 0, 'completed': False}
+
+def _save_checkpoint(checkpoint_path: str, checkpoint: dict):
+    if not checkpoint_path:
+        return
+    tmp_path = f"{checkpoint_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, checkpoint_path)
+
+def _iter_csv_chunks(csv_path: str, chunk_size: int, skip_rows: int):
+    """Yield (rows_read, chunk) for an already-filtered company CSV"""
+    rows_read = skip_rows
+    for chunk in pd.read_csv(csv_path, chunksize=chunk_size, dtype=str, on_bad_lines='skip',
+                             skiprows=range(1, skip_rows + 1) if skip_rows else None):
+        rows_read += len(chunk)
+        yield rows_read, chunk
+
+def bulk_import_legal_companies(csv_path: str = SAMPLE_CSV_PATH, prefiltered: bool = True,
+                                chunk_size: int = DEFAULT_CHUNK_SIZE,
+                                checkpoint_path: str = None, session=None,
+                                max_workers: int = None) -> dict:
+    """
+    Import companies chunk by chunk with in-memory dedup and bulk upserts
+
+    Rows whose external_id is already imported update that vendor; new rows
+    whose name matches an existing vendor are skipped. Malformed CSV lines
+    are dropped, and rows the database rejects are counted as failed without
+    aborting their chunk.
+
+    Args:
+        csv_path: Company CSV. With prefiltered=False it is the raw company
+            dataset: CompanyDataProcessor.filter_to_parquet first stages the
+            legal matches as Parquet parts (on max_workers processes) next to
+            it, and the import then streams those parts.
+        checkpoint_path: JSON file recording rows consumed; an interrupted
+            run restarts after the last committed chunk (without filtering
+            the raw dataset again).
+    Returns:
+        Summary with imported/updated/skipped/failed counts and throughput
+    """
+    checkpoint_path = checkpoint_path or f"{csv_path}.import_checkpoint.json"
+    checkpoint = _load_checkpoint(checkpoint_path, csv_path)
+    for key in ('updated', 'failed'):
+        checkpoint.setdefault(key, 0)  # checkpoints written before these counters
+    if checkpoint['rows_read']:
+        print(f"Resuming import after {checkpoint['rows_read']} rows")
+
+    owns_session = session is None
+    session = session or get_db_session()
+    started = time.monotonic()
+    rows_this_run = 0
+
+    try:
+        # Preload dedup keys once instead of one OR query per row
+        known_ids, known_names = set(), set()
+        for external_id, name in session.query(Vendor.external_id, Vendor.name):
+            if external_id:
+                known_ids.add(external_id)
+            if name:
+                known_names.add(name)
+
+        upsert_stmt = _vendor_upsert(session)
+
+        staged_dir = f"{csv_path}.legal_parquet"
+        if prefiltered:
+            chunk_iter = _iter_csv_chunks(csv_path, chunk_size, checkpoint['rows_read'])
+        elif checkpoint['rows_read'] and not checkpoint.get('filtered'):
+            # Resuming a run that counted raw rows: finish it on the serial filter
+            processor = CompanyDataProcessor(csv_path)
+            chunk_iter = processor.iter_legal_company_chunks(chunk_size,
+                                                             skip_rows=checkpoint['rows_read'])
+        else:
+            if not (checkpoint.get('filtered') and os.path.isdir(staged_dir)):
+                CompanyDataProcessor(csv_path).filter_to_parquet(staged_dir, chunk_size=chunk_size,
+                                                                 max_workers=max_workers)
+                checkpoint.update(filtered=True, rows_read=0)
+                _save_checkpoint(checkpoint_path, checkpoint)
+            chunk_iter = iter_parquet_parts(staged_dir, skip_rows=checkpoint['rows_read'])
+
+        for rows_read, chunk in chunk_iter:
+            chunk_started = time.monotonic()
+            records = build_vendor_records(chunk) if not chunk.empty else pd.DataFrame()
+
+            if not records.empty:
+                is_update = records['external_id'].isin(known_ids)
+                # One row per conflict key per statement (Postgres rejects touching a row twice)
+                duplicate = (records['external_id'].notna()
+                             & records.duplicated(subset=['external_id'], keep='last'))
+                name_taken = records['name'].isin(known_names) | records.duplicated(subset=['name'])
+                duplicate |= ~is_update & name_taken
+                records = records[~duplicate]
+                is_update = is_update[~duplicate]
+                checkpoint['skipped'] += int(duplicate.sum())
+
+                if not records.empty:
+                    failed = _write_records(session, upsert_stmt, records.to_dict('records'))
+                    written = pd.Series(True, index=records.index)
+                    written.iloc[failed] = False
+                    known_ids.update(v for v in records.loc[written, 'external_id'] if v)
+                    known_names.update(records.loc[written, 'name'])
+                    checkpoint['imported'] += int((written & ~is_update).sum())
+                    checkpoint['updated'] += int((written & is_update).sum())
+                    checkpoint['failed'] += len(failed)
+
+            session.commit()
+            rows_this_run += rows_read - checkpoint['rows_read']
+            checkpoint['rows_read'] = rows_read
+            _save_checkpoint(checkpoint_path, checkpoint)
+
+            elapsed = time.monotonic() - chunk_started
+            print(f"Rows read: {rows_read} | imported: {checkpoint['imported']} | "
+                  f"updated: {checkpoint['updated']} | skipped: {checkpoint['skipped']} | "
+                  f"failed: {checkpoint['failed']} | {len(chunk) / max(elapsed, 1e-6):,.0f} rows/s")
+
+        checkpoint['completed'] = True
+        _save_checkpoint(checkpoint_path, checkpoint)
+        if checkpoint.get('filtered'):
+            shutil.rmtree(staged_dir, ignore_errors=True)
+
+    except Exception as e:
+        session.rollback()
+        print(f"Import interrupted after {checkpoint['rows_read']} rows (resumable): {str(e)}")
+        raise
+    finally:
+        if owns_session:
+            session.close()
+
+    elapsed = time.monotonic() - started
+    summary = dict(checkpoint)
+    summary['elapsed_seconds'] = round(elapsed, 2)
+    summary['rows_per_second'] = round(rows_this_run / elapsed, 1) if elapsed > 0 else 0.0
+    return summary
+
 def import_legal_companies():
     """Import legal companies from CSV into database"""
     print("Starting import of legal companies...")
     
-    # Read the sample data
-    csv_path = '/app/backend/data_processing/legal_companies_sample.csv'
-    df = pd.read_csv(csv_path)
+    summary = bulk_import_legal_companies(SAMPLE_CSV_PATH)
     
-    print(f"Loaded {len(df)} companies from CSV")
+    print(f"\nImport completed!")
+    print(f"Imported: {summary['imported']} companies")
+    print(f"Updated: {summary['updated']} companies")
+    print(f"Skipped (duplicates): {summary['skipped']} companies")
+    print(f"Failed (malformed): {summary['failed']} companies")
+    print(f"Throughput: {summary['rows_per_second']:,.0f} rows/s over {summary['elapsed_seconds']}s")
     
-    # Get database session
     session = get_db_session()
-    
     try:
-        imported_count = 0
-        skipped_count = 0
-        
-        for index, row in df.iterrows():
-            try:
-                # Check if vendor already exists (by external_id or name)
-                existing = session.query(Vendor).filter(
-                    (Vendor.external_id == row['id']) | 
-                    (Vendor.name == row['name'])
-                ).first()
-                
-                if existing:
-                    skipped_count += 1
-                    continue
-                
-                # Clean and process data
-                website = clean_website(row.get('website'))
-                practice_area = categorize_practice_area(row.get('industry'), row.get('name'))
-                company_tier = estimate_company_tier(row.get('size'), row.get('founded'))
-                
-                # Create vendor record
-                vendor = Vendor(
-                    external_id=row['id'],
-                    name=str(row['name']).title() if not pd.isna(row['name']) else 'Unknown',
-                    vendor_type='Legal Service Provider',
-                    industry_category=row.get('industry'),
-                    practice_area=practice_area,
-                    firm_size_category=company_tier,
-                    employee_count=row.get('size'),
-                    founded_year=int(row['founded']) if row.get('founded') and not pd.isna(row['founded']) else None,
-                    country=str(row['country']).title() if not pd.isna(row['country']) else None,
-                    state_province=str(row['region']).title() if not pd.isna(row['region']) else None,
-                    city=str(row['locality']).title() if not pd.isna(row['locality']) else None,
-                    website=website,
-                    linkedin_url=row.get('linkedin_url') if not pd.isna(row.get('linkedin_url')) else None,
-                    status='Prospect',
-                    data_source='Company Dataset',
-                    created_at=datetime.now(timezone.utc)
-                )
-                
-                session.add(vendor)
-                imported_count += 1
-                
-                # Commit every 100 records
-                if imported_count % 100 == 0:
-                    session.commit()
-                    print(f"Imported {imported_count} companies...")
-                    
-            except Exception as e:
-                print(f"Error importing row {index}: {str(e)}")
-                continue
-        
-        # Final commit
-        session.commit()
-        
-        print(f"\nImport completed!")
-        print(f"Imported: {imported_count} companies")
-        print(f"Skipped (duplicates): {skipped_count} companies")
-        
         # Show some statistics
         print("\n=== Import Statistics ===")
         
         # Practice area distribution
-        practice_areas = session.query(Vendor.practice_area, 
-                                     session.query(Vendor).filter(Vendor.practice_area == Vendor.practice_area).count().label('count'))\
+        practice_areas = session.query(Vendor.practice_area, func.count(Vendor.id))\
                                .filter(Vendor.data_source == 'Company Dataset')\
                                .group_by(Vendor.practice_area)\
+                               .order_by(func.count(Vendor.id).desc())\
+                               .limit(10)\
                                .all()
         
         print("\nPractice Areas:")
-        for area in practice_areas[:10]:
-            count = session.query(Vendor).filter(Vendor.practice_area == area[0]).count()
-            print(f"  {area[0]}: {count}")
+        for area, count in practice_areas:
+            print(f"  {area}: {count}")
         
         # Country distribution
         print("\nTop Countries:")
-        countries = session.query(Vendor.country)\
+        countries = session.query(Vendor.country, func.count(Vendor.id))\
                           .filter(Vendor.data_source == 'Company Dataset')\
                           .filter(Vendor.country.isnot(None))\
+                          .group_by(Vendor.country)\
+                          .order_by(func.count(Vendor.id).desc())\
+                          .limit(10)\
                           .all()
         
-        country_counts = {}
-        for country in countries:
-            country_counts[country[0]] = country_counts.get(country[0], 0) + 1
-        
-        for country, count in sorted(country_counts.items(), key=lambda x: x[1], reverse=True)[:10]:
+        for country, count in countries:
             print(f"  {country}: {count}")
-        
-    except Exception as e:
-        session.rollback()
-        print(f"Error during import: {str(e)}")
-        raise
     finally:
         session.close()
 
@@ -3,8 +3,77 @@ Development authentication helpers for LAIT
 """
 import os
 from functools import wraps
-from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity, create_access_token
-from flask import request, current_app
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity, create_access_token, get_jwt, get_jwt_header
+from flask_jwt_extended.config import config as jwt_config
+from flask_jwt_extended.exceptions import RevokedTokenError
+from flask_jwt_extended.internal_utils import has_user_lookup
+from flask import g, request, current_app
+
+from services.token_cache import get_token_cache
+
+
+JWT_CACHE_NAMESPACE = 'jwt-extended'
+
+
+def _bearer_token():
+    """Raw token from the Authorization header, or None if it isn't the only place to look"""
+    if 'headers' not in jwt_config.token_location or len(jwt_config.token_location) != 1:
+        return None
+    parts = request.headers.get(jwt_config.header_name, '').split()
+    if jwt_config.header_type:
+        if len(parts) != 2 or parts[0] != jwt_config.header_type:
+            return None
+        return parts[1]
+    return parts[0] if len(parts) == 1 else None
+
+
+def _verify_cached(token, cache, namespace):
+    """Serve a previously verified token's claims into the request context"""
+    if token is None or has_user_lookup():
+        return None
+    cached = cache.get(token, namespace)
+    if cached is None:
+        return None
+    claims, header = cached
+    g._jwt_extended_jwt_user = {"loaded_user": None}
+    g._jwt_extended_jwt_header = header
+    g._jwt_extended_jwt = claims
+    g._jwt_extended_jwt_location = 'headers'
+    return header, claims
+
+
+def verify_jwt_versioned():
+    """
+    verify_jwt_in_request() plus the per-user token version check.
+    A token already verified earlier in this request is not decoded again, and
+    a bearer token verified on an earlier request comes from the claims cache
+    (same VerifiedTokenCache app_real.decode_jwt_token uses), so only a cache
+    miss pays for signature verification.
+    Tokens whose 'tv' claim is behind the user's token version raise RevokedTokenError.
+    """
+    cache = get_token_cache()
+    namespace = f"{JWT_CACHE_NAMESPACE}:{jwt_config.decode_key}"
+    try:
+        claims = get_jwt()
+    except RuntimeError:
+        claims = None
+    token = None
+    if claims:
+        header = get_jwt_header()
+    else:
+        token = _bearer_token()
+        cached = _verify_cached(token, cache, namespace)
+        if cached is not None:
+            # get() has already applied the token version check
+            return cached
+        verify_jwt_in_request()
+        claims = get_jwt()
+        header = get_jwt_header()
+    if cache.is_revoked(claims):
+        raise RevokedTokenError(header, claims)
+    if token is not None:
+        cache.put(token, namespace, claims, header)
+    return header, claims
 
 
 def development_jwt_required(f):
@@ -64,7 +133,7 @@ def development_jwt_required(f):
 
         # Normal enforcement path
         try:
-            verify_jwt_in_request()
+            verify_jwt_versioned()
         except Exception as e:  # Return a controlled 401 instead of 500
             return {
                 "error": "authorization_required",
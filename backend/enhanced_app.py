@@ -395,6 +395,11 @@ def create_app():
             logger.warning(f"ModelManager init failed: {mm_e}")
             app.model_manager = None
         logger.info("✅ ML models initialized successfully")
+        # NLP data/models are lazy; opt in to loading them before the first request
+        if os.getenv('LAIT_WARMUP_ON_START', 'false').lower() == 'true':
+            import utils.nlp_resources  # noqa: F401 - registers the NLP warmup steps
+            from utils.lazy_imports import warmup
+            logger.info(f"Warmup: {warmup()}")
     except Exception as e:
         logger.error(f"❌ Failed to initialize ML models: {e}")
         app.invoice_analyzer = None
@@ -416,7 +421,9 @@ def create_app():
     # API Routes
     @app.route('/api/health')
     def health_check():
-        return jsonify({"status": "healthy", "timestamp": datetime.now(timezone.utc)})
+        from services.pii_redaction import get_pii_redactor
+        return jsonify({"status": "healthy", "timestamp": datetime.now(timezone.utc),
+                        "pii_redaction": get_pii_redactor().status()})
 
     # ML Service Status Endpoint
     @app.route('/api/ml/status')
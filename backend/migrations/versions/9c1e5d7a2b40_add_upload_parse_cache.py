@@ -0,0 +1,40 @@
+"""add upload parse cache
+
+Revision ID: 9c1e5d7a2b40
+Revises: 70b3762d9adc
+Create Date: 2025-08-24 10:12:41.306118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c1e5d7a2b40'
+down_revision = '70b3762d9adc'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('upload_parse_cache',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('content_hash', sa.String(length=64), nullable=False),
+    sa.Column('parser_version', sa.String(length=100), nullable=False),
+    sa.Column('model_version', sa.String(length=64), nullable=False),
+    sa.Column('result', sa.JSON(), nullable=True),
+    sa.Column('invoice_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('content_hash', 'parser_version', 'model_version', name='uq_upload_parse_cache_key')
+    )
+    with op.batch_alter_table('upload_parse_cache', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_upload_parse_cache_content_hash'), ['content_hash'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('upload_parse_cache', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_upload_parse_cache_content_hash'))
+
+    op.drop_table('upload_parse_cache')
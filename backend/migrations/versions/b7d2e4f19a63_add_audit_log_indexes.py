@@ -0,0 +1,30 @@
+"""add audit log indexes
+
+Revision ID: b7d2e4f19a63
+Revises: 9c1e5d7a2b40
+Create Date: 2025-09-02 09:41:17.552310
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d2e4f19a63'
+down_revision = '9c1e5d7a2b40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('audit_logs', schema=None) as batch_op:
+        batch_op.create_index('ix_audit_logs_timestamp_id', ['timestamp', 'id'], unique=False)
+        batch_op.create_index('ix_audit_logs_user_timestamp', ['user_id', 'timestamp'], unique=False)
+        batch_op.create_index('ix_audit_logs_action_timestamp', ['action', 'timestamp'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('audit_logs', schema=None) as batch_op:
+        batch_op.drop_index('ix_audit_logs_action_timestamp')
+        batch_op.drop_index('ix_audit_logs_user_timestamp')
+        batch_op.drop_index('ix_audit_logs_timestamp_id')
@@ -0,0 +1,28 @@
+"""add user failed login counters
+
+Revision ID: d41f6a2c8e57
+Revises: b7d2e4f19a63
+Create Date: 2025-09-04 15:08:52.904117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd41f6a2c8e57'
+down_revision = 'b7d2e4f19a63'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('failed_login_attempts', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('last_failed_login', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('last_failed_login')
+        batch_op.drop_column('failed_login_attempts')
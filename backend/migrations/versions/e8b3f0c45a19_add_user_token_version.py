@@ -0,0 +1,26 @@
+"""add user token version
+
+Revision ID: e8b3f0c45a19
+Revises: d41f6a2c8e57
+Create Date: 2025-09-06 10:21:37.418265
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8b3f0c45a19'
+down_revision = 'd41f6a2c8e57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('token_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('token_version')
@@ -0,0 +1,313 @@
+"""
+Array-compiled tree ensembles for low-latency scoring
+
+Scoring one invoice through sklearn's IsolationForest / RandomForest
+pays input validation plus a Python-level call per tree, which dominates
+for a handful of rows. compile_forest() flattens a fitted forest into
+contiguous node arrays (feature, threshold, children, leaf values) and
+evaluates every tree at once, one vectorised step per tree level.
+
+Results are bit-for-bit identical to sklearn: rows are cast to float32
+and compared against the float64 thresholds exactly as sklearn's tree
+code does, leaf values are precomputed with the same arithmetic, and
+per-tree contributions are accumulated in estimator order.
+
+    fast_model(model).score_samples(X)   # compiled if supported, else model
+
+Supported: IsolationForest, RandomForest/ExtraTrees classifiers and
+regressors (single output), and GradientBoostingRegressor with a constant
+init (the default mean/quantile or 'zero'). Anything else is returned
+unchanged by fast_model(), which logs the fallback once per fitted model.
+`python -m ml.compiled_forest` prints sklearn vs compiled
+latency for a 20-row batch.
+"""
+
+import logging
+import threading
+import time
+import weakref
+from typing import Any
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_TREE_LEAF = -1
+
+
+class _NodeArrays:
+    """All trees of a forest concatenated into flat node arrays"""
+
+    def __init__(self, estimators, features_per_tree=None):
+        roots, features, thresholds, lefts, rights = [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for i, estimator in enumerate(estimators):
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            is_leaf = tree.children_left == _TREE_LEAF
+            node_ids = np.arange(n_nodes)
+
+            feature = np.where(is_leaf, 0, tree.feature).astype(np.intp)
+            if features_per_tree is not None:
+                # Tree was fitted on a feature subset: map back to input columns
+                feature = np.asarray(features_per_tree[i], dtype=np.intp)[feature]
+            roots.append(offset)
+            features.append(feature)
+            thresholds.append(np.where(is_leaf, 0.0, tree.threshold))
+            # Leaves point at themselves so extra traversal steps are no-ops
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left) + offset)
+            rights.append(np.where(is_leaf, node_ids, tree.children_right) + offset)
+            max_depth = max(max_depth, tree.max_depth)
+            offset += n_nodes
+
+        left = np.concatenate(lefts).astype(np.intp)
+        right = np.concatenate(rights).astype(np.intp)
+        self.roots = np.asarray(roots, dtype=np.intp)
+        self.feature = np.concatenate(features)
+        self.threshold = np.concatenate(thresholds).astype(np.float64)
+        # children[2 * node + went_right]
+        self.children = np.column_stack([left, right]).ravel()
+        self.is_leaf = left == np.arange(offset)
+        self.max_depth = max_depth
+        self.n_trees = len(roots)
+        self.n_nodes = offset
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """Leaf node index reached by every (tree, row): shape (n_trees, n_rows)"""
+        n_rows, n_features = X.shape
+        # float32 values widened to float64, as sklearn's Tree.apply compares them
+        values = X.astype(np.float64).ravel()
+        row_offsets = np.arange(n_rows, dtype=np.intp) * n_features
+        node = np.repeat(self.roots[:, np.newaxis], n_rows, axis=1)
+        for level in range(self.max_depth):
+            row_values = values.take(self.feature.take(node) + row_offsets)
+            went_right = row_values > self.threshold.take(node)
+            node = self.children.take(2 * node + went_right)
+            # Deep forests: stop once every row sits in a leaf
+            if level % 4 == 3 and self.is_leaf.take(node).all():
+                break
+        return node
+
+
+class _CompiledForest:
+    """Shared input handling for compiled forests"""
+
+    def __init__(self, model):
+        self.n_features_in_ = model.n_features_in_
+        self.feature_names_in_ = getattr(model, 'feature_names_in_', None)
+        self.source = type(model).__name__
+        self.n_estimators = len(model.estimators_)
+
+    def _prepare(self, X) -> np.ndarray:
+        if self.feature_names_in_ is not None and hasattr(X, 'columns'):
+            X = X[list(self.feature_names_in_)]
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X has {X.shape[-1]} features, but {self.source} "
+                             f"is expecting {self.n_features_in_} features as input.")
+        if not np.isfinite(X).all():
+            raise ValueError("Input X contains NaN or infinity.")
+        return X
+
+    @staticmethod
+    def _accumulate(contributions: np.ndarray) -> np.ndarray:
+        # A running sum adds tree by tree in estimator order, like sklearn's
+        # accumulation loop (a plain reduce may sum pairwise and round differently)
+        return np.cumsum(contributions, axis=0)[-1]
+
+
+class CompiledIsolationForest(_CompiledForest):
+    """score_samples / decision_function / predict of a fitted IsolationForest"""
+
+    def __init__(self, model):
+        from sklearn.ensemble._iforest import _average_path_length
+
+        super().__init__(model)
+        subsample = model._max_features != model.n_features_in_
+        features_per_tree = model.estimators_features_ if subsample else None
+        self.nodes = _NodeArrays(model.estimators_, features_per_tree)
+
+        path_lengths = getattr(model, '_decision_path_lengths', None)
+        average_lengths = getattr(model, '_average_path_length_per_tree', None)
+        if path_lengths is None or average_lengths is None:
+            average_lengths = [
+                _average_path_length(e.tree_.n_node_samples) for e in model.estimators_
+            ]
+            path_lengths = [e.tree_.compute_node_depths() for e in model.estimators_]
+        # Per-node depth contribution, same expression sklearn evaluates per leaf
+        self.leaf_depth = np.concatenate([
+            path_lengths[i] + average_lengths[i] - 1.0 for i in range(self.nodes.n_trees)
+        ])
+        self.denominator = self.nodes.n_trees * _average_path_length([model._max_samples])
+        self.offset_ = model.offset_
+
+    def score_samples(self, X) -> np.ndarray:
+        depths = self._accumulate(self.leaf_depth[self.nodes.apply(self._prepare(X))])
+        scores = 2 ** (-np.divide(depths, self.denominator, out=np.ones_like(depths),
+                                  where=self.denominator != 0))
+        return -scores
+
+    def decision_function(self, X) -> np.ndarray:
+        return self.score_samples(X) - self.offset_
+
+    def predict(self, X) -> np.ndarray:
+        decision = self.decision_function(X)
+        is_inlier = np.ones_like(decision, dtype=int)
+        is_inlier[decision < 0] = -1
+        return is_inlier
+
+
+class CompiledForestClassifier(_CompiledForest):
+    """predict_proba / predict of a fitted single-output forest classifier"""
+
+    def __init__(self, model):
+        super().__init__(model)
+        self.nodes = _NodeArrays(model.estimators_)
+        self.classes_ = model.classes_
+        n_classes = len(model.classes_)
+        leaf_proba = []
+        for estimator in model.estimators_:
+            proba = estimator.tree_.value[:, 0, :n_classes].copy()
+            normalizer = proba.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            proba /= normalizer
+            leaf_proba.append(proba)
+        self.leaf_proba = np.concatenate(leaf_proba)
+
+    def predict_proba(self, X) -> np.ndarray:
+        proba = self._accumulate(self.leaf_proba[self.nodes.apply(self._prepare(X))])
+        proba /= self.nodes.n_trees
+        return proba
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+
+class CompiledForestRegressor(_CompiledForest):
+    """predict of a fitted single-output forest regressor"""
+
+    def __init__(self, model):
+        super().__init__(model)
+        self.nodes = _NodeArrays(model.estimators_)
+        self.leaf_value = np.concatenate([e.tree_.value[:, 0, 0] for e in model.estimators_])
+
+    def predict(self, X) -> np.ndarray:
+        y_hat = self._accumulate(self.leaf_value[self.nodes.apply(self._prepare(X))])
+        y_hat /= self.nodes.n_trees
+        return y_hat
+
+
+class CompiledGradientBoostingRegressor(_CompiledForest):
+    """predict of a fitted GradientBoostingRegressor with a constant init"""
+
+    def __init__(self, model):
+        super().__init__(model)
+        trees = model.estimators_[:, 0]
+        self.nodes = _NodeArrays(trees)
+        # Stage outputs are scaled before they're added, as sklearn's predict_stages does
+        self.leaf_value = np.concatenate([
+            model.learning_rate * e.tree_.value[:, 0, 0] for e in trees
+        ])
+        # Starting prediction of every row (init estimator's constant, or zero)
+        any_row = np.zeros((1, self.n_features_in_), dtype=np.float32)
+        self.baseline = float(model._raw_predict_init(any_row)[0, 0])
+
+    def predict(self, X) -> np.ndarray:
+        contributions = self.leaf_value[self.nodes.apply(self._prepare(X))]
+        start = np.full((1, contributions.shape[1]), self.baseline)
+        return self._accumulate(np.vstack([start, contributions]))
+
+
+def compile_forest(model: Any) -> _CompiledForest:
+    """Flatten a fitted forest into node arrays; TypeError if unsupported"""
+    # sklearn is only needed once a model exists, not when scoring modules import this
+    from sklearn.dummy import DummyRegressor
+    from sklearn.ensemble import (ExtraTreesClassifier, ExtraTreesRegressor,
+                                  GradientBoostingRegressor, IsolationForest,
+                                  RandomForestClassifier, RandomForestRegressor)
+
+    if not hasattr(model, 'estimators_'):
+        raise TypeError(f"{type(model).__name__} is not a fitted tree ensemble")
+    if isinstance(model, IsolationForest):
+        return CompiledIsolationForest(model)
+    if getattr(model, 'n_outputs_', 1) != 1:
+        raise TypeError("Only single-output forests can be compiled")
+    if isinstance(model, (RandomForestClassifier, ExtraTreesClassifier)):
+        return CompiledForestClassifier(model)
+    if isinstance(model, (RandomForestRegressor, ExtraTreesRegressor)):
+        return CompiledForestRegressor(model)
+    if isinstance(model, GradientBoostingRegressor):
+        if not (isinstance(model.init_, DummyRegressor) or model.init_ == 'zero'):
+            raise TypeError(f"{type(model.init_).__name__} init gives per-row baselines")
+        return CompiledGradientBoostingRegressor(model)
+    raise TypeError(f"{type(model).__name__} is not a supported tree ensemble")
+
+
+# model -> (estimators_ list, tree count, compiled); recompiled after refit or warm start
+_compiled = weakref.WeakKeyDictionary()
+_compiled_lock = threading.Lock()
+
+
+def fast_model(model: Any) -> Any:
+    """Compiled version of `model` (cached per fitted state), or `model` itself"""
+    if model is None:
+        return None
+    estimators = getattr(model, 'estimators_', None)
+    if estimators is None:
+        return model
+    try:
+        cached = _compiled.get(model)
+    except TypeError:
+        return model
+    if cached is not None and cached[0] is estimators and cached[1] == len(estimators):
+        return cached[2]
+
+    with _compiled_lock:
+        try:
+            compiled = compile_forest(model)
+        except TypeError as e:
+            logger.info(f"No compiled form for {type(model).__name__}, using sklearn: {str(e)}")
+            compiled = model
+        except Exception as e:
+            logger.warning(f"Could not compile {type(model).__name__}, using sklearn: {str(e)}")
+            compiled = model
+        _compiled[model] = (estimators, len(estimators), compiled)
+    return compiled
+
+
+def benchmark(rows: int = 20, repeat: int = 200) -> dict:
+    """Median latency (ms) of sklearn vs compiled scoring for `rows` rows"""
+    from sklearn.ensemble import IsolationForest, RandomForestClassifier
+
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(5000, 8))
+    y = (X[:, 0] + rng.normal(size=5000) > 0).astype(int)
+    batch = X[:rows]
+
+    results = {}
+    for name, model, method in (
+        ('isolation_forest', IsolationForest(random_state=0).fit(X), 'score_samples'),
+        ('random_forest',
+         RandomForestClassifier(n_estimators=100, max_depth=12, random_state=0).fit(X, y),
+         'predict_proba'),
+    ):
+        compiled = compile_forest(model)
+        timings = {}
+        for label, target in (('sklearn', model), ('compiled', compiled)):
+            samples = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                getattr(target, method)(batch)
+                samples.append(time.perf_counter() - start)
+            timings[f'{label}_ms'] = round(float(np.median(samples)) * 1000, 4)
+        results[name] = timings
+    return results
+
+
+if __name__ == '__main__':
+    import json
+
+    print(json.dumps(benchmark(), indent=2))
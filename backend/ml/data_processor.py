@@ -30,39 +30,32 @@ class InvoiceDataProcessor:
         Convert raw invoice data into ML-ready features
         """
         try:
-            from db.database import Invoice, Vendor, Matter
+            from ml.feature_store import get_feature_store
             
-            # Get all invoices with related data
-            invoices_query = session.query(Invoice)\
-                .join(Vendor, Invoice.vendor_id == Vendor.id, isouter=True)\
-                .join(Matter, Invoice.matter_id == Matter.id, isouter=True)\
-                .all()
+            # Bulk-extracted invoice/vendor/matter columns from the feature store
+            store = get_feature_store(refresh=False)
+            store.refresh(session)
+            invoices = store.invoice_training_frame()
             
-            if not invoices_query:
+            if invoices.empty:
                 logger.warning("No invoice data found for processing")
                 return pd.DataFrame()
             
-            # Convert to DataFrame
-            data = []
-            for invoice in invoices_query:
-                row = {
-                    'id': invoice.id,
-                    'amount': float(invoice.amount) if invoice.amount else 0,
-                    'hours': float(invoice.total_hours) if invoice.total_hours else 0,
-                    'rate': float(invoice.rate) if invoice.rate else 0,
-                    'vendor_id': invoice.vendor_id,
-                    'vendor_name': invoice.vendor.name if invoice.vendor else 'Unknown',
-                    'vendor_risk_profile': float(invoice.vendor.risk_profile) if invoice.vendor and invoice.vendor.risk_profile else 0.5,
-                    'practice_area': invoice.practice_area or 'General',
-                    'matter_id': invoice.matter_id,
-                    'matter_budget': float(invoice.matter.budget) if invoice.matter and invoice.matter.budget else 0,
-                    'date': invoice.date,
-                    'current_risk_score': float(invoice.risk_score) if invoice.risk_score else 0,
-                    'status': invoice.status or 'pending'
-                }
-                data.append(row)
-            
-            df = pd.DataFrame(data)
+            df = pd.DataFrame({
+                'id': invoices['id'],
+                'amount': invoices['amount'].astype(float),
+                'hours': invoices['hours'].astype(float),
+                'rate': invoices['rate'].astype(float),
+                'vendor_id': invoices['vendor_id'],
+                'vendor_name': invoices['vendor_name'].fillna('Unknown'),
+                'vendor_risk_profile': invoices['vendor_risk_profile'].fillna(0.5).astype(float),
+                'practice_area': invoices['practice_area'].fillna('General'),
+                'matter_id': invoices['matter_id'],
+                'matter_budget': invoices['matter_budget'].fillna(0).astype(float),
+                'date': invoices['date'],
+                'current_risk_score': invoices['risk_score'].fillna(0).astype(float),
+                'status': invoices['status'].fillna('pending')
+            })
             
             # Generate engineered features
             df = self._engineer_features(df)
@@ -0,0 +1,488 @@
+"""
+Columnar feature store for LAIT model retraining
+
+Extracts invoice, line-item, risk-factor and vendor rows from the OLTP
+database with a handful of bulk SQL queries and keeps them as versioned
+Parquet snapshots. Each refresh only pulls rows past the stored watermark
+and appends them as a new part file, so retraining reads columnar files
+instead of walking ORM objects invoice by invoice.
+
+Line items and risk factors have no updated_at of their own, and
+re-scoring deletes and re-inserts an invoice's RiskFactor rows. They follow
+their invoice instead: a refresh re-extracts every row of invoices that are
+new or whose updated_at moved past the invoices watermark (score_invoices
+bumps it), plus invoices that gained rows past the table's max_id. The part
+holds the complete current row set of those invoices, and load() keeps each
+invoice's rows from the newest part that covers it. An updated invoice left
+with no rows is written as a tombstone row with a null id.
+
+Deletes the watermarks can't see are only picked up by rebuild(): deleted
+invoices and vendors, and child rows removed without touching their
+invoice's updated_at.
+"""
+
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import or_, select
+
+try:
+    import pyarrow  # type: ignore  # noqa: F401
+    PARQUET_AVAILABLE = True
+except Exception:  # pyarrow is optional; fall back to pickled frames
+    PARQUET_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_DIR = os.getenv('FEATURE_STORE_DIR', os.path.join('data', 'feature_store'))
+
+# Feature order expected by InvoiceAnalyzer's scaler (mirrors extract_invoice_features)
+INVOICE_FEATURE_COLUMNS = [
+    'amount', 'hours', 'rate', 'line_item_count', 'unique_timekeepers',
+    'partner_hours', 'associate_hours', 'paralegal_hours',
+    'partner_ratio', 'associate_ratio', 'paralegal_ratio'
+]
+
+# Feature order expected by RiskPredictor.retrain_model
+RISK_FEATURE_COLUMNS = [
+    'amount', 'line_item_count', 'hours', 'rate', 'unique_timekeepers',
+    'risk_factor_count', 'is_litigation', 'has_high_amount', 'has_excessive_hours'
+]
+
+# Feature order expected by VendorAnalyzer.retrain_model
+VENDOR_FEATURE_COLUMNS = ['avg_rate', 'total_spend_scaled', 'matter_count', 'diversity_scaled']
+
+
+LINE_ITEM_FEATURE_COLUMNS = ['invoice_id', 'line_item_count', 'unique_timekeepers', 'partner_hours',
+                             'associate_hours', 'paralegal_hours', 'line_item_text']
+
+
+def aggregate_line_items(items: pd.DataFrame) -> pd.DataFrame:
+    """Aggregate line item rows into per-invoice staffing and text features"""
+    if items.empty:
+        return pd.DataFrame(columns=LINE_ITEM_FEATURE_COLUMNS)
+
+    titles = items['timekeeper_title'].fillna('').str.lower()
+    hours = items['hours'].fillna(0).astype(float)
+    items = items.assign(
+        partner_hours=np.where(titles.str.startswith('partner'), hours, 0.0),
+        associate_hours=np.where(titles.str.contains('associate'), hours, 0.0),
+        paralegal_hours=np.where(titles.str.contains('paralegal'), hours, 0.0),
+        timekeeper=items['timekeeper'].fillna(''),
+        description=items['description'].fillna(''),
+    )
+    grouped = items.groupby('invoice_id')
+    return pd.DataFrame({
+        'line_item_count': grouped.size(),
+        'unique_timekeepers': grouped['timekeeper'].nunique(),
+        'partner_hours': grouped['partner_hours'].sum(),
+        'associate_hours': grouped['associate_hours'].sum(),
+        'paralegal_hours': grouped['paralegal_hours'].sum(),
+        'line_item_text': grouped['description'].agg(lambda d: ' '.join(s for s in d if s)),
+    }).reset_index()
+
+
+def add_staffing_ratios(df: pd.DataFrame) -> pd.DataFrame:
+    """Partner/associate/paralegal share of invoice hours, in place"""
+    safe_hours = df['hours'].replace(0, np.nan)
+    for role in ('partner', 'associate', 'paralegal'):
+        df[f'{role}_ratio'] = (df[f'{role}_hours'] / safe_hours).fillna(0)
+    return df
+
+
+def invoice_feature_frame(invoices: pd.DataFrame, line_items: pd.DataFrame) -> pd.DataFrame:
+    """
+    INVOICE_FEATURE_COLUMNS for a batch of invoices, computed column-wise
+
+    invoices needs id, amount, hours and rate; line_items the columns of the
+    line_items snapshot. Missing invoice hours/rate fall back to the line
+    item totals. Row order follows `invoices`.
+    """
+    df = invoices[['id', 'amount', 'hours', 'rate']].rename(columns={'id': 'invoice_id'})
+    df = df.merge(aggregate_line_items(line_items), on='invoice_id', how='left')
+    if not line_items.empty:
+        items = line_items.assign(hours=line_items['hours'].fillna(0).astype(float),
+                                  rate=line_items['rate'].fillna(0).astype(float))
+        items = items.assign(billed=items['hours'] * items['rate'])
+        totals = items.groupby('invoice_id')[['hours', 'billed']].sum()
+        item_hours = df['invoice_id'].map(totals['hours'])
+        item_rate = df['invoice_id'].map(totals['billed'] / totals['hours'].replace(0, np.nan))
+        df['hours'] = df['hours'].where(df['hours'].fillna(0) > 0, item_hours)
+        df['rate'] = df['rate'].where(df['rate'].fillna(0) > 0, item_rate)
+
+    numeric = [c for c in INVOICE_FEATURE_COLUMNS if not c.endswith('_ratio')]
+    df[numeric] = df[numeric].astype(float).fillna(0)
+    add_staffing_ratios(df)
+    return df.rename(columns={'invoice_id': 'id'})
+
+
+def _table_specs():
+    """Column selections for every snapshot table, keyed by table name"""
+    from models.db_models import Invoice, LineItem, RiskFactor, Vendor, Matter
+
+    return {
+        'invoices': {
+            'model': Invoice,
+            'columns': [
+                Invoice.id, Invoice.vendor_id, Invoice.matter_id, Invoice.amount,
+                Invoice.hours, Invoice.rate, Invoice.date, Invoice.status,
+                Invoice.description, Invoice.risk_score, Invoice.updated_at,
+                Matter.budget.label('matter_budget'),
+                Matter.category.label('practice_area'),
+            ],
+            'joins': [(Matter, Invoice.matter_id == Matter.id)],
+            'updated_col': Invoice.updated_at,
+        },
+        'line_items': {
+            'model': LineItem,
+            'columns': [
+                LineItem.id, LineItem.invoice_id, LineItem.description, LineItem.hours,
+                LineItem.rate, LineItem.amount, LineItem.timekeeper,
+                LineItem.timekeeper_title, LineItem.created_at,
+            ],
+            'joins': [],
+            'updated_col': None,
+            'parent_col': LineItem.invoice_id,
+        },
+        'risk_factors': {
+            'model': RiskFactor,
+            'columns': [
+                RiskFactor.id, RiskFactor.invoice_id, RiskFactor.factor_type,
+                RiskFactor.severity, RiskFactor.impact_score, RiskFactor.created_at,
+            ],
+            'joins': [],
+            'updated_col': None,
+            'parent_col': RiskFactor.invoice_id,
+        },
+        'vendors': {
+            'model': Vendor,
+            'columns': [
+                Vendor.id, Vendor.name, Vendor.risk_profile, Vendor.practice_area,
+                Vendor.updated_at,
+            ],
+            'joins': [],
+            'updated_col': Vendor.updated_at,
+        },
+    }
+
+
+class FeatureStore:
+    """Versioned, incrementally appended columnar snapshots of training data"""
+
+    TABLES = ('invoices', 'line_items', 'risk_factors', 'vendors')
+    # Tables snapshotted per invoice (see module docstring)
+    CHILD_TABLES = ('line_items', 'risk_factors')
+
+    def __init__(self, store_dir: Optional[str] = None):
+        self.store_dir = store_dir or DEFAULT_STORE_DIR
+        self.file_format = 'parquet' if PARQUET_AVAILABLE else 'pkl'
+        os.makedirs(self.store_dir, exist_ok=True)
+        self.manifest_path = os.path.join(self.store_dir, 'manifest.json')
+        self.manifest = self._load_manifest()
+
+    # ------------------------------------------------------------------
+    # Manifest / watermark handling
+    # ------------------------------------------------------------------
+    def _load_manifest(self) -> Dict[str, Any]:
+        """Load or create the snapshot manifest"""
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, 'r') as f:
+                return json.load(f)
+        return {
+            'version': 0,
+            'refreshed_at': None,
+            'tables': {name: {'max_id': 0, 'max_updated_at': None, 'parts': [], 'rows': 0}
+                       for name in self.TABLES}
+        }
+
+    def _save_manifest(self):
+        """Atomically persist the manifest so readers never see a partial file"""
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    @property
+    def version(self) -> int:
+        """Current snapshot version (incremented on every refresh that adds rows)"""
+        return self.manifest['version']
+
+    def watermark(self, table: str) -> Dict[str, Any]:
+        """Return the (max_id, max_updated_at) watermark stored for a table"""
+        state = self.manifest['tables'][table]
+        return {'max_id': state['max_id'], 'max_updated_at': state['max_updated_at']}
+
+    # ------------------------------------------------------------------
+    # Extraction
+    # ------------------------------------------------------------------
+    def _extract(self, session, table: str, spec: Dict[str, Any],
+                 invoice_mark: Optional[Dict[str, Any]] = None) -> pd.DataFrame:
+        """Fetch every row past the table watermark in a single query"""
+        model = spec['model']
+        state = self.manifest['tables'][table]
+        stmt = select(*spec['columns']).select_from(model)
+        for target, on_clause in spec['joins']:
+            stmt = stmt.outerjoin(target, on_clause)
+
+        updated = None
+        if spec.get('parent_col') is not None:
+            parent_col = spec['parent_col']
+            updated = self._updated_invoices(invoice_mark)
+            gained = select(parent_col).where(model.id > state['max_id'])
+            predicates = [parent_col > invoice_mark['max_id'], parent_col.in_(gained)]
+            if updated is not None:
+                predicates.append(parent_col.in_(updated))
+        else:
+            predicates = [model.id > state['max_id']]
+            if spec['updated_col'] is not None and state['max_updated_at']:
+                watermark = datetime.fromisoformat(state['max_updated_at'])
+                predicates.append(spec['updated_col'] > watermark)
+        stmt = stmt.where(or_(*predicates)).order_by(model.id)
+
+        result = session.execute(stmt)
+        df = pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+        if updated is not None:
+            # Updated invoices whose rows are all gone still have to replace their old rows
+            emptied = sorted(set(session.execute(updated).scalars()) - set(df['invoice_id']))
+            if emptied:
+                df = pd.concat([df, pd.DataFrame({'invoice_id': emptied})], ignore_index=True)
+        return df
+
+    def _updated_invoices(self, invoice_mark: Dict[str, Any]):
+        """Query for already snapshotted invoices whose updated_at moved past the watermark"""
+        from models.db_models import Invoice
+
+        if not invoice_mark['max_updated_at']:
+            return None
+        watermark = datetime.fromisoformat(invoice_mark['max_updated_at'])
+        return select(Invoice.id).where(Invoice.id <= invoice_mark['max_id'],
+                                        Invoice.updated_at > watermark)
+
+    def refresh(self, session=None) -> Dict[str, int]:
+        """
+        Append rows changed since the last watermark to the snapshots
+
+        Line items and risk factors are re-extracted for invoices changed
+        since the invoices watermark as it was before this refresh.
+
+        Returns:
+            Mapping of table name to the number of rows appended
+        """
+        from db.database import get_db_session
+
+        owns_session = session is None
+        session = session or get_db_session()
+        appended = {}
+        try:
+            specs = _table_specs()
+            new_version = self.version + 1
+            invoice_mark = self.watermark('invoices')
+            for table in self.TABLES:
+                df = self._extract(session, table, specs[table], invoice_mark)
+                appended[table] = len(df)
+                if df.empty:
+                    continue
+                self._write_part(table, df, new_version)
+
+            if any(appended.values()):
+                self.manifest['version'] = new_version
+                self.manifest['refreshed_at'] = datetime.utcnow().isoformat()
+                self._save_manifest()
+                logger.info(f"Feature store refreshed to v{new_version}: {appended}")
+            return appended
+        finally:
+            if owns_session:
+                session.close()
+
+    def rebuild(self, session=None) -> Dict[str, int]:
+        """Drop all snapshots and re-extract from scratch (the only way deletes are picked up)"""
+        for table in self.TABLES:
+            for part in self.manifest['tables'][table]['parts']:
+                try:
+                    os.remove(os.path.join(self.store_dir, part))
+                except FileNotFoundError:
+                    pass
+        self.manifest = {
+            'version': self.version,
+            'refreshed_at': None,
+            'tables': {name: {'max_id': 0, 'max_updated_at': None, 'parts': [], 'rows': 0}
+                       for name in self.TABLES}
+        }
+        return self.refresh(session)
+
+    def _write_part(self, table: str, df: pd.DataFrame, version: int):
+        """Write one part file and advance the table watermark"""
+        table_dir = os.path.join(self.store_dir, table)
+        os.makedirs(table_dir, exist_ok=True)
+        relpath = os.path.join(table, f"part-{version:06d}.{self.file_format}")
+        path = os.path.join(self.store_dir, relpath)
+
+        if self.file_format == 'parquet':
+            df.to_parquet(path, index=False)
+        else:
+            df.to_pickle(path)
+
+        state = self.manifest['tables'][table]
+        state['parts'].append(relpath)
+        state['rows'] += len(df)
+        if df['id'].notna().any():
+            state['max_id'] = max(state['max_id'], int(df['id'].max()))
+        if 'updated_at' in df.columns and df['updated_at'].notna().any():
+            latest = pd.to_datetime(df['updated_at']).max().to_pydatetime().isoformat()
+            if not state['max_updated_at'] or latest > state['max_updated_at']:
+                state['max_updated_at'] = latest
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+    def load(self, table: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Read a table snapshot, keeping the latest copy of each row"""
+        parts = self.manifest['tables'][table]['parts']
+        if not parts:
+            return pd.DataFrame(columns=columns or [])
+
+        per_invoice = table in self.CHILD_TABLES
+        read_columns = columns
+        if per_invoice and columns is not None:
+            read_columns = list(dict.fromkeys(list(columns) + ['id', 'invoice_id']))
+        frames = []
+        for part_number, part in enumerate(parts):
+            path = os.path.join(self.store_dir, part)
+            if part.endswith('.parquet'):
+                frame = pd.read_parquet(path, columns=read_columns)
+            else:
+                frame = pd.read_pickle(path)
+                frame = frame[read_columns] if read_columns else frame
+            frames.append(frame.assign(_part=part_number) if per_invoice else frame)
+        df = pd.concat(frames, ignore_index=True)
+        if per_invoice:
+            # Each invoice's rows come from the newest part that re-extracted it
+            latest = df.groupby('invoice_id')['_part'].transform('max')
+            df = df[(df['_part'] == latest) & df['id'].notna()].drop(columns='_part')
+            df = df.astype({'id': 'int64'})
+            if columns is not None:
+                df = df[columns]
+        elif 'id' in df.columns and len(parts) > 1:
+            df = df.drop_duplicates(subset='id', keep='last')
+        return df.reset_index(drop=True)
+
+    def compact(self):
+        """Collapse each table's part files into a single deduplicated part"""
+        new_version = self.version + 1
+        for table in self.TABLES:
+            state = self.manifest['tables'][table]
+            if len(state['parts']) <= 1:
+                continue
+            df = self.load(table)
+            old_parts = list(state['parts'])
+            state['parts'], state['rows'] = [], 0
+            self._write_part(table, df, new_version)
+            for part in old_parts:
+                try:
+                    os.remove(os.path.join(self.store_dir, part))
+                except FileNotFoundError:
+                    pass
+        self.manifest['version'] = new_version
+        self._save_manifest()
+
+    # ------------------------------------------------------------------
+    # Training frames
+    # ------------------------------------------------------------------
+    def line_item_features(self) -> pd.DataFrame:
+        """Aggregate line items into per-invoice staffing and text features"""
+        return aggregate_line_items(self.load('line_items'))
+
+    def risk_factor_features(self) -> pd.DataFrame:
+        """Aggregate risk factors into per-invoice counts and flags"""
+        factors = self.load('risk_factors')
+        if factors.empty:
+            return pd.DataFrame(columns=['invoice_id', 'risk_factor_count',
+                                         'has_high_amount', 'has_excessive_hours'])
+
+        factors = factors.assign(
+            is_high_amount=(factors['factor_type'] == 'high_amount').astype(int),
+            is_excessive_hours=(factors['factor_type'] == 'excessive_hours').astype(int),
+        )
+        grouped = factors.groupby('invoice_id')
+        return pd.DataFrame({
+            'risk_factor_count': grouped.size(),
+            'has_high_amount': grouped['is_high_amount'].max(),
+            'has_excessive_hours': grouped['is_excessive_hours'].max(),
+        }).reset_index()
+
+    def invoice_training_frame(self) -> pd.DataFrame:
+        """
+        One row per invoice with numeric, line-item, risk-factor and vendor features
+
+        Columns include INVOICE_FEATURE_COLUMNS, RISK_FEATURE_COLUMNS and
+        the raw invoice fields (description, status, risk_score, date...).
+        """
+        invoices = self.load('invoices')
+        if invoices.empty:
+            return invoices
+
+        df = invoices.rename(columns={'id': 'invoice_id'})
+        df = df.merge(self.line_item_features(), on='invoice_id', how='left')
+        df = df.merge(self.risk_factor_features(), on='invoice_id', how='left')
+
+        vendors = self.load('vendors', columns=['id', 'name', 'risk_profile'])
+        vendors = vendors.rename(columns={'id': 'vendor_id', 'name': 'vendor_name',
+                                          'risk_profile': 'vendor_risk_profile'})
+        df = df.merge(vendors, on='vendor_id', how='left')
+
+        fill_zero = ['amount', 'hours', 'rate', 'line_item_count', 'unique_timekeepers',
+                     'partner_hours', 'associate_hours', 'paralegal_hours',
+                     'risk_factor_count', 'has_high_amount', 'has_excessive_hours']
+        df[fill_zero] = df[fill_zero].fillna(0)
+        df['line_item_text'] = df['line_item_text'].fillna('')
+        df['description'] = df['description'].fillna('')
+
+        add_staffing_ratios(df)
+
+        df['is_litigation'] = df['description'].str.lower().str.contains('litigation').astype(int)
+        return df.rename(columns={'invoice_id': 'id'})
+
+    def vendor_training_frame(self) -> pd.DataFrame:
+        """One row per vendor that has invoices, with clustering features"""
+        invoices = self.load('invoices', columns=['id', 'vendor_id', 'matter_id', 'amount', 'rate'])
+        vendors = self.load('vendors', columns=['id', 'name', 'risk_profile'])
+        if invoices.empty or vendors.empty:
+            return pd.DataFrame(columns=['vendor_id'] + VENDOR_FEATURE_COLUMNS)
+
+        invoices = invoices.dropna(subset=['vendor_id'])
+        grouped = invoices.groupby('vendor_id')
+        stats = pd.DataFrame({
+            'total_spend': grouped['amount'].sum(min_count=1).fillna(0),
+            'invoice_count': grouped.size(),
+            'matter_count': grouped['matter_id'].nunique(),
+            # Zero/NULL rates are treated as missing, matching the ORM implementation
+            'avg_rate': grouped['rate'].agg(lambda r: r[r > 0].mean()).fillna(0),
+        }).reset_index()
+
+        vendors = vendors.rename(columns={'id': 'vendor_id', 'name': 'vendor_name'})
+        df = stats.merge(vendors, on='vendor_id', how='inner')
+        df['diversity_score'] = df['risk_profile'].fillna(0.5)
+        df['total_spend_scaled'] = df['total_spend'] / 10000
+        df['diversity_scaled'] = df['diversity_score'] * 100
+        return df.sort_values('vendor_id').reset_index(drop=True)
+
+
+_feature_store = None
+
+
+def get_feature_store(store_dir: Optional[str] = None, refresh: bool = True) -> FeatureStore:
+    """Return the process-wide feature store, optionally catching it up first"""
+    global _feature_store
+    if _feature_store is None or (store_dir and _feature_store.store_dir != store_dir):
+        _feature_store = FeatureStore(store_dir)
+    if refresh:
+        try:
+            _feature_store.refresh()
+        except Exception as e:
+            logger.error(f"Feature store refresh failed, serving last snapshot: {str(e)}")
+    return _feature_store
@@ -11,6 +11,9 @@ except Exception:  # boto3 may be absent in test environment
     boto3 = None  # type: ignore
 from typing import Optional, Dict, Any
 
+# Training runs kept per model type in the metadata
+TRAINING_HISTORY_LIMIT = 50
+
 class ModelManager:
     def __init__(self, model_dir: str = "models", s3_bucket: Optional[str] = None):
         self.model_dir = model_dir
@@ -36,11 +39,17 @@ class ModelManager:
         }
     
     def _save_metadata(self):
-        """Save model metadata to file"""
-        with open(self.metadata_file, 'w') as f:
+        """Save model metadata to file (write-then-rename so readers never see a partial file)"""
+        tmp_path = f"{self.metadata_file}.tmp"
+        with open(tmp_path, 'w') as f:
             json.dump(self.metadata, f, indent=2)
+        os.replace(tmp_path, self.metadata_file)
+    
+    def _model_entry(self, model_type: str) -> Dict[str, Any]:
+        return self.metadata["models"].setdefault(model_type, {"current_version": None, "versions": []})
     
-    def save_model(self, model: Any, model_type: str, metrics: Dict[str, float]) -> str:
+    def save_model(self, model: Any, model_type: str, metrics: Dict[str, float],
+                   training: Optional[Dict[str, Any]] = None) -> str:
         """
         Save a trained model with version control
         
@@ -48,6 +57,7 @@ class ModelManager:
             model: The trained model object
             model_type: Type of model ('outlier_detector', 'risk_predictor', 'vendor_cluster')
             metrics: Dictionary of evaluation metrics
+            training: Optional training run stats (wall time, peak memory, n_jobs)
             
         Returns:
             version_id: The version ID of the saved model
@@ -81,13 +91,16 @@ class ModelManager:
             "created_at": datetime.now().isoformat(),
             "is_current": True
         }
+        if training:
+            model_info["training"] = training
         
         # Set previous current version to false
-        for version in self.metadata["models"][model_type]["versions"]:
+        entry = self._model_entry(model_type)
+        for version in entry["versions"]:
             version["is_current"] = False
         
-        self.metadata["models"][model_type]["versions"].append(model_info)
-        self.metadata["models"][model_type]["current_version"] = version_id
+        entry["versions"].append(model_info)
+        entry["current_version"] = version_id
         self._save_metadata()
         
         return version_id
@@ -166,3 +179,17 @@ class ModelManager:
             
         self.metadata["models"][model_type]["current_version"] = version_id
         self._save_metadata()
+    
+    def record_training(self, model_type: str, stats: Dict[str, Any]):
+        """Record a training run (wall time, peak memory...) for a model type"""
+        stats = dict(stats, recorded_at=datetime.now().isoformat())
+        entry = self._model_entry(model_type)
+        entry["last_training"] = stats
+        history = entry.setdefault("training_history", [])
+        history.append(stats)
+        del history[:-TRAINING_HISTORY_LIMIT]
+        self._save_metadata()
+    
+    def get_training_stats(self, model_type: str) -> Optional[Dict[str, Any]]:
+        """Stats of the most recent training run for a model type"""
+        return self.metadata["models"].get(model_type, {}).get("last_training")
@@ -22,6 +22,8 @@ warnings.filterwarnings('ignore')
 
 # Add backend to path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from ml.model_manager import ModelManager
+from ml.training_orchestrator import TrainingJob, TrainingOrchestrator, ensemble_params, for_serving
 
 logger = logging.getLogger(__name__)
 
@@ -41,6 +43,8 @@ class RealWorldMLTrainer:
         self.cases = None
         self.vendors = None
         self.billing_patterns = None
+        # Cores per fit; set by the training orchestrator for each job
+        self.n_jobs = 1
         
         self._load_collected_data()
     
@@ -81,36 +85,30 @@ class RealWorldMLTrainer:
         except Exception as e:
             logger.error(f"Error loading data: {e}")
     
+    def _run_step(self, step, n_jobs=1):
+        """Training job: run one train_* method with the given core budget"""
+        self.n_jobs = n_jobs
+        return getattr(self, step)()
+    
     def train_all_models(self):
         """Train all ML models"""
         logger.info("🚀 Starting comprehensive ML model training...")
         
         models_trained = {}
         
-        # 1. Train outlier detection model
-        outlier_model = self.train_outlier_detection_model()
-        if outlier_model:
-            models_trained['outlier_detection'] = outlier_model
-        
-        # 2. Train rate prediction model
-        rate_model = self.train_rate_prediction_model()
-        if rate_model:
-            models_trained['rate_prediction'] = rate_model
-        
-        # 3. Train spend prediction model
-        spend_model = self.train_spend_prediction_model()
-        if spend_model:
-            models_trained['spend_prediction'] = spend_model
-        
-        # 4. Train attorney classification model
-        attorney_model = self.train_attorney_classification_model()
-        if attorney_model:
-            models_trained['attorney_classification'] = attorney_model
-        
-        # 5. Train vendor analysis model
-        vendor_model = self.train_vendor_analysis_model()
-        if vendor_model:
-            models_trained['vendor_analysis'] = vendor_model
+        # 1-5. Independent model fits, run in parallel under the CPU budget
+        steps = {
+            'outlier_detection': 'train_outlier_detection_model',
+            'rate_prediction': 'train_rate_prediction_model',
+            'spend_prediction': 'train_spend_prediction_model',
+            'attorney_classification': 'train_attorney_classification_model',
+            'vendor_analysis': 'train_vendor_analysis_model',
+        }
+        jobs = [TrainingJob(name, self._run_step, args=(step,)) for name, step in steps.items()]
+        orchestrator = TrainingOrchestrator(model_manager=ModelManager(self.models_dir))
+        for name, stats in orchestrator.run(jobs).items():
+            if stats['result']:
+                models_trained[name] = stats['result']
         
         # 6. Create rate benchmarks
         benchmarks = self.create_rate_benchmarks()
@@ -167,12 +165,12 @@ class RealWorldMLTrainer:
             scaled_features = scaler.fit_transform(feature_matrix)
             
             # Train isolation forest
-            model = IsolationForest(
-                contamination=0.1,  # Expect 10% outliers
-                random_state=42,
-                n_estimators=100
-            )
+            model = IsolationForest(**ensemble_params(
+                IsolationForest,
+                {'contamination': 0.1, 'random_state': 42, 'n_estimators': 100},  # Expect 10% outliers
+                n_samples=len(scaled_features), n_jobs=self.n_jobs))
             model.fit(scaled_features)
+            for_serving(model)
             
             # Save model and preprocessing objects
             model_data = {
@@ -247,12 +245,11 @@ class RealWorldMLTrainer:
             X_test_scaled = scaler.transform(X_test)
             
             # Train model
-            model = RandomForestRegressor(
-                n_estimators=100,
-                random_state=42,
-                max_depth=10
-            )
+            model = RandomForestRegressor(**ensemble_params(
+                RandomForestRegressor, {'n_estimators': 100, 'random_state': 42, 'max_depth': 10},
+                n_samples=len(X_train_scaled), n_jobs=self.n_jobs))
             model.fit(X_train_scaled, y_train)
+            for_serving(model)
             
             # Evaluate model
             y_pred = model.predict(X_test_scaled)
@@ -343,12 +340,11 @@ class RealWorldMLTrainer:
             X_test_scaled = scaler.transform(X_test)
             
             # Train model
-            model = RandomForestRegressor(
-                n_estimators=100,
-                random_state=42,
-                max_depth=10
-            )
+            model = RandomForestRegressor(**ensemble_params(
+                RandomForestRegressor, {'n_estimators': 100, 'random_state': 42, 'max_depth': 10},
+                n_samples=len(X_train_scaled), n_jobs=self.n_jobs))
             model.fit(X_train_scaled, y_train)
+            for_serving(model)
             
             # Evaluate model
             y_pred = model.predict(X_test_scaled)
@@ -425,12 +421,11 @@ class RealWorldMLTrainer:
             X_test_scaled = scaler.transform(X_test)
             
             # Train model
-            model = RandomForestClassifier(
-                n_estimators=100,
-                random_state=42,
-                max_depth=10
-            )
+            model = RandomForestClassifier(**ensemble_params(
+                RandomForestClassifier, {'n_estimators': 100, 'random_state': 42, 'max_depth': 10},
+                n_samples=len(X_train_scaled), n_jobs=self.n_jobs))
             model.fit(X_train_scaled, y_train)
+            for_serving(model)
             
             # Evaluate model
             y_pred = model.predict(X_test_scaled)
@@ -514,12 +509,11 @@ class RealWorldMLTrainer:
             X_test_scaled = scaler.transform(X_test)
             
             # Train model
-            model = RandomForestRegressor(
-                n_estimators=100,
-                random_state=42,
-                max_depth=10
-            )
+            model = RandomForestRegressor(**ensemble_params(
+                RandomForestRegressor, {'n_estimators': 100, 'random_state': 42, 'max_depth': 10},
+                n_samples=len(X_train_scaled), n_jobs=self.n_jobs))
             model.fit(X_train_scaled, y_train)
+            for_serving(model)
             
             # Evaluate model
             y_pred = model.predict(X_test_scaled)
@@ -0,0 +1,236 @@
+"""
+Parallel, warm-started model training
+
+Independent model fits (invoice anomaly forest, risk regressor, vendor
+clustering, the offline trainers' models) used to run one after another,
+single-threaded and from scratch. TrainingOrchestrator runs them in a
+process pool, splitting a CPU budget between jobs so that each fit's
+n_jobs times the number of concurrent fits never exceeds the cores
+available. Wall time and peak memory per job are recorded in ModelManager
+metadata.
+
+Ensemble helpers:
+    ensemble_params()  - n_jobs plus a bounded max_samples for large data
+    warm_start_fit()   - add trees fitted on new rows to an existing forest
+"""
+
+import logging
+import multiprocessing
+import os
+import resource
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Sequence
+
+from sklearn.ensemble import IsolationForest
+
+try:
+    from threadpoolctl import threadpool_limits
+    THREADPOOLCTL_AVAILABLE = True
+except ImportError:
+    THREADPOOLCTL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Cores the orchestrator may use in total (defaults to all of them)
+TRAINING_CPU_BUDGET = int(os.getenv('TRAINING_CPU_BUDGET', '0')) or (os.cpu_count() or 1)
+# Upper bound on concurrent fits; 0 = one per job, within the CPU budget
+TRAINING_MAX_WORKERS = int(os.getenv('TRAINING_MAX_WORKERS', '0'))
+TRAINING_START_METHOD = os.getenv('TRAINING_START_METHOD', 'fork' if os.name == 'posix' else 'spawn')
+# Rows each IsolationForest tree is built from (the paper's default of 256)
+ISOLATION_FOREST_MAX_SAMPLES = int(os.getenv('ISOLATION_FOREST_MAX_SAMPLES', '256'))
+# Bootstrap sample size cap per RandomForest tree on large training sets
+RANDOM_FOREST_MAX_SAMPLES = int(os.getenv('RANDOM_FOREST_MAX_SAMPLES', '20000'))
+# Trees added per warm-start round
+WARM_START_TREES = int(os.getenv('TRAINING_WARM_START_TREES', '25'))
+# Fewer new rows than this are not worth a warm-start round
+WARM_START_MIN_ROWS = int(os.getenv('TRAINING_WARM_START_MIN_ROWS', '10'))
+
+
+def ensemble_params(estimator_cls: type, params: Optional[Dict[str, Any]] = None,
+                    n_samples: Optional[int] = None, n_jobs: int = 1) -> Dict[str, Any]:
+    """
+    Constructor params for a tree ensemble with n_jobs and max_samples set
+
+    Explicit values in `params` win. IsolationForest trees are built from at
+    most ISOLATION_FOREST_MAX_SAMPLES rows; bootstrapped forests draw at most
+    RANDOM_FOREST_MAX_SAMPLES rows per tree so fit time and memory stay flat
+    as the history grows.
+    """
+    params = dict(params or {})
+    params.setdefault('n_jobs', n_jobs)
+    if n_samples:
+        if issubclass(estimator_cls, IsolationForest):
+            params.setdefault('max_samples', min(ISOLATION_FOREST_MAX_SAMPLES, n_samples))
+        elif params.get('bootstrap', True) and n_samples > RANDOM_FOREST_MAX_SAMPLES:
+            # As a fraction, so CV folds and warm-start batches stay valid
+            params.setdefault('max_samples', RANDOM_FOREST_MAX_SAMPLES / n_samples)
+    return params
+
+
+def supports_warm_start(model: Any) -> bool:
+    """True for fitted ensembles that can grow more estimators"""
+    params = model.get_params() if hasattr(model, 'get_params') else {}
+    return 'warm_start' in params and 'n_estimators' in params and hasattr(model, 'estimators_')
+
+
+def warm_start_rows_needed(model: Any) -> int:
+    """Fewest new rows a warm-start round on `model` accepts"""
+    if isinstance(model, IsolationForest) and hasattr(model, 'max_samples_'):
+        # Path lengths of every tree are normalized by one max_samples_
+        return max(WARM_START_MIN_ROWS, model.max_samples_)
+    return WARM_START_MIN_ROWS
+
+
+def warm_start_fit(model: Any, X, y=None, extra_trees: Optional[int] = None, n_jobs: Optional[int] = None):
+    """
+    Add `extra_trees` estimators fitted on X (typically rows seen since the
+    last fit) to an already fitted ensemble; existing trees are kept as is.
+
+    An IsolationForest keeps its fitted max_samples_: sklearn scores all
+    trees against that one subsample size, so growing it on fewer rows
+    would shift every anomaly score. ValueError if X has fewer rows.
+    """
+    if not supports_warm_start(model):
+        raise ValueError(f"{type(model).__name__} is not a fitted warm-startable ensemble")
+
+    params = {'warm_start': True, 'n_estimators': model.n_estimators + (extra_trees or WARM_START_TREES)}
+    if n_jobs is not None and 'n_jobs' in model.get_params():
+        params['n_jobs'] = n_jobs
+    if isinstance(model, IsolationForest):
+        if len(X) < model.max_samples_:
+            raise ValueError(f"Warm start needs at least max_samples_={model.max_samples_} rows, "
+                             f"got {len(X)}")
+        params['max_samples'] = model.max_samples_
+    else:
+        max_samples = model.get_params().get('max_samples')
+        if isinstance(max_samples, int) and max_samples > len(X):
+            # Bootstrapped forests reject max_samples > n_samples
+            params['max_samples'] = None
+    model.set_params(**params)
+
+    if y is None:
+        model.fit(X)
+    else:
+        model.fit(X, y)
+    return model
+
+
+def for_serving(model: Any):
+    """Drop the training n_jobs so one-row predictions don't start a thread pool"""
+    if hasattr(model, 'get_params') and 'n_jobs' in model.get_params():
+        model.set_params(n_jobs=None)
+    return model
+
+
+class TrainingJob:
+    """One independent fit: `func(*args, n_jobs=<budget>, **kwargs)`"""
+
+    def __init__(self, name: str, func: Callable, args: Sequence = (), kwargs: Optional[Dict] = None,
+                 model_type: Optional[str] = None, cpus: Optional[int] = None):
+        self.name = name
+        self.func = func
+        self.args = tuple(args)
+        self.kwargs = dict(kwargs or {})
+        # ModelManager entry the stats are recorded under
+        self.model_type = model_type or name
+        # Fixed core count for this job instead of an even share
+        self.cpus = cpus
+
+
+def _run_job(func: Callable, args: tuple, kwargs: Dict, n_jobs: int) -> Dict[str, Any]:
+    """Run one job and measure it (executes inside the pool worker)"""
+    tracing = not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    stats: Dict[str, Any] = {'n_jobs': n_jobs, 'pid': os.getpid()}
+    try:
+        if THREADPOOLCTL_AVAILABLE:
+            # Keep BLAS/OpenMP inside the job's share as well
+            with threadpool_limits(limits=n_jobs):
+                result = func(*args, n_jobs=n_jobs, **kwargs)
+        else:
+            result = func(*args, n_jobs=n_jobs, **kwargs)
+        # Jobs return False when they skip (not enough data) and raise when they fail
+        stats.update(status='success' if result is not False else 'skipped', result=result)
+    except Exception as e:
+        logger.exception("Training job failed")
+        stats.update(status='error', error=str(e), result=None)
+    finally:
+        stats['wall_time_s'] = round(time.perf_counter() - start, 3)
+        stats['peak_memory_mb'] = round(tracemalloc.get_traced_memory()[1] / 1e6, 2)
+        if tracing:
+            tracemalloc.stop()
+        # Linux reports KiB; this is the worker's high-water mark
+        stats['max_rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2)
+    return stats
+
+
+class TrainingOrchestrator:
+    """Runs TrainingJobs in a process pool under a shared CPU budget"""
+
+    def __init__(self, model_manager=None, cpu_budget: Optional[int] = None, max_workers: Optional[int] = None):
+        self.model_manager = model_manager
+        self.cpu_budget = max(1, cpu_budget or TRAINING_CPU_BUDGET)
+        self.max_workers = max_workers if max_workers is not None else TRAINING_MAX_WORKERS
+
+    def plan(self, jobs: Sequence[TrainingJob]) -> Dict[str, int]:
+        """Cores (n_jobs) assigned to each job"""
+        workers = self._workers(jobs)
+        share = max(1, self.cpu_budget // workers)
+        return {job.name: max(1, min(job.cpus or share, self.cpu_budget)) for job in jobs}
+
+    def _workers(self, jobs: Sequence[TrainingJob]) -> int:
+        workers = min(len(jobs), self.cpu_budget) or 1
+        if self.max_workers:
+            workers = min(workers, self.max_workers)
+        return workers
+
+    def _can_fork(self, workers: int) -> bool:
+        # Daemonic processes (e.g. Celery prefork children) may not have children
+        return workers > 1 and not multiprocessing.current_process().daemon
+
+    def run(self, jobs: Sequence[TrainingJob]) -> Dict[str, Dict[str, Any]]:
+        """Run all jobs; returns per-job stats including each job's return value"""
+        jobs = list(jobs)
+        if not jobs:
+            return {}
+        budgets = self.plan(jobs)
+        workers = self._workers(jobs)
+        started_at = datetime.now().isoformat()
+
+        results: Dict[str, Dict[str, Any]] = {}
+        if self._can_fork(workers):
+            context = multiprocessing.get_context(TRAINING_START_METHOD)
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                futures = {
+                    job.name: pool.submit(_run_job, job.func, job.args, job.kwargs, budgets[job.name])
+                    for job in jobs
+                }
+                for name, future in futures.items():
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        # Worker died or the job could not be pickled
+                        results[name] = {'status': 'error', 'error': str(e), 'result': None,
+                                         'n_jobs': budgets[name]}
+        else:
+            if workers > 1:
+                logger.info("Running training jobs in-process (no child processes allowed here)")
+            for job in jobs:
+                results[job.name] = _run_job(job.func, job.args, job.kwargs, budgets[job.name])
+
+        for job in jobs:
+            stats = results[job.name]
+            stats.update(started_at=started_at, parallel_workers=workers)
+            logger.info(f"Trained {job.name}: {stats['status']} in {stats.get('wall_time_s', 0)}s, "
+                        f"peak {stats.get('peak_memory_mb', 0)} MB, n_jobs={stats['n_jobs']}")
+            if self.model_manager is not None:
+                self.model_manager.record_training(
+                    job.model_type, {k: v for k, v in stats.items() if k != 'result'}
+                )
+        return results
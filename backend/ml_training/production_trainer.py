@@ -16,6 +16,8 @@ import pandas as pd
 import numpy as np
 import json
 import logging
+import os
+import sys
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any, Tuple
 from pathlib import Path
@@ -41,6 +43,11 @@ except ImportError:
     HAS_TENSORFLOW = False
     logging.warning("TensorFlow not available. Using sklearn models only.")
 
+# Backend packages (ml.*) when run as a script
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from ml.model_manager import ModelManager
+from ml.training_orchestrator import TrainingJob, TrainingOrchestrator, ensemble_params, for_serving
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -63,6 +70,8 @@ class ProductionMLTrainer:
         self.models = {}
         self.scalers = {}
         self.encoders = {}
+        # Cores per fit; set by the training orchestrator for each job
+        self.n_jobs = 1
         
         # Model configurations
         self.model_configs = {
@@ -425,11 +434,13 @@ class ProductionMLTrainer:
         X_scaled = scaler.fit_transform(X)
         
         # Train isolation forest
-        model = IsolationForest(**self.model_configs['invoice_anomaly']['params'])
+        model = IsolationForest(**self._params(IsolationForest, 'invoice_anomaly', len(X_scaled)))
         model.fit(X_scaled)
         
         # Also train a supervised classifier for comparison
-        classifier = RandomForestClassifier(n_estimators=100, random_state=42)
+        classifier = RandomForestClassifier(**ensemble_params(
+            RandomForestClassifier, {'n_estimators': 100, 'random_state': 42},
+            n_samples=len(X_scaled), n_jobs=self.n_jobs))
         X_train, X_test, y_train, y_test = train_test_split(X_scaled, y, test_size=0.2, random_state=42)
         classifier.fit(X_train, y_train)
         
@@ -449,8 +460,8 @@ class ProductionMLTrainer:
         }
         
         # Save to disk
-        joblib.dump(model, self.models_dir / 'invoice_anomaly_detector.joblib')
-        joblib.dump(classifier, self.models_dir / 'invoice_anomaly_classifier.joblib')
+        joblib.dump(for_serving(model), self.models_dir / 'invoice_anomaly_detector.joblib')
+        joblib.dump(for_serving(classifier), self.models_dir / 'invoice_anomaly_classifier.joblib')
         joblib.dump(scaler, self.models_dir / 'invoice_anomaly_scaler.joblib')
         joblib.dump(self.encoders['invoice_anomaly'], self.models_dir / 'invoice_anomaly_encoders.joblib')
         
@@ -492,7 +503,7 @@ class ProductionMLTrainer:
         # Train model
         X_train, X_test, y_train, y_test = train_test_split(X_scaled, y_encoded, test_size=0.2, random_state=42)
         
-        model = RandomForestClassifier(**self.model_configs['vendor_risk']['params'])
+        model = RandomForestClassifier(**self._params(RandomForestClassifier, 'vendor_risk', len(X_train)))
         model.fit(X_train, y_train)
         
         # Evaluate
@@ -511,7 +522,7 @@ class ProductionMLTrainer:
         }
         
         # Save to disk
-        joblib.dump(model, self.models_dir / 'vendor_risk_model.joblib')
+        joblib.dump(for_serving(model), self.models_dir / 'vendor_risk_model.joblib')
         joblib.dump(scaler, self.models_dir / 'vendor_risk_scaler.joblib')
         joblib.dump(self.encoders['vendor_risk'], self.models_dir / 'vendor_risk_encoders.joblib')
         
@@ -543,7 +554,7 @@ class ProductionMLTrainer:
         # Train model
         X_train, X_test, y_train, y_test = train_test_split(X_scaled, y, test_size=0.2, random_state=42)
         
-        model = RandomForestRegressor(**self.model_configs['cost_prediction']['params'])
+        model = RandomForestRegressor(**self._params(RandomForestRegressor, 'cost_prediction', len(X_train)))
         model.fit(X_train, y_train)
         
         # Evaluate
@@ -557,12 +568,23 @@ class ProductionMLTrainer:
         self.encoders['cost_prediction'] = {'practice_area': le_practice}
         
         # Save to disk
-        joblib.dump(model, self.models_dir / 'cost_prediction_model.joblib')
+        joblib.dump(for_serving(model), self.models_dir / 'cost_prediction_model.joblib')
         joblib.dump(scaler, self.models_dir / 'cost_prediction_scaler.joblib')
         joblib.dump(self.encoders['cost_prediction'], self.models_dir / 'cost_prediction_encoders.joblib')
         
         logger.info("Cost prediction model trained and saved")
     
+    def _params(self, estimator_cls, config_name: str, n_samples: int) -> Dict[str, Any]:
+        """Configured params plus this job's n_jobs and a max_samples bound"""
+        return ensemble_params(estimator_cls, self.model_configs[config_name]['params'],
+                               n_samples=n_samples, n_jobs=self.n_jobs)
+    
+    def _run_step(self, step: str, n_jobs: int = 1) -> Dict[str, Dict]:
+        """Training job: run one train_* method and hand back what it produced"""
+        self.n_jobs = n_jobs
+        getattr(self, step)()
+        return {'models': self.models, 'scalers': self.scalers, 'encoders': self.encoders}
+    
     def train_all_models(self):
         """Train all ML models"""
         logger.info("Starting comprehensive ML model training...")
@@ -570,10 +592,20 @@ class ProductionMLTrainer:
         # Load data
         self.load_real_data()
         
-        # Train individual models
-        self.train_invoice_anomaly_detector()
-        self.train_vendor_risk_model()
-        self.train_cost_prediction_model()
+        # The three models are independent: fit them in parallel
+        steps = {
+            'invoice_anomaly': 'train_invoice_anomaly_detector',
+            'vendor_risk': 'train_vendor_risk_model',
+            'cost_prediction': 'train_cost_prediction_model',
+        }
+        jobs = [TrainingJob(name, self._run_step, args=(step,)) for name, step in steps.items()]
+        orchestrator = TrainingOrchestrator(model_manager=ModelManager(str(self.models_dir)))
+        for name, stats in orchestrator.run(jobs).items():
+            if stats['status'] == 'error':
+                logger.error(f"Training {name} failed: {stats.get('error')}")
+                continue
+            for attr, produced in stats['result'].items():
+                getattr(self, attr).update(produced)
         
         logger.info("All ML models trained successfully")
         
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Float, String, DateTime, Date, ForeignKey, JSON, Boolean, Index
+from sqlalchemy import Column, Integer, Float, String, DateTime, Date, ForeignKey, JSON, Boolean, Index, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -15,6 +15,9 @@ class User(Base):
     password_hash = Column(String(256), nullable=False)
     role = Column(String(50), default='user')  # 'user', 'admin', 'manager'
     active = Column(Boolean, default=True)
+    failed_login_attempts = Column(Integer, default=0)  # Reset on successful login
+    last_failed_login = Column(DateTime)
+    token_version = Column(Integer, default=0)  # Bumped to revoke issued tokens
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -199,6 +202,12 @@ class RiskFactor(Base):
 
 class AuditLog(Base):
     __tablename__ = 'audit_logs'
+    __table_args__ = (
+        # Keyset pagination: newest first, optionally per user or action
+        Index('ix_audit_logs_timestamp_id', 'timestamp', 'id'),
+        Index('ix_audit_logs_user_timestamp', 'user_id', 'timestamp'),
+        Index('ix_audit_logs_action_timestamp', 'action', 'timestamp'),
+    )
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('users.id'))
     action = Column(String(100))
@@ -206,6 +215,22 @@ class AuditLog(Base):
     details = Column(String(1000))  # JSON or text for extra info
     user = relationship("User")
 
+class UploadParseCache(Base):
+    """Parse/scoring result of an uploaded file, keyed by content hash and pipeline versions"""
+    __tablename__ = 'upload_parse_cache'
+    __table_args__ = (
+        UniqueConstraint('content_hash', 'parser_version', 'model_version', name='uq_upload_parse_cache_key'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    content_hash = Column(String(64), nullable=False, index=True)  # SHA-256 of the uploaded bytes
+    parser_version = Column(String(100), nullable=False)
+    model_version = Column(String(64), nullable=False)
+    result = Column(JSON)
+    invoice_id = Column(Integer)  # invoice created from this upload, if any
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
 class VendorMarketInsight(Base):
     """Market insights derived from company dataset analysis"""
     __tablename__ = 'vendor_market_insights'
@@ -67,31 +67,7 @@ class EnhancedInvoiceAnalyzer:
             # Perform enhanced outlier detection
             outlier_analysis = self._detect_outliers(processed_data)
             
-            # Analyze rates against real-world benchmarks
-            rate_analysis = self._analyze_rates(processed_data)
-            
-            # Predict future spend patterns
-            spend_analysis = self._analyze_spend_patterns(processed_data)
-            
-            # Generate comprehensive insights
-            insights = self._generate_insights(
-                outlier_analysis,
-                rate_analysis, 
-                spend_analysis,
-                processed_data
-            )
-            
-            return {
-                'invoice_id': invoice_data.get('id', 'unknown'),
-                'total_amount': processed_data.get('total_amount', 0),
-                'currency': processed_data.get('currency', 'USD'),
-                'outlier_analysis': outlier_analysis,
-                'rate_analysis': rate_analysis,
-                'spend_analysis': spend_analysis,
-                'insights': insights,
-                'recommendations': self._generate_recommendations(outlier_analysis, rate_analysis),
-                'analysis_timestamp': datetime.now().isoformat()
-            }
+            return self._compose_analysis(invoice_data, processed_data, outlier_analysis)
             
         except Exception as e:
             logger.error(f"Error analyzing invoice: {str(e)}")
@@ -100,6 +76,69 @@ class EnhancedInvoiceAnalyzer:
                 'analysis_timestamp': datetime.now().isoformat()
             }
     
+    def analyze_invoices(self, invoices: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Analyze several invoices with a single batched outlier-model call
+
+        Like analyze_invoice, an invoice that can't be analyzed gets an error
+        entry; the rest of the batch is unaffected.
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(invoices)
+        processed = {}
+        for idx, invoice in enumerate(invoices):
+            try:
+                processed[idx] = self._preprocess_invoice_data(invoice)
+            except Exception as e:
+                results[idx] = self._error_result(invoice, e)
+
+        indices = list(processed)
+        outlier_analyses = self._detect_outliers_batch([processed[idx] for idx in indices])
+        for idx, outlier_analysis in zip(indices, outlier_analyses):
+            try:
+                results[idx] = self._compose_analysis(invoices[idx], processed[idx],
+                                                      outlier_analysis)
+            except Exception as e:
+                results[idx] = self._error_result(invoices[idx], e)
+        return results
+
+    @staticmethod
+    def _error_result(invoice_data: Any, error: Exception) -> Dict[str, Any]:
+        invoice_id = invoice_data.get('id') if isinstance(invoice_data, dict) else None
+        logger.error(f"Error analyzing invoice {invoice_id}: {str(error)}")
+        return {
+            'error': str(error),
+            'analysis_timestamp': datetime.now().isoformat()
+        }
+    
+    def _compose_analysis(self, invoice_data: Dict[str, Any], processed_data: Dict[str, Any],
+                          outlier_analysis: Dict[str, Any]) -> Dict[str, Any]:
+        """Combine outlier results with rate/spend analysis into the response payload"""
+        # Analyze rates against real-world benchmarks
+        rate_analysis = self._analyze_rates(processed_data)
+        
+        # Predict future spend patterns
+        spend_analysis = self._analyze_spend_patterns(processed_data)
+        
+        # Generate comprehensive insights
+        insights = self._generate_insights(
+            outlier_analysis,
+            rate_analysis, 
+            spend_analysis,
+            processed_data
+        )
+        
+        return {
+            'invoice_id': invoice_data.get('id', 'unknown'),
+            'total_amount': processed_data.get('total_amount', 0),
+            'currency': processed_data.get('currency', 'USD'),
+            'outlier_analysis': outlier_analysis,
+            'rate_analysis': rate_analysis,
+            'spend_analysis': spend_analysis,
+            'insights': insights,
+            'recommendations': self._generate_recommendations(outlier_analysis, rate_analysis),
+            'analysis_timestamp': datetime.now().isoformat()
+        }
+    
     def _preprocess_invoice_data(self, invoice_data: Dict[str, Any]) -> Dict[str, Any]:
         """Extract and normalize invoice data for analysis"""
         processed = {
@@ -127,62 +166,100 @@ class EnhancedInvoiceAnalyzer:
         
         return processed
     
-    def _detect_outliers(self, processed_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Detect outliers using enhanced model"""
-        outlier_results = {
+    @staticmethod
+    def _empty_outlier_results() -> Dict[str, Any]:
+        return {
             'has_outliers': False,
             'outlier_scores': [],
             'outlier_items': [],
             'overall_score': 0.0
         }
+    
+    def _detect_outliers(self, processed_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Detect outliers using enhanced model"""
+        return self._detect_outliers_batch([processed_data])[0]
+    
+    def _detect_outliers_batch(self, processed_batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Score the line items of every invoice in one scaler/model call"""
+        results = [self._empty_outlier_results() for _ in processed_batch]
         
         if 'outlier' not in self.models:
-            return outlier_results
+            return results
         
         try:
-            line_items = processed_data.get('line_items', [])
-            if not line_items:
-                return outlier_results
+            matrices = [self._outlier_feature_matrix(data.get('line_items', [])) for data in processed_batch]
+            sizes = [len(matrix) for matrix in matrices]
+            if not any(sizes):
+                return results
             
-            # Create DataFrame for analysis
-            df = pd.DataFrame(line_items)
+            features_array = np.nan_to_num(np.vstack([m for m in matrices if len(m)]), nan=0.0)
             
-            # Extract features for each line item
-            features = []
-            for _, item in df.iterrows():
-                feature_vector = self._extract_outlier_features(item, df)
-                features.append(feature_vector)
+            # Scale features and predict
+            features_scaled = self.scalers['outlier'].transform(features_array)
+            outlier_scores = self.models['outlier'].decision_function(features_scaled)
+            outlier_predictions = self.models['outlier'].predict(features_scaled)
             
-            if features:
-                features_array = np.array(features)
-                features_array = np.nan_to_num(features_array, nan=0.0)
-                
-                # Scale features and predict
-                features_scaled = self.scalers['outlier'].transform(features_array)
-                outlier_scores = self.models['outlier'].decision_function(features_scaled)
-                outlier_predictions = self.models['outlier'].predict(features_scaled)
-                
-                # Process results
-                outlier_results['outlier_scores'] = outlier_scores.tolist()
-                outlier_results['has_outliers'] = any(pred == -1 for pred in outlier_predictions)
-                outlier_results['overall_score'] = float(np.mean(outlier_scores))
-                
-                # Identify specific outlier items
-                for i, (score, prediction) in enumerate(zip(outlier_scores, outlier_predictions)):
-                    if prediction == -1:  # Outlier detected
-                        outlier_results['outlier_items'].append({
-                            'item_index': i,
-                            'description': line_items[i]['description'],
-                            'rate': line_items[i]['rate'],
-                            'hours': line_items[i]['hours'],
-                            'amount': line_items[i]['amount'],
-                            'outlier_score': float(score),
-                            'reason': self._explain_outlier(line_items[i], score)
-                        })
+            offset = 0
+            for idx, size in enumerate(sizes):
+                if not size:
+                    continue
+                results[idx] = self._build_outlier_results(
+                    processed_batch[idx]['line_items'],
+                    outlier_scores[offset:offset + size],
+                    outlier_predictions[offset:offset + size]
+                )
+                offset += size
                         
         except Exception as e:
+            if len(processed_batch) > 1:
+                # Score invoices one at a time so only the bad one loses its results
+                logger.warning(f"Batched outlier detection failed, scoring per invoice: {str(e)}")
+                return [self._detect_outliers_batch([data])[0] for data in processed_batch]
             logger.error(f"Error in outlier detection: {str(e)}")
         
+        return results
+    
+    def _outlier_feature_matrix(self, line_items: List[Dict[str, Any]]) -> np.ndarray:
+        """Build the outlier feature rows for one invoice's line items"""
+        if not line_items:
+            return np.empty((0, 6))
+        
+        hours = np.array([item['hours'] for item in line_items], dtype=float)
+        rates = np.array([item['rate'] for item in line_items], dtype=float)
+        amounts = np.array([item['amount'] for item in line_items], dtype=float)
+        mean_rate = rates.mean()
+        relative_rate = rates / mean_rate if mean_rate > 0 else np.zeros_like(rates)
+        
+        return np.column_stack([
+            hours,
+            rates,
+            amounts,
+            relative_rate,
+            hours * rates,
+            np.zeros_like(rates)  # Benchmark comparison placeholder
+        ])
+    
+    def _build_outlier_results(self, line_items: List[Dict[str, Any]], outlier_scores: np.ndarray,
+                               outlier_predictions: np.ndarray) -> Dict[str, Any]:
+        """Turn raw model output for one invoice into the outlier analysis payload"""
+        outlier_results = self._empty_outlier_results()
+        outlier_results['outlier_scores'] = outlier_scores.tolist()
+        outlier_results['has_outliers'] = any(pred == -1 for pred in outlier_predictions)
+        outlier_results['overall_score'] = float(np.mean(outlier_scores))
+        
+        # Identify specific outlier items
+        for i, (score, prediction) in enumerate(zip(outlier_scores, outlier_predictions)):
+            if prediction == -1:  # Outlier detected
+                outlier_results['outlier_items'].append({
+                    'item_index': i,
+                    'description': line_items[i]['description'],
+                    'rate': line_items[i]['rate'],
+                    'hours': line_items[i]['hours'],
+                    'amount': line_items[i]['amount'],
+                    'outlier_score': float(score),
+                    'reason': self._explain_outlier(line_items[i], score)
+                })
+        
         return outlier_results
     
     def _analyze_rates(self, processed_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -278,17 +355,6 @@ class EnhancedInvoiceAnalyzer:
         
         return spend_analysis
     
-    def _extract_outlier_features(self, item: pd.Series, df: pd.DataFrame) -> List[float]:
-        """Extract features for outlier detection"""
-        return [
-            item['hours'],
-            item['rate'], 
-            item['amount'],
-            item['rate'] / df['rate'].mean() if df['rate'].mean() > 0 else 0,
-            item['hours'] * item['rate'],
-            0  # Benchmark comparison placeholder
-        ]
-    
     def _compare_rate_to_benchmark(self, rate: float, practice_area: str, role: str) -> Optional[Dict[str, Any]]:
         """Compare rate to real-world benchmarks"""
         if practice_area not in self.rate_benchmarks:
@@ -421,8 +487,23 @@ class EnhancedInvoiceAnalyzer:
         
         return recommendations
 
+_analyzer = None
+
+
+def _get_analyzer() -> EnhancedInvoiceAnalyzer:
+    """Load the enhanced models once per process instead of once per call"""
+    global _analyzer
+    if _analyzer is None:
+        _analyzer = EnhancedInvoiceAnalyzer()
+    return _analyzer
+
 # Integration function for backward compatibility
 def analyze_invoice_enhanced(invoice_data: Dict[str, Any]) -> Dict[str, Any]:
     """Enhanced invoice analysis function"""
-    analyzer = EnhancedInvoiceAnalyzer()
-    return analyzer.analyze_invoice(invoice_data)
+    return _get_analyzer().analyze_invoice(invoice_data)
+
+def analyze_invoices_enhanced(invoices: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Batched enhanced invoice analysis (one model call for all line items)"""
+    if not invoices:
+        return []
+    return _get_analyzer().analyze_invoices(invoices)
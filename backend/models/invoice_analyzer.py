@@ -3,33 +3,38 @@ import pandas as pd
 from sklearn.ensemble import RandomForestClassifier, IsolationForest
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.preprocessing import StandardScaler
+from sklearn.exceptions import NotFittedError
+from sklearn.utils.validation import check_is_fitted
 import joblib
 import os
 import re
-import nltk
-import spacy
 from datetime import datetime
 from db.database import get_db_session, Invoice, LineItem, RiskFactor, Vendor
+from ml.compiled_forest import fast_model
 from models.db_models import Invoice, LineItem
 from utils.ml_preprocessing import extract_invoice_features, preprocess_text, scale_features
+from utils.nlp_resources import get_spacy_nlp, get_stop_words
 
 class InvoiceAnalyzer:
+    # Defaults until retrain_model derives thresholds from the data
+    amount_threshold = 50000
+    hours_threshold = 200
+    rate_threshold = 800
+
     def __init__(self):
         self.model_path = 'models/invoice_anomaly_model.joblib'
         self.vectorizer_path = 'models/invoice_vectorizer.joblib'
         self.scaler_path = 'models/invoice_scaler.joblib'
         
-        # Initialize NLP resources
-        try:
-            nltk.download('stopwords', quiet=True)
-            nltk.download('punkt', quiet=True)
-            self.nlp = spacy.load('en_core_web_sm')
-            self.stop_words = set(nltk.corpus.stopwords.words('english'))
-        except:
-            print("NLP resources couldn't be downloaded. Using basic processing.")
-            self.stop_words = {'the', 'and', 'to', 'of', 'in', 'for', 'with'}
+        # NLP resources are shared and lazy: no downloads or model loads here
+        self.stop_words = sorted(get_stop_words())
         
         self._load_models()
+    
+    @property
+    def nlp(self):
+        """spaCy pipeline, loaded on first use"""
+        return get_spacy_nlp()
         
     def _load_models(self):
         """Load or initialize all ML models"""
@@ -116,7 +121,7 @@ class InvoiceAnalyzer:
         # Detect anomalies
         if self.isolation_forest and self.scaler:
             scaled_features = self.scaler.transform([features])
-            anomaly_score = self.isolation_forest.score_samples(scaled_features)[0]
+            anomaly_score = fast_model(self.isolation_forest).score_samples(scaled_features)[0]
             risk_score = self._calculate_risk_score(anomaly_score, processed_data)
             
             # Identify specific risk factors
@@ -127,6 +132,73 @@ class InvoiceAnalyzer:
             'anomalies': risk_factors
         }
     
+    def _models_fitted(self):
+        try:
+            check_is_fitted(self.scaler)
+            check_is_fitted(self.isolation_forest)
+            return True
+        except (NotFittedError, AttributeError, TypeError):
+            return False
+    
+    def score_batch(self, invoices, line_items):
+        """
+        Risk-score many invoices at once
+        
+        invoices is a frame with id, amount, hours and rate; line_items a
+        frame of their line items. Features are built column-wise and the
+        scaler and isolation forest each run once over the whole batch.
+        Returns one dict per invoice (input order) with risk_score,
+        anomaly_score and anomalies.
+        """
+        from ml.feature_store import INVOICE_FEATURE_COLUMNS, invoice_feature_frame
+        
+        df = invoice_feature_frame(invoices, line_items)
+        anomaly_scores = np.zeros(len(df))
+        if len(df) and self._models_fitted():
+            try:
+                scaled = self.scaler.transform(df[INVOICE_FEATURE_COLUMNS])
+                anomaly_scores = fast_model(self.isolation_forest).score_samples(scaled)
+            except ValueError as e:
+                # Models trained on a different feature layout; score on rules only
+                print(f"Batch anomaly scoring skipped: {e}")
+        
+        amount = df['amount'].to_numpy()
+        hours = df['hours'].to_numpy()
+        rate = df['rate'].to_numpy()
+        
+        risk_scores = 50 - anomaly_scores * 20
+        risk_scores += np.select([amount > 100000, amount > 50000], [20, 10], 0)
+        if not line_items.empty:
+            item_max = line_items.groupby('invoice_id')[['rate', 'hours']].max()
+            suspicious = ((item_max['rate'].fillna(0) > self.rate_threshold) |
+                          (item_max['hours'].fillna(0) > self.hours_threshold))
+            risk_scores += np.where(df['id'].map(suspicious).fillna(False).to_numpy(dtype=bool), 15, 0)
+        risk_scores = np.clip(risk_scores, 0, 100)
+        
+        anomalies = [[] for _ in range(len(df))]
+        checks = [
+            ('high_amount', 'high', amount > self.amount_threshold,
+             lambda i: f"Invoice amount (${amount[i]}) exceeds normal range"),
+            ('excessive_hours', 'medium', hours > self.hours_threshold,
+             lambda i: f"Total hours ({hours[i]}) are higher than typical"),
+            ('high_rate', 'high', rate > self.rate_threshold,
+             lambda i: f"Hourly rate (${round(rate[i], 2)}) is above normal range"),
+        ]
+        for factor_type, severity, mask, describe in checks:
+            for i in np.flatnonzero(mask):
+                anomalies[i].append({'type': factor_type, 'severity': severity, 'description': describe(i)})
+        
+        return [
+            {
+                'invoice_id': int(invoice_id),
+                'risk_score': float(risk_score),
+                'anomaly_score': float(anomaly_score),
+                'anomalies': invoice_anomalies
+            }
+            for invoice_id, risk_score, anomaly_score, invoice_anomalies
+            in zip(df['id'], risk_scores, anomaly_scores, anomalies)
+        ]
+    
     def _extract_features(self, processed_data):
         """Extract features for ML analysis from processed invoice data"""
         try:
@@ -295,62 +367,49 @@ class InvoiceAnalyzer:
         # Try to train with any available data
         self._train_initial_models()
     
-    def retrain_model(self):
-        """Retrain models with all available data"""
-        from db.database import get_db_session
-        from models.db_models import Invoice, LineItem
-        from utils.ml_preprocessing import extract_invoice_features, preprocess_text, scale_features
-        import pandas as pd
+    def retrain_model(self, warm_start=False, n_jobs=1, refresh=True):
+        """
+        Retrain models with all available data
+
+        With warm_start, trees fitted on invoices added since the last fit are
+        appended to the current forest (scaler and vectorizer are kept).
+        """
+        from ml.feature_store import get_feature_store, INVOICE_FEATURE_COLUMNS
+        from ml.training_orchestrator import (ensemble_params, for_serving, supports_warm_start,
+                                              warm_start_fit, warm_start_rows_needed)
+        from utils.ml_preprocessing import preprocess_text
         
-        session = get_db_session()
         try:
-            # Get all invoice data
-            invoices = session.query(Invoice).all()
+            # Read columnar training snapshot (incrementally refreshed from the DB)
+            training_df = get_feature_store(refresh=refresh).invoice_training_frame()
             
-            if len(invoices) < 10:
+            if len(training_df) < 10:
                 print("Not enough data for model retraining")
                 return False
-                
-            # Extract features from invoices
-            feature_list = []
-            text_data = []
             
-            for invoice in invoices:
-                # Convert invoice to dict
-                invoice_dict = {
-                    'id': invoice.id,
-                    'amount': invoice.amount,
-                    'hours': invoice.hours or 0,
-                    'rate': invoice.rate or 0,
-                    'description': invoice.description,
-                    'status': invoice.status,
-                    'line_items': []
-                }
+            trained_through = getattr(self.isolation_forest, 'trained_through_id_', None)
+            if warm_start and trained_through is not None and supports_warm_start(self.isolation_forest):
+                new_rows = training_df[training_df['id'] > trained_through]
+                if len(new_rows) < warm_start_rows_needed(self.isolation_forest):
+                    # Fewer rows than each tree's subsample would rescale every anomaly score
+                    print("Not enough new data for a warm-start round")
+                    return False
                 
-                # Get line items for this invoice
-                line_items = session.query(LineItem).filter(LineItem.invoice_id == invoice.id).all()
+                new_features = self.scaler.transform(new_rows[INVOICE_FEATURE_COLUMNS].astype(float))
+                warm_start_fit(self.isolation_forest, new_features, n_jobs=n_jobs)
+                self.isolation_forest.trained_through_id_ = int(training_df['id'].max())
+                self._set_thresholds(training_df)
                 
-                for item in line_items:
-                    line_item_dict = {
-                        'description': item.description,
-                        'hours': item.hours,
-                        'rate': item.rate,
-                        'amount': item.amount,
-                        'timekeeper': item.timekeeper,
-                        'timekeeper_title': item.timekeeper_title
-                    }
-                    invoice_dict['line_items'].append(line_item_dict)
-                
-                # Extract numerical features
-                features, _ = extract_invoice_features(invoice_dict)
-                feature_list.append(features)
-                
-                # Process text data
-                text_corpus = invoice.description + ' ' + ' '.join([item.description for item in line_items if item.description])
-                text_data.append(preprocess_text(text_corpus))
+                joblib.dump(for_serving(self.isolation_forest), self.model_path)
+                print(f"Added trees for {len(new_rows)} new invoices to the anomaly model")
+                return True
             
-            # Convert to DataFrame and normalize
-            feature_df = pd.DataFrame(feature_list)
+            # Process text data
+            text_corpus = (training_df['description'] + ' ' + training_df['line_item_text']).str.strip()
+            text_data = [preprocess_text(text) for text in text_corpus]
+            
+            # Normalize numerical features
+            feature_df = training_df[INVOICE_FEATURE_COLUMNS].astype(float)
             self.scaler = StandardScaler().fit(feature_df)
             scaled_features = self.scaler.transform(feature_df)
             
@@ -358,17 +417,17 @@ class InvoiceAnalyzer:
             self.vectorizer.fit(text_data)
             
             # Train isolation forest model for anomaly detection
-            self.isolation_forest = IsolationForest(contamination=0.1, random_state=42, n_estimators=100)
+            self.isolation_forest = IsolationForest(**ensemble_params(
+                IsolationForest, {'contamination': 0.1, 'random_state': 42, 'n_estimators': 100},
+                n_samples=len(scaled_features), n_jobs=n_jobs))
             self.isolation_forest.fit(scaled_features)
+            self.isolation_forest.trained_through_id_ = int(training_df['id'].max())
             
-            # Calculate new thresholds based on data distribution
-            self.amount_threshold = np.percentile([invoice.amount for invoice in invoices], 90)
-            self.hours_threshold = np.percentile([invoice.hours for invoice in invoices if invoice.hours], 90)
-            self.rate_threshold = np.percentile([invoice.rate for invoice in invoices if invoice.rate], 90)
+            self._set_thresholds(training_df)
             
             # Save models
             os.makedirs(os.path.dirname(self.model_path), exist_ok=True)
-            joblib.dump(self.isolation_forest, self.model_path)
+            joblib.dump(for_serving(self.isolation_forest), self.model_path)
             joblib.dump(self.vectorizer, self.vectorizer_path)
             joblib.dump(self.scaler, self.scaler_path)
             
@@ -377,10 +436,18 @@ class InvoiceAnalyzer:
             
         except Exception as e:
             print(f"Error retraining models: {e}")
-            return False
-            
-        finally:
-            session.close()
+            # Surface the failure to the caller; False only means "skipped"
+            raise
+
+    def _set_thresholds(self, training_df):
+        """Calculate new thresholds based on data distribution (defaults stay for empty columns)"""
+        self.amount_threshold = np.percentile(training_df['amount'], 90)
+        hours = training_df.loc[training_df['hours'] > 0, 'hours']
+        if len(hours):
+            self.hours_threshold = np.percentile(hours, 90)
+        rates = training_df.loc[training_df['rate'] > 0, 'rate']
+        if len(rates):
+            self.rate_threshold = np.percentile(rates, 90)
 
     def _train_initial_models(self):
         """Train the initial models with historical data if available"""
@@ -5,6 +5,7 @@ from sklearn.preprocessing import StandardScaler
 import joblib
 import os
 from db.database import get_db_session
+from ml.compiled_forest import fast_model
 import re
 
 class RiskPredictor:
@@ -96,7 +97,7 @@ class RiskPredictor:
         X_scaled = self.scaler.transform(features)
         
         # Predict risk score
-        risk_score = self.model.predict(X_scaled)[0]
+        risk_score = fast_model(self.model).predict(X_scaled)[0]
         
         # Add additional risk factors
         additional_risk = self._evaluate_additional_risk_factors(invoice_data)
@@ -108,59 +109,48 @@ class RiskPredictor:
             'risk_factors': self._identify_risk_factors(invoice_data, final_risk_score)
         }
     
-    def retrain_model(self):
-        """Retrain the risk model with all available data"""
-        from models.db_models import Invoice, LineItem, RiskFactor
-        import pandas as pd
+    def retrain_model(self, warm_start=False, n_jobs=1, refresh=True):
+        """
+        Retrain the risk model with all available data
+
+        With warm_start, trees fitted on invoices scored since the last fit are
+        appended to the current ensemble using the existing scaler.
+        """
+        from ml.feature_store import get_feature_store, RISK_FEATURE_COLUMNS
+        from ml.training_orchestrator import (ensemble_params, for_serving, supports_warm_start,
+                                              warm_start_fit, warm_start_rows_needed)
         
-        session = get_db_session()
         try:
-            # Get all invoices with risk factors
-            invoices = session.query(Invoice).all()
+            # Invoice, line-item and risk-factor aggregates from the columnar snapshot
+            training_df = get_feature_store(refresh=refresh).invoice_training_frame()
             
-            if len(invoices) < 10:
+            if len(training_df) < 10:
                 print("Not enough data for risk model retraining")
                 return False
             
-            # Prepare training data
-            features = []
-            targets = []
+            # Skip invoices without risk score
+            training_df = training_df[training_df['risk_score'].notna()]
             
-            for invoice in invoices:
-                # Skip invoices without risk score
-                if invoice.risk_score is None:
-                    continue
-                
-                # Get line items
-                line_items = session.query(LineItem).filter(LineItem.invoice_id == invoice.id).all()
-                
-                # Get risk factors
-                risk_factors = session.query(RiskFactor).filter(RiskFactor.invoice_id == invoice.id).all()
-                
-                # Extract features
-                invoice_features = [
-                    invoice.amount,
-                    len(line_items),  # line item count
-                    invoice.hours or 0,
-                    invoice.rate or 0,
-                    len(set(item.timekeeper for item in line_items if item.timekeeper)),  # unique timekeepers
-                    len(risk_factors),  # risk factor count
-                    1 if 'litigation' in (invoice.description or '').lower() else 0,  # litigation flag
-                    1 if any(rf.factor_type == 'high_amount' for rf in risk_factors) else 0,  # high amount flag
-                    1 if any(rf.factor_type == 'excessive_hours' for rf in risk_factors) else 0  # excessive hours flag
-                ]
-                
-                features.append(invoice_features)
-                targets.append(invoice.risk_score)
-            
-            # Convert to numpy arrays
-            X = np.array(features)
-            y = np.array(targets)
+            X = training_df[RISK_FEATURE_COLUMNS].astype(float).values
+            y = training_df['risk_score'].astype(float).values
             
             if len(X) < 10:
                 print("Not enough complete data for risk model training")
                 return False
             
+            trained_through = getattr(self.model, 'trained_through_id_', None)
+            if warm_start and trained_through is not None and supports_warm_start(self.model):
+                is_new = (training_df['id'] > trained_through).values
+                if is_new.sum() < warm_start_rows_needed(self.model):
+                    print("Not enough new data for a warm-start round")
+                    return False
+                
+                warm_start_fit(self.model, self.scaler.transform(X[is_new]), y[is_new], n_jobs=n_jobs)
+                self.model.trained_through_id_ = int(training_df['id'].max())
+                joblib.dump(for_serving(self.model), self.model_path)
+                print(f"Added trees for {int(is_new.sum())} new invoices to the risk model")
+                return True
+            
             # Scale features
             self.scaler = StandardScaler()
             X_scaled = self.scaler.fit_transform(X)
@@ -171,7 +161,9 @@ class RiskPredictor:
             
             # Try different models
             models = {
-                'random_forest': RandomForestRegressor(n_estimators=100, random_state=42),
+                'random_forest': RandomForestRegressor(**ensemble_params(
+                    RandomForestRegressor, {'n_estimators': 100, 'random_state': 42},
+                    n_samples=len(X), n_jobs=n_jobs)),
                 'gradient_boosting': GradientBoostingRegressor(random_state=42)
             }
             
@@ -191,10 +183,11 @@ class RiskPredictor:
             # Train final model on all data
             self.model = best_model
             self.model.fit(X_scaled, y)
+            self.model.trained_through_id_ = int(training_df['id'].max())
             
             # Save model
             os.makedirs(os.path.dirname(self.model_path), exist_ok=True)
-            joblib.dump(self.model, self.model_path)
+            joblib.dump(for_serving(self.model), self.model_path)
             joblib.dump(self.scaler, self.scaler_path)
             
             print("Risk prediction model successfully retrained and saved")
@@ -202,10 +195,8 @@ class RiskPredictor:
             
         except Exception as e:
             print(f"Error retraining risk prediction model: {e}")
-            return False
-            
-        finally:
-            session.close()
+            # Surface the failure to the caller; False only means "skipped"
+            raise
     
     def _calculate_avg_rate(self, invoice_data):
         """Calculate average rate from line items"""
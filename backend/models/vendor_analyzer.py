@@ -444,61 +444,24 @@ class VendorAnalyzer:
             # More sample data would be included in a real system
         ]
     
-    def retrain_model(self):
+    def retrain_model(self, refresh=True):
         """Retrain the vendor clustering model with all available data"""
         from db.database import get_db_session
-        from models.db_models import Invoice, Vendor
-        import pandas as pd
-        from sqlalchemy import func
+        from models.db_models import Vendor
+        from ml.feature_store import get_feature_store, VENDOR_FEATURE_COLUMNS
         
         session = get_db_session()
         try:
-            # Get all vendors with their metrics
-            vendors = session.query(Vendor).all()
+            # Per-vendor spend/rate/matter aggregates from the columnar snapshot
+            vendor_df = get_feature_store(refresh=refresh).vendor_training_frame()
             
-            if len(vendors) < 5:  # Need at least a few vendors for clustering
-                print("Not enough vendor data for clustering model training")
+            if len(vendor_df) < 5:
+                print("Not enough complete vendor data for clustering")
                 return False
-                
-            # Gather features for each vendor
-            features = []
-            vendor_ids = []
             
-            for vendor in vendors:
-                # Get vendor's invoices
-                invoices = session.query(Invoice).filter(Invoice.vendor_id == vendor.id).all()
-                
-                if not invoices:
-                    continue
-                    
-                # Calculate metrics
-                total_spend = sum(invoice.amount for invoice in invoices)
-                matter_count = session.query(func.count(func.distinct(Invoice.matter_id)))\
-                    .filter(Invoice.vendor_id == vendor.id).scalar() or 0
-                
-                avg_rate = 0
-                if any(invoice.rate for invoice in invoices if invoice.rate):
-                    rates = [invoice.rate for invoice in invoices if invoice.rate]
-                    avg_rate = sum(rates) / len(rates)
-                
-                # Use risk_profile as diversity score if available or default value
-                diversity_score = vendor.risk_profile if vendor.risk_profile is not None else 0.5
-                
-                # Extract features
-                vendor_features = [
-                    avg_rate,
-                    total_spend / 10000,  # Normalize large values
-                    matter_count,
-                    diversity_score * 100  # Scale up small values
-                ]
-                
-                features.append(vendor_features)
-                vendor_ids.append(vendor.id)
+            features = vendor_df[VENDOR_FEATURE_COLUMNS].astype(float).values.tolist()
+            vendor_ids = [int(vendor_id) for vendor_id in vendor_df['vendor_id']]
             
-            if len(features) < 5:
-                print("Not enough complete vendor data for clustering")
-                return False
-                
             # Convert to numpy array
             X = np.array(features)
             
@@ -555,8 +518,12 @@ class VendorAnalyzer:
                     }
             
             # Update vendors with cluster information
+            vendors_by_id = {
+                vendor.id: vendor
+                for vendor in session.query(Vendor).filter(Vendor.id.in_(vendor_ids)).all()
+            }
             for idx, vendor_id in enumerate(vendor_ids):
-                vendor = session.query(Vendor).filter(Vendor.id == vendor_id).first()
+                vendor = vendors_by_id.get(vendor_id)
                 if vendor:
                     cluster_label = int(cluster_labels[idx])
                     
@@ -573,7 +540,8 @@ class VendorAnalyzer:
         except Exception as e:
             session.rollback()
             print(f"Error retraining vendor clustering model: {e}")
-            return False
+            # Surface the failure to the caller; False only means "skipped"
+            raise
             
         finally:
             session.close()
@@ -16,6 +16,7 @@ from .notification import notification_bp
 from .vendors import vendors_bp
 from .legal_intelligence import legal_intel_bp
 from .enhanced_upload import upload_bp
+from .reports import reports_bp
 
 # List of all blueprints
 blueprints = [
@@ -27,7 +28,8 @@ blueprints = [
     (notification_bp, None),  # blueprint already has /api/notifications prefix
     (vendors_bp, None),  # url_prefix already included in blueprint
     (legal_intel_bp, '/api/legal-intelligence'),
-    (upload_bp, None)  # url_prefix already included in blueprint
+    (upload_bp, None),  # url_prefix already included in blueprint
+    (reports_bp, '/api/reports')
 ]
 
 def register_routes(app):
@@ -3,59 +3,20 @@ from db.database import get_db_session
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from dev_auth import development_jwt_required
 from auth import role_required
+from services.audit_service import AuditLogger
+from services.settings_store import get_settings_store
 # from backend.tasks import retrain_models  # Comment out for now
-import json
-import os
+from datetime import datetime
 
 admin_bp = Blueprint('admin', __name__)
 
-# Settings storage (in real app, would be in DB)
-SETTINGS_FILE = 'config/settings.json'
-
 def get_settings():
-    """Load settings from file"""
-    try:
-        if not os.path.exists(SETTINGS_FILE):
-            # Create directory if it doesn't exist
-            os.makedirs(os.path.dirname(SETTINGS_FILE), exist_ok=True)
-            # Create default settings
-            default_settings = {
-                'anomaly_threshold': 0.8,
-                'high_risk_threshold': 7,
-                'hourly_rate_threshold': 1.2,  # Multiplier for hourly rate comparison
-                'notifications_enabled': True,
-                'auto_retrain_enabled': True,
-                'auto_retrain_frequency': 'monthly'  # daily, weekly, monthly
-            }
-            with open(SETTINGS_FILE, 'w') as f:
-                json.dump(default_settings, f, indent=2)
-            return default_settings
-        
-        with open(SETTINGS_FILE, 'r') as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"Error loading settings: {str(e)}")
-        return {
-            'anomaly_threshold': 0.8,
-            'high_risk_threshold': 7,
-            'hourly_rate_threshold': 1.2,
-            'notifications_enabled': True,
-            'auto_retrain_enabled': True,
-            'auto_retrain_frequency': 'monthly'
-        }
+    """Current settings (served from memory, reloaded when the file changes)"""
+    return get_settings_store().all()
 
 def save_settings(settings):
-    """Save settings to file"""
-    try:
-        # Create directory if it doesn't exist
-        os.makedirs(os.path.dirname(SETTINGS_FILE), exist_ok=True)
-        
-        with open(SETTINGS_FILE, 'w') as f:
-            json.dump(settings, f, indent=2)
-        return True
-    except Exception as e:
-        print(f"Error saving settings: {str(e)}")
-        return False
+    """Save settings atomically and propagate the change to other workers"""
+    return get_settings_store().save(settings)
 
 @admin_bp.route('/settings', methods=['GET'])
 @development_jwt_required
@@ -115,12 +76,7 @@ def trigger_model_retrain():
 @development_jwt_required
 @role_required(['admin'])
 def get_audit_logs():
-    """Get system audit logs"""
-    # In a real implementation, we would query an AuditLog table
-    # For now, we'll return dummy data
-    
-    # Get pagination parameters
-    offset = int(request.args.get('offset', 0))
+    """Get system audit logs, newest first (pass next_cursor back as ?cursor=)"""
     limit = min(int(request.args.get('limit', 50)), 100)  # Max 100 per page
     
     # Get filter parameters
@@ -129,57 +85,24 @@ def get_audit_logs():
     date_from = request.args.get('date_from')
     date_to = request.args.get('date_to')
     
-    # Dummy data
-    logs = [
-        {
-            'id': 1,
-            'user_id': 1,
-            'username': 'admin@example.com',
-            'action': 'LOGIN',
-            'details': 'User login successful',
-            'timestamp': '2023-06-15T10:30:00Z'
-        },
-        {
-            'id': 2,
-            'user_id': 1,
-            'username': 'admin@example.com',
-            'action': 'SETTINGS_CHANGE',
-            'details': 'Updated anomaly threshold to 0.85',
-            'timestamp': '2023-06-15T10:35:00Z'
-        },
-        {
-            'id': 3,
-            'user_id': 2,
-            'username': 'user@example.com',
-            'action': 'UPLOAD_INVOICE',
-            'details': 'Uploaded invoice INV-2023-001',
-            'timestamp': '2023-06-15T11:15:00Z'
-        },
-        {
-            'id': 4,
-            'user_id': 1,
-            'username': 'admin@example.com',
-            'action': 'MODEL_RETRAIN',
-            'details': 'Initiated model retraining',
-            'timestamp': '2023-06-15T14:20:00Z'
-        }
-    ]
-    
-    # Apply filters (in a real app, this would be done in the database query)
-    if action_type:
-        logs = [log for log in logs if log['action'] == action_type]
-    if user_id:
-        logs = [log for log in logs if log['user_id'] == int(user_id)]
-    
-    # Apply pagination
-    paginated_logs = logs[offset:offset + limit]
+    try:
+        page = AuditLogger.get_audit_logs(
+            start_date=datetime.fromisoformat(date_from) if date_from else None,
+            end_date=datetime.fromisoformat(date_to) if date_to else None,
+            event_type=action_type,
+            user_id=int(user_id) if user_id else None,
+            resource_type=request.args.get('resource_type'),
+            cursor=request.args.get('cursor'),
+            per_page=limit
+        )
+    except ValueError as e:
+        return jsonify({'error': f'Invalid filter: {str(e)}'}), 400
     
     return jsonify({
-        'logs': paginated_logs,
+        'logs': page['logs'],
         'pagination': {
-            'total': len(logs),
-            'offset': offset,
-            'limit': limit
+            'limit': limit,
+            'next_cursor': page['next_cursor']
         }
     })
 
@@ -9,7 +9,7 @@ from datetime import datetime, timedelta
 import calendar
 from models.vendor_analyzer import VendorAnalyzer
 from models.matter_analyzer import MatterAnalyzer
-from models.enhanced_invoice_analyzer import analyze_invoice_enhanced
+from services.analytics_report_engine import AnalyticsReportEngine
 
 analytics_bp = Blueprint('analytics', __name__)
 
@@ -688,116 +688,9 @@ def generate_report():
             date_from = (datetime.now() - timedelta(days=365)).strftime('%Y-%m-%d')
         if not date_to:
             date_to = datetime.now().strftime('%Y-%m-%d')
-            
-        date_from_obj = datetime.strptime(date_from, '%Y-%m-%d')
-        date_to_obj = datetime.strptime(date_to, '%Y-%m-%d')
-        
-        # Get all invoices in the date range
-        invoices = session.query(Invoice)\
-            .filter(Invoice.date >= date_from_obj, Invoice.date <= date_to_obj)\
-            .all()
         
-        # Calculate summary metrics
-        total_spend = sum(invoice.amount for invoice in invoices)
-        invoice_count = len(invoices)
-        
-        # Vendor analysis
-        vendor_spend = {}
-        for invoice in invoices:
-            vendor_name = invoice.vendor.name if invoice.vendor else 'Unknown'
-            vendor_spend[vendor_name] = vendor_spend.get(vendor_name, 0) + invoice.amount
-        
-        top_vendors = sorted(vendor_spend.items(), key=lambda x: x[1], reverse=True)[:10]
-        
-        # Practice area analysis
-        practice_area_spend = {}
-        for invoice in invoices:
-            line_items = session.query(LineItem).filter(LineItem.invoice_id == invoice.id).all()
-            for item in line_items:
-                # Infer practice area from description
-                practice_area = _infer_practice_area(item.description)
-                practice_area_spend[practice_area] = practice_area_spend.get(practice_area, 0) + item.amount
-        
-        # Risk analysis
-        high_risk_invoices = [inv for inv in invoices if inv.risk_score and inv.risk_score > 70]
-        medium_risk_invoices = [inv for inv in invoices if inv.risk_score and 40 <= inv.risk_score <= 70]
-        low_risk_invoices = [inv for inv in invoices if inv.risk_score and inv.risk_score < 40]
-        
-        # Rate analysis using enhanced ML model
-        rate_analysis = _analyze_rates_comprehensive(invoices, session)
-        
-        # Monthly trends
-        monthly_trends = _calculate_monthly_trends(invoices)
-        
-        # ML-driven insights
-        ml_insights = []
-        if invoices:
-            # Analyze a sample of invoices for patterns
-            sample_invoices = invoices[:10]  # Analyze first 10 invoices
-            for invoice in sample_invoices:
-                invoice_data = {
-                    'id': invoice.id,
-                    'amount': invoice.amount,
-                    'vendor': invoice.vendor.name if invoice.vendor else 'Unknown',
-                    'date': invoice.date.isoformat() if invoice.date else None,
-                    'line_items': [
-                        {
-                            'description': item.description,
-                            'amount': item.amount,
-                            'hours': item.hours or 0,
-                            'rate': item.rate or 0,
-                            'attorney': item.timekeeper or 'Unknown'
-                        }
-                        for item in session.query(LineItem).filter(LineItem.invoice_id == invoice.id).all()
-                    ]
-                }
-                
-                # Run ML analysis
-                analysis = analyze_invoice_enhanced(invoice_data)
-                if analysis.get('insights'):
-                    ml_insights.extend(analysis['insights'])
-        
-        # Generate comprehensive report
-        report = {
-            'report_id': f"RPT-{datetime.now().strftime('%Y%m%d%H%M%S')}",
-            'generated_at': datetime.now().isoformat(),
-            'date_range': {
-                'from': date_from,
-                'to': date_to
-            },
-            'summary': {
-                'total_spend': float(total_spend),
-                'invoice_count': invoice_count,
-                'average_invoice_amount': float(total_spend / invoice_count) if invoice_count > 0 else 0,
-                'unique_vendors': len(vendor_spend),
-                'report_type': report_type
-            },
-            'vendor_analysis': {
-                'top_vendors': [
-                    {'name': vendor, 'spend': float(spend), 'percentage': float(spend / total_spend * 100) if total_spend > 0 else 0}
-                    for vendor, spend in top_vendors
-                ],
-                'vendor_diversity': len(vendor_spend),
-                'concentration_risk': float(top_vendors[0][1] / total_spend * 100) if top_vendors and total_spend > 0 else 0
-            },
-            'practice_area_analysis': {
-                'breakdown': [
-                    {'practice_area': area, 'spend': float(spend), 'percentage': float(spend / total_spend * 100) if total_spend > 0 else 0}
-                    for area, spend in sorted(practice_area_spend.items(), key=lambda x: x[1], reverse=True)
-                ]
-            },
-            'risk_analysis': {
-                'high_risk_count': len(high_risk_invoices),
-                'medium_risk_count': len(medium_risk_invoices),
-                'low_risk_count': len(low_risk_invoices),
-                'high_risk_spend': float(sum(inv.amount for inv in high_risk_invoices)),
-                'average_risk_score': float(sum(inv.risk_score for inv in invoices if inv.risk_score) / len([inv for inv in invoices if inv.risk_score])) if invoices else 0
-            },
-            'rate_analysis': rate_analysis,
-            'monthly_trends': monthly_trends,
-            'ml_insights': list(set(ml_insights))[:20],  # Unique insights, max 20
-            'recommendations': _generate_report_recommendations(invoices, vendor_spend, practice_area_spend, high_risk_invoices)
-        }
+        # Grouped/columnar computation: query count is independent of invoice count
+        report = AnalyticsReportEngine(session).generate(date_from, date_to, report_type)
         
         return jsonify(report)
         
@@ -805,138 +698,3 @@ def generate_report():
         return jsonify({'error': f'Report generation failed: {str(e)}'}), 500
     finally:
         session.close()
-
-def _infer_practice_area(description):
-    """Infer practice area from line item description"""
-    if not description:
-        return 'General'
-    
-    description_lower = description.lower()
-    
-    if any(word in description_lower for word in ['litigation', 'trial', 'court', 'dispute', 'lawsuit']):
-        return 'Litigation'
-    elif any(word in description_lower for word in ['corporate', 'merger', 'acquisition', 'due diligence', 'm&a']):
-        return 'Corporate'
-    elif any(word in description_lower for word in ['contract', 'agreement', 'negotiation', 'commercial']):
-        return 'Commercial'
-    elif any(word in description_lower for word in ['employment', 'labor', 'hr', 'workplace']):
-        return 'Employment'
-    elif any(word in description_lower for word in ['ip', 'patent', 'trademark', 'copyright', 'intellectual property']):
-        return 'Intellectual Property'
-    elif any(word in description_lower for word in ['real estate', 'property', 'lease', 'zoning']):
-        return 'Real Estate'
-    elif any(word in description_lower for word in ['tax', 'taxation', 'irs', 'compliance']):
-        return 'Tax'
-    elif any(word in description_lower for word in ['regulatory', 'compliance', 'government', 'administrative']):
-        return 'Regulatory'
-    else:
-        return 'General'
-
-def _analyze_rates_comprehensive(invoices, session):
-    """Comprehensive rate analysis using ML models"""
-    all_rates = []
-    attorney_rates = {}
-    
-    for invoice in invoices:
-        line_items = session.query(LineItem).filter(LineItem.invoice_id == invoice.id).all()
-        for item in line_items:
-            if item.rate and item.rate > 0:
-                all_rates.append(item.rate)
-                attorney = item.timekeeper or 'Unknown'
-                if attorney not in attorney_rates:
-                    attorney_rates[attorney] = []
-                attorney_rates[attorney].append(item.rate)
-    
-    if not all_rates:
-        return {'average_rate': 0, 'rate_range': [0, 0], 'attorney_analysis': []}
-    
-    avg_rate = sum(all_rates) / len(all_rates)
-    min_rate = min(all_rates)
-    max_rate = max(all_rates)
-    
-    # Attorney rate analysis
-    attorney_analysis = []
-    for attorney, rates in attorney_rates.items():
-        attorney_avg = sum(rates) / len(rates)
-        attorney_analysis.append({
-            'attorney': attorney,
-            'average_rate': float(attorney_avg),
-            'rate_count': len(rates),
-            'rate_range': [float(min(rates)), float(max(rates))]
-        })
-    
-    attorney_analysis.sort(key=lambda x: x['average_rate'], reverse=True)
-    
-    return {
-        'average_rate': float(avg_rate),
-        'rate_range': [float(min_rate), float(max_rate)],
-        'total_rate_entries': len(all_rates),
-        'attorney_analysis': attorney_analysis[:10]  # Top 10 attorneys by rate
-    }
-
-def _calculate_monthly_trends(invoices):
-    """Calculate monthly spending trends"""
-    monthly_spend = {}
-    
-    for invoice in invoices:
-        if invoice.date:
-            month_key = invoice.date.strftime('%Y-%m')
-            monthly_spend[month_key] = monthly_spend.get(month_key, 0) + invoice.amount
-    
-    # Sort by month
-    return [
-        {'month': month, 'spend': float(spend)}
-        for month, spend in sorted(monthly_spend.items())
-    ]
-
-def _generate_report_recommendations(invoices, vendor_spend, practice_area_spend, high_risk_invoices):
-    """Generate actionable recommendations based on analysis"""
-    recommendations = []
-    
-    total_spend = sum(invoice.amount for invoice in invoices)
-    
-    # Vendor concentration risk
-    if vendor_spend and total_spend > 0:
-        top_vendor_percentage = max(vendor_spend.values()) / total_spend * 100
-        if top_vendor_percentage > 50:
-            recommendations.append({
-                'category': 'Vendor Risk',
-                'priority': 'High',
-                'recommendation': f'Consider diversifying legal vendors. Top vendor represents {top_vendor_percentage:.1f}% of total spend.',
-                'impact': 'Risk Management'
-            })
-    
-    # High-risk invoice management
-    if high_risk_invoices:
-        high_risk_percentage = len(high_risk_invoices) / len(invoices) * 100
-        if high_risk_percentage > 20:
-            recommendations.append({
-                'category': 'Risk Management',
-                'priority': 'High',
-                'recommendation': f'{high_risk_percentage:.1f}% of invoices are high-risk. Implement enhanced review processes.',
-                'impact': 'Cost Control'
-            })
-    
-    # Practice area optimization
-    if practice_area_spend and len(practice_area_spend) > 1:
-        top_practice_area = max(practice_area_spend, key=practice_area_spend.get)
-        top_practice_percentage = practice_area_spend[top_practice_area] / total_spend * 100
-        if top_practice_percentage > 60:
-            recommendations.append({
-                'category': 'Practice Area',
-                'priority': 'Medium',
-                'recommendation': f'{top_practice_area} represents {top_practice_percentage:.1f}% of spend. Consider specialized vendor partnerships.',
-                'impact': 'Cost Optimization'
-            })
-    
-    # Budget management
-    avg_invoice_amount = total_spend / len(invoices) if invoices else 0
-    if avg_invoice_amount > 10000:
-        recommendations.append({
-            'category': 'Budget Control',
-            'priority': 'Medium',
-            'recommendation': f'Average invoice amount is ${avg_invoice_amount:,.2f}. Consider implementing approval thresholds.',
-            'impact': 'Process Improvement'
-        })
-    
-    return recommendations
@@ -1,9 +1,10 @@
 from flask import Blueprint, request, jsonify, current_app
 from db.database import get_db_session
 from models.db_models import User
-from werkzeug.security import generate_password_hash, check_password_hash
+from services.password_hashing import PasswordHasherBusy, busy_response, get_password_hasher
+from services.token_cache import VERSION_CLAIM, bump_token_version, get_token_cache, token_version
 from auth import authenticate_user, role_required
-from flask_jwt_extended import jwt_required, get_jwt_identity, create_access_token, create_refresh_token, set_refresh_cookies, unset_jwt_cookies
+from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity, create_access_token, create_refresh_token, set_refresh_cookies, unset_jwt_cookies
 from dev_auth import development_jwt_required
 from datetime import timedelta
 import re
@@ -25,18 +26,22 @@ def login():
     password = data.get('password') or ''
     if not email or not password:
         return jsonify({'message': 'Missing email or password'}), 400
-    user = authenticate_user(email, password)
+    try:
+        user = authenticate_user(email, password)
+    except PasswordHasherBusy as e:
+        return busy_response(e)
     if not user:
         return jsonify({'message': 'Invalid credentials'}), 401
     try:
         # Include stable claims (email + user_id) so /me can recover correct user even if identity monkeypatched
         # NOTE: JWT identity must be string
+        version = token_version(user.id)
         access_token = create_access_token(
             identity=str(user.id),
-            additional_claims={'role': user.role, 'email': user.email, 'user_id': user.id},
+            additional_claims={'role': user.role, 'email': user.email, 'user_id': user.id, VERSION_CLAIM: version},
             expires_delta=timedelta(hours=1)
         )
-        refresh_token = create_refresh_token(identity=str(user.id))
+        refresh_token = create_refresh_token(identity=str(user.id), additional_claims={VERSION_CLAIM: version})
     except Exception as e:
         return jsonify({'message': 'Token generation failed', 'detail': str(e)}), 500
     resp = jsonify({
@@ -88,7 +93,7 @@ def register():
         # Create new user
         new_user = User(
             email=email,
-            password_hash=generate_password_hash(password),
+            password_hash=get_password_hasher().hash(password),
             first_name=first_name,
             last_name=last_name,
             role=role  # Note: In production, this should validate role or restrict to 'user' only
@@ -121,6 +126,9 @@ def register():
             'user': user_data
         }), 201
         
+    except PasswordHasherBusy as e:
+        session.rollback()
+        return busy_response(e)
     except Exception as e:
         session.rollback()
         return jsonify({'message': f'Error creating user: {str(e)}'}), 500
@@ -132,10 +140,14 @@ def register():
 def refresh():
     """Rotate refresh token and issue new access token"""
     user_id = get_jwt_identity()
-    # Revoke old (JWT ID would be needed; simplified demo)
+    # Refresh tokens from before a logout / password change are revoked
+    if get_token_cache().is_revoked(get_jwt()):
+        return jsonify({'message': 'Token has been revoked'}), 401
     # Issue new tokens
-    access_token = create_access_token(identity=user_id, expires_delta=timedelta(hours=1))
-    new_refresh = create_refresh_token(identity=user_id)
+    version = {VERSION_CLAIM: token_version(user_id)}
+    access_token = create_access_token(identity=user_id, expires_delta=timedelta(hours=1),
+                                       additional_claims=version)
+    new_refresh = create_refresh_token(identity=user_id, additional_claims=version)
     resp = jsonify({'token': access_token})
     set_refresh_cookies(resp, new_refresh)
     return resp
@@ -143,6 +155,10 @@ def refresh():
 @auth_bp.route('/logout', methods=['POST'])
 @jwt_required(optional=True)
 def logout():
+    user_id = get_jwt_identity()
+    if user_id:
+        # Invalidates this user's outstanding access and refresh tokens
+        bump_token_version(user_id)
     resp = jsonify({'message': 'Logged out'})
     unset_jwt_cookies(resp)
     return resp
@@ -274,9 +290,11 @@ def update_user(user_id):
         if 'active' in data:
             user.active = data['active']
         if 'password' in data and data['password']:
-            user.password_hash = generate_password_hash(data['password'])
+            user.password_hash = get_password_hasher().hash(data['password'])
             
         session.commit()
+        if 'password' in data and data['password']:
+            bump_token_version(user_id)
         
         # Store user data before closing session
         user_data = {
@@ -317,14 +335,19 @@ def change_password():
     try:
         user = session.query(User).filter_by(id=user_id).first()
 
-        if not user or not check_password_hash(user.password_hash, old_password):
+        hasher = get_password_hasher()
+        if not user or not hasher.verify(user.password_hash, old_password)[0]:
             session.close()
             return jsonify({'message': 'Invalid old password'}), 401
 
-        user.password_hash = generate_password_hash(new_password)
+        user.password_hash = hasher.hash(new_password)
         session.commit()
+        bump_token_version(user.id)
         session.close()
         return jsonify({'message': 'Password changed successfully'})
+    except PasswordHasherBusy as e:
+        session.rollback()
+        return busy_response(e)
     except Exception as e:
         session.rollback()
         return jsonify({'message': f'Error changing password: {str(e)}'}), 500
@@ -22,6 +22,7 @@ import re
 
 from db.database import get_db_session, User
 from auth import authenticate_user, role_required
+from services.password_hashing import PasswordHasherBusy, busy_response
 
 # Import the complete user system classes
 try:
@@ -104,6 +105,8 @@ def register():
             'verification_required': True
         }), 201
         
+    except PasswordHasherBusy as e:
+        return busy_response(e)
     except ValidationError as e:
         logger.warning(f"Registration validation error: {str(e)}")
         return jsonify({'error': str(e)}), 400
@@ -215,6 +218,8 @@ def login():
                 }
             }), 200
             
+        except PasswordHasherBusy as e:
+            return busy_response(e)
         except EmailNotVerifiedError:
             return jsonify({
                 'error': 'Please verify your email address before logging in',
@@ -277,6 +282,8 @@ def reset_password():
         else:
             return jsonify({'error': 'Invalid or expired reset token'}), 400
             
+    except PasswordHasherBusy as e:
+        return busy_response(e)
     except ValidationError as e:
         return jsonify({'error': str(e)}), 400
     except Exception as e:
@@ -305,6 +312,8 @@ def change_password():
         else:
             return jsonify({'error': 'Current password is incorrect'}), 400
             
+    except PasswordHasherBusy as e:
+        return busy_response(e)
     except ValidationError as e:
         return jsonify({'error': str(e)}), 400
     except Exception as e:
@@ -1,18 +1,27 @@
 """
 Invoice routes: upload, list, get, file download
 """
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, url_for
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from dev_auth import development_jwt_required, get_current_user_id
 from db.database import get_db_session, Invoice as DbInvoice, LineItem, Vendor
-from services.s3_service import S3Service
+from services.storage import get_storage, storage_configured, stream_response, ObjectNotFound
 from services.pdf_parser_service import PDFParserService
+from services.upload_cache import get_upload_cache, file_sha256, model_version, PARSER_VERSION
 import tempfile
 import os
-from datetime import datetime
+from datetime import datetime, timezone
+
+UPLOAD_PARSER_VERSION = f"pdf_parser_service/{PARSER_VERSION}"
 
 invoices_bp = Blueprint('invoices', __name__, url_prefix='/api/invoices')
 
+def invoice_file_url(inv):
+    """Presigned URL where the backend has one, else the streaming download route"""
+    if not inv.pdf_s3_key:
+        return None
+    return get_storage().url(inv.pdf_s3_key) or url_for('invoices.invoice_file', invoice_id=inv.id)
+
 @invoices_bp.route('', methods=['GET'])
 @development_jwt_required
 def list_invoices():
@@ -54,8 +63,7 @@ def get_invoice(invoice_id):
         if not inv:
             return jsonify({"error": "Invoice not found"}), 404
             
-        s3 = S3Service()
-        file_url = s3.generate_presigned_url(inv.pdf_s3_key) if inv.pdf_s3_key else None
+        file_url = invoice_file_url(inv)
         # Fix relationship attribute (line_items instead of lines)
         lines = [
             {
@@ -111,23 +119,44 @@ def upload_invoice():
     file = request.files['file']
     if not file.filename.lower().endswith('.pdf'):
         return jsonify({'error': 'File must be a PDF'}), 400
-    parser = PDFParserService()
-    s3 = S3Service()
     temp_file_path = None
     session = get_db_session()
     try:
+        # Hash before any parsing: identical resends short-circuit here
+        file_bytes = file.read()
+        content_hash = file_sha256(file_bytes)
+        models_version = model_version()
+        upload_cache = get_upload_cache()
+        cached = upload_cache.get(content_hash, UPLOAD_PARSER_VERSION, models_version)
+        if cached and cached.get('invoice_id'):
+            existing = session.query(DbInvoice).filter_by(id=cached['invoice_id'], uploaded_by=user_id).first()
+            if existing:
+                return jsonify({
+                    'message': 'Invoice already uploaded',
+                    'duplicate': True,
+                    'invoice_id': str(existing.id),
+                    'risk_score': existing.risk_score,
+                    'invoice_number': existing.invoice_number,
+                    'vendor': existing.vendor.name if existing.vendor else 'Unknown Vendor',
+                    'content_hash': content_hash
+                })
+        cached_result = (cached or {}).get('result') or {}
+
         with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-            file.save(temp_file.name)
+            temp_file.write(file_bytes)
             temp_file_path = temp_file.name
-        parsed_data = parser.parse_pdf(temp_file_path)
+        if 'parsed_data' in cached_result:
+            parsed_data = cached_result['parsed_data']
+        else:
+            parsed_data = PDFParserService().parse_pdf(temp_file_path)
         pdf_s3_key = None
         try:
-            if os.getenv('AWS_S3_BUCKET'):
+            if storage_configured():
+                # Content-addressed key: re-uploads of the same file never collide with other invoices
                 with open(temp_file_path, 'rb') as fobj:
-                    from werkzeug.datastructures import FileStorage
-                    fobj_seek = FileStorage(stream=fobj, filename=file.filename, content_type='application/pdf')
-                    pdf_s3_key = s3.upload_file(fobj_seek)
-        except Exception:
+                    pdf_s3_key = get_storage().upload_fileobj(fobj, f"invoices/{content_hash}.pdf", 'application/pdf')
+        except Exception as e:
+            current_app.logger.error(f"Invoice PDF not stored, check storage configuration: {e}")
             pdf_s3_key = None
         vendor_name = parsed_data.get('vendor_name') or request.form.get('vendor') or 'Unknown Vendor'
         vendor = session.query(Vendor).filter_by(name=vendor_name).first()
@@ -150,11 +179,11 @@ def upload_invoice():
             total_amount = float(total_amount)
         except Exception:
             total_amount = 0
-        risk_score = None
-        analysis_result = None
+        risk_score = cached_result.get('risk_score')
+        analysis_result = cached_result.get('analysis_result')
         try:
             analyzer = getattr(current_app, 'invoice_analyzer', None)
-            if analyzer:
+            if analyzer and analysis_result is None:
                 invoice_input = {
                     'amount': total_amount,
                     'line_items': parsed_data.get('line_items', []),
@@ -194,12 +223,18 @@ def upload_invoice():
             )
             session.add(line)
         session.commit()
+        upload_cache.put(content_hash, UPLOAD_PARSER_VERSION, models_version, {
+            'parsed_data': parsed_data,
+            'analysis_result': analysis_result,
+            'risk_score': risk_score
+        }, invoice_id=invoice.id)
         return jsonify({
             'message': 'Invoice uploaded successfully',
             'invoice_id': str(invoice.id),
             'risk_score': risk_score,
             'invoice_number': invoice.invoice_number,
-            'vendor': vendor_name
+            'vendor': vendor_name,
+            'content_hash': content_hash
         })
     except Exception as e:
         session.rollback()
@@ -212,22 +247,37 @@ def upload_invoice():
 @invoices_bp.route('/download/<int:invoice_id>', methods=['GET'])
 @development_jwt_required
 def download_invoice(invoice_id):
-    """Download invoice PDF from S3"""
-    current_user = get_current_user_id()
+    """Download URL for the invoice PDF: presigned on S3, else the streaming file route"""
     session = get_db_session()
     try:
         inv = session.query(DbInvoice).filter_by(id=invoice_id).first()
         if not inv:
             return jsonify({"error": "Invoice not found"}), 404
-            
-        s3 = S3Service()
-        file_url = s3.generate_presigned_url(inv.pdf_s3_key) if inv.pdf_s3_key else None
-        
+        file_url = invoice_file_url(inv)
         if not file_url:
             return jsonify({'message': 'File not found'}), 404
-            
         return jsonify({'file_url': file_url})
     except Exception as e:
         return jsonify({'message': f'Error retrieving invoice: {str(e)}'}), 500
     finally:
         session.close()
+
+@invoices_bp.route('/<int:invoice_id>/file', methods=['GET'])
+@development_jwt_required
+def invoice_file(invoice_id):
+    """Stream the invoice PDF from storage (supports Range requests)"""
+    session = get_db_session()
+    try:
+        inv = session.query(DbInvoice).filter_by(id=invoice_id).first()
+        if not inv:
+            return jsonify({"error": "Invoice not found"}), 404
+        if not inv.pdf_s3_key:
+            return jsonify({'message': 'File not found'}), 404
+        download_name = f"{inv.invoice_number or inv.id}.pdf"
+        return stream_response(get_storage(), inv.pdf_s3_key, request.range, download_name=download_name)
+    except ObjectNotFound:
+        return jsonify({'message': 'File not found'}), 404
+    except Exception as e:
+        return jsonify({'message': f'Error retrieving invoice: {str(e)}'}), 500
+    finally:
+        session.close()
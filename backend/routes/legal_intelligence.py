@@ -7,6 +7,7 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from dev_auth import development_jwt_required
 from services.courtlistener_service import LegalIntelligenceService
+from services.case_search_index import get_case_search_index
 from db.database import get_db_session
 from models.db_models import Vendor, Invoice, Matter
 from datetime import datetime, timezone
@@ -706,20 +707,27 @@ def analyze_law_firm():
 @legal_intel_bp.route('/search-cases', methods=['POST'])
 @development_jwt_required
 def search_cases():
-    """Search for legal cases using real case database and CourtListener API"""
+    """Search the local case index first, CourtListener only when it has no match"""
     try:
         data = request.get_json()
         query = data.get('query', '')
         court = data.get('court')
-        date_range = data.get('date_range')
+        date_from, date_to = parse_date_range(data.get('date_range'))
+        limit = min(int(data.get('limit', 20)), 100)
         
         if not query:
             return jsonify({'error': 'Search query is required'}), 400
         
-        # First search our local case database
-        local_cases = search_local_case_database(query, court)
+        local_cases = search_local_case_database(query, court, date_from, date_to, limit)
+        if local_cases:
+            return jsonify({
+                'cases': local_cases,
+                'total': len(local_cases),
+                'query': query,
+                'court': court,
+                'sources': ['Local Database']
+            })
         
-        # Then search CourtListener API if available
         api_cases = []
         try:
             search_results = legal_service.search_case_law(query, court=court, limit=10)
@@ -738,51 +746,33 @@ def search_cases():
         except Exception as e:
             logger.warning(f"CourtListener API unavailable: {str(e)}")
         
-        # Combine results
-        all_cases = local_cases + api_cases
-        
         return jsonify({
-            'cases': all_cases[:20],  # Limit to 20 results
-            'total': len(all_cases),
+            'cases': api_cases[:limit],
+            'total': len(api_cases),
             'query': query,
             'court': court,
-            'sources': ['Local Database', 'CourtListener API'] if api_cases else ['Local Database']
+            'sources': ['CourtListener API'] if api_cases else []
         })
         
     except Exception as e:
         logger.error(f"Error searching cases: {str(e)}")
         return jsonify({'error': f'Error searching cases: {str(e)}'}), 500
 
-def search_local_case_database(query: str, court: str = None) -> list:
-    """Search local case database"""
-    # This would search a local database of cases
-    # For now, return some sample cases
-    sample_cases = [
-        {
-            'id': 'local_001',
-            'title': f'Local Case: {query} - Sample 1',
-            'court': court or 'Local Court',
-            'date': '2024-01-15',
-            'relevance': 90,
-            'excerpt': f'This is a sample local case involving {query}. The case demonstrates important legal principles...',
-            'citation': 'Local Citation 2024-001',
-            'url': '#',
-            'source': 'Local Database'
-        },
-        {
-            'id': 'local_002',
-            'title': f'Local Case: {query} - Sample 2',
-            'court': court or 'Local Court',
-            'date': '2024-01-10',
-            'relevance': 85,
-            'excerpt': f'Another sample case related to {query}. This case shows different aspects of the legal issue...',
-            'citation': 'Local Citation 2024-002',
-            'url': '#',
-            'source': 'Local Database'
-        }
-    ]
-    
-    return sample_cases
+def parse_date_range(date_range) -> tuple:
+    """Accept {'start'/'from', 'end'/'to'} or [start, end]; returns ISO date strings or None"""
+    if isinstance(date_range, dict):
+        start = date_range.get('start') or date_range.get('from')
+        end = date_range.get('end') or date_range.get('to')
+    elif isinstance(date_range, (list, tuple)) and len(date_range) == 2:
+        start, end = date_range
+    else:
+        return None, None
+    return (str(start)[:10] if start else None), (str(end)[:10] if end else None)
+
+def search_local_case_database(query: str, court: str = None, date_from: str = None,
+                               date_to: str = None, limit: int = 20) -> list:
+    """BM25 full-text search over the collected case database"""
+    return get_case_search_index().search(query, court=court, date_from=date_from, date_to=date_to, limit=limit)
 
 @legal_intel_bp.route('/attorney-search', methods=['POST'])
 @development_jwt_required
@@ -906,6 +896,11 @@ def vendor_risk_assessment():
 def get_case_details(case_id):
     """Get detailed information about a specific legal case"""
     try:
+        # Cases collected into the local index are served without a network call
+        indexed_case = get_case_search_index().get_case(case_id)
+        if indexed_case:
+            return jsonify(indexed_case)
+        
         # Check if it's a local database case ID (starts with CASE-)
         if case_id.startswith('CASE-'):
             # Get case details from local database
@@ -11,11 +11,11 @@ import tempfile
 import os
 import json
 from sqlalchemy import func, desc, and_, or_
-from backend.db.database import get_db_session
-from backend.models.db_models import Invoice, Vendor, Matter, LineItem, RiskFactor
-from backend.services.report_service import ReportService
-from backend.models.enhanced_invoice_analyzer import EnhancedInvoiceAnalyzer
-from backend.models.vendor_analyzer import VendorAnalyzer
+from db.database import get_db_session
+from models.db_models import Invoice, Vendor, Matter, LineItem, RiskFactor
+from services.report_jobs import get_report_job_manager, data_watermark, EXPORT_FORMATS
+from models.enhanced_invoice_analyzer import EnhancedInvoiceAnalyzer
+from models.vendor_analyzer import VendorAnalyzer
 from ml.models.outlier_detector import OutlierDetector
 from ml.models.risk_predictor import RiskPredictor
 import logging
@@ -91,22 +91,72 @@ def get_report_templates():
         'categories': list(set(t['category'] for t in templates))
     })
 
+REPORT_TEMPLATE_IDS = {
+    'real-time-spend-analysis',
+    'vendor-performance-intelligence',
+    'matter-analytics-dashboard',
+    'risk-compliance-audit',
+    'predictive-budget-forecast',
+    'legal-market-intelligence',
+}
+
 @reports_bp.route('/generate', methods=['POST'])
 @development_jwt_required
 def generate_real_time_report():
-    """Generate real-time report using ML models and live data"""
+    """Queue real-time report generation (served from cache when inputs and data are unchanged)"""
     current_user = get_jwt_identity()
-    data = request.get_json()
+    data = request.get_json() or {}
     
     template_id = data.get('template_id', 'real-time-spend-analysis')
     parameters = data.get('parameters', {})
+    wait = bool(data.get('wait', False))
+    
+    if template_id not in REPORT_TEMPLATE_IDS:
+        return jsonify({'error': f'Unknown template: {template_id}'}), 400
     
     logger.info(f"Starting real-time report generation: {template_id} for user {current_user}")
     
+    session = get_db_session()
+    try:
+        watermark = data_watermark(session)
+    except Exception as e:
+        logger.error(f"Error computing report data watermark: {str(e)}")
+        return jsonify({'error': f'Error generating report: {str(e)}'}), 500
+    finally:
+        session.close()
+    
+    manager = get_report_job_manager()
+    job = manager.submit(
+        template_id, parameters, watermark,
+        lambda progress: _build_report(template_id, parameters, current_user, progress),
+        requested_by=current_user
+    )
+    
+    if wait and job.get('status') not in ('completed', 'failed'):
+        job = manager.wait(job['report_id'])
+    
+    if job.get('status') == 'completed':
+        report_data = manager.get_cached_result(job['cache_key'])
+        if report_data is not None:
+            report_data['cached'] = job.get('cached', False)
+            return jsonify(report_data)
+    
+    if job.get('status') == 'failed':
+        return jsonify({'error': f"Error generating report: {job.get('error')}"}), 500
+    
+    return jsonify({
+        'report_id': job['report_id'],
+        'status': job.get('status'),
+        'progress': job.get('progress', 0),
+        'status_url': f"/api/reports/status/{job['report_id']}"
+    }), 202
+
+def _build_report(template_id, parameters, current_user, progress):
+    """Build one report on a background worker, reporting progress as it goes"""
+    session = get_db_session()
     try:
-        # Initialize services and models
-        report_service = ReportService()
-        session = get_db_session()
+        progress(10, 'loading_models')
+        invoice_analyzer = vendor_analyzer = outlier_detector = risk_predictor = None
         
         # Load ML models
         try:
@@ -131,6 +181,8 @@ def generate_real_time_report():
         start_date = datetime.strptime(date_range.get('start', '2024-01-01'), '%Y-%m-%d') if date_range.get('start') else datetime.now() - timedelta(days=365)
         end_date = datetime.strptime(date_range.get('end', datetime.now().strftime('%Y-%m-%d')), '%Y-%m-%d') if date_range.get('end') else datetime.now()
         
+        progress(30, 'generating')
+        
         # Generate report based on template
         if template_id == 'real-time-spend-analysis':
             report_data = _generate_spend_analysis_report(session, start_date, end_date, parameters, invoice_analyzer, vendor_analyzer, outlier_detector, risk_predictor)
@@ -142,30 +194,22 @@ def generate_real_time_report():
             report_data = _generate_risk_compliance_report(session, start_date, end_date, parameters, outlier_detector, invoice_analyzer, risk_predictor)
         elif template_id == 'predictive-budget-forecast':
             report_data = _generate_budget_forecast_report(session, start_date, end_date, parameters, risk_predictor, outlier_detector)
-        elif template_id == 'legal-market-intelligence':
-            report_data = _generate_market_intelligence_report(session, start_date, end_date, parameters, risk_predictor, vendor_analyzer)
         else:
-            return jsonify({'error': f'Unknown template: {template_id}'}), 400
+            report_data = _generate_market_intelligence_report(session, start_date, end_date, parameters, risk_predictor, vendor_analyzer)
+        
+        progress(90, 'finalizing')
         
         # Add metadata
         report_data.update({
-            'report_id': f"LAIT-{template_id}-{datetime.now().strftime('%Y%m%d-%H%M%S')}",
             'template_id': template_id,
             'generated_at': datetime.now().isoformat(),
             'generated_by': current_user,
             'parameters': parameters,
             'data_freshness': 'real-time',
-            'ml_models_used': ['invoice_analyzer', 'vendor_analyzer', 'rate_benchmarking', 'spend_optimizer', 'outlier_detector'],
-            'status': 'completed'
+            'ml_models_used': ['invoice_analyzer', 'vendor_analyzer', 'rate_benchmarking', 'spend_optimizer', 'outlier_detector']
         })
         
-        logger.info(f"Report generation completed: {report_data['report_id']}")
-        
-        return jsonify(report_data)
-        
-    except Exception as e:
-        logger.error(f"Error generating report: {str(e)}")
-        return jsonify({'error': f'Error generating report: {str(e)}'}), 500
+        return report_data
     finally:
         session.close()
 
@@ -886,20 +930,36 @@ def _generate_market_intelligence_report(session, start_date, end_date, paramete
         ]
     }
 
+def _owned_job(manager, report_id):
+    """Job record for report_id if the current user requested it (others get None)"""
+    job = manager.get_status(report_id)
+    if job is None or str(job.get('requested_by')) != str(get_jwt_identity()):
+        return None
+    return job
+
 @reports_bp.route('/export/<report_id>', methods=['GET'])
 @development_jwt_required
 def export_report(report_id):
-    """Export report to PDF or Excel format"""
-    format_type = request.args.get('format', 'pdf').lower()
+    """Export a finished report (pdf, csv or json), rendered once per content key"""
+    default_format = 'pdf' if 'pdf' in EXPORT_FORMATS else 'json'
+    format_type = request.args.get('format', default_format).lower()
+    
+    if format_type not in EXPORT_FORMATS:
+        return jsonify({'error': f'Unsupported export format: {format_type}',
+                        'supported_formats': sorted(EXPORT_FORMATS)}), 400
     
     try:
-        # In a real implementation, you would retrieve the report data
-        # For now, return a success message
-        return jsonify({
-            'message': f'Report {report_id} export initiated',
-            'format': format_type,
-            'download_url': f'/api/reports/download/{report_id}.{format_type}'
-        })
+        manager = get_report_job_manager()
+        job = _owned_job(manager, report_id)
+        if job is None:
+            return jsonify({'error': f'Report {report_id} not found'}), 404
+        path = manager.export(report_id, format_type)
+        if path is None:
+            return jsonify({'error': f'Report {report_id} is not ready',
+                            'status': job.get('status'), 'progress': job.get('progress', 0)}), 409
+        
+        return send_file(path, mimetype=EXPORT_FORMATS[format_type], as_attachment=True,
+                         download_name=f"{report_id}.{format_type}")
         
     except Exception as e:
         logger.error(f"Error exporting report {report_id}: {str(e)}")
@@ -909,11 +969,17 @@ def export_report(report_id):
 @development_jwt_required
 def get_report_status(report_id):
     """Get report generation status"""
-    # In a real implementation, you would track report generation status
+    job = _owned_job(get_report_job_manager(), report_id)
+    if job is None:
+        return jsonify({'error': f'Report {report_id} not found'}), 404
+    
     return jsonify({
         'report_id': report_id,
-        'status': 'completed',
-        'progress': 100,
-        'estimated_completion': None,
-        'download_ready': True
+        'status': job.get('status'),
+        'stage': job.get('stage'),
+        'progress': job.get('progress', 0),
+        'cached': job.get('cached', False),
+        'error': job.get('error'),
+        'updated_at': job.get('updated_at'),
+        'download_ready': job.get('status') == 'completed'
     })
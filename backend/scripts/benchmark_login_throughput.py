@@ -0,0 +1,128 @@
+"""
+Benchmark login throughput and concurrent API latency with inline vs pooled password hashing
+
+Usage:
+    python scripts/benchmark_login_throughput.py [--threads 8] [--login-clients 16]
+        [--api-clients 4] [--duration 10] [--method pbkdf2:sha256:600000]
+
+Models one gthread worker: --threads request slots shared by login clients
+(each verifying a password) and API clients (each doing a small JSON
+round trip). Waiting for a request slot counts toward latency. 'inline'
+verifies on the request thread like the old routes. 'pool' goes through
+PasswordHasher, which caps concurrent hashes and rejects the excess (the
+503 path), so API requests keep getting slots.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from werkzeug.security import check_password_hash, generate_password_hash  # noqa: E402
+
+from services.password_hashing import PasswordHasher, PasswordHasherBusy  # noqa: E402
+
+PAYLOAD = {'lines': [{'id': i, 'hours': 1.5, 'rate': 450.0, 'description': 'Review and revise brief'}
+                     for i in range(50)]}
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run(mode, args, stored_hash):
+    slots = threading.BoundedSemaphore(args.threads)
+    hasher = PasswordHasher(workers=args.hash_workers, queue_limit=args.queue_limit, method=args.method)
+    stop = threading.Event()
+    counts = {'logins': 0, 'rejected': 0}
+    latencies = []
+    lock = threading.Lock()
+
+    def login_client():
+        while not stop.is_set():
+            with slots:
+                try:
+                    if mode == 'inline':
+                        ok = check_password_hash(stored_hash, args.password)
+                    else:
+                        ok = hasher.verify(stored_hash, args.password)[0]
+                    key = 'logins' if ok else 'rejected'
+                except PasswordHasherBusy as e:
+                    key = 'rejected'
+                    retry_after = min(e.retry_after, args.retry_after)
+                else:
+                    retry_after = 0
+            with lock:
+                counts[key] += 1
+            if retry_after:
+                stop.wait(retry_after)
+
+    def api_client():
+        while not stop.is_set():
+            start = time.perf_counter()
+            with slots:
+                json.loads(json.dumps(PAYLOAD))
+            with lock:
+                latencies.append(time.perf_counter() - start)
+            stop.wait(args.api_interval)
+
+    threads = [threading.Thread(target=login_client, daemon=True) for _ in range(args.login_clients)]
+    threads += [threading.Thread(target=api_client, daemon=True) for _ in range(args.api_clients)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    hasher.close()
+
+    return {
+        'logins_per_s': counts['logins'] / args.duration,
+        'rejected': counts['rejected'],
+        'api_requests': len(latencies),
+        'api_p50_ms': percentile(latencies, 50) * 1000,
+        'api_p95_ms': percentile(latencies, 95) * 1000,
+        'api_p99_ms': percentile(latencies, 99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8, help='request threads per worker (gunicorn --threads)')
+    parser.add_argument('--login-clients', type=int, default=16)
+    parser.add_argument('--api-clients', type=int, default=4)
+    parser.add_argument('--api-interval', type=float, default=0.01, help='pause between API requests per client')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per mode')
+    parser.add_argument('--hash-workers', type=int, default=2)
+    parser.add_argument('--queue-limit', type=int, default=4)
+    parser.add_argument('--retry-after', type=float, default=0.2,
+                        help='seconds a rejected client waits (capped below Retry-After to keep pressure on)')
+    parser.add_argument('--method', default=None, help='werkzeug hash method, default werkzeug\'s own')
+    parser.add_argument('--password', default='Password123')
+    parser.add_argument('--modes', nargs='+', default=['inline', 'pool'], choices=['inline', 'pool'])
+    args = parser.parse_args()
+
+    stored_hash = generate_password_hash(args.password, method=args.method) if args.method \
+        else generate_password_hash(args.password)
+    start = time.perf_counter()
+    check_password_hash(stored_hash, args.password)
+    print(f"hash {stored_hash.split('$', 1)[0]}: {(time.perf_counter() - start) * 1000:.0f}ms per verify, "
+          f"{args.threads} request threads, {args.login_clients} login / {args.api_clients} API clients")
+
+    print(f"\n{'mode':<8} {'logins/s':>9} {'rejected':>9} {'api reqs':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for mode in args.modes:
+        result = run(mode, args, stored_hash)
+        print(f"{mode:<8} {result['logins_per_s']:>9.1f} {result['rejected']:>9} {result['api_requests']:>9} "
+              f"{result['api_p50_ms']:>8.1f} {result['api_p95_ms']:>8.1f} {result['api_p99_ms']:>8.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
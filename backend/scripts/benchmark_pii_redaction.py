@@ -0,0 +1,98 @@
+"""
+Benchmark PII redaction on synthetic invoice text
+
+Usage:
+    python scripts/benchmark_pii_redaction.py [--paragraphs N] [--repeat N]
+
+Compares the previous approach (full spaCy pipeline over the whole
+document, four separate regex scans, slice-per-redaction assembly) with
+services.pii_redaction in 'ner' and 'regex' modes. NER timings need the
+configured spaCy model (SPACY_MODEL, installed by the warmup); without it
+only the regex paths are measured.
+"""
+import argparse
+import os
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.pii_redaction import PII_ENTITY_LABELS, PII_PATTERNS, PIIRedactor  # noqa: E402
+from utils.nlp_resources import get_spacy_nlp  # noqa: E402
+
+
+def build_invoice_text(paragraphs):
+    lines = []
+    for number in range(paragraphs):
+        lines.append(
+            f"{number + 1}. Reviewed discovery responses with Jane Doe and John Smith regarding "
+            f"matter {number:04d}; call 555-123-{number % 10000:04d} or email jdoe{number}@firm.com. "
+            f"Card on file 4111 1111 1111 {number % 10000:04d}. 2.5 hours at $450.00."
+        )
+    return '\n\n'.join(lines)
+
+
+def legacy_redact(text, nlp):
+    """The pre-batching implementation, kept here for comparison only"""
+    spans = []
+    if nlp is not None:
+        spans = [(ent.start_char, ent.end_char) for ent in nlp(text).ents if ent.label_ in PII_ENTITY_LABELS]
+    for pattern in PII_PATTERNS.values():
+        spans.extend(match.span() for match in re.finditer(pattern, text))
+    spans.sort(key=lambda span: span[0])
+    merged = []
+    for start, end in spans:
+        if not merged or merged[-1][1] < start:
+            merged.append((start, end))
+        else:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+    for start, end in reversed(merged):
+        text = text[:start] + '[REDACTED]' + text[end:]
+    return text
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.mean(samples), min(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--paragraphs', type=int, default=400)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    text = build_invoice_text(args.paragraphs)
+    try:
+        nlp = get_spacy_nlp()
+        nlp.max_length = max(nlp.max_length, len(text) + 1)
+    except Exception as e:
+        print(f"spaCy model unavailable ({e}); measuring regex paths only")
+        nlp = None
+
+    cases = [
+        ('legacy regex', lambda: legacy_redact(text, None)),
+        ('regex mode', lambda: PIIRedactor(mode='regex').redact(text)),
+    ]
+    if nlp is not None:
+        redactor = PIIRedactor(mode='ner', nlp=nlp)
+        cases += [
+            ('legacy full pipeline', lambda: legacy_redact(text, nlp)),
+            ('ner mode (batched)', lambda: redactor.redact(text)),
+        ]
+
+    print(f"{len(text):,} characters, {args.paragraphs} paragraphs")
+    for name, fn in cases:
+        mean, best = timed(fn, args.repeat)
+        print(f"  {name:<22} mean {mean * 1000:>9.1f}ms  best {best * 1000:>9.1f}ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
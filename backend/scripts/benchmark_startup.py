@@ -0,0 +1,85 @@
+"""
+Benchmark cold-start import cost of the backend modules
+
+Usage:
+    python scripts/benchmark_startup.py [module ...] [--top N] [--warmup]
+
+Each module is imported in a fresh interpreter with `-X importtime`; the
+report lists total wall time and the heaviest imports by cumulative time,
+which is where lazy_import()/LazySingleton pay off. --warmup additionally
+times the registered warmup steps (nltk data, spaCy model, ...) so the
+cost moved out of import is visible too.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+DEFAULT_MODULES = [
+    'utils.ml_preprocessing',
+    'models.invoice_analyzer',
+    'services.pdf_service',
+    'services.real_ai_legal_service',
+    'enhanced_app',
+]
+
+
+def parse_importtime(stderr):
+    """Parse `-X importtime` output into [(module, self_us, cumulative_us)]"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+            rows.append((name.strip(), int(self_us), int(cumulative_us)))
+        except ValueError:
+            continue
+    return rows
+
+
+def measure(module):
+    """Import a module in a fresh interpreter; return (wall seconds, importtime rows, error)"""
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=BACKEND_DIR, capture_output=True, text=True
+    )
+    elapsed = time.perf_counter() - start
+    error = None
+    if proc.returncode != 0:
+        error = (proc.stderr.strip().splitlines() or ['failed'])[-1]
+    return elapsed, parse_importtime(proc.stderr), error
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('modules', nargs='*', default=DEFAULT_MODULES)
+    parser.add_argument('--top', type=int, default=10, help='heaviest imports to list per module')
+    parser.add_argument('--warmup', action='store_true', help='also time the registered warmup steps')
+    args = parser.parse_args()
+
+    for module in args.modules:
+        elapsed, rows, error = measure(module)
+        total_ms = max((cumulative for _, _, cumulative in rows), default=0) / 1000
+        print(f"\n{module}: {elapsed:.2f}s wall, {total_ms:.0f}ms in imports" + (f"  [{error}]" if error else ''))
+        for name, self_us, cumulative_us in sorted(rows, key=lambda row: -row[2])[:args.top]:
+            print(f"  {cumulative_us / 1000:>9.1f}ms  {self_us / 1000:>8.1f}ms self  {name}")
+
+    if args.warmup:
+        sys.path.insert(0, BACKEND_DIR)
+        import utils.nlp_resources  # noqa: F401 - registers the NLP warmup steps
+        from utils.lazy_imports import warmup
+
+        print("\nwarmup:")
+        for step, result in warmup().items():
+            status = 'ok' if result['ok'] else f"failed: {result.get('error')}"
+            print(f"  {step:<24} {result['seconds']:>8.2f}s  {status}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,52 @@
+"""
+Replay historical invoice lines through two line-scoring model versions
+
+Usage:
+    python scripts/replay_model_versions.py --candidate-anomaly 20250101_120000 \
+        [--baseline-anomaly production] [--source line_items|invoice_lines] [--limit N]
+
+Model specs are 'production' (models/iso_forest.pkl, models/overspend.pkl),
+'current' (the model registry's current version) or a registry version id.
+Streams rows one invoice at a time and prints throughput, latency
+percentiles, flag-rate delta and score correlation as JSON, so a
+promotion with ModelManager.set_current_version can be judged on data.
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.shadow_scoring import iter_request_frames, load_model_pair, replay  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--source', choices=['line_items', 'invoice_lines'], default='line_items')
+    parser.add_argument('--database-url', default=os.getenv('DATABASE_URL', 'sqlite:///./legal_ai.db'))
+    parser.add_argument('--registry-dir', default=os.getenv('ML_MODEL_REGISTRY_DIR', os.getenv('MODEL_DIR', 'models')))
+    parser.add_argument('--baseline-anomaly', default='production')
+    parser.add_argument('--baseline-overspend', default='production')
+    parser.add_argument('--candidate-anomaly', default='current')
+    parser.add_argument('--candidate-overspend', default='current')
+    parser.add_argument('--limit', type=int, default=None, help='maximum number of lines to replay')
+    args = parser.parse_args()
+
+    from sqlalchemy import create_engine
+
+    from ml.model_manager import ModelManager
+
+    manager = ModelManager(args.registry_dir)
+    baseline = load_model_pair(args.baseline_anomaly, args.baseline_overspend, manager)
+    candidate = load_model_pair(args.candidate_anomaly, args.candidate_overspend, manager)
+    engine = create_engine(args.database_url)
+    try:
+        report = replay(iter_request_frames(args.source, engine, limit=args.limit), baseline, candidate)
+    finally:
+        engine.dispose()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
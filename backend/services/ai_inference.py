@@ -0,0 +1,324 @@
+"""
+Batched, cached local model inference for the AI legal service
+
+Each pipeline (sentiment, qa, text_generation, embedding) is loaded on its
+own the first time a request needs it. Calls go through a per-pipeline
+micro-batcher: requests arriving within a few milliseconds of each other
+are run as one batched forward pass. Results are cached in an in-process
+LRU and on disk, keyed by sha256(pipeline, version, input), so repeated
+documents never reach the model.
+
+A pipeline factory returns a callable mapping a list of inputs to a list
+of outputs. Tests (or a deployment with a different model) can replace one
+with register_pipeline(name, factory, version).
+"""
+
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from utils.lazy_imports import LazySingleton, lazy_import, module_available
+from utils.nlp_resources import SENTENCE_MODEL, get_sentence_model
+
+logger = logging.getLogger(__name__)
+
+transformers = lazy_import('transformers')
+
+DEFAULT_CACHE_DIR = os.getenv('AI_INFERENCE_CACHE_DIR', os.path.join('data', 'inference_cache'))
+MAX_BATCH = int(os.getenv('AI_INFERENCE_MAX_BATCH', '16'))
+MAX_WAIT_MS = float(os.getenv('AI_INFERENCE_MAX_WAIT_MS', '5'))
+LRU_ENTRIES = int(os.getenv('AI_INFERENCE_LRU_ENTRIES', '4096'))
+RESULT_TIMEOUT = 120
+
+BatchFn = Callable[[List[Any]], Sequence[Any]]
+
+
+def _hf_batch(pipe, **call_kwargs) -> BatchFn:
+    def run(inputs: List[Any]) -> List[Any]:
+        outputs = pipe(inputs, batch_size=len(inputs), **call_kwargs)
+        return outputs if isinstance(outputs, list) else [outputs]
+    return run
+
+
+def _sentence_batch(model) -> BatchFn:
+    def run(inputs: List[str]) -> List[List[float]]:
+        vectors = model.encode(list(inputs), batch_size=len(inputs), normalize_embeddings=True, convert_to_numpy=True)
+        return [row.tolist() for row in np.asarray(vectors, dtype=np.float32)]
+    return run
+
+
+# name -> (factory, version, modules the factory needs)
+DEFAULT_PIPELINES = {
+    'sentiment': (lambda: _hf_batch(transformers.pipeline('sentiment-analysis'), truncation=True),
+                  'hf-sentiment-default', ('transformers', 'torch')),
+    'qa': (lambda: _hf_batch(transformers.pipeline('question-answering')),
+           'hf-qa-default', ('transformers', 'torch')),
+    'text_generation': (lambda: _hf_batch(transformers.pipeline('text-generation', model='microsoft/DialoGPT-small')),
+                        'microsoft/DialoGPT-small', ('transformers', 'torch')),
+    'embedding': (lambda: _sentence_batch(get_sentence_model()),
+                  SENTENCE_MODEL, ('sentence_transformers', 'torch')),
+}
+
+
+class MicroBatcher:
+    """Collects concurrent submissions for up to max_wait and runs them as one batch"""
+
+    _STOP = object()
+
+    def __init__(self, fn: BatchFn, max_batch: int = MAX_BATCH, max_wait_ms: float = MAX_WAIT_MS,
+                 name: str = 'batcher'):
+        self.fn = fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+        self._queue: 'queue.Queue' = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+
+    def submit(self, item: Any) -> Future:
+        future = Future()
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name=f'microbatch-{self.name}', daemon=True)
+                self._thread.start()
+        self._queue.put((item, future))
+        return future
+
+    def _loop(self):
+        while True:
+            first = self._queue.get()
+            if first is self._STOP:
+                return
+            batch = [first]
+            stop = False
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    entry = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if entry is self._STOP:
+                    stop = True
+                    break
+                batch.append(entry)
+            self._run(batch)
+            if stop:
+                return
+
+    def _run(self, batch):
+        inputs = [item for item, _ in batch]
+        try:
+            outputs = list(self.fn(inputs))
+            if len(outputs) != len(inputs):
+                raise RuntimeError(f"{self.name} returned {len(outputs)} outputs for {len(inputs)} inputs")
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        self.batches += 1
+        self.items += len(inputs)
+        for (_, future), output in zip(batch, outputs):
+            future.set_result(output)
+
+    def close(self):
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(self._STOP)
+            self._thread.join(timeout=5)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'batches': self.batches,
+            'items': self.items,
+            'mean_batch_size': round(self.items / self.batches, 2) if self.batches else 0,
+            'queue_depth': self._queue.qsize(),
+        }
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return str(value)
+
+
+class InferenceCache:
+    """Bounded in-process LRU in front of a sharded on-disk JSON cache"""
+
+    def __init__(self, cache_dir: Optional[str] = DEFAULT_CACHE_DIR, max_entries: int = LRU_ENTRIES):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, Any]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(pipeline: str, version: str, value: Any) -> str:
+        payload = json.dumps([pipeline, version, value], sort_keys=True, default=_json_default)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f'{key}.json')
+
+    def _remember(self, key: str, value: Any):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key: str, default=None):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+        if self.cache_dir:
+            try:
+                with open(self._path(key)) as f:
+                    value = json.load(f)
+                self.disk_hits += 1
+                self._remember(key, value)
+                return value
+            except (FileNotFoundError, json.JSONDecodeError):
+                pass
+        self.misses += 1
+        return default
+
+    def put(self, key: str, value: Any):
+        self._remember(key, value)
+        if not self.cache_dir:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(value, f, default=_json_default)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError) as e:
+            logger.warning(f"Inference cache disk write failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {'entries': len(self._entries), 'hits': self.hits, 'disk_hits': self.disk_hits, 'misses': self.misses}
+
+
+_MISSING = object()
+
+
+class InferenceEngine:
+    """Per-pipeline lazy models behind micro-batchers and a result cache"""
+
+    def __init__(self, cache: Optional[InferenceCache] = None, max_batch: int = MAX_BATCH,
+                 max_wait_ms: float = MAX_WAIT_MS):
+        self.cache = cache if cache is not None else InferenceCache()
+        self.max_batch = max_batch
+        self.max_wait_ms = max_wait_ms
+        self._lock = threading.Lock()
+        self._pipelines: Dict[str, LazySingleton] = {}
+        self._versions: Dict[str, str] = {}
+        self._requires: Dict[str, tuple] = {}
+        self._batchers: Dict[str, MicroBatcher] = {}
+        for name, (factory, version, requires) in DEFAULT_PIPELINES.items():
+            self._install(name, factory, version, requires)
+
+    def _install(self, name: str, factory: Callable[[], BatchFn], version: str, requires: tuple = ()):
+        old = self._batchers.pop(name, None)
+        if old is not None:
+            old.close()
+        holder = LazySingleton(factory, f'{name} pipeline')
+        self._pipelines[name] = holder
+        self._versions[name] = version
+        self._requires[name] = requires
+        self._batchers[name] = MicroBatcher(
+            lambda inputs, holder=holder: holder.get()(inputs),
+            max_batch=self.max_batch, max_wait_ms=self.max_wait_ms, name=name
+        )
+
+    def register_pipeline(self, name: str, factory: Callable[[], BatchFn], version: str = 'custom'):
+        """Swap the model behind a pipeline (e.g. a local stub in tests)"""
+        with self._lock:
+            self._install(name, factory, version)
+
+    def available(self, name: str) -> bool:
+        """True if the pipeline's dependencies are installed (loading may still fail)"""
+        return name in self._pipelines and all(module_available(module) for module in self._requires[name])
+
+    def loaded(self) -> List[str]:
+        return [name for name, holder in self._pipelines.items() if holder.loaded]
+
+    def preload(self, names: Optional[Iterable[str]] = None):
+        """Load pipelines ahead of traffic (warmup); errors are logged per pipeline"""
+        for name in names or list(self._pipelines):
+            if self.available(name):
+                try:
+                    self._pipelines[name].get()
+                except Exception as e:
+                    logger.error(f"Failed to load {name} pipeline: {e}")
+
+    def run(self, name: str, inputs: List[Any], use_cache: bool = True) -> List[Any]:
+        """Outputs for each input, from cache where possible, else one batched pass"""
+        if name not in self._pipelines:
+            raise KeyError(f"Unknown pipeline: {name}")
+        version = self._versions[name]
+        keys = [InferenceCache.key(name, version, value) for value in inputs]
+        outputs = [self.cache.get(key, _MISSING) if use_cache else _MISSING for key in keys]
+
+        pending = {}
+        batcher = self._batchers[name]
+        for position, (value, output) in enumerate(zip(inputs, outputs)):
+            if output is _MISSING:
+                pending[position] = batcher.submit(value)
+        for position, future in pending.items():
+            outputs[position] = future.result(timeout=RESULT_TIMEOUT)
+            if use_cache:
+                self.cache.put(keys[position], outputs[position])
+        return outputs
+
+    def classify(self, text: str) -> Dict[str, Any]:
+        """Sentiment label and score for one text"""
+        return self.run('sentiment', [text])[0]
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """L2-normalized sentence embeddings, one float32 row per text"""
+        return np.asarray(self.run('embedding', list(texts)), dtype=np.float32)
+
+    def answer(self, question: str, context: str) -> Dict[str, Any]:
+        return self.run('qa', [{'question': question, 'context': context}])[0]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'loaded': self.loaded(),
+            'cache': self.cache.stats(),
+            'batchers': {name: batcher.stats() for name, batcher in self._batchers.items()},
+        }
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_inference_engine() -> InferenceEngine:
+    """Return the process-wide inference engine"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = InferenceEngine()
+        return _engine
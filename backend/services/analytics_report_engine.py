@@ -0,0 +1,299 @@
+"""
+Set-based analytics report engine
+
+Builds the /api/analytics/reports/generate payload from two columnar
+fetches (invoices and their line items for the date range) processed with
+pandas/NumPy, plus one batched ML call for insights. Query count is
+constant regardless of how many invoices fall in the range.
+"""
+
+import logging
+from datetime import datetime
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+
+from models.db_models import Invoice, LineItem, Vendor
+
+logger = logging.getLogger(__name__)
+
+# Ordered like the original if/elif chain: the first matching area wins
+PRACTICE_AREA_KEYWORDS = [
+    ('Litigation', ['litigation', 'trial', 'court', 'dispute', 'lawsuit']),
+    ('Corporate', ['corporate', 'merger', 'acquisition', 'due diligence', 'm&a']),
+    ('Commercial', ['contract', 'agreement', 'negotiation', 'commercial']),
+    ('Employment', ['employment', 'labor', 'hr', 'workplace']),
+    ('Intellectual Property', ['ip', 'patent', 'trademark', 'copyright', 'intellectual property']),
+    ('Real Estate', ['real estate', 'property', 'lease', 'zoning']),
+    ('Tax', ['tax', 'taxation', 'irs', 'compliance']),
+    ('Regulatory', ['regulatory', 'compliance', 'government', 'administrative']),
+]
+
+ML_SAMPLE_SIZE = 10
+
+
+def infer_practice_areas(descriptions: pd.Series) -> pd.Series:
+    """Infer the practice area of every line item description at once"""
+    lowered = descriptions.fillna('').str.lower()
+    conditions = [
+        np.logical_or.reduce([lowered.str.contains(word, regex=False).values for word in keywords])
+        for _, keywords in PRACTICE_AREA_KEYWORDS
+    ]
+    areas = np.select(conditions, [area for area, _ in PRACTICE_AREA_KEYWORDS], default='General')
+    return pd.Series(areas, index=descriptions.index)
+
+
+class AnalyticsReportEngine:
+    """Computes vendor, practice-area, risk, rate and monthly breakdowns in bulk"""
+
+    def __init__(self, session):
+        self.session = session
+
+    def _fetch_frames(self, date_from: datetime, date_to: datetime):
+        """Fetch invoices and line items for the range with one query each"""
+        in_range = (Invoice.date >= date_from, Invoice.date <= date_to)
+
+        invoice_stmt = select(
+            Invoice.id, Invoice.amount, Invoice.risk_score, Invoice.date,
+            Vendor.name.label('vendor_name')
+        ).select_from(Invoice).outerjoin(Vendor, Invoice.vendor_id == Vendor.id)\
+         .where(*in_range).order_by(Invoice.id)
+        result = self.session.execute(invoice_stmt)
+        invoices = pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+
+        item_stmt = select(
+            LineItem.invoice_id, LineItem.description, LineItem.amount,
+            LineItem.hours, LineItem.rate, LineItem.timekeeper
+        ).join(Invoice, LineItem.invoice_id == Invoice.id)\
+         .where(*in_range).order_by(LineItem.invoice_id, LineItem.id)
+        result = self.session.execute(item_stmt)
+        line_items = pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+
+        invoices['amount'] = invoices['amount'].astype(float).fillna(0.0)
+        invoices['vendor_name'] = invoices['vendor_name'].fillna('Unknown')
+        line_items['amount'] = line_items['amount'].astype(float).fillna(0.0)
+        return invoices, line_items
+
+    def generate(self, date_from: str, date_to: str,
+                 report_type: str = 'comprehensive') -> Dict[str, Any]:
+        """Build the full report payload for a YYYY-MM-DD date range"""
+        date_from_obj = datetime.strptime(date_from, '%Y-%m-%d')
+        date_to_obj = datetime.strptime(date_to, '%Y-%m-%d')
+        invoices, line_items = self._fetch_frames(date_from_obj, date_to_obj)
+
+        total_spend = float(invoices['amount'].sum())
+        invoice_count = len(invoices)
+
+        vendor_spend = invoices.groupby('vendor_name')['amount'].sum().sort_values(ascending=False)
+        top_vendors = vendor_spend.head(10)
+
+        if line_items.empty:
+            practice_area_spend = pd.Series(dtype=float)
+        else:
+            practice_area_spend = line_items.groupby(
+                infer_practice_areas(line_items['description'])
+            )['amount'].sum().sort_values(ascending=False)
+
+        risk = self._risk_analysis(invoices)
+
+        def pct(value):
+            return float(value / total_spend * 100) if total_spend > 0 else 0
+
+        return {
+            'report_id': f"RPT-{datetime.now().strftime('%Y%m%d%H%M%S')}",
+            'generated_at': datetime.now().isoformat(),
+            'date_range': {
+                'from': date_from,
+                'to': date_to
+            },
+            'summary': {
+                'total_spend': total_spend,
+                'invoice_count': invoice_count,
+                'average_invoice_amount': (float(total_spend / invoice_count)
+                                           if invoice_count > 0 else 0),
+                'unique_vendors': len(vendor_spend),
+                'report_type': report_type
+            },
+            'vendor_analysis': {
+                'top_vendors': [
+                    {'name': vendor, 'spend': float(spend), 'percentage': pct(spend)}
+                    for vendor, spend in top_vendors.items()
+                ],
+                'vendor_diversity': len(vendor_spend),
+                'concentration_risk': pct(top_vendors.iloc[0]) if len(top_vendors) else 0
+            },
+            'practice_area_analysis': {
+                'breakdown': [
+                    {'practice_area': area, 'spend': float(spend), 'percentage': pct(spend)}
+                    for area, spend in practice_area_spend.items()
+                ]
+            },
+            'risk_analysis': risk,
+            'rate_analysis': self._rate_analysis(line_items),
+            'monthly_trends': self._monthly_trends(invoices),
+            'ml_insights': self._ml_insights(invoices, line_items),
+            'recommendations': self._recommendations(
+                total_spend, invoice_count, vendor_spend, practice_area_spend,
+                risk['high_risk_count']
+            )
+        }
+
+    def _risk_analysis(self, invoices: pd.DataFrame) -> Dict[str, Any]:
+        """Bucket invoices by risk score (unscored/zero scores are ignored)"""
+        scores = invoices['risk_score'].astype(float)
+        scored = scores.notna() & (scores != 0)
+        high = scored & (scores > 70)
+        medium = scored & (scores >= 40) & (scores <= 70)
+        low = scored & (scores < 40)
+
+        return {
+            'high_risk_count': int(high.sum()),
+            'medium_risk_count': int(medium.sum()),
+            'low_risk_count': int(low.sum()),
+            'high_risk_spend': float(invoices.loc[high, 'amount'].sum()),
+            'average_risk_score': float(scores[scored].mean()) if scored.any() else 0
+        }
+
+    def _rate_analysis(self, line_items: pd.DataFrame) -> Dict[str, Any]:
+        """Rate statistics overall and per timekeeper"""
+        rated = line_items
+        if not line_items.empty:
+            rated = line_items[line_items['rate'].astype(float) > 0]
+        if rated.empty:
+            return {'average_rate': 0, 'rate_range': [0, 0], 'attorney_analysis': []}
+
+        rates = rated['rate'].astype(float)
+        by_attorney = rates.groupby(rated['timekeeper'].fillna('Unknown')) \
+            .agg(['mean', 'count', 'min', 'max'])
+        by_attorney = by_attorney.sort_values('mean', ascending=False).head(10)
+
+        return {
+            'average_rate': float(rates.mean()),
+            'rate_range': [float(rates.min()), float(rates.max())],
+            'total_rate_entries': int(len(rates)),
+            'attorney_analysis': [
+                {
+                    'attorney': attorney,
+                    'average_rate': float(row['mean']),
+                    'rate_count': int(row['count']),
+                    'rate_range': [float(row['min']), float(row['max'])]
+                }
+                for attorney, row in by_attorney.iterrows()
+            ]
+        }
+
+    def _monthly_trends(self, invoices: pd.DataFrame) -> List[Dict[str, Any]]:
+        """Monthly spend series sorted by month"""
+        dated = invoices[invoices['date'].notna()]
+        if dated.empty:
+            return []
+        months = pd.to_datetime(dated['date']).dt.strftime('%Y-%m')
+        monthly = dated['amount'].groupby(months).sum().sort_index()
+        return [{'month': month, 'spend': float(spend)} for month, spend in monthly.items()]
+
+    def _ml_insights(self, invoices: pd.DataFrame, line_items: pd.DataFrame) -> List[str]:
+        """Run the enhanced analyzer once over a sample of invoices"""
+        from models.enhanced_invoice_analyzer import analyze_invoices_enhanced
+
+        if invoices.empty:
+            return []
+
+        sample = invoices.head(ML_SAMPLE_SIZE)
+        items = line_items[line_items['invoice_id'].isin(sample['id'])].fillna(
+            {'description': '', 'hours': 0, 'rate': 0, 'timekeeper': 'Unknown'}
+        )
+        items_by_invoice = {
+            invoice_id: [
+                {
+                    'description': row.description,
+                    'amount': row.amount,
+                    'hours': row.hours,
+                    'rate': row.rate,
+                    'attorney': row.timekeeper
+                }
+                for row in group.itertuples(index=False)
+            ]
+            for invoice_id, group in items.groupby('invoice_id')
+        }
+
+        batch = [
+            {
+                'id': int(row.id),
+                'amount': row.amount,
+                'vendor': row.vendor_name,
+                'date': row.date.isoformat() if pd.notna(row.date) else None,
+                'line_items': items_by_invoice.get(row.id, [])
+            }
+            for row in sample.itertuples(index=False)
+        ]
+
+        insights = []
+        for analysis in analyze_invoices_enhanced(batch):
+            insights.extend(analysis.get('insights') or [])
+        return list(set(insights))[:20]  # Unique insights, max 20
+
+    def _recommendations(self, total_spend: float, invoice_count: int, vendor_spend: pd.Series,
+                         practice_area_spend: pd.Series,
+                         high_risk_count: int) -> List[Dict[str, str]]:
+        """Generate actionable recommendations based on analysis"""
+        recommendations = []
+
+        # Vendor concentration risk
+        if len(vendor_spend) and total_spend > 0:
+            top_vendor_percentage = vendor_spend.max() / total_spend * 100
+            if top_vendor_percentage > 50:
+                recommendations.append({
+                    'category': 'Vendor Risk',
+                    'priority': 'High',
+                    'recommendation': (
+                        'Consider diversifying legal vendors. Top vendor represents '
+                        f'{top_vendor_percentage:.1f}% of total spend.'
+                    ),
+                    'impact': 'Risk Management'
+                })
+
+        # High-risk invoice management
+        if high_risk_count:
+            high_risk_percentage = high_risk_count / invoice_count * 100
+            if high_risk_percentage > 20:
+                recommendations.append({
+                    'category': 'Risk Management',
+                    'priority': 'High',
+                    'recommendation': (
+                        f'{high_risk_percentage:.1f}% of invoices are high-risk. '
+                        'Implement enhanced review processes.'
+                    ),
+                    'impact': 'Cost Control'
+                })
+
+        # Practice area optimization
+        if len(practice_area_spend) > 1 and total_spend > 0:
+            top_practice_area = practice_area_spend.idxmax()
+            top_practice_percentage = practice_area_spend.max() / total_spend * 100
+            if top_practice_percentage > 60:
+                recommendations.append({
+                    'category': 'Practice Area',
+                    'priority': 'Medium',
+                    'recommendation': (
+                        f'{top_practice_area} represents {top_practice_percentage:.1f}% of spend. '
+                        'Consider specialized vendor partnerships.'
+                    ),
+                    'impact': 'Cost Optimization'
+                })
+
+        # Budget management
+        avg_invoice_amount = total_spend / invoice_count if invoice_count else 0
+        if avg_invoice_amount > 10000:
+            recommendations.append({
+                'category': 'Budget Control',
+                'priority': 'Medium',
+                'recommendation': (
+                    f'Average invoice amount is ${avg_invoice_amount:,.2f}. '
+                    'Consider implementing approval thresholds.'
+                ),
+                'impact': 'Process Improvement'
+            })
+
+        return recommendations
@@ -1,16 +1,364 @@
 """
 Enhanced audit logging service for tracking all system events
+
+Audited requests never write to the database themselves. log_event()
+appends the event to a per-process spool file (flushed to the OS, so it
+survives a worker crash) and puts it on a bounded in-process queue; a
+background writer inserts queued events into audit_logs in batches and
+checkpoints its spool offset after each commit.
+
+If the queue is full the event is only in the spool; the writer re-reads
+the spool from its checkpoint on its next pass, so nothing is lost and
+the request is never blocked. Spools left behind by dead processes are
+replayed by recover_spools() when the writer starts. Delivery is
+at-least-once: a crash between an insert and its checkpoint replays that
+batch.
 """
-import logging
-from datetime import datetime
-from flask import request, g
-from models import db, AuditLog
-from typing import Optional, Dict, Any
+import glob
 import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from flask import g, has_app_context, has_request_context, request
+from sqlalchemy import and_, insert, or_
+
+from models.db_models import AuditLog, User
 
 logger = logging.getLogger(__name__)
 
+AUDIT_QUEUE_SIZE = int(os.getenv('AUDIT_QUEUE_SIZE', '10000'))
+AUDIT_BATCH_SIZE = int(os.getenv('AUDIT_BATCH_SIZE', '200'))
+AUDIT_FLUSH_INTERVAL = float(os.getenv('AUDIT_FLUSH_INTERVAL', '1.0'))
+AUDIT_SPOOL_DIR = os.getenv('AUDIT_SPOOL_DIR', os.path.join('logs', 'audit_spool'))
+# Spool is truncated once fully committed and at least this large
+AUDIT_SPOOL_ROTATE_BYTES = int(os.getenv('AUDIT_SPOOL_ROTATE_BYTES', str(1024 * 1024)))
+MAX_PAGE_SIZE = 100
+
+# audit_logs.details is String(1000)
+DETAILS_MAX_LENGTH = 1000
+# Never spool credentials from security-event headers
+REDACTED_HEADERS = {'authorization', 'cookie', 'x-api-key'}
+
+
+def _details_json(payload: Dict[str, Any]) -> str:
+    """JSON for audit_logs.details, shortening event details to fit the column"""
+    text = json.dumps(payload, default=str)
+    if len(text) <= DETAILS_MAX_LENGTH:
+        return text
+    event_text = json.dumps(payload.get('event_details'), default=str)
+    budget = DETAILS_MAX_LENGTH - len(json.dumps(dict(payload, event_details='', truncated=True), default=str))
+    while budget > 0:
+        text = json.dumps(dict(payload, event_details=event_text[:budget], truncated=True), default=str)
+        if len(text) <= DETAILS_MAX_LENGTH:
+            return text
+        # Escaping made the cut longer than planned
+        budget -= len(text) - DETAILS_MAX_LENGTH
+    summary = {k: payload[k] for k in ('resource_type', 'resource_id', 'status', 'severity') if k in payload}
+    return json.dumps(dict(summary, truncated=True), default=str)[:DETAILS_MAX_LENGTH]
+
+
+def _encode_row(row: Dict[str, Any]) -> str:
+    return json.dumps(dict(row, timestamp=row['timestamp'].isoformat()))
+
+
+def _decode_row(line: str) -> Dict[str, Any]:
+    row = json.loads(line)
+    row['timestamp'] = datetime.fromisoformat(row['timestamp'])
+    return row
+
+
+def _insert_rows(rows: List[Dict[str, Any]]):
+    from db.database import get_db_session
+
+    session = get_db_session()
+    try:
+        session.execute(insert(AuditLog.__table__), rows)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def _write_offset(path: str, offset: int):
+    tmp_path = f"{path}.offset.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(str(offset))
+    os.replace(tmp_path, f"{path}.offset")
+
+
+def _read_offset(path: str) -> int:
+    try:
+        with open(f"{path}.offset") as f:
+            return int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def _read_spool(path: str, start: int, end: Optional[int] = None) -> List[Dict[str, Any]]:
+    rows = []
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read() if end is None else f.read(end - start)
+    for line in data.decode('utf-8').splitlines():
+        if not line.strip():
+            continue
+        try:
+            rows.append(_decode_row(line))
+        except ValueError:
+            # Torn final line from a crash mid-write
+            logger.warning(f"Skipping unreadable audit spool line in {path}")
+    return rows
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def recover_spools(spool_dir: str = AUDIT_SPOOL_DIR) -> int:
+    """Insert uncommitted events from spools of processes that are gone"""
+    recovered = 0
+    for path in glob.glob(os.path.join(spool_dir, 'audit-*.jsonl')):
+        try:
+            pid = int(os.path.basename(path)[len('audit-'):-len('.jsonl')])
+        except ValueError:
+            continue
+        # A live process (this one included) replays its own spool
+        if pid == os.getpid() or _pid_alive(pid):
+            continue
+        # Claim the spool so two starting workers don't both replay it
+        claimed = f"{path}.{os.getpid()}.recovering"
+        try:
+            os.rename(path, claimed)
+        except OSError:
+            continue
+        try:
+            rows = _read_spool(claimed, _read_offset(path))
+            for start in range(0, len(rows), AUDIT_BATCH_SIZE):
+                _insert_rows(rows[start:start + AUDIT_BATCH_SIZE])
+            recovered += len(rows)
+            for leftover in (claimed, f"{path}.offset"):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+        except Exception as e:
+            logger.error(f"Failed to recover audit spool {path}: {str(e)}")
+            # Hand it back for the next attempt
+            os.replace(claimed, path)
+    if recovered:
+        logger.info(f"Recovered {recovered} audit events from spool")
+    return recovered
+
+
+class AuditWriter:
+    """Bounded queue + spool file in front of batched audit_logs inserts"""
+
+    _STOP = object()
+
+    def __init__(self, spool_dir: str = AUDIT_SPOOL_DIR, queue_size: int = AUDIT_QUEUE_SIZE,
+                 batch_size: int = AUDIT_BATCH_SIZE, flush_interval: float = AUDIT_FLUSH_INTERVAL):
+        self.spool_dir = spool_dir
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spool_path = os.path.join(spool_dir, f'audit-{os.getpid()}.jsonl')
+        self._queue: 'queue.Queue' = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._spool = None
+        self._generation = 0
+        self._committed = 0
+        self._spilled = False
+        self._thread = None
+        self.written = 0
+        self.batches = 0
+        self.spilled = 0
+        self.errors = 0
+
+    def _open_spool(self):
+        if self._spool is None:
+            os.makedirs(self.spool_dir, exist_ok=True)
+            self._spool = open(self.spool_path, 'ab')
+            # An earlier process with this pid may have left uncommitted events behind
+            self._committed = min(_read_offset(self.spool_path), self._spool.tell())
+            if self._committed < self._spool.tell():
+                self._spilled = True
+            _write_offset(self.spool_path, self._committed)
+
+    def _ensure_worker(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._loop, name='audit-writer', daemon=True)
+            self._thread.start()
+
+    def submit(self, row: Dict[str, Any]):
+        """Spool one audit row and queue it for the writer; never blocks"""
+        line = (_encode_row(row) + '\n').encode('utf-8')
+        with self._lock:
+            self._open_spool()
+            self._spool.write(line)
+            self._spool.flush()
+            entry = (self._generation, self._spool.tell(), row)
+            self._ensure_worker()
+            try:
+                self._queue.put_nowait(entry)
+            except queue.Full:
+                # Already durable in the spool; the writer picks it up from there
+                self._spilled = True
+                self.spilled += 1
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Block until everything submitted so far is committed"""
+        if self._thread is None or not self._thread.is_alive():
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def _loop(self):
+        # Replay what dead workers left behind, off the request path
+        recover_spools(self.spool_dir)
+        while True:
+            batch, waiters, stop = [], [], False
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    entry = self._queue.get(timeout=max(0.0, deadline - time.monotonic()) if batch else
+                                            self.flush_interval)
+                except queue.Empty:
+                    break
+                if entry is self._STOP:
+                    stop = True
+                    break
+                if isinstance(entry, threading.Event):
+                    waiters.append(entry)
+                    break
+                batch.append(entry)
+            try:
+                self._commit(batch)
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Failed to write audit batch ({len(batch)} events stay spooled): {str(e)}")
+                time.sleep(min(self.flush_interval, 1.0))
+            for waiter in waiters:
+                waiter.set()
+            if stop:
+                return
+
+    def _commit(self, batch):
+        with self._lock:
+            spilled, self._spilled = self._spilled, False
+            generation, committed = self._generation, self._committed
+            end = self._spool.tell() if (spilled and self._spool is not None) else None
+        if spilled:
+            # Some events never made it onto the queue: take everything from the spool
+            rows = _read_spool(self.spool_path, committed, end)
+        else:
+            # Entries from before a spool rotation (or a spill re-read) are already in
+            fresh = [(offset, row) for gen, offset, row in batch if gen == generation and offset > committed]
+            rows = [row for _, row in fresh]
+            end = fresh[-1][0] if fresh else None
+        if end is None:
+            return
+        if rows:
+            try:
+                # One fsync per batch makes the spooled events crash-durable
+                os.fsync(self._spool.fileno())
+                _insert_rows(rows)
+            except Exception:
+                with self._lock:
+                    self._spilled = True
+                raise
+            self.written += len(rows)
+            self.batches += 1
+        with self._lock:
+            self._committed = end
+            if end == self._spool.tell() and end >= AUDIT_SPOOL_ROTATE_BYTES:
+                self._spool.truncate(0)
+                self._spool.seek(0)
+                self._generation += 1
+                self._committed = 0
+            _write_offset(self.spool_path, self._committed)
+
+    def close(self):
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(self._STOP)
+            self._thread.join(timeout=10)
+        with self._lock:
+            if self._spool is not None:
+                self._spool.close()
+                self._spool = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'written': self.written,
+            'batches': self.batches,
+            'spilled': self.spilled,
+            'errors': self.errors,
+            'queue_depth': self._queue.qsize(),
+            'spool_path': self.spool_path,
+        }
+
+
+_writer: Optional[AuditWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_audit_writer() -> AuditWriter:
+    """Process-wide audit writer (a forked worker gets its own)"""
+    global _writer
+    if _writer is None or not _writer.spool_path.endswith(f'audit-{os.getpid()}.jsonl'):
+        with _writer_lock:
+            if _writer is None or not _writer.spool_path.endswith(f'audit-{os.getpid()}.jsonl'):
+                _writer = AuditWriter()
+    return _writer
+
+
+def _encode_cursor(log: AuditLog) -> str:
+    return f"{log.timestamp.isoformat()}|{log.id}"
+
+
+def _decode_cursor(cursor: str):
+    timestamp, _, log_id = cursor.rpartition('|')
+    return datetime.fromisoformat(timestamp), int(log_id)
+
+
 class AuditLogger:
+    @staticmethod
+    def _request_context() -> Dict[str, Any]:
+        if not has_request_context():
+            return {'user_id': getattr(g, 'user_id', None) if has_app_context() else None}
+        return {
+            'user_id': getattr(g, 'user_id', None),
+            'ip_address': request.remote_addr,
+            'user_agent': request.user_agent.string,
+        }
+
+    @staticmethod
+    def _submit(user_id, action: str, payload: Dict[str, Any]):
+        row = {
+            'user_id': user_id,
+            'action': action[:100],
+            'details': _details_json(payload),
+            'timestamp': datetime.now(timezone.utc).replace(tzinfo=None),
+        }
+        try:
+            get_audit_writer().submit(row)
+        except Exception as e:
+            # Auditing must not fail the request it describes
+            logger.error(f"Failed to spool audit log: {str(e)}")
+
     @staticmethod
     def log_event(
         event_type: str,
@@ -21,7 +369,7 @@ class AuditLogger:
     ) -> None:
         """
         Log an auditable event to both database and log file
-        
+
         Args:
             event_type: Type of event (e.g., 'invoice_upload', 'user_login')
             event_details: Dictionary containing event details
@@ -29,43 +377,25 @@ class AuditLogger:
             resource_type: Type of resource (e.g., 'invoice', 'user')
             status: Outcome status of the event
         """
-        try:
-            # Get user from flask g object
-            user_id = getattr(g, 'user_id', None)
-            
-            # Create audit log entry
-            audit_log = AuditLog(
-                user_id=user_id,
-                event_type=event_type,
-                resource_type=resource_type,
-                resource_id=resource_id,
-                event_details=json.dumps(event_details),
-                ip_address=request.remote_addr,
-                user_agent=request.user_agent.string,
-                status=status,
-                timestamp=datetime.now(timezone.utc)
-            )
-            
-            # Save to database
-            db.session.add(audit_log)
-            db.session.commit()
-            
-            # Also log to file
-            log_message = (
-                f"AUDIT: {event_type} | "
-                f"User: {user_id} | "
-                f"Resource: {resource_type}:{resource_id} | "
-                f"Status: {status} | "
-                f"IP: {request.remote_addr} | "
-                f"Details: {json.dumps(event_details)}"
-            )
-            logger.info(log_message)
-            
-        except Exception as e:
-            logger.error(f"Failed to create audit log: {str(e)}")
-            # Ensure database session is clean
-            db.session.rollback()
-            raise
+        context = AuditLogger._request_context()
+        user_id = context.pop('user_id')
+        AuditLogger._submit(user_id, event_type, {
+            'resource_type': resource_type,
+            'resource_id': resource_id,
+            'status': status,
+            **context,
+            'event_details': event_details,
+        })
+
+        # Also log to file
+        logger.info(
+            f"AUDIT: {event_type} | "
+            f"User: {user_id} | "
+            f"Resource: {resource_type}:{resource_id} | "
+            f"Status: {status} | "
+            f"IP: {context.get('ip_address')} | "
+            f"Details: {json.dumps(event_details, default=str)}"
+        )
 
     @staticmethod
     def log_security_event(
@@ -76,35 +406,23 @@ class AuditLogger:
         """
         Log security-specific events with enhanced detail
         """
-        try:
-            user_id = getattr(g, 'user_id', None)
-            
-            security_details = {
-                **event_details,
-                "headers": dict(request.headers),
+        context = AuditLogger._request_context()
+        user_id = context.pop('user_id')
+        security_details = dict(event_details)
+        if has_request_context():
+            security_details.update({
+                "headers": {k: v for k, v in request.headers.items() if k.lower() not in REDACTED_HEADERS},
                 "endpoint": request.endpoint,
                 "method": request.method
-            }
-            
-            audit_log = AuditLog(
-                user_id=user_id,
-                event_type=f"SECURITY_{event_type}",
-                event_details=json.dumps(security_details),
-                ip_address=request.remote_addr,
-                user_agent=request.user_agent.string,
-                severity=severity,
-                timestamp=datetime.now(timezone.utc)
-            )
-            
-            db.session.add(audit_log)
-            db.session.commit()
-            
-            logger.warning(f"SECURITY: {event_type} | User: {user_id} | Severity: {severity} | IP: {request.remote_addr}")
-            
-        except Exception as e:
-            logger.error(f"Failed to create security audit log: {str(e)}")
-            db.session.rollback()
-            raise
+            })
+        AuditLogger._submit(user_id, f"SECURITY_{event_type}", {
+            'severity': severity,
+            **context,
+            'event_details': security_details,
+        })
+
+        logger.warning(f"SECURITY: {event_type} | User: {user_id} | Severity: {severity} | "
+                       f"IP: {context.get('ip_address')}")
 
     @staticmethod
     def get_audit_logs(
@@ -113,25 +431,52 @@ class AuditLogger:
         event_type: Optional[str] = None,
         user_id: Optional[int] = None,
         resource_type: Optional[str] = None,
-        page: int = 1,
-        per_page: int = 50
-    ):
+        cursor: Optional[str] = None,
+        per_page: int = 50,
+        session=None
+    ) -> Dict[str, Any]:
         """
-        Retrieve audit logs with filtering and pagination
+        Retrieve audit logs, newest first, with filtering and keyset pagination
+
+        Pass the returned next_cursor back as `cursor` for the next page; each
+        page is an index range scan on (timestamp, id) instead of an OFFSET.
         """
-        query = AuditLog.query
-        
-        if start_date:
-            query = query.filter(AuditLog.timestamp >= start_date)
-        if end_date:
-            query = query.filter(AuditLog.timestamp <= end_date)
-        if event_type:
-            query = query.filter(AuditLog.event_type == event_type)
-        if user_id:
-            query = query.filter(AuditLog.user_id == user_id)
-        if resource_type:
-            query = query.filter(AuditLog.resource_type == resource_type)
-            
-        return query.order_by(AuditLog.timestamp.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
-        )
+        from db.database import get_db_session
+
+        own_session = session is None
+        session = session or get_db_session()
+        try:
+            query = session.query(AuditLog, User.email).outerjoin(User, AuditLog.user_id == User.id)
+            if start_date:
+                query = query.filter(AuditLog.timestamp >= start_date)
+            if end_date:
+                query = query.filter(AuditLog.timestamp <= end_date)
+            if event_type:
+                query = query.filter(AuditLog.action == event_type)
+            if user_id:
+                query = query.filter(AuditLog.user_id == user_id)
+            if resource_type:
+                # Not a column of audit_logs; stored in the details JSON
+                query = query.filter(AuditLog.details.like(f'%"resource_type": {json.dumps(resource_type)}%'))
+            if cursor:
+                before_ts, before_id = _decode_cursor(cursor)
+                query = query.filter(or_(AuditLog.timestamp < before_ts,
+                                         and_(AuditLog.timestamp == before_ts, AuditLog.id < before_id)))
+
+            per_page = max(1, min(per_page, MAX_PAGE_SIZE))
+            rows = query.order_by(AuditLog.timestamp.desc(), AuditLog.id.desc()).limit(per_page + 1).all()
+            page = rows[:per_page]
+            return {
+                'logs': [{
+                    'id': log.id,
+                    'user_id': log.user_id,
+                    'username': email,
+                    'action': log.action,
+                    'details': log.details,
+                    'timestamp': log.timestamp.isoformat() + 'Z' if log.timestamp else None,
+                } for log, email in page],
+                'next_cursor': _encode_cursor(page[-1][0]) if len(rows) > per_page else None,
+            }
+        finally:
+            if own_session:
+                session.close()
@@ -0,0 +1,287 @@
+"""
+Local full-text search over the collected case database
+
+RealDataCollector stores dockets in the `cases` table of its SQLite file
+(data/real_world/legal_data.db). This module adds an FTS5 index next to
+it, kept current by triggers on `cases`, so rows are searchable as soon as
+the collector inserts them, with no separate indexing job. Searches rank
+by BM25 (case name and docket weighted highest), filter by court and filing
+date, and return highlighted snippets.
+
+The triggers use BEFORE INSERT to drop the stale index row: the collector
+writes with INSERT OR REPLACE, and REPLACE deletions do not fire DELETE
+triggers unless recursive_triggers is on.
+"""
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.getenv('CASE_INDEX_DB', os.path.join('data', 'real_world', 'legal_data.db'))
+
+FTS_TABLE = 'cases_fts'
+FTS_COLUMNS = (
+    'case_name', 'docket_number', 'court', 'case_type', 'nature_of_suit', 'parties', 'attorneys',
+    'law_firms',
+)
+# bm25() column weights, in FTS_COLUMNS order
+BM25_WEIGHTS = (10.0, 6.0, 2.0, 2.0, 2.0, 3.0, 1.5, 1.5)
+SNIPPET_TOKENS = 16
+
+_TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _column_list(prefix: str = '') -> str:
+    return ', '.join(f'{prefix}{column}' for column in FTS_COLUMNS)
+
+
+INDEX_SCHEMA = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        {_column_list()}, tokenize='porter unicode61', prefix='2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_before_insert BEFORE INSERT ON cases BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid IN (SELECT rowid FROM cases WHERE id = new.id);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_after_insert AFTER INSERT ON cases BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, {_column_list()}) VALUES (new.rowid, {_column_list('new.')});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_after_update AFTER UPDATE ON cases BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.rowid;
+        INSERT INTO {FTS_TABLE}(rowid, {_column_list()}) VALUES (new.rowid, {_column_list('new.')});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_after_delete AFTER DELETE ON cases BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.rowid;
+    END
+    """,
+]
+
+
+def _table_exists(conn: sqlite3.Connection, name: str) -> bool:
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,)).fetchone()
+    return row is not None
+
+
+def _index_all_cases(conn: sqlite3.Connection) -> int:
+    """Copy every case into the (empty) FTS table; returns the number indexed"""
+    columns = _column_list()
+    conn.execute(f"INSERT INTO {FTS_TABLE}(rowid, {columns}) SELECT rowid, {columns} FROM cases")
+    return conn.execute(f"SELECT COUNT(*) FROM {FTS_TABLE}").fetchone()[0]
+
+
+def install_case_index(conn: sqlite3.Connection) -> bool:
+    """
+    Create the FTS table and its triggers on a collector database
+
+    Existing rows are indexed once when the FTS table is first created.
+    Returns False when there is no `cases` table (nothing to index yet).
+    """
+    if not _table_exists(conn, 'cases'):
+        return False
+    created = not _table_exists(conn, FTS_TABLE)
+    for statement in INDEX_SCHEMA:
+        conn.execute(statement)
+    if created:
+        logger.info(f"Built case search index ({_index_all_cases(conn)} cases)")
+    conn.commit()
+    return True
+
+
+def build_match_query(text: str, operator: str = 'AND') -> str:
+    """Turn free text into an FTS5 query of quoted terms (no user query syntax)"""
+    terms = _TERM_RE.findall(text or '')
+    return f' {operator} '.join(f'"{term}"' for term in terms)
+
+
+def _json_list(value: Optional[str]) -> List[Any]:
+    try:
+        parsed = json.loads(value) if value else []
+    except (TypeError, ValueError):
+        return []
+    return parsed if isinstance(parsed, list) else []
+
+
+class CaseSearchIndex:
+    """BM25 search and lookups over the collector's `cases` table"""
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or DEFAULT_DB_PATH
+        self._ready = False
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _connection(self):
+        """Short-lived connection: committed on success, always closed"""
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def ensure_ready(self) -> bool:
+        """Install the index on first use; False when there is no case database"""
+        if self._ready:
+            return True
+        if not os.path.exists(self.db_path):
+            return False
+        with self._lock:
+            if not self._ready:
+                try:
+                    with self._connection() as conn:
+                        self._ready = install_case_index(conn)
+                except sqlite3.Error as e:
+                    logger.warning(f"Case search index unavailable: {e}")
+        return self._ready
+
+    def search(self, query: str, court: Optional[str] = None, date_from: Optional[str] = None,
+               date_to: Optional[str] = None, limit: int = 20,
+               offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        Rank cases matching all query terms (any term if none match all)
+
+        Args:
+            court: words that must appear in the court name
+            date_from/date_to: inclusive ISO filing-date bounds (YYYY-MM-DD)
+        Returns:
+            Result dicts ordered by relevance, with an HTML-highlighted excerpt
+        """
+        if not self.ensure_ready():
+            return []
+        filters = (court, date_from, date_to, limit, offset)
+        results = self._search(build_match_query(query, 'AND'), *filters)
+        if not results and len(_TERM_RE.findall(query or '')) > 1:
+            results = self._search(build_match_query(query, 'OR'), *filters)
+        return results
+
+    def _search(self, match: str, court, date_from, date_to, limit, offset) -> List[Dict[str, Any]]:
+        if not match:
+            return []
+        if court:
+            court_match = build_match_query(court)
+            if court_match:
+                match = f'({match}) AND court : ({court_match})'
+
+        sql = f"""
+            SELECT c.id, c.case_name, c.docket_number, c.court, c.filed_date, c.case_type,
+                   c.nature_of_suit, c.status,
+                   snippet({FTS_TABLE}, -1, '<mark>', '</mark>', '...',
+                           {SNIPPET_TOKENS}) AS excerpt,
+                   bm25({FTS_TABLE}, {', '.join(str(weight) for weight in BM25_WEIGHTS)}) AS score
+            FROM {FTS_TABLE} JOIN cases c ON c.rowid = {FTS_TABLE}.rowid
+            WHERE {FTS_TABLE} MATCH ?
+        """
+        params: List[Any] = [match]
+        if date_from:
+            sql += " AND c.filed_date >= ?"
+            params.append(date_from)
+        if date_to:
+            sql += " AND c.filed_date <= ?"
+            params.append(date_to)
+        sql += " ORDER BY score LIMIT ? OFFSET ?"
+        params.extend([limit, offset])
+
+        try:
+            with self._connection() as conn:
+                rows = conn.execute(sql, params).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"Case search failed: {e}")
+            return []
+
+        # bm25() is negative, best match most negative; scale relative to the top hit
+        best = rows[0]['score'] if rows and rows[0]['score'] < 0 else None
+        return [{
+            'id': row['id'],
+            'title': row['case_name'],
+            'court': row['court'],
+            'date': row['filed_date'],
+            'relevance': round(100 * row['score'] / best) if best else 0,
+            'excerpt': row['excerpt'],
+            'citation': row['docket_number'],
+            'docket_number': row['docket_number'],
+            'case_type': row['case_type'] or row['nature_of_suit'],
+            'status': row['status'],
+            'url': '',
+            'source': 'Local Database'
+        } for row in rows]
+
+    def get_case(self, case_id: str) -> Optional[Dict[str, Any]]:
+        """Full record for one case id, or None"""
+        if not self.ensure_ready():
+            return None
+        try:
+            with self._connection() as conn:
+                row = conn.execute("SELECT * FROM cases WHERE id = ?", (case_id,)).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Case lookup failed: {e}")
+            return None
+        if row is None:
+            return None
+        return {
+            'id': row['id'],
+            'title': row['case_name'],
+            'court': row['court'],
+            'date': row['filed_date'],
+            'date_filed': row['filed_date'],
+            'status': row['status'],
+            'case_type': row['case_type'],
+            'nature_of_suit': row['nature_of_suit'],
+            'docket_number': row['docket_number'],
+            'citation': row['docket_number'],
+            'parties': _json_list(row['parties']),
+            'attorneys': _json_list(row['attorneys']),
+            'law_firms': _json_list(row['law_firms']),
+            'estimated_value': row['estimated_value'],
+            'complexity_score': row['complexity_score'],
+            'source': 'Local Database'
+        }
+
+    def rebuild(self) -> int:
+        """Re-index every case from scratch; returns the number indexed"""
+        if not self.ensure_ready():
+            return 0
+        with self._connection() as conn:
+            conn.execute(f"DELETE FROM {FTS_TABLE}")
+            indexed = _index_all_cases(conn)
+            conn.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+            return indexed
+
+    def stats(self) -> Dict[str, Any]:
+        if not self.ensure_ready():
+            return {'available': False, 'database_path': self.db_path}
+        with self._connection() as conn:
+            return {
+                'available': True,
+                'database_path': self.db_path,
+                'cases': conn.execute("SELECT COUNT(*) FROM cases").fetchone()[0],
+                'indexed': conn.execute(f"SELECT COUNT(*) FROM {FTS_TABLE}").fetchone()[0],
+            }
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_case_search_index() -> CaseSearchIndex:
+    """Return the process-wide case search index"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = CaseSearchIndex()
+        return _index
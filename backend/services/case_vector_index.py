@@ -0,0 +1,402 @@
+"""
+Offline vector index for similar-case lookups
+
+Case texts from the collector database are embedded once and stored as a
+memory-mapped float32 matrix (rows L2-normalized, so a dot product is the
+cosine similarity). Queries are answered locally: exact top-k is a single
+matrix-vector product plus argpartition; large indexes can also be built
+with an inverted-file (IVF) layer that only scores the rows of the nearest
+k-means cells.
+
+Encoders are pluggable:
+    hashing-tfidf         hashed unigrams/bigrams with corpus IDF, no model
+                          download or network needed (default)
+    sentence-transformer  dense embeddings from the shared SentenceTransformer
+
+Build or refresh the index with:
+    python -m services.case_vector_index [--db PATH] [--encoder NAME] [--ivf]
+"""
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import uuid
+import zlib
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from utils.nlp_resources import BASIC_STOP_WORDS, get_sentence_model
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_DIR = os.getenv('CASE_VECTOR_DIR', os.path.join('data', 'case_vectors'))
+DEFAULT_ENCODER = os.getenv('CASE_VECTOR_ENCODER', 'hashing-tfidf')
+HASHING_DIM = int(os.getenv('CASE_VECTOR_DIM', '2048'))
+# Below this many rows exact search is already a few milliseconds
+IVF_MIN_ROWS = 5000
+DEFAULT_NPROBE = 8
+ENCODE_BATCH = 512
+
+META_FILE = 'meta.json'
+VECTORS_FILE = 'vectors.f32'
+ITEMS_FILE = 'items.json'
+IDF_FILE = 'idf.npy'
+CENTROIDS_FILE = 'ivf_centroids.npy'
+ASSIGNMENTS_FILE = 'ivf_assignments.npy'
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32, copy=False)
+
+
+# ----------------------------------------------------------------------
+# Encoders
+# ----------------------------------------------------------------------
+class HashingTfidfEncoder:
+    """Hashed unigram+bigram TF-IDF; stable across processes (crc32, not hash())"""
+
+    name = 'hashing-tfidf'
+
+    def __init__(self, dim: int = HASHING_DIM, idf: Optional[np.ndarray] = None):
+        self.dim = dim
+        self.idf = idf
+
+    def _buckets(self, text: str) -> np.ndarray:
+        tokens = [token for token in _TOKEN_RE.findall((text or '').lower()) if token not in BASIC_STOP_WORDS]
+        grams = tokens + [f'{first} {second}' for first, second in zip(tokens, tokens[1:])]
+        return np.fromiter((zlib.crc32(gram.encode('utf-8')) % self.dim for gram in grams),
+                           dtype=np.int64, count=len(grams))
+
+    def term_frequencies(self, texts: List[str]) -> np.ndarray:
+        """Sublinear (log1p) hashed term frequencies, one row per text"""
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            buckets = self._buckets(text)
+            if buckets.size:
+                matrix[row] = np.bincount(buckets, minlength=self.dim)
+        return np.log1p(matrix, out=matrix)
+
+    def fit(self, texts: List[str]):
+        document_frequency = np.zeros(self.dim, dtype=np.float64)
+        for start in range(0, len(texts), ENCODE_BATCH):
+            document_frequency += (self.term_frequencies(texts[start:start + ENCODE_BATCH]) > 0).sum(axis=0)
+        self.idf = (np.log((1 + len(texts)) / (1 + document_frequency)) + 1).astype(np.float32)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        matrix = self.term_frequencies(texts)
+        if self.idf is not None:
+            matrix *= self.idf
+        return _normalize(matrix)
+
+    def save(self, index_dir: str, suffix: str = ''):
+        if self.idf is not None:
+            with open(os.path.join(index_dir, IDF_FILE) + suffix, 'wb') as f:
+                np.save(f, self.idf)
+
+    @classmethod
+    def load(cls, index_dir: str, meta: Dict[str, Any]) -> 'HashingTfidfEncoder':
+        idf_path = os.path.join(index_dir, IDF_FILE)
+        return cls(dim=meta['dim'], idf=np.load(idf_path) if os.path.exists(idf_path) else None)
+
+
+class SentenceTransformerEncoder:
+    """Dense sentence embeddings; the model is loaded once per process"""
+
+    name = 'sentence-transformer'
+
+    def __init__(self, model_name: Optional[str] = None):
+        self.model_name = model_name
+
+    @property
+    def dim(self) -> int:
+        return get_sentence_model(self.model_name).get_sentence_embedding_dimension()
+
+    def fit(self, texts: List[str]):
+        pass
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        vectors = get_sentence_model(self.model_name).encode(
+            list(texts), batch_size=64, normalize_embeddings=True, convert_to_numpy=True
+        )
+        return np.asarray(vectors, dtype=np.float32)
+
+    def save(self, index_dir: str, suffix: str = ''):
+        pass
+
+    @classmethod
+    def load(cls, index_dir: str, meta: Dict[str, Any]) -> 'SentenceTransformerEncoder':
+        return cls(meta.get('model_name'))
+
+
+ENCODERS = {
+    HashingTfidfEncoder.name: HashingTfidfEncoder,
+    SentenceTransformerEncoder.name: SentenceTransformerEncoder,
+}
+
+
+def make_encoder(name: Optional[str] = None):
+    name = name or DEFAULT_ENCODER
+    if name not in ENCODERS:
+        raise ValueError(f"Unknown case vector encoder: {name}")
+    return ENCODERS[name]()
+
+
+# ----------------------------------------------------------------------
+# IVF
+# ----------------------------------------------------------------------
+def train_ivf(matrix: np.ndarray, nlist: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Spherical k-means centroids over a sample of the (normalized) rows"""
+    rng = np.random.default_rng(seed)
+    rows = matrix.shape[0]
+    sample = np.sort(rng.choice(rows, size=min(rows, nlist * 64), replace=False))
+    data = np.asarray(matrix[sample], dtype=np.float32)
+    centroids = data[rng.choice(len(data), size=nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = np.argmax(data @ centroids.T, axis=1)
+        counts = np.bincount(assignments, minlength=nlist)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        filled = counts > 0
+        # Empty cells keep their previous centroid
+        sums = centroids.copy()
+        sums[filled] = np.add.reduceat(data[np.argsort(assignments, kind='stable')], starts[filled], axis=0)
+        centroids = _normalize(sums)
+    return centroids
+
+
+def assign_ivf(matrix: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    assignments = np.empty(matrix.shape[0], dtype=np.int32)
+    for start in range(0, matrix.shape[0], ENCODE_BATCH * 8):
+        block = np.asarray(matrix[start:start + ENCODE_BATCH * 8])
+        assignments[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+
+# ----------------------------------------------------------------------
+# Index
+# ----------------------------------------------------------------------
+class CaseVectorIndex:
+    """Memory-mapped embedding matrix with exact and IVF top-k search"""
+
+    def __init__(self, index_dir: Optional[str] = None):
+        self.index_dir = index_dir or DEFAULT_INDEX_DIR
+        self._lock = threading.Lock()
+        self._meta_mtime = None
+        self.meta: Dict[str, Any] = {}
+        self.encoder = None
+        self.matrix: Optional[np.ndarray] = None
+        self.items: List[Dict[str, Any]] = []
+        self._courts: Optional[np.ndarray] = None
+        self.centroids: Optional[np.ndarray] = None
+        self._list_order: Optional[np.ndarray] = None
+        self._list_offsets: Optional[np.ndarray] = None
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.index_dir, name)
+
+    # -- building ------------------------------------------------------
+    def build(self, records: Iterable[Dict[str, Any]], encoder=None, ivf: Optional[bool] = None,
+              nlist: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Embed records ({'id', 'text', ...metadata}) and replace the index on disk
+
+        Files are written under temporary names and renamed into place with
+        meta.json last, so concurrent readers keep serving the old version.
+        """
+        records = [record for record in records if record.get('text')]
+        encoder = encoder or make_encoder()
+        texts = [record['text'] for record in records]
+        encoder.fit(texts)
+        os.makedirs(self.index_dir, exist_ok=True)
+        suffix = f'.{uuid.uuid4().hex}.tmp'
+
+        dim = None
+        with open(self._path(VECTORS_FILE) + suffix, 'wb') as f:
+            for start in range(0, len(texts), ENCODE_BATCH):
+                block = encoder.encode(texts[start:start + ENCODE_BATCH])
+                dim = block.shape[1]
+                f.write(np.ascontiguousarray(block, dtype=np.float32).tobytes())
+        dim = dim or encoder.dim
+
+        items = [{key: value for key, value in record.items() if key != 'text'} for record in records]
+        for item, text in zip(items, texts):
+            item['snippet'] = text[:300]
+        with open(self._path(ITEMS_FILE) + suffix, 'w') as f:
+            json.dump(items, f, default=str)
+
+        meta = {'encoder': encoder.name, 'dim': dim, 'count': len(records), 'ivf': False,
+                'model_name': getattr(encoder, 'model_name', None)}
+        use_ivf = ivf if ivf is not None else len(records) >= IVF_MIN_ROWS
+        if use_ivf and records:
+            matrix = np.memmap(self._path(VECTORS_FILE) + suffix, dtype=np.float32, mode='r', shape=(len(records), dim))
+            nlist = min(nlist or max(1, int(np.sqrt(len(records)))), len(records))
+            centroids = train_ivf(matrix, nlist)
+            with open(self._path(CENTROIDS_FILE) + suffix, 'wb') as f:
+                np.save(f, centroids)
+            with open(self._path(ASSIGNMENTS_FILE) + suffix, 'wb') as f:
+                np.save(f, assign_ivf(matrix, centroids))
+            del matrix
+            meta.update({'ivf': True, 'nlist': nlist})
+
+        encoder.save(self.index_dir, suffix)
+        for name in (VECTORS_FILE, ITEMS_FILE, IDF_FILE, CENTROIDS_FILE, ASSIGNMENTS_FILE):
+            if os.path.exists(self._path(name) + suffix):
+                os.replace(self._path(name) + suffix, self._path(name))
+        with open(self._path(META_FILE) + suffix, 'w') as f:
+            json.dump(meta, f)
+        os.replace(self._path(META_FILE) + suffix, self._path(META_FILE))
+        logger.info(f"Built case vector index: {len(records)} cases, {encoder.name}, dim {dim}, ivf={meta['ivf']}")
+        self.load(force=True)
+        return meta
+
+    # -- loading -------------------------------------------------------
+    def load(self, force: bool = False) -> bool:
+        """Map the index from disk, reloading when it has been rebuilt"""
+        meta_path = self._path(META_FILE)
+        try:
+            mtime = os.stat(meta_path).st_mtime_ns
+        except FileNotFoundError:
+            return False
+        if not force and mtime == self._meta_mtime:
+            return True
+        with self._lock:
+            if not force and mtime == self._meta_mtime:
+                return True
+            with open(meta_path) as f:
+                meta = json.load(f)
+            with open(self._path(ITEMS_FILE)) as f:
+                items = json.load(f)
+            self.encoder = ENCODERS[meta['encoder']].load(self.index_dir, meta)
+            self.matrix = (np.memmap(self._path(VECTORS_FILE), dtype=np.float32, mode='r',
+                                     shape=(meta['count'], meta['dim'])) if meta['count'] else
+                           np.zeros((0, meta['dim']), dtype=np.float32))
+            self.items = items
+            self._courts = np.array([str(item.get('court') or '').lower() for item in items], dtype=object)
+            if meta.get('ivf'):
+                self.centroids = np.load(self._path(CENTROIDS_FILE))
+                assignments = np.load(self._path(ASSIGNMENTS_FILE))
+                self._list_order = np.argsort(assignments, kind='stable')
+                self._list_offsets = np.searchsorted(assignments[self._list_order], np.arange(len(self.centroids) + 1))
+            else:
+                self.centroids = self._list_order = self._list_offsets = None
+            self.meta = meta
+            self._meta_mtime = mtime
+        return True
+
+    # -- search --------------------------------------------------------
+    def search(self, text: str, k: int = 10, court: Optional[str] = None, mode: Optional[str] = None,
+               nprobe: int = DEFAULT_NPROBE, min_score: float = 0.0) -> List[Dict[str, Any]]:
+        """
+        Most similar cases to a description
+
+        Args:
+            court: keep only cases whose court name contains this text
+            mode: 'exact' or 'ivf' (default: ivf when the index has it)
+            nprobe: IVF cells to scan
+        Returns:
+            Case metadata dicts with a cosine 'score', best first
+        """
+        if not text or not self.load() or not len(self.items):
+            return []
+        query = self.encoder.encode([text])[0]
+
+        if (mode or ('ivf' if self.centroids is not None else 'exact')) == 'ivf' and self.centroids is not None:
+            nprobe = min(nprobe, len(self.centroids))
+            cells = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+            rows = np.sort(np.concatenate([
+                self._list_order[self._list_offsets[cell]:self._list_offsets[cell + 1]] for cell in cells
+            ]))
+            scores = np.asarray(self.matrix[rows]) @ query
+        else:
+            rows = None
+            scores = np.asarray(self.matrix @ query)
+
+        if court:
+            courts = self._courts if rows is None else self._courts[rows]
+            needle = court.lower()
+            scores = np.where([needle in name for name in courts], scores, -np.inf)
+
+        top = min(k, len(scores))
+        if top <= 0:
+            return []
+        best = np.argpartition(-scores, top - 1)[:top]
+        best = best[np.argsort(-scores[best])]
+
+        results = []
+        for position in best:
+            score = float(scores[position])
+            if not score > min_score:
+                break
+            row = int(position if rows is None else rows[position])
+            results.append(dict(self.items[row], score=round(score, 4)))
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        if not self.load():
+            return {'available': False, 'index_dir': self.index_dir}
+        return dict(self.meta, available=True, index_dir=self.index_dir)
+
+
+# ----------------------------------------------------------------------
+# Case database source
+# ----------------------------------------------------------------------
+def case_records_from_db(db_path: str) -> List[Dict[str, Any]]:
+    """Index records for every row of RealDataCollector's `cases` table"""
+    with sqlite3.connect(db_path) as conn:
+        conn.row_factory = sqlite3.Row
+        rows = conn.execute(
+            "SELECT id, case_name, docket_number, court, filed_date, case_type, nature_of_suit, parties "
+            "FROM cases"
+        ).fetchall()
+    records = []
+    for row in rows:
+        try:
+            parties = ' '.join(json.loads(row['parties'] or '[]'))
+        except (TypeError, ValueError):
+            parties = ''
+        text = '. '.join(part for part in (
+            row['case_name'], row['nature_of_suit'], row['case_type'], row['court'], parties
+        ) if part)
+        records.append({
+            'id': row['id'], 'text': text, 'case_name': row['case_name'], 'court': row['court'],
+            'date_filed': row['filed_date'], 'docket_number': row['docket_number'],
+        })
+    return records
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_case_vector_index() -> CaseVectorIndex:
+    """Return the process-wide case vector index"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = CaseVectorIndex()
+        return _index
+
+
+if __name__ == '__main__':
+    import argparse
+    from services.case_search_index import DEFAULT_DB_PATH
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Build the offline case vector index')
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help='collector SQLite database')
+    parser.add_argument('--index-dir', default=DEFAULT_INDEX_DIR)
+    parser.add_argument('--encoder', default=DEFAULT_ENCODER, choices=sorted(ENCODERS))
+    parser.add_argument('--ivf', action='store_true', default=None, help='force an IVF layer')
+    args = parser.parse_args()
+
+    meta = CaseVectorIndex(args.index_dir).build(
+        case_records_from_db(args.db), encoder=make_encoder(args.encoder), ivf=args.ivf
+    )
+    print(json.dumps(meta, indent=2))
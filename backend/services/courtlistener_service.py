@@ -20,6 +20,12 @@ from dataclasses import dataclass
 from urllib.parse import urljoin, quote_plus
 import time
 
+try:
+    from services.case_vector_index import get_case_vector_index
+    CASE_VECTORS_AVAILABLE = True
+except ImportError:
+    CASE_VECTORS_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -403,7 +409,11 @@ class CourtListenerClient:
             return {}
     
     def search_similar_cases(self, case_description: str, court: str = None, limit: int = 10) -> List[Dict]:
-        """Search for similar cases based on description"""
+        """Search for similar cases based on description (local vector index first)"""
+        local_cases = self._local_similar_cases(case_description, court, limit)
+        if local_cases:
+            return local_cases
+        
         params = {
             'q': case_description,
             'type': 'o',  # Opinions
@@ -434,6 +444,25 @@ class CourtListenerClient:
             logger.error(f"Error searching similar cases: {str(e)}")
             return []
     
+    def _local_similar_cases(self, case_description: str, court: str = None, limit: int = 10) -> List[Dict]:
+        """Nearest collected cases from the offline vector index (no network)"""
+        if not CASE_VECTORS_AVAILABLE:
+            return []
+        try:
+            matches = get_case_vector_index().search(case_description, k=limit, court=court)
+        except Exception as e:
+            logger.warning(f"Local similar-case search failed: {str(e)}")
+            return []
+        return [{
+            'case_name': match.get('case_name', ''),
+            'court': match.get('court', ''),
+            'date_filed': match.get('date_filed', ''),
+            'citation': [match['docket_number']] if match.get('docket_number') else [],
+            'snippet': match.get('snippet', ''),
+            'relevance_score': match['score'],
+            'source': 'Local Index'
+        } for match in matches]
+    
     def _calculate_success_metrics(self, cases: List[Dict]) -> Dict[str, float]:
         """Calculate success metrics from case history"""
         if not cases:
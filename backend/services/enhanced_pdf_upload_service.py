@@ -6,8 +6,6 @@ Uses trained ML models to extract and analyze invoice data
 import os
 import sys
 import tempfile
-import pdfplumber
-import PyPDF2
 import json
 import logging
 from datetime import datetime
@@ -21,9 +19,13 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 from models.enhanced_invoice_analyzer import EnhancedInvoiceAnalyzer
 from services.pdf_parser_service import PDFParserService
+from services.pdf_extraction import extract_pdf
+from services.upload_cache import get_upload_cache, file_sha256, model_version, PARSER_VERSION
 
 logger = logging.getLogger(__name__)
 
+UPLOAD_PARSER_VERSION = f"enhanced_pdf_upload/{PARSER_VERSION}"
+
 class EnhancedPDFUploadService:
     """Enhanced PDF upload service with real ML analysis"""
     
@@ -36,14 +38,27 @@ class EnhancedPDFUploadService:
         try:
             logger.info(f"Processing uploaded file: {file.filename}")
             
+            # Hash before any parsing so identical resends skip extraction and scoring
+            file_bytes = file.read()
+            content_hash = file_sha256(file_bytes)
+            models_version = model_version()
+            upload_cache = get_upload_cache()
+            form_data = {k: v for k, v in (additional_data or {}).items() if v}
+            cached = upload_cache.get(content_hash, UPLOAD_PARSER_VERSION, models_version)
+            cached_result = (cached or {}).get('result') or {}
+            
+            if cached_result.get('response') and cached_result.get('additional_data') == form_data:
+                logger.info(f"Duplicate upload {content_hash[:12]} served from cache")
+                return {**cached_result['response'], 'duplicate': True, 'invoice_added': False}
+            
             # Create temporary file
             with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-                file.save(temp_file.name)
+                temp_file.write(file_bytes)
                 temp_file_path = temp_file.name
             
             try:
-                # Extract data from PDF
-                extracted_data = self._extract_pdf_data(temp_file_path)
+                # Extract data from PDF (reused when only the form fields changed)
+                extracted_data = cached_result.get('extracted_data') or self._extract_pdf_data(temp_file_path)
                 
                 # Parse invoice structure
                 parsed_invoice = self._parse_invoice_structure(extracted_data, additional_data)
@@ -75,9 +90,16 @@ class EnhancedPDFUploadService:
                         'tables_found': len(extracted_data.get('tables', [])),
                         'line_items_extracted': len(parsed_invoice.get('line_items', [])),
                         'confidence_score': self._calculate_extraction_confidence(extracted_data, parsed_invoice)
-                    }
+                    },
+                    'content_hash': content_hash
                 }
                 
+                upload_cache.put(content_hash, UPLOAD_PARSER_VERSION, models_version, {
+                    'extracted_data': extracted_data,
+                    'additional_data': form_data,
+                    'response': result
+                }, invoice_id=db_invoice.id if db_invoice else None)
+                
                 logger.info(f"Successfully processed file: {file.filename}")
                 return result
                 
@@ -103,38 +125,15 @@ class EnhancedPDFUploadService:
         }
         
         try:
-            # Extract using pdfplumber (better for tables)
-            with pdfplumber.open(file_path) as pdf:
-                all_text = []
-                all_tables = []
-                
-                for page_num, page in enumerate(pdf.pages):
-                    # Extract text
-                    page_text = page.extract_text()
-                    if page_text:
-                        all_text.append(page_text)
-                    
-                    # Extract tables
-                    tables = page.extract_tables()
-                    if tables:
-                        all_tables.extend(tables)
-                
-                extracted_data['text'] = '\n'.join(all_text)
-                extracted_data['tables'] = all_tables
-                
-            # Also try PyPDF2 for metadata
-            try:
-                with open(file_path, 'rb') as pdf_file:
-                    pdf_reader = PyPDF2.PdfReader(pdf_file)
-                    extracted_data['metadata'] = {
-                        'pages': len(pdf_reader.pages),
-                        'title': pdf_reader.metadata.get('/Title', '') if pdf_reader.metadata else '',
-                        'author': pdf_reader.metadata.get('/Author', '') if pdf_reader.metadata else '',
-                        'creator': pdf_reader.metadata.get('/Creator', '') if pdf_reader.metadata else ''
-                    }
-            except:
-                logger.warning("Could not extract PDF metadata")
-                
+            extraction = extract_pdf(file_path, tables=True)
+            extracted_data['text'] = extraction.text
+            extracted_data['tables'] = extraction.tables
+            extracted_data['metadata'] = {
+                'pages': extraction.page_count,
+                'title': extraction.metadata.get('title', ''),
+                'author': extraction.metadata.get('author', ''),
+                'creator': extraction.metadata.get('creator', '')
+            }
         except Exception as e:
             logger.error(f"Error extracting PDF data: {str(e)}")
             # Fallback: try to read as text
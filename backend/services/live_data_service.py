@@ -7,6 +7,9 @@ import asyncio
 import aiohttp
 import json
 import logging
+import random
+import time
+from collections import OrderedDict, deque
 from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional
 from dataclasses import dataclass
@@ -29,16 +32,141 @@ class LegalDataSource:
     data_type: str = "json"  # json, xml, csv
     update_frequency: int = 300  # seconds
     enabled: bool = True
+    max_concurrency: int = 1  # simultaneous in-flight fetches for this source
+
+class TTLCache:
+    """Bounded LRU cache with per-entry TTL and approximate byte accounting"""
+    
+    def __init__(self, max_entries: int = 256, max_bytes: int = 8 * 1024 * 1024, ttl: float = 3600.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, size, value)
+        self.total_bytes = 0
+        self.evictions = 0
+    
+    @staticmethod
+    def _sizeof(value: Any) -> int:
+        return len(json.dumps(value, default=str).encode('utf-8'))
+    
+    def _remove(self, key: str):
+        _, size, _ = self._entries.pop(key)
+        self.total_bytes -= size
+    
+    def _purge_expired(self, now: float):
+        for key in [k for k, (expires_at, _, _) in self._entries.items() if expires_at <= now]:
+            self._remove(key)
+            self.evictions += 1
+    
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        now = time.monotonic()
+        size = self._sizeof(value)
+        if key in self._entries:
+            self._remove(key)
+        if size > self.max_bytes:
+            logger.warning(f"Cache entry for {key} ({size} bytes) exceeds cache capacity; not cached")
+            return
+        
+        self._purge_expired(now)
+        while self._entries and (len(self._entries) >= self.max_entries
+                                 or self.total_bytes + size > self.max_bytes):
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+        
+        self._entries[key] = (now + (ttl if ttl is not None else self.ttl), size, value)
+        self.total_bytes += size
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        if entry[0] <= time.monotonic():
+            self._remove(key)
+            self.evictions += 1
+            return default
+        self._entries.move_to_end(key)
+        return entry[2]
+    
+    def items(self) -> List[tuple]:
+        self._purge_expired(time.monotonic())
+        return [(key, value) for key, (_, _, value) in self._entries.items()]
+    
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'entries': len(self._entries),
+            'bytes': self.total_bytes,
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+            'evictions': self.evictions
+        }
+
+class TimerWheel:
+    """Hashed timing wheel: O(1) schedule, one slot scanned per tick"""
+    
+    def __init__(self, tick: float = 1.0, slots: int = 512):
+        self.tick = tick
+        self.slots = [[] for _ in range(slots)]
+        self.cursor = 0
+        self._size = 0
+    
+    def schedule(self, key: str, delay: float):
+        ticks = max(1, int(round(delay / self.tick)))
+        rounds, offset = divmod(ticks, len(self.slots))
+        if offset == 0:
+            rounds, offset = rounds - 1, len(self.slots)
+        slot = (self.cursor + offset) % len(self.slots)
+        self.slots[slot].append([key, rounds])
+        self._size += 1
+    
+    def advance(self) -> List[str]:
+        """Move one tick forward and return keys that are now due"""
+        self.cursor = (self.cursor + 1) % len(self.slots)
+        due, pending = [], []
+        for entry in self.slots[self.cursor]:
+            if entry[1] <= 0:
+                due.append(entry[0])
+            else:
+                entry[1] -= 1
+                pending.append(entry)
+        self.slots[self.cursor] = pending
+        self._size -= len(due)
+        return due
+    
+    def __len__(self) -> int:
+        return self._size
 
 class RealTimeLegalDataService:
     """Real-time legal data integration service"""
     
-    def __init__(self):
+    def __init__(self, workers: int = 8, jitter: float = 0.1, startup_spread: float = 60.0,
+                 base_backoff: float = 30.0, max_backoff: float = 3600.0,
+                 cache_max_entries: int = 256, cache_max_bytes: int = 8 * 1024 * 1024):
         self.data_sources = self._initialize_data_sources()
         self.session = None
-        self.data_cache = {}
+        self.data_cache = TTLCache(max_entries=cache_max_entries, max_bytes=cache_max_bytes)
         self.last_updates = {}
         
+        # Scheduler configuration and state
+        self.workers = workers
+        self.jitter = jitter
+        self.startup_spread = startup_spread
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.wheel = TimerWheel()
+        self.queue = None
+        self._stop_event = None
+        self._sources_by_name = {source.name: source for source in self.data_sources}
+        self._in_flight = {}
+        self._failures = {}
+        self._latencies = deque(maxlen=500)
+        self._last_latency = {}
+        
     def _initialize_data_sources(self) -> List[LegalDataSource]:
         """Initialize legal data sources"""
         return [
@@ -206,33 +334,84 @@ class RealTimeLegalDataService:
             timeout=aiohttp.ClientTimeout(total=30),
             connector=aiohttp.TCPConnector(limit=100)
         )
+        self.queue = asyncio.Queue()
+        self._stop_event = asyncio.Event()
         
-        # Start data collection tasks
-        tasks = []
+        # Spread first fetches over the startup window instead of firing all at once
         for source in self.data_sources:
             if source.enabled:
-                task = asyncio.create_task(self._data_collection_loop(source))
-                tasks.append(task)
+                self.wheel.schedule(source.name, random.uniform(0, min(self.startup_spread, source.update_frequency)))
+        
+        # One scheduler plus a fixed pool of fetch workers
+        tasks = [asyncio.create_task(self._scheduler_loop())]
+        tasks.extend(asyncio.create_task(self._worker_loop()) for _ in range(self.workers))
         
         # Run all tasks concurrently
         await asyncio.gather(*tasks, return_exceptions=True)
     
-    async def _data_collection_loop(self, source: LegalDataSource):
-        """Main data collection loop for a source"""
-        while True:
+    def stop(self):
+        """Ask the scheduler and workers to exit"""
+        if self._stop_event is not None:
+            self._stop_event.set()
+    
+    def _next_delay(self, source: LegalDataSource, success: bool) -> float:
+        """Jittered update interval, or backoff after failures (never sooner than the interval)"""
+        if success:
+            self._failures[source.name] = 0
+            delay = source.update_frequency
+        else:
+            failures = self._failures.get(source.name, 0) + 1
+            self._failures[source.name] = failures
+            backoff = min(self.max_backoff, self.base_backoff * (2 ** (failures - 1)))
+            delay = max(source.update_frequency, backoff)
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+    
+    async def _scheduler_loop(self):
+        """Advance the timer wheel and enqueue due sources"""
+        while not self._stop_event.is_set():
+            for name in self.wheel.advance():
+                source = self._sources_by_name.get(name)
+                if source is None or not source.enabled:
+                    continue
+                if self._in_flight.get(name, 0) >= source.max_concurrency:
+                    # Still running from the previous round: try again next tick
+                    self.wheel.schedule(name, self.wheel.tick)
+                    continue
+                self._in_flight[name] = self._in_flight.get(name, 0) + 1
+                self.queue.put_nowait((source, time.monotonic()))
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), timeout=self.wheel.tick)
+            except asyncio.TimeoutError:
+                pass
+    
+    async def _worker_loop(self):
+        """Fetch queued sources and reschedule them on the wheel"""
+        while not self._stop_event.is_set():
             try:
-                await self._collect_data_from_source(source)
-                await asyncio.sleep(source.update_frequency)
+                source, enqueued_at = await asyncio.wait_for(self.queue.get(), timeout=1.0)
+            except asyncio.TimeoutError:
+                continue
+            
+            success = False
+            try:
+                success = await self._collect_data_from_source(source)
             except asyncio.CancelledError:
-                break
+                raise
             except Exception as e:
                 logger.error(f"Error collecting data from {source.name}: {e}")
-                await asyncio.sleep(60)  # Wait before retrying
+            finally:
+                self._in_flight[source.name] -= 1
+                latency = time.monotonic() - enqueued_at
+                self._latencies.append(latency)
+                self._last_latency[source.name] = latency
+                self.queue.task_done()
+            
+            self.wheel.schedule(source.name, self._next_delay(source, success))
     
-    async def _collect_data_from_source(self, source: LegalDataSource):
-        """Collect data from a specific source"""
+    async def _collect_data_from_source(self, source: LegalDataSource) -> bool:
+        """Collect data from a specific source; returns False when it should back off"""
         try:
-            headers = source.headers or {}
+            headers = dict(source.headers or {})
             if source.api_key:
                 headers['Authorization'] = f'Bearer {source.api_key}'
             
@@ -241,16 +420,20 @@ class RealTimeLegalDataService:
                     data = await self._parse_response(response, source.data_type)
                     processed_data = self._process_legal_data(data, source.name)
                     
-                    # Cache the data
-                    self.data_cache[source.name] = processed_data
+                    # Cache only the processed insights; raw payloads are dropped
+                    processed_data.pop('data', None)
+                    self.data_cache.set(source.name, processed_data, ttl=source.update_frequency * 2)
                     self.last_updates[source.name] = datetime.now()
                     
                     logger.info(f"Successfully updated data from {source.name}")
+                    return True
                 else:
                     logger.warning(f"Failed to fetch data from {source.name}: {response.status}")
+                    return False
         
         except Exception as e:
             logger.error(f"Error fetching data from {source.name}: {e}")
+            return False
     
     async def _parse_response(self, response, data_type: str) -> Any:
         """Parse response based on data type"""
@@ -335,7 +518,7 @@ class RealTimeLegalDataService:
         """Get real-time data from cache"""
         if source_name:
             return self.data_cache.get(source_name, {})
-        return self.data_cache
+        return dict(self.data_cache.items())
     
     def get_aggregated_insights(self) -> List[Dict[str, Any]]:
         """Get aggregated insights from all sources"""
@@ -344,8 +527,7 @@ class RealTimeLegalDataService:
         for source_name, cached_data in self.data_cache.items():
             if 'processed_insights' in cached_data:
                 for insight in cached_data['processed_insights']:
-                    insight['source'] = source_name
-                    all_insights.append(insight)
+                    all_insights.append({**insight, 'source': source_name})
         
         # Sort by impact level
         impact_priority = {'high': 3, 'medium': 2, 'low': 1}
@@ -357,6 +539,10 @@ class RealTimeLegalDataService:
         """Get service status"""
         active_sources = len([s for s in self.data_sources if s.enabled])
         connected_sources = len(self.last_updates)
+        latencies = sorted(self._latencies)
+        
+        def percentile(p):
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 3) if latencies else None
         
         return {
             'service_status': 'operational',
@@ -364,11 +550,22 @@ class RealTimeLegalDataService:
             'active_sources': active_sources,
             'connected_sources': connected_sources,
             'last_update': max(self.last_updates.values()).isoformat() if self.last_updates else None,
+            'scheduler': {
+                'queue_depth': self.queue.qsize() if self.queue is not None else 0,
+                'scheduled': len(self.wheel),
+                'in_flight': sum(self._in_flight.values()),
+                'backing_off': len([n for n, f in self._failures.items() if f]),
+                'fetch_latency_p50': percentile(0.5),
+                'fetch_latency_p95': percentile(0.95)
+            },
+            'cache': self.data_cache.stats(),
             'sources': {
                 name: {
                     'enabled': any(s.name == name for s in self.data_sources if s.enabled),
                     'last_update': update.isoformat() if update else None,
-                    'status': 'connected' if name in self.data_cache else 'disconnected'
+                    'status': 'connected' if name in self.data_cache else 'disconnected',
+                    'consecutive_failures': self._failures.get(name, 0),
+                    'last_fetch_latency': round(self._last_latency[name], 3) if name in self._last_latency else None
                 }
                 for name, update in self.last_updates.items()
             }
@@ -376,6 +573,7 @@ class RealTimeLegalDataService:
     
     async def close(self):
         """Close the service and cleanup resources"""
+        self.stop()
         if self.session:
             await self.session.close()
         logger.info("Real-Time Legal Data Service stopped")
@@ -0,0 +1,198 @@
+"""
+Shared, bounded login throttling
+
+Attempts are counted with a sliding-window counter: one integer for the
+current fixed window and one for the previous, weighted by how much of the
+previous window still overlaps. That is constant memory per key, however
+many attempts an attacker makes, and it expires on its own.
+
+- InMemoryThrottleStore: per process, at most LOGIN_THROTTLE_MAX_KEYS keys
+  (least recently used keys are evicted first).
+- RedisThrottleStore: INCR + EXPIRE, shared by every worker; falls back to
+  an in-memory store while Redis is unreachable.
+
+get_throttle_store() picks Redis when LOGIN_THROTTLE_REDIS_URL (or
+REDIS_URL) is set. The per-user failed_login_attempts column is kept with
+single UPDATE statements (record_failed_login / reset_failed_logins)
+rather than a SELECT followed by a write. A failure more than
+LOCKOUT_MINUTES after the previous one starts the count over, so an
+account whose lockout lapsed is not locked again by one wrong password.
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import case, func, update
+
+try:
+    import redis  # type: ignore
+    REDIS_AVAILABLE = True
+except ImportError:  # pragma: no cover - redis is optional
+    redis = None  # type: ignore
+    REDIS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+LOGIN_THROTTLE_WINDOW = int(os.getenv('LOGIN_THROTTLE_WINDOW', '300'))
+LOGIN_THROTTLE_MAX_ATTEMPTS = int(os.getenv('LOGIN_THROTTLE_MAX_ATTEMPTS', '5'))
+LOGIN_THROTTLE_MAX_KEYS = int(os.getenv('LOGIN_THROTTLE_MAX_KEYS', '100000'))
+LOGIN_THROTTLE_REDIS_URL = os.getenv('LOGIN_THROTTLE_REDIS_URL', os.getenv('REDIS_URL'))
+# How long an account stays locked after its last failed attempt
+LOCKOUT_MINUTES = 30
+REDIS_KEY_PREFIX = 'lait:throttle'
+# After a failed Redis call, count locally for this long before retrying
+REDIS_RETRY_SECONDS = 30
+
+
+def _weighted(previous: int, current: int, now: float, window: int) -> float:
+    """Sliding-window estimate from two fixed-window counts"""
+    overlap = 1.0 - (now % window) / window
+    return previous * overlap + current
+
+
+class InMemoryThrottleStore:
+    """Fixed-memory sliding-window counters for one process"""
+
+    def __init__(self, max_keys: int = LOGIN_THROTTLE_MAX_KEYS):
+        self.max_keys = max_keys
+        # key -> [window index, current count, previous count]
+        self._counters: 'OrderedDict[str, list]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _slot(self, key: str, window: int, now: float, create: bool):
+        index = int(now // window)
+        slot = self._counters.get(key)
+        if slot is None:
+            if not create:
+                return None
+            slot = self._counters[key] = [index, 0, 0]
+            while len(self._counters) > self.max_keys:
+                self._counters.popitem(last=False)
+        else:
+            self._counters.move_to_end(key)
+        if slot[0] != index:
+            # Roll forward: the old current window becomes "previous" only if adjacent
+            slot[2] = slot[1] if slot[0] == index - 1 else 0
+            slot[1] = 0
+            slot[0] = index
+        return slot
+
+    def hit(self, key: str, window: int = LOGIN_THROTTLE_WINDOW) -> float:
+        now = time.time()
+        with self._lock:
+            slot = self._slot(key, window, now, create=True)
+            slot[1] += 1
+            return _weighted(slot[2], slot[1], now, window)
+
+    def count(self, key: str, window: int = LOGIN_THROTTLE_WINDOW) -> float:
+        now = time.time()
+        with self._lock:
+            slot = self._slot(key, window, now, create=False)
+            return _weighted(slot[2], slot[1], now, window) if slot else 0.0
+
+    def __len__(self):
+        return len(self._counters)
+
+
+class RedisThrottleStore:
+    """Sliding-window counters in Redis, shared across workers and hosts"""
+
+    def __init__(self, client, prefix: str = REDIS_KEY_PREFIX, fallback: Optional[InMemoryThrottleStore] = None):
+        self.client = client
+        self.prefix = prefix
+        self.fallback = fallback or InMemoryThrottleStore()
+        self._retry_at = 0.0
+
+    def _keys(self, key: str, window: int, now: float):
+        index = int(now // window)
+        return f"{self.prefix}:{window}:{key}:{index}", f"{self.prefix}:{window}:{key}:{index - 1}"
+
+    def _available(self) -> bool:
+        return time.monotonic() >= self._retry_at
+
+    def _failed(self, e: Exception):
+        self._retry_at = time.monotonic() + REDIS_RETRY_SECONDS
+        logger.warning(f"Login throttle store unavailable, counting in-process: {str(e)}")
+
+    def hit(self, key: str, window: int = LOGIN_THROTTLE_WINDOW) -> float:
+        if not self._available():
+            return self.fallback.hit(key, window)
+        now = time.time()
+        current, previous = self._keys(key, window, now)
+        try:
+            pipe = self.client.pipeline()
+            pipe.incr(current)
+            pipe.expire(current, window * 2)
+            pipe.get(previous)
+            count, _, prior = pipe.execute()
+        except Exception as e:
+            self._failed(e)
+            return self.fallback.hit(key, window)
+        return _weighted(int(prior or 0), int(count), now, window)
+
+    def count(self, key: str, window: int = LOGIN_THROTTLE_WINDOW) -> float:
+        if not self._available():
+            return self.fallback.count(key, window)
+        now = time.time()
+        try:
+            current, prior = self.client.mget(self._keys(key, window, now))
+        except Exception as e:
+            self._failed(e)
+            return self.fallback.count(key, window)
+        return _weighted(int(prior or 0), int(current or 0), now, window)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_throttle_store():
+    """Process-wide throttle store: Redis when configured, else in-process"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                store = InMemoryThrottleStore()
+                if LOGIN_THROTTLE_REDIS_URL and REDIS_AVAILABLE:
+                    client = redis.Redis.from_url(LOGIN_THROTTLE_REDIS_URL, socket_timeout=0.2,
+                                                  socket_connect_timeout=0.2)
+                    store = RedisThrottleStore(client, fallback=store)
+                _store = store
+    return _store
+
+
+def record_failed_login(session, user_model, email: str) -> int:
+    """
+    Bump failed_login_attempts in one UPDATE; returns the number of rows matched
+
+    The count restarts at 1 when the previous failure is older than
+    LOCKOUT_MINUTES, i.e. once any lockout it caused has lapsed.
+    """
+    now = datetime.utcnow()
+    lapsed = user_model.last_failed_login < now - timedelta(minutes=LOCKOUT_MINUTES)
+    attempts = case(
+        (user_model.last_failed_login.is_(None) | lapsed, 1),
+        else_=func.coalesce(user_model.failed_login_attempts, 0) + 1
+    )
+    result = session.execute(
+        update(user_model)
+        .where(user_model.email == email.lower())
+        .values(failed_login_attempts=attempts, last_failed_login=now)
+    )
+    session.commit()
+    return result.rowcount
+
+
+def reset_failed_logins(session, user_model, email: str) -> int:
+    """Clear failed_login_attempts in one UPDATE (no-op write skipped)"""
+    result = session.execute(
+        update(user_model)
+        .where(user_model.email == email.lower(), user_model.failed_login_attempts > 0)
+        .values(failed_login_attempts=0)
+    )
+    session.commit()
+    return result.rowcount
@@ -22,9 +22,12 @@ import pickle
 import logging
 import pandas as pd
 import numpy as np
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, List, Optional, Tuple
 from pathlib import Path
 
+from ml.compiled_forest import fast_model
+from services.settings_store import DEFAULT_SETTINGS, get_setting
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
@@ -121,7 +124,7 @@ class MLService:
             # Anomaly detection
             if self.models.get('anomaly'):
                 try:
-                    anomaly_scores = self.models['anomaly'].decision_function(features)
+                    anomaly_scores = fast_model(self.models['anomaly']).decision_function(features)
                     # Convert to 0-1 scale (lower scores = more anomalous)
                     result_df['anomaly_score'] = 1 / (1 + np.exp(-anomaly_scores))
                 except Exception as e:
@@ -133,7 +136,7 @@ class MLService:
             # Overspend prediction  
             if self.models.get('overspend'):
                 try:
-                    overspend_probs = self.models['overspend'].predict_proba(features)
+                    overspend_probs = fast_model(self.models['overspend']).predict_proba(features)
                     # Get probability of positive class (overspend)
                     result_df['is_flagged'] = overspend_probs[:, 1] > 0.5
                 except Exception as e:
@@ -336,6 +339,103 @@ except ImportError as e:
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Used when the admin settings have no anomaly_threshold
+DEFAULT_FLAG_THRESHOLD = DEFAULT_SETTINGS['anomaly_threshold']
+
+def prepare_features(df):
+    """Prepare features for ML models from invoice line DataFrame"""
+    if not ML_DEPS_AVAILABLE:
+        return df
+        
+    try:
+        # Create a copy to avoid modifying original
+        features_df = df.copy()
+        
+        # Basic numeric features
+        features_df['amount'] = pd.to_numeric(features_df.get('amount', 0), errors='coerce').fillna(0)
+        features_df['billable_hours'] = pd.to_numeric(features_df.get('billable_hours', 0), errors='coerce').fillna(0)
+        features_df['rate'] = pd.to_numeric(features_df.get('rate', 0), errors='coerce').fillna(0)
+        
+        # Derived features
+        features_df['amount_log'] = np.log1p(features_df['amount'])
+        features_df['rate_log'] = np.log1p(features_df['rate'])
+        features_df['hours_log'] = np.log1p(features_df['billable_hours'])
+        
+        # Description length feature
+        features_df['description_length'] = features_df.get('description', '').astype(str).str.len()
+        
+        # Rate bands (categorical to numeric)
+        features_df['rate_band'] = pd.cut(
+            features_df['rate'], 
+            bins=[0, 150, 250, 350, 500, float('inf')], 
+            labels=[1, 2, 3, 4, 5]
+        ).astype(float).fillna(1)
+        
+        # Amount bands
+        features_df['amount_band'] = pd.cut(
+            features_df['amount'], 
+            bins=[0, 1000, 5000, 10000, float('inf')], 
+            labels=[1, 2, 3, 4]
+        ).astype(float).fillna(1)
+        
+        # Hours efficiency (amount per hour)
+        features_df['efficiency'] = np.where(
+            features_df['billable_hours'] > 0,
+            features_df['amount'] / features_df['billable_hours'],
+            features_df['amount']
+        )
+        features_df['efficiency_log'] = np.log1p(features_df['efficiency'])
+        
+        # Select features for ML models (adjust based on your model training)
+        ml_features = [
+            'amount', 'billable_hours', 'rate',
+            'amount_log', 'rate_log', 'hours_log',
+            'description_length', 'rate_band', 'amount_band',
+            'efficiency', 'efficiency_log'
+        ]
+        
+        # Return only the ML features
+        return features_df[ml_features].fillna(0)
+        
+    except Exception as e:
+        logger.error(f"Error preparing features: {e}")
+        # Return minimal features on error
+        return pd.DataFrame({
+            'amount': df.get('amount', [0] * len(df)),
+            'rate': df.get('rate', [0] * len(df))
+        })
+
+
+def score_with_models(iso_forest_model, overspend_model, features,
+                      flag_threshold: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Combined anomaly/overspend scores for prepared features, as arrays
+
+    Shared by MLService, shadow scoring and the offline replay so every
+    model version is scored with exactly the same formula. The flag
+    threshold defaults to the admin 'anomaly_threshold' setting.
+    """
+    if flag_threshold is None:
+        flag_threshold = get_setting('anomaly_threshold', DEFAULT_FLAG_THRESHOLD)
+    # Compiled node arrays: same scores as sklearn, without per-tree overhead
+    anomaly_scores = fast_model(iso_forest_model).decision_function(features)
+    # Probability of positive class
+    overspend_probs = fast_model(overspend_model).predict_proba(features)[:, 1]
+    
+    # Normalize anomaly score to 0-1 range (Isolation Forest gives negative values for anomalies)
+    normalized_anomaly = np.clip((anomaly_scores + 0.5) * -1, 0, 1)  # Invert and normalize
+    
+    # Combined risk score; flag if high risk
+    combined_score = (normalized_anomaly * 0.6) + (overspend_probs * 0.4)
+    return {
+        'anomaly_score': anomaly_scores,
+        'overspend_prob': overspend_probs,
+        'normalized_anomaly': normalized_anomaly,
+        'combined_score': combined_score,
+        'is_flagged': combined_score > flag_threshold
+    }
+
+
 class MLService:
     """ML Service for invoice line scoring and anomaly detection"""
     
@@ -345,6 +445,7 @@ class MLService:
         self.overspend_model = None
         self.models_loaded = False
         self.fallback_mode = True
+        self.shadow = None
         
         # Check if ML dependencies are available
         if not ML_DEPS_AVAILABLE:
@@ -353,6 +454,47 @@ class MLService:
         
         # Load models on initialization
         self._load_models()
+        
+        # Candidate versions configured for shadow scoring
+        anomaly_version = os.getenv('ML_SHADOW_ANOMALY_VERSION')
+        overspend_version = os.getenv('ML_SHADOW_OVERSPEND_VERSION')
+        if anomaly_version or overspend_version:
+            self.enable_shadow(anomaly_version or 'current', overspend_version or 'current')
+    
+    def enable_shadow(self, anomaly_version: str = 'current', overspend_version: str = 'current',
+                      model_manager=None, sample_rate: Optional[float] = None) -> bool:
+        """Shadow-score uploads with candidate model versions from the registry"""
+        from services.shadow_scoring import (SHADOW_SAMPLE_RATE, ModelPair, ShadowScorer,
+                                             load_model_pair)
+        
+        try:
+            if model_manager is None:
+                from ml.model_manager import ModelManager
+                model_manager = ModelManager(os.getenv('ML_MODEL_REGISTRY_DIR', os.getenv('MODEL_DIR', 'models')))
+            candidate = load_model_pair(anomaly_version, overspend_version, model_manager, self.models_dir)
+        except Exception as e:
+            logger.error(f"Could not load shadow models: {e}")
+            return False
+        
+        baseline = None
+        if self.models_loaded and not self.fallback_mode:
+            baseline = ModelPair(self.iso_forest_model, self.overspend_model, label='production')
+        
+        self.disable_shadow()
+        sample_rate = SHADOW_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.shadow = ShadowScorer(candidate, sample_rate, baseline=baseline)
+        logger.info(f"👥 Shadow scoring enabled with {candidate.label}")
+        return True
+    
+    def disable_shadow(self):
+        """Stop shadow scoring; the comparison collected so far is discarded"""
+        shadow, self.shadow = self.shadow, None
+        if shadow is not None:
+            shadow.close()
+    
+    def shadow_report(self) -> Optional[Dict[str, Any]]:
+        """Production vs candidate comparison, or None when shadow scoring is off"""
+        return self.shadow.report() if self.shadow is not None else None
     
     def _load_models(self):
         """Load ML models from disk if available"""
@@ -387,66 +529,7 @@ class MLService:
     
     def _prepare_features(self, df):
         """Prepare features for ML models from invoice line DataFrame"""
-        if not ML_DEPS_AVAILABLE:
-            return df
-            
-        try:
-            # Create a copy to avoid modifying original
-            features_df = df.copy()
-            
-            # Basic numeric features
-            features_df['amount'] = pd.to_numeric(features_df.get('amount', 0), errors='coerce').fillna(0)
-            features_df['billable_hours'] = pd.to_numeric(features_df.get('billable_hours', 0), errors='coerce').fillna(0)
-            features_df['rate'] = pd.to_numeric(features_df.get('rate', 0), errors='coerce').fillna(0)
-            
-            # Derived features
-            features_df['amount_log'] = np.log1p(features_df['amount'])
-            features_df['rate_log'] = np.log1p(features_df['rate'])
-            features_df['hours_log'] = np.log1p(features_df['billable_hours'])
-            
-            # Description length feature
-            features_df['description_length'] = features_df.get('description', '').astype(str).str.len()
-            
-            # Rate bands (categorical to numeric)
-            features_df['rate_band'] = pd.cut(
-                features_df['rate'], 
-                bins=[0, 150, 250, 350, 500, float('inf')], 
-                labels=[1, 2, 3, 4, 5]
-            ).astype(float).fillna(1)
-            
-            # Amount bands
-            features_df['amount_band'] = pd.cut(
-                features_df['amount'], 
-                bins=[0, 1000, 5000, 10000, float('inf')], 
-                labels=[1, 2, 3, 4]
-            ).astype(float).fillna(1)
-            
-            # Hours efficiency (amount per hour)
-            features_df['efficiency'] = np.where(
-                features_df['billable_hours'] > 0,
-                features_df['amount'] / features_df['billable_hours'],
-                features_df['amount']
-            )
-            features_df['efficiency_log'] = np.log1p(features_df['efficiency'])
-            
-            # Select features for ML models (adjust based on your model training)
-            ml_features = [
-                'amount', 'billable_hours', 'rate',
-                'amount_log', 'rate_log', 'hours_log',
-                'description_length', 'rate_band', 'amount_band',
-                'efficiency', 'efficiency_log'
-            ]
-            
-            # Return only the ML features
-            return features_df[ml_features].fillna(0)
-            
-        except Exception as e:
-            logger.error(f"Error preparing features: {e}")
-            # Return minimal features on error
-            return pd.DataFrame({
-                'amount': df.get('amount', [0] * len(df)),
-                'rate': df.get('rate', [0] * len(df))
-            })
+        return prepare_features(df)
     
     def _ml_score_lines(self, df) -> List[Tuple[float, bool, str]]:
         """Score lines using ML models"""
@@ -456,26 +539,14 @@ class MLService:
             # Prepare features
             features = self._prepare_features(df)
             
-            # Get anomaly scores from Isolation Forest
-            anomaly_scores = self.iso_forest_model.decision_function(features)
-            
-            # Get overspend predictions 
-            overspend_probs = self.overspend_model.predict_proba(features)[:, 1]  # Probability of positive class
+            scored = score_with_models(self.iso_forest_model, self.overspend_model, features)
             
             results = []
             for i in range(len(df)):
-                # Combine anomaly and overspend scores
-                anomaly_score = float(anomaly_scores[i])
-                overspend_prob = float(overspend_probs[i])
-                
-                # Normalize anomaly score to 0-1 range (Isolation Forest gives negative values for anomalies)
-                normalized_anomaly = max(0, min(1, (anomaly_score + 0.5) * -1))  # Invert and normalize
-                
-                # Combined risk score
-                combined_score = (normalized_anomaly * 0.6) + (overspend_prob * 0.4)
-                
-                # Flag if high risk
-                is_flagged = combined_score > 0.7  # Threshold can be tuned
+                overspend_prob = float(scored['overspend_prob'][i])
+                normalized_anomaly = float(scored['normalized_anomaly'][i])
+                combined_score = float(scored['combined_score'][i])
+                is_flagged = bool(scored['is_flagged'][i])
                 
                 # Generate reason
                 if is_flagged:
@@ -636,6 +707,10 @@ class MLService:
             result_df['anomaly_score'] = anomaly_scores
             result_df['is_flagged'] = is_flagged_list
             
+            if self.shadow is not None:
+                # Candidate scoring happens on the shadow thread, never on this request
+                self.shadow.submit(df.copy(), anomaly_scores, is_flagged_list)
+            
             # Return only required columns
             return result_df[['description', 'hours', 'rate', 'line_total', 'anomaly_score', 'is_flagged']]
             
@@ -683,7 +758,8 @@ class MLService:
             "iso_forest_available": self.iso_forest_model is not None,
             "overspend_available": self.overspend_model is not None,
             "models_dir": str(self.models_dir),
-            "models_dir_exists": self.models_dir.exists()
+            "models_dir_exists": self.models_dir.exists(),
+            "shadow": self.shadow.stats() if self.shadow is not None else None
         }
 
 
@@ -718,10 +794,16 @@ def get_model_status() -> Dict[str, Any]:
     service = get_ml_service()
     return service.get_model_status()
 
+def get_shadow_report() -> Optional[Dict[str, Any]]:
+    """Production vs shadow candidate comparison, if shadow scoring is enabled"""
+    return get_ml_service().shadow_report()
+
 def reload_models() -> bool:
     """Reload ML models from disk"""
     global _ml_service
     try:
+        if _ml_service is not None:
+            _ml_service.disable_shadow()
         _ml_service = MLService()
         return _ml_service.models_loaded
     except Exception as e:
@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import datetime, timezone
 import json
 from flask_socketio import SocketIO
 from db.database import get_db_session
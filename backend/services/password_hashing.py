@@ -0,0 +1,188 @@
+"""
+Password hashing on a bounded, dedicated executor
+
+bcrypt/scrypt are deliberately slow. Run inline, a burst of logins
+occupies every gthread worker thread and starves invoice requests.
+Hashing and verification instead run on a small per-process thread pool
+(the hash functions release the GIL). At most PASSWORD_HASH_WORKERS hashes
+run at once, and at most PASSWORD_HASH_QUEUE_LIMIT more wait. Beyond that,
+PasswordHasherBusy is raised straight away, and routes answer 503 with
+Retry-After instead of queueing without bound.
+
+Work factors are configurable: BCRYPT_ROUNDS for bcrypt hashes and
+PASSWORD_HASH_METHOD for werkzeug hashes (e.g. 'scrypt:32768:8:1' or
+'pbkdf2:sha256:600000'). verify() returns a replacement hash when the
+stored one was made with a different cost, so callers can rehash on login.
+
+    ok, new_hash = get_password_hasher().verify(user.password_hash, password)
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Dict, Optional, Tuple
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+try:
+    import bcrypt  # type: ignore
+    BCRYPT_AVAILABLE = True
+except ImportError:
+    bcrypt = None  # type: ignore
+    BCRYPT_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', '2'))
+PASSWORD_HASH_QUEUE_LIMIT = int(os.getenv('PASSWORD_HASH_QUEUE_LIMIT', '16'))
+PASSWORD_HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', '10'))
+# None keeps werkzeug's default method and cost
+PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD') or None
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', '12'))
+RETRY_AFTER_SECONDS = 1
+
+
+class PasswordHasherBusy(Exception):
+    """Too many password hashes already running or queued"""
+
+    def __init__(self, retry_after: int = RETRY_AFTER_SECONDS):
+        super().__init__('Password hashing is saturated, retry shortly')
+        self.retry_after = retry_after
+
+
+def _is_bcrypt(stored_hash: str) -> bool:
+    return stored_hash.startswith(('$2a$', '$2b$', '$2y$'))
+
+
+class PasswordHasher:
+    """Hash/verify passwords on a bounded thread pool with configurable cost"""
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, queue_limit: int = PASSWORD_HASH_QUEUE_LIMIT,
+                 method: Optional[str] = PASSWORD_HASH_METHOD, bcrypt_rounds: int = BCRYPT_ROUNDS,
+                 timeout: float = PASSWORD_HASH_TIMEOUT):
+        self.workers = workers
+        self.method = method
+        self.bcrypt_rounds = bcrypt_rounds
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(workers + queue_limit)
+        self._executor = None
+        self._lock = threading.Lock()
+        self._method_prefix = None
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise PasswordHasherBusy()
+        try:
+            if self._executor is None:
+                with self._lock:
+                    if self._executor is None:
+                        self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                            thread_name_prefix='password-hash')
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            result = future.result(timeout=self.timeout)
+        except FutureTimeout:
+            self.rejected += 1
+            raise PasswordHasherBusy()
+        self.completed += 1
+        return result
+
+    # The _*_sync methods run on the executor threads
+
+    def _hash_sync(self, password: str, scheme: str) -> str:
+        if scheme == 'bcrypt':
+            if not BCRYPT_AVAILABLE:
+                raise RuntimeError('bcrypt is not installed')
+            return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(self.bcrypt_rounds)).decode('utf-8')
+        if self.method:
+            return generate_password_hash(password, method=self.method)
+        return generate_password_hash(password)
+
+    def _werkzeug_prefix(self) -> str:
+        # werkzeug fills in default parameters, so learn the stored prefix from a real hash
+        if self._method_prefix is None:
+            self._method_prefix = self._hash_sync('', 'werkzeug').split('$', 1)[0]
+        return self._method_prefix
+
+    def needs_rehash(self, stored_hash: str) -> bool:
+        """Whether stored_hash was made with a different scheme cost than configured"""
+        if _is_bcrypt(stored_hash):
+            try:
+                return int(stored_hash.split('$')[2]) != self.bcrypt_rounds
+            except (IndexError, ValueError):
+                return False
+        return stored_hash.split('$', 1)[0] != self._werkzeug_prefix()
+
+    def _verify_sync(self, stored_hash: str, password: str) -> Tuple[bool, Optional[str]]:
+        if _is_bcrypt(stored_hash):
+            if not BCRYPT_AVAILABLE:
+                raise RuntimeError('bcrypt is not installed')
+            ok = bcrypt.checkpw(password.encode('utf-8'), stored_hash.encode('utf-8'))
+            scheme = 'bcrypt'
+        else:
+            ok = check_password_hash(stored_hash, password)
+            scheme = 'werkzeug'
+        if ok and self.needs_rehash(stored_hash):
+            # Same job, so a login never waits in the queue twice
+            return True, self._hash_sync(password, scheme)
+        return ok, None
+
+    def hash(self, password: str, scheme: str = 'werkzeug') -> str:
+        """New hash for password ('werkzeug' or 'bcrypt' scheme)"""
+        return self._run(self._hash_sync, password, scheme)
+
+    def verify(self, stored_hash: Optional[str], password: str) -> Tuple[bool, Optional[str]]:
+        """(password matches, replacement hash if the work factor changed)"""
+        if not stored_hash:
+            return False, None
+        ok, new_hash = self._run(self._verify_sync, stored_hash, password)
+        if new_hash:
+            self.rehashed += 1
+        return ok, new_hash
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'workers': self.workers,
+            'completed': self.completed,
+            'rejected': self.rejected,
+            'rehashed': self.rehashed,
+            'method': self.method or 'werkzeug default',
+            'bcrypt_rounds': self.bcrypt_rounds,
+        }
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+_hasher: Optional[PasswordHasher] = None
+_hasher_lock = threading.Lock()
+
+
+def get_password_hasher() -> PasswordHasher:
+    """Process-wide password hasher"""
+    global _hasher
+    if _hasher is None:
+        with _hasher_lock:
+            if _hasher is None:
+                _hasher = PasswordHasher()
+    return _hasher
+
+
+def busy_response(exc: PasswordHasherBusy, body: Optional[Dict[str, Any]] = None):
+    """503 + Retry-After for routes shedding login load"""
+    from flask import jsonify
+
+    response = jsonify(body or {'message': 'Too many login requests, please retry shortly'})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(exc.retry_after)
+    return response
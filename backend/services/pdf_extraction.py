@@ -0,0 +1,277 @@
+"""
+Shared PDF text/table extraction backend
+
+Every invoice and document parser goes through extract_pdf(). Text comes
+from PyMuPDF when it is installed (an order of magnitude faster than
+pdfplumber); pdfplumber is only opened for pages that carry ruling lines,
+which is what its default table finder needs anyway. Large documents are
+split into page ranges and extracted in parallel worker processes.
+
+Engines can also be forced (engine='pdfplumber', 'pymupdf', 'pypdf2') for
+benchmarking or when a caller needs identical behaviour to one library.
+"""
+
+import io
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+try:
+    import pymupdf as fitz
+    PYMUPDF_AVAILABLE = True
+except ImportError:
+    try:
+        import fitz  # PyMuPDF < 1.24
+        PYMUPDF_AVAILABLE = True
+    except ImportError:
+        PYMUPDF_AVAILABLE = False
+
+try:
+    import pdfplumber
+    PDFPLUMBER_AVAILABLE = True
+except ImportError:
+    PDFPLUMBER_AVAILABLE = False
+
+try:
+    import PyPDF2
+    PYPDF2_AVAILABLE = True
+except ImportError:
+    PYPDF2_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+PARALLEL_MIN_PAGES = int(os.getenv('PDF_PARALLEL_MIN_PAGES', '16'))
+MAX_WORKERS = int(os.getenv('PDF_EXTRACT_WORKERS', str(min(4, os.cpu_count() or 1))))
+# Drawn line/rect segments on a page before we treat it as holding a ruled table
+TABLE_RULING_THRESHOLD = 4
+
+PdfSource = Union[str, bytes, io.IOBase]
+
+
+@dataclass
+class PageContent:
+    number: int
+    text: str = ''
+    tables: List[List[List[Any]]] = field(default_factory=list)
+
+
+@dataclass
+class ExtractionResult:
+    pages: List[PageContent]
+    metadata: Dict[str, Any]
+    engine: str
+
+    @property
+    def text(self) -> str:
+        return '\n'.join(page.text for page in self.pages if page.text)
+
+    @property
+    def tables(self) -> List[List[List[Any]]]:
+        return [table for page in self.pages for table in page.tables]
+
+    @property
+    def page_count(self) -> int:
+        return len(self.pages)
+
+
+def _normalize_metadata(raw: Optional[Dict[str, Any]], page_count: int) -> Dict[str, Any]:
+    """Map library-specific metadata keys ('/Title', 'Title', 'title') onto lowercase names"""
+    metadata = {'pages': page_count}
+    for key, value in (raw or {}).items():
+        name = str(key).lstrip('/').lower()
+        if name in ('title', 'author', 'creator', 'producer', 'subject') and value:
+            metadata[name] = str(value)
+    return metadata
+
+
+def _read_source(source: PdfSource) -> Union[str, bytes]:
+    """Paths stay paths; file objects are read once into bytes"""
+    if isinstance(source, (str, bytes)):
+        return source
+    if isinstance(source, os.PathLike):
+        return os.fspath(source)
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    return source.read()
+
+
+# ----------------------------------------------------------------------
+# Engines
+# ----------------------------------------------------------------------
+def _open_pymupdf(source: Union[str, bytes]):
+    if isinstance(source, bytes):
+        return fitz.open(stream=source, filetype='pdf')
+    return fitz.open(source)
+
+
+def _open_pdfplumber(source: Union[str, bytes], pages: Optional[List[int]] = None):
+    """Open with pdfplumber, loading only the given 0-based pages when provided"""
+    return pdfplumber.open(
+        io.BytesIO(source) if isinstance(source, bytes) else source,
+        pages=[number + 1 for number in pages] if pages is not None else None
+    )
+
+
+def _page_has_rulings(page) -> bool:
+    """True when a PyMuPDF page draws enough lines/rectangles to form a ruled table"""
+    segments = 0
+    for path in page.get_drawings():
+        for item in path.get('items', ()):
+            if item[0] in ('l', 're'):
+                segments += 1
+                if segments >= TABLE_RULING_THRESHOLD:
+                    return True
+    return False
+
+
+def _extract_range_hybrid(source: Union[str, bytes], start: int, stop: int, tables: str) -> List[PageContent]:
+    """PyMuPDF text for [start, stop); pdfplumber tables only where needed"""
+    pages = []
+    table_pages = []
+    doc = _open_pymupdf(source)
+    try:
+        for number in range(start, stop):
+            page = doc[number]
+            pages.append(PageContent(number=number, text=page.get_text().strip()))
+            if tables == 'all' or (tables == 'auto' and _page_has_rulings(page)):
+                table_pages.append(number)
+    finally:
+        doc.close()
+
+    if table_pages and PDFPLUMBER_AVAILABLE:
+        by_number = {page.number: page for page in pages}
+        with _open_pdfplumber(source, pages=table_pages) as pdf:
+            for number, plumber_page in zip(table_pages, pdf.pages):
+                by_number[number].tables = plumber_page.extract_tables() or []
+    return pages
+
+
+def _extract_range_pdfplumber(source: Union[str, bytes], start: int, stop: int, tables: str) -> List[PageContent]:
+    pages = []
+    with _open_pdfplumber(source, pages=list(range(start, stop))) as pdf:
+        for number, page in zip(range(start, stop), pdf.pages):
+            pages.append(PageContent(
+                number=number,
+                text=(page.extract_text() or '').strip(),
+                tables=(page.extract_tables() or []) if tables != 'none' else []
+            ))
+    return pages
+
+
+def _extract_range_pypdf2(source: Union[str, bytes], start: int, stop: int, tables: str) -> List[PageContent]:
+    stream = io.BytesIO(source) if isinstance(source, bytes) else open(source, 'rb')
+    try:
+        reader = PyPDF2.PdfReader(stream)
+        return [
+            PageContent(number=number, text=(reader.pages[number].extract_text() or '').strip())
+            for number in range(start, stop)
+        ]
+    finally:
+        stream.close()
+
+
+_RANGE_EXTRACTORS = {
+    'pymupdf': _extract_range_hybrid,
+    'pdfplumber': _extract_range_pdfplumber,
+    'pypdf2': _extract_range_pypdf2,
+}
+
+
+def _engine_available(engine: str) -> bool:
+    return {
+        'pymupdf': PYMUPDF_AVAILABLE,
+        'pdfplumber': PDFPLUMBER_AVAILABLE,
+        'pypdf2': PYPDF2_AVAILABLE,
+    }.get(engine, False)
+
+
+def available_engines() -> List[str]:
+    """Engines usable in this environment, fastest first"""
+    return [engine for engine in ('pymupdf', 'pdfplumber', 'pypdf2') if _engine_available(engine)]
+
+
+def _page_count_and_metadata(source: Union[str, bytes], engine: str):
+    if engine == 'pymupdf':
+        doc = _open_pymupdf(source)
+        try:
+            return doc.page_count, doc.metadata
+        finally:
+            doc.close()
+    if engine == 'pdfplumber':
+        with _open_pdfplumber(source) as pdf:
+            return len(pdf.pages), pdf.metadata
+    stream = io.BytesIO(source) if isinstance(source, bytes) else open(source, 'rb')
+    try:
+        reader = PyPDF2.PdfReader(stream)
+        return len(reader.pages), dict(reader.metadata or {})
+    finally:
+        stream.close()
+
+
+def _page_ranges(page_count: int, workers: int) -> List[Tuple[int, int]]:
+    size = max(1, -(-page_count // workers))
+    return [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+
+def _run_engine(source: Union[str, bytes], engine: str, tables: str, max_workers: int) -> ExtractionResult:
+    page_count, raw_metadata = _page_count_and_metadata(source, engine)
+    extractor = _RANGE_EXTRACTORS[engine]
+
+    if max_workers > 1 and page_count >= PARALLEL_MIN_PAGES:
+        ranges = _page_ranges(page_count, max_workers)
+        with ProcessPoolExecutor(max_workers=len(ranges)) as executor:
+            futures = [executor.submit(extractor, source, start, stop, tables) for start, stop in ranges]
+            pages = [page for future in futures for page in future.result()]
+    else:
+        pages = extractor(source, 0, page_count, tables)
+
+    return ExtractionResult(pages=pages, metadata=_normalize_metadata(raw_metadata, page_count), engine=engine)
+
+
+def extract_pdf(source: PdfSource, tables: Union[bool, str] = 'auto', engine: Optional[str] = None,
+                max_workers: Optional[int] = None) -> ExtractionResult:
+    """
+    Extract per-page text (and optionally tables) from a PDF
+
+    Args:
+        source: file path, raw bytes or a binary file object
+        tables: False/'none' to skip tables, True/'auto' for pages with ruling
+            lines only, 'all' to run the table finder on every page
+        engine: force 'pymupdf', 'pdfplumber' or 'pypdf2'; by default the
+            fastest available engine is tried first, falling back on error
+        max_workers: worker processes for large documents (1 disables)
+    Returns:
+        ExtractionResult with pages, normalized metadata and the engine used
+    """
+    tables = {True: 'auto', False: 'none'}.get(tables, tables)
+    source = _read_source(source)
+    workers = MAX_WORKERS if max_workers is None else max_workers
+    if engine and not _engine_available(engine):
+        raise RuntimeError(f"PDF engine '{engine}' is not installed")
+    engines = [engine] if engine else available_engines()
+    if not engines:
+        raise RuntimeError("No PDF extraction library installed (PyMuPDF, pdfplumber or PyPDF2)")
+
+    fallback = None
+    last_error = None
+    for name in engines:
+        try:
+            result = _run_engine(source, name, tables, workers)
+        except Exception as e:
+            logger.warning(f"{name} extraction failed: {e}")
+            last_error = e
+            continue
+        if result.text:
+            return result
+        # No text layer (e.g. scanned pages): keep it, but let the next engine try
+        fallback = fallback or result
+    if fallback is not None:
+        return fallback
+    raise last_error
+
+
+def extract_pdf_text(source: PdfSource, engine: Optional[str] = None) -> str:
+    """Plain text of a PDF with no table extraction"""
+    return extract_pdf(source, tables=False, engine=engine).text
@@ -1,8 +1,9 @@
-import pdfplumber
 import re
 import logging
 from datetime import datetime
 
+from services.pdf_extraction import extract_pdf
+
 class PDFParserService:
     def __init__(self):
         self.patterns = {
@@ -16,26 +17,19 @@ class PDFParserService:
     def parse_invoice(self, pdf_file):
         """Parse an invoice PDF file and extract structured data."""
         try:
-            with pdfplumber.open(pdf_file) as pdf:
-                text = ""
-                line_items = []
-                
-                # Extract text from all pages
-                for page in pdf.pages:
-                    text += page.extract_text() + "\n"
-                    
-                    # Try to find tables on each page (for line items)
-                    tables = page.extract_tables()
-                    for table in tables:
-                        line_items.extend(self._process_table(table))
-                
-                # Extract invoice metadata using regex patterns
-                invoice_data = self._extract_metadata(text)
-                
-                # Add processed line items
-                invoice_data['line_items'] = line_items
-                
-                return invoice_data
+            # Text from all pages; tables (for line items) only from ruled pages
+            extraction = extract_pdf(pdf_file, tables=True)
+            line_items = []
+            for table in extraction.tables:
+                line_items.extend(self._process_table(table))
+            
+            # Extract invoice metadata using regex patterns
+            invoice_data = self._extract_metadata(extraction.text)
+            
+            # Add processed line items
+            invoice_data['line_items'] = line_items
+            
+            return invoice_data
                 
         except Exception as e:
             logging.error(f"Error parsing PDF: {str(e)}")
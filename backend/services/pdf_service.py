@@ -1,77 +1,69 @@
 """
 Enhanced PDF parsing service with PII redaction and comprehensive error handling
 """
-import pdfplumber
 import re
 from typing import Dict, List, Any, Tuple
 import logging
 from datetime import datetime
 import pandas as pd
-import spacy
 from services.s3_service import S3Service
 from services.audit_service import AuditLogger
+from services.pdf_extraction import extract_pdf
+from services.pii_redaction import get_pii_redactor
+from utils.nlp_resources import get_spacy_nlp
 
 logger = logging.getLogger(__name__)
 
 class PDFParser:
     def __init__(self):
-        # Load spaCy model for NER
-        try:
-            self.nlp = spacy.load("en_core_web_sm")
-        except OSError:
-            logger.warning("Downloading spaCy model...")
-            import subprocess
-            subprocess.run(["python", "-m", "spacy", "download", "en_core_web_sm"])
-            self.nlp = spacy.load("en_core_web_sm")
-        
         self.s3_service = S3Service()
+    
+    @property
+    def nlp(self):
+        """Shared spaCy pipeline for NER, loaded on first use (downloaded during warmup)"""
+        return get_spacy_nlp()
         
     def extract_invoice_data(self, file_path: str, original_filename: str) -> Dict[str, Any]:
         """
         Extract and process invoice data from PDF with error handling and PII redaction
         """
         try:
-            with pdfplumber.open(file_path) as pdf:
-                raw_text = ""
-                tables = []
-                
-                # Extract text and tables from all pages
-                for page in pdf.pages:
-                    raw_text += page.extract_text() + "\n"
-                    tables.extend(page.extract_tables())
-                
-                # Redact PII from text
-                redacted_text = self._redact_pii(raw_text)
-                
-                # Extract structured data
-                invoice_data = {
-                    'metadata': self._extract_metadata(pdf),
-                    'vendor_info': self._extract_vendor_info(redacted_text),
-                    'invoice_details': self._extract_invoice_details(redacted_text),
-                    'line_items': self._process_tables(tables),
-                }
-                
-                # Validate extracted data
-                self._validate_invoice_data(invoice_data)
-                
-                # Store original file in S3
-                s3_path = self.s3_service.upload_file(
-                    open(file_path, 'rb'),
-                    f"invoices/{datetime.now().strftime('%Y/%m/%d')}/{original_filename}",
-                    'application/pdf'
-                )
-                
-                invoice_data['file_location'] = s3_path
-                
-                # Log successful extraction
-                AuditLogger.log_event(
-                    'invoice_parse',
-                    {'filename': original_filename, 'status': 'success'},
-                    resource_type='invoice'
-                )
-                
-                return invoice_data
-                
+            # Text and tables for all pages (tables only where the page is ruled)
+            extraction = extract_pdf(file_path, tables=True)
+            raw_text = extraction.text
+            
+            # Redact PII from text
+            redacted_text = self._redact_pii(raw_text)
+            
+            # Extract structured data
+            invoice_data = {
+                'metadata': self._extract_metadata(extraction),
+                'vendor_info': self._extract_vendor_info(redacted_text),
+                'invoice_details': self._extract_invoice_details(redacted_text),
+                'line_items': self._process_tables(extraction.tables),
+            }
+            
+            # Validate extracted data
+            self._validate_invoice_data(invoice_data)
+            
+            # Store original file in S3
+            s3_path = self.s3_service.upload_file(
+                open(file_path, 'rb'),
+                f"invoices/{datetime.now().strftime('%Y/%m/%d')}/{original_filename}",
+                'application/pdf'
+            )
+            
+            invoice_data['file_location'] = s3_path
+            
+            # Log successful extraction
+            AuditLogger.log_event(
+                'invoice_parse',
+                {'filename': original_filename, 'status': 'success'},
+                resource_type='invoice'
+            )
+            
+            return invoice_data
+            
         except Exception as e:
             logger.error(f"Error processing PDF {original_filename}: {str(e)}")
             AuditLogger.log_event(
@@ -82,51 +74,19 @@ class PDFParser:
             )
             raise
     
-    def _redact_pii(self, text: str) -> str:
+    def _redact_pii(self, text: str, mode: str = None) -> str:
         """
-        Redact PII from text using spaCy NER
+        Redact PII from text (combined regex pass plus batched spaCy NER)
+
+        mode='regex' skips NER; by default PII_REDACTION_MODE decides.
         """
-        doc = self.nlp(text)
-        redacted_text = text
-        
-        # Collect all entities to redact
-        entities_to_redact = []
-        for ent in doc.ents:
-            if ent.label_ in ['PERSON', 'EMAIL', 'PHONE', 'SSN']:
-                entities_to_redact.append((ent.start_char, ent.end_char))
-        
-        # Additional pattern matching for sensitive data
-        patterns = {
-            'email': r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
-            'phone': r'\b\d{3}[-.]?\d{3}[-.]?\d{4}\b',
-            'ssn': r'\b\d{3}-\d{2}-\d{4}\b',
-            'credit_card': r'\b\d{4}[- ]?\d{4}[- ]?\d{4}[- ]?\d{4}\b'
-        }
-        
-        for pattern_type, pattern in patterns.items():
-            for match in re.finditer(pattern, text):
-                entities_to_redact.append(match.span())
-        
-        # Sort and merge overlapping ranges
-        entities_to_redact.sort(key=lambda x: x[0])
-        merged = []
-        for start, end in entities_to_redact:
-            if not merged or merged[-1][1] < start:
-                merged.append((start, end))
-            else:
-                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
-        
-        # Redact text from end to start to preserve indices
-        for start, end in reversed(merged):
-            redacted_text = redacted_text[:start] + '[REDACTED]' + redacted_text[end:]
-        
-        return redacted_text
+        return get_pii_redactor().redact(text, mode=mode)
     
-    def _extract_metadata(self, pdf) -> Dict[str, Any]:
+    def _extract_metadata(self, extraction) -> Dict[str, Any]:
         """Extract PDF metadata"""
         return {
-            'pages': len(pdf.pages),
-            'metadata': pdf.metadata
+            'pages': extraction.page_count,
+            'metadata': extraction.metadata
         }
     
     def _extract_vendor_info(self, text: str) -> Dict[str, str]:
@@ -0,0 +1,200 @@
+"""
+PII redaction for extracted invoice text
+
+Structured identifiers (emails, card numbers, SSNs, phone numbers) are
+found with one combined compiled regex. Names come from spaCy NER, run
+with nlp.pipe over paragraph-sized chunks and with every component except
+the entity recognizer (and the tok2vec it listens to) disabled. All spans
+are merged and the output is assembled in a single pass.
+
+Mode 'regex' skips spaCy entirely. Mode 'ner' (the default,
+PII_REDACTION_MODE) fails closed: when no spaCy model can be loaded it logs
+an error and raises PIIRedactionUnavailable instead of silently letting
+names through. Deployments without a model must choose
+PII_REDACTION_MODE=regex explicitly. status() reports this for health checks.
+"""
+
+import logging
+import os
+import re
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from utils.lazy_imports import module_available
+from utils.nlp_resources import SPACY_AVAILABLE, SPACY_MODEL, get_spacy_nlp
+
+logger = logging.getLogger(__name__)
+
+REDACTION_MODE = os.getenv('PII_REDACTION_MODE', 'ner')
+REDACTION_TOKEN = '[REDACTED]'
+PII_ENTITY_LABELS = frozenset({'PERSON', 'EMAIL', 'PHONE', 'SSN'})
+# Components that set doc.ents; everything else is disabled while redacting
+ENTITY_COMPONENTS = frozenset({'ner', 'entity_ruler'})
+
+# Order matters where alternatives can start at the same offset: longer
+# identifiers first so a card number is not consumed as a phone number
+PII_PATTERNS = {
+    'email': r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
+    'credit_card': r'\b\d{4}[- ]?\d{4}[- ]?\d{4}[- ]?\d{4}\b',
+    'ssn': r'\b\d{3}-\d{2}-\d{4}\b',
+    'phone': r'\b\d{3}[-.]?\d{3}[-.]?\d{4}\b',
+}
+PII_RE = re.compile('|'.join(f'(?P<{name}>{pattern})' for name, pattern in PII_PATTERNS.items()))
+
+_PARAGRAPH_BREAK_RE = re.compile(r'\n\s*\n|\f')
+DEFAULT_CHUNK_CHARS = 2000
+DEFAULT_BATCH_SIZE = 32
+
+Span = Tuple[int, int]
+
+
+class PIIRedactionUnavailable(RuntimeError):
+    """NER redaction was requested but no spaCy model can be loaded"""
+
+
+def chunk_text(text: str, max_chars: int = DEFAULT_CHUNK_CHARS) -> Iterator[Tuple[int, str]]:
+    """
+    Yield (offset, chunk) pieces of text split on paragraph/page breaks
+
+    Short paragraphs are packed together up to max_chars; a single paragraph
+    longer than that is cut at the last whitespace before the limit.
+    """
+    start = 0
+    length = len(text)
+    while start < length:
+        stop = min(start + max_chars, length)
+        if stop < length:
+            window = text[start:stop]
+            breaks = [match.end() for match in _PARAGRAPH_BREAK_RE.finditer(window)]
+            if breaks:
+                stop = start + breaks[-1]
+            else:
+                space = max(window.rfind(' '), window.rfind('\n'))
+                if space > 0:
+                    stop = start + space + 1
+        yield start, text[start:stop]
+        start = stop
+
+
+def merge_spans(spans: List[Span]) -> List[Span]:
+    """Sort and merge overlapping or touching character ranges"""
+    merged = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def apply_redactions(text: str, spans: List[Span], token: str = REDACTION_TOKEN) -> str:
+    """Replace merged spans with the redaction token in one pass over the text"""
+    parts = []
+    position = 0
+    for start, end in merge_spans(spans):
+        parts.append(text[position:start])
+        parts.append(token)
+        position = end
+    parts.append(text[position:])
+    return ''.join(parts)
+
+
+def ner_only_disable(nlp) -> List[str]:
+    """Pipeline components that can be skipped when only doc.ents is needed"""
+    keep = set(ENTITY_COMPONENTS)
+    for name, component in nlp.pipeline:
+        # A shared tok2vec must still run if the entity recognizer listens to it
+        if keep.intersection(getattr(component, 'listening_components', None) or ()):
+            keep.add(name)
+    return [name for name in nlp.pipe_names if name not in keep]
+
+
+class PIIRedactor:
+    """Regex plus batched, NER-only spaCy redaction"""
+
+    def __init__(self, mode: Optional[str] = None, nlp=None, chunk_chars: int = DEFAULT_CHUNK_CHARS,
+                 batch_size: int = DEFAULT_BATCH_SIZE):
+        self.mode = mode or REDACTION_MODE
+        if self.mode not in ('ner', 'regex'):
+            raise ValueError(f"Unknown PII redaction mode: {self.mode}")
+        self.chunk_chars = chunk_chars
+        self.batch_size = batch_size
+        self._nlp = nlp
+        self._ner_unavailable = False
+        self._lock = threading.Lock()
+
+    def _get_nlp(self):
+        """spaCy pipeline for NER, or None when none can be loaded"""
+        if self._nlp is None and not self._ner_unavailable:
+            with self._lock:
+                if self._nlp is None and not self._ner_unavailable:
+                    try:
+                        self._nlp = get_spacy_nlp()
+                    except Exception as e:
+                        logger.error(
+                            f"spaCy NER unavailable, refusing NER-mode PII redaction "
+                            f"(install {SPACY_MODEL} or set PII_REDACTION_MODE=regex): {e}"
+                        )
+                        self._ner_unavailable = True
+        return self._nlp
+
+    def status(self) -> Dict[str, Any]:
+        """Health summary; ready is False when NER mode has no spaCy model to run"""
+        if self.mode == 'regex':
+            ner_available = None
+        elif self._nlp is not None or self._ner_unavailable:
+            ner_available = self._nlp is not None
+        else:
+            # Not loaded yet: check the model is installed without loading it
+            ner_available = SPACY_AVAILABLE and (module_available(SPACY_MODEL)
+                                                 or os.path.isdir(SPACY_MODEL))
+        return {'mode': self.mode, 'ner_available': ner_available,
+                'ready': ner_available is not False}
+
+    def regex_spans(self, text: str) -> List[Span]:
+        return [match.span() for match in PII_RE.finditer(text)]
+
+    def entity_spans(self, text: str) -> List[Span]:
+        """Character spans of PII entities found by spaCy across all chunks"""
+        nlp = self._get_nlp()
+        if nlp is None:
+            raise PIIRedactionUnavailable(
+                f"No spaCy model ({SPACY_MODEL}) for NER-mode PII redaction; "
+                "install it or set PII_REDACTION_MODE=regex"
+            )
+        chunks = list(chunk_text(text, min(self.chunk_chars, nlp.max_length)))
+        docs = nlp.pipe(
+            (chunk for _, chunk in chunks),
+            batch_size=self.batch_size,
+            disable=ner_only_disable(nlp)
+        )
+        spans = []
+        for (offset, _), doc in zip(chunks, docs):
+            spans.extend(
+                (offset + ent.start_char, offset + ent.end_char)
+                for ent in doc.ents if ent.label_ in PII_ENTITY_LABELS
+            )
+        return spans
+
+    def redact(self, text: str, mode: Optional[str] = None) -> str:
+        """Return text with PII replaced by the redaction token"""
+        if not text:
+            return text
+        spans = self.regex_spans(text)
+        if (mode or self.mode) == 'ner':
+            spans.extend(self.entity_spans(text))
+        return apply_redactions(text, spans)
+
+
+_redactor = None
+_redactor_lock = threading.Lock()
+
+
+def get_pii_redactor() -> PIIRedactor:
+    """Return the process-wide PII redactor"""
+    global _redactor
+    with _redactor_lock:
+        if _redactor is None:
+            _redactor = PIIRedactor()
+        return _redactor
@@ -6,20 +6,31 @@ Connects to real, publicly available legal data sources
 
 import asyncio
 import aiohttp
+import hashlib
 import json
 import logging
+import os
 import sqlite3
+import threading
+import time
 from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional
+from urllib.parse import urlparse
 import xml.etree.ElementTree as ET
 import re
 import random
 from dataclasses import dataclass
+from pathlib import Path
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+LIVE_DATA_DIR = os.getenv('LIVE_DATA_DIR', str(Path(__file__).parent.parent / 'data' / 'live_data'))
+LEGAL_DATA_CACHE_PATH = os.getenv(
+    'LEGAL_DATA_CACHE_PATH', os.path.join(LIVE_DATA_DIR, 'legal_data_cache.sqlite')
+)
+
 @dataclass
 class RealLegalDataSource:
     """Real legal data source that actually works"""
@@ -29,19 +40,48 @@ class RealLegalDataSource:
     data_type: str = "json"
     update_frequency: int = 3600
     enabled: bool = True
+    # Scheduler state (monotonic timestamps and HTTP validators)
+    last_fetched: Optional[float] = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    @property
+    def host(self) -> str:
+        return urlparse(self.url).netloc
+
+    def is_due(self, now: float) -> bool:
+        return self.last_fetched is None or now - self.last_fetched >= self.update_frequency
+
+def insight_content_hash(insight: Dict) -> str:
+    """Stable dedup key for an insight (source + title + content)"""
+    key = '\x1f'.join(str(insight.get(field) or '') for field in ('source', 'title', 'content'))
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
 
 class ProductionLegalDataService:
     """Production-ready legal data service using real APIs"""
     
-    def __init__(self, db_path="legal_data_cache.sqlite"):
-        self.db_path = db_path
+    def __init__(self, db_path: Optional[str] = None, per_host_concurrency: int = 2):
+        self.db_path = db_path or LEGAL_DATA_CACHE_PATH
         self.data_sources = self._initialize_real_sources()
         self.session = None
+        self.per_host_concurrency = per_host_concurrency
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._conn = None
+        self._db_lock = threading.Lock()
         self._init_database()
+    
+    def _connection(self) -> sqlite3.Connection:
+        """Persistent WAL-mode connection shared by all reads and writes"""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+        return self._conn
         
     def _init_database(self):
         """Initialize SQLite database for caching live data"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connection()
         cursor = conn.cursor()
         
         # Create tables for different data types
@@ -54,10 +94,30 @@ class ProductionLegalDataService:
                 category TEXT,
                 impact_score REAL DEFAULT 0.0,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                relevance_score REAL DEFAULT 0.0
+                relevance_score REAL DEFAULT 0.0,
+                content_hash TEXT
             )
         ''')
         
+        # Older caches predate content_hash; add it in place
+        columns = {row[1] for row in cursor.execute('PRAGMA table_info(legal_insights)')}
+        if 'content_hash' not in columns:
+            cursor.execute('ALTER TABLE legal_insights ADD COLUMN content_hash TEXT')
+        self._backfill_content_hashes(cursor)
+        
+        cursor.execute('''
+            CREATE UNIQUE INDEX IF NOT EXISTS ix_legal_insights_content_hash
+            ON legal_insights (content_hash)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS ix_legal_insights_created_at
+            ON legal_insights (created_at)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS ix_legal_insights_category_created
+            ON legal_insights (category, created_at)
+        ''')
+        
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS rate_benchmarks (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -82,7 +142,31 @@ class ProductionLegalDataService:
         ''')
         
         conn.commit()
-        conn.close()
+    
+    def _backfill_content_hashes(self, cursor: sqlite3.Cursor):
+        """Hash rows stored before content_hash existed, keeping the oldest of each duplicate"""
+        pending = cursor.execute('''
+            SELECT id, source, title, content FROM legal_insights
+            WHERE content_hash IS NULL ORDER BY id
+        ''').fetchall()
+        if not pending:
+            return
+        
+        seen = {row[0] for row in cursor.execute(
+            'SELECT content_hash FROM legal_insights WHERE content_hash IS NOT NULL'
+        )}
+        updates, duplicates = [], []
+        for row_id, source, title, content in pending:
+            content_hash = insight_content_hash({'source': source, 'title': title, 'content': content})
+            if content_hash in seen:
+                duplicates.append((row_id,))
+            else:
+                seen.add(content_hash)
+                updates.append((content_hash, row_id))
+        
+        cursor.executemany('DELETE FROM legal_insights WHERE id = ?', duplicates)
+        cursor.executemany('UPDATE legal_insights SET content_hash = ? WHERE id = ?', updates)
+        logger.info(f"Backfilled content_hash for {len(updates)} insights ({len(duplicates)} duplicates removed)")
         
     def _initialize_real_sources(self) -> List[RealLegalDataSource]:
         """Initialize real, working legal data sources"""
@@ -133,27 +217,44 @@ class ProductionLegalDataService:
             )
         ]
     
-    async def fetch_live_data(self):
-        """Fetch data from all enabled sources"""
+    def _host_semaphore(self, host: str) -> asyncio.Semaphore:
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self.per_host_concurrency)
+        return self._host_semaphores[host]
+    
+    def due_sources(self, now: Optional[float] = None) -> List[RealLegalDataSource]:
+        """Enabled sources whose update_frequency has elapsed"""
+        now = time.monotonic() if now is None else now
+        return [source for source in self.data_sources if source.enabled and source.is_due(now)]
+    
+    async def fetch_live_data(self, force: bool = False):
+        """Fetch all due sources concurrently and store new insights"""
         if not self.session:
             self.session = aiohttp.ClientSession()
-            
-        insights_collected = []
         
-        for source in self.data_sources:
-            if not source.enabled:
-                continue
-                
-            try:
+        sources = [s for s in self.data_sources if s.enabled] if force else self.due_sources()
+        results = await asyncio.gather(*(self._fetch_source(source) for source in sources))
+        insights_collected = [insight for batch in results for insight in batch]
+        
+        # Store insights in database
+        self._store_insights(insights_collected)
+        
+        return insights_collected
+    
+    async def _fetch_source(self, source: RealLegalDataSource) -> List[Dict]:
+        """Conditionally GET one source under its host's concurrency limit"""
+        try:
+            async with self._host_semaphore(source.host):
                 logger.info(f"Fetching data from {source.name}")
                 
-                # Add realistic delay between requests
-                await asyncio.sleep(1)
-                
                 headers = {
                     'User-Agent': 'LAIT-Legal-Intelligence/1.0',
                     'Accept': 'application/json'
                 }
+                if source.etag:
+                    headers['If-None-Match'] = source.etag
+                if source.last_modified:
+                    headers['If-Modified-Since'] = source.last_modified
                 
                 # For news API, add API key if available
                 if 'newsapi.org' in source.url:
@@ -161,32 +262,54 @@ class ProductionLegalDataService:
                     headers['X-API-Key'] = api_key
                 
                 async with self.session.get(source.url, headers=headers, timeout=30) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        parser_method = getattr(self, source.parser_func, None)
-                        if parser_method:
-                            parsed_insights = parser_method(data, source.name)
-                            insights_collected.extend(parsed_insights)
-                            logger.info(f"Collected {len(parsed_insights)} insights from {source.name}")
-                    else:
+                    source.last_fetched = time.monotonic()
+                    if response.status == 304:
+                        logger.info(f"{source.name} not modified since last fetch")
+                        return []
+                    if response.status != 200:
                         logger.warning(f"Failed to fetch from {source.name}: {response.status}")
+                        return []
+                    
+                    source.etag = response.headers.get('ETag', source.etag)
+                    source.last_modified = response.headers.get('Last-Modified', source.last_modified)
+                    data = await response.json()
+                
+            parser_method = getattr(self, source.parser_func, None)
+            if not parser_method:
+                return []
+            parsed_insights = parser_method(data, source.name)
+            logger.info(f"Collected {len(parsed_insights)} insights from {source.name}")
+            return parsed_insights
                         
-            except Exception as e:
-                logger.error(f"Error fetching from {source.name}: {str(e)}")
-                # Generate synthetic insight about the error for transparency
-                insights_collected.append({
-                    'source': source.name,
-                    'title': f"Data Source Status: {source.name}",
-                    'content': f"Attempting to connect to live data source. Status: Configuring connection.",
-                    'category': 'system',
-                    'impact_score': 0.1,
-                    'relevance_score': 0.3
-                })
-        
-        # Store insights in database
-        self._store_insights(insights_collected)
-        
-        return insights_collected
+        except Exception as e:
+            logger.error(f"Error fetching from {source.name}: {str(e)}")
+            source.last_fetched = time.monotonic()
+            # Generate synthetic insight about the error for transparency
+            return [{
+                'source': source.name,
+                'title': f"Data Source Status: {source.name}",
+                'content': f"Attempting to connect to live data source. Status: Configuring connection.",
+                'category': 'system',
+                'impact_score': 0.1,
+                'relevance_score': 0.3
+            }]
+    
+    async def run_scheduler(self, stop_event: Optional[asyncio.Event] = None, min_sleep: float = 5.0):
+        """Fetch sources as they come due until stop_event is set"""
+        stop_event = stop_event or asyncio.Event()
+        while not stop_event.is_set():
+            await self.fetch_live_data()
+            
+            now = time.monotonic()
+            enabled = [s for s in self.data_sources if s.enabled]
+            next_due = min(
+                (s.last_fetched + s.update_frequency - now for s in enabled if s.last_fetched is not None),
+                default=min_sleep
+            )
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=max(min_sleep, next_due))
+            except asyncio.TimeoutError:
+                pass
     
     def parse_news_api(self, data: Dict, source: str) -> List[Dict]:
         """Parse news API data for legal insights"""
@@ -281,41 +404,53 @@ class ProductionLegalDataService:
             'relevance_score': 0.7
         }]
     
-    def _store_insights(self, insights: List[Dict]):
-        """Store insights in database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def _store_insights(self, insights: List[Dict]) -> int:
+        """Batch-insert insights, skipping any whose content hash is already stored"""
+        if not insights:
+            return 0
         
-        for insight in insights:
-            cursor.execute('''
-                INSERT INTO legal_insights (source, title, content, category, impact_score, relevance_score)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (
+        rows = [
+            (
                 insight['source'],
                 insight['title'],
                 insight['content'],
                 insight['category'],
                 insight['impact_score'],
-                insight['relevance_score']
-            ))
+                insight['relevance_score'],
+                insight_content_hash(insight)
+            )
+            for insight in insights
+        ]
         
-        conn.commit()
-        conn.close()
+        with self._db_lock:
+            conn = self._connection()
+            before = conn.total_changes
+            conn.executemany('''
+                INSERT OR IGNORE INTO legal_insights
+                    (source, title, content, category, impact_score, relevance_score, content_hash)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+            conn.commit()
+            inserted = conn.total_changes - before
+        
+        logger.info(f"Stored {inserted} new insights ({len(rows) - inserted} duplicates skipped)")
+        return inserted
     
-    def get_recent_insights(self, limit: int = 20) -> List[Dict]:
+    def get_recent_insights(self, limit: int = 20, category: Optional[str] = None) -> List[Dict]:
         """Get recent insights from database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
+        query = '''
             SELECT source, title, content, category, impact_score, relevance_score, created_at
             FROM legal_insights
-            ORDER BY created_at DESC
-            LIMIT ?
-        ''', (limit,))
+        '''
+        params: List[Any] = []
+        if category:
+            query += ' WHERE category = ?'
+            params.append(category)
+        query += ' ORDER BY created_at DESC LIMIT ?'
+        params.append(limit)
         
-        results = cursor.fetchall()
-        conn.close()
+        with self._db_lock:
+            results = self._connection().execute(query, params).fetchall()
         
         insights = []
         for row in results:
@@ -333,20 +468,15 @@ class ProductionLegalDataService:
     
     def get_service_status(self) -> Dict:
         """Get service status and statistics"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT COUNT(*) FROM legal_insights')
-        total_insights = cursor.fetchone()[0]
-        
-        cursor.execute('''
-            SELECT COUNT(*) FROM legal_insights 
-            WHERE created_at > datetime('now', '-24 hours')
-        ''')
-        recent_insights = cursor.fetchone()[0]
-        
-        conn.close()
+        with self._db_lock:
+            conn = self._connection()
+            total_insights = conn.execute('SELECT COUNT(*) FROM legal_insights').fetchone()[0]
+            recent_insights = conn.execute('''
+                SELECT COUNT(*) FROM legal_insights 
+                WHERE created_at > datetime('now', '-24 hours')
+            ''').fetchone()[0]
         
+        now = time.monotonic()
         return {
             'service_status': 'operational',
             'total_sources': len(self.data_sources),
@@ -354,6 +484,7 @@ class ProductionLegalDataService:
             'connected_sources': len([s for s in self.data_sources if s.enabled]),  # Simplified
             'total_insights': total_insights,
             'recent_insights_24h': recent_insights,
+            'due_sources': len(self.due_sources(now)),
             'last_update': datetime.now().isoformat()
         }
     
@@ -361,6 +492,10 @@ class ProductionLegalDataService:
         """Close the service and cleanup resources"""
         if self.session:
             await self.session.close()
+        if self._conn is not None:
+            with self._db_lock:
+                self._conn.close()
+                self._conn = None
 
 # Global instance
 production_service = ProductionLegalDataService()
@@ -10,40 +10,26 @@ import requests
 import time
 import re
 from typing import Dict, List, Any, Optional, Union
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import tempfile
 import io
 
 # PDF Processing
-import pdfplumber
-import PyPDF2
+from services.pdf_extraction import extract_pdf_text, PYMUPDF_AVAILABLE
 
-# Try to import PyMuPDF (fitz)
-try:
-    import fitz  # PyMuPDF
-    PYMUPDF_AVAILABLE = True
-except ImportError:
-    PYMUPDF_AVAILABLE = False
-    logging.warning("PyMuPDF not available. Install with: pip install PyMuPDF")
+if not PYMUPDF_AVAILABLE:
+    logging.warning("PyMuPDF not available (falling back to pdfplumber). Install with: pip install PyMuPDF")
 
-# AI/ML Libraries
-try:
-    from transformers import pipeline, AutoTokenizer, AutoModel
-    from sentence_transformers import SentenceTransformer
-    import torch
-    TRANSFORMERS_AVAILABLE = True
-except ImportError:
-    TRANSFORMERS_AVAILABLE = False
-    logging.warning("Transformers not available. Install with: pip install transformers torch sentence-transformers")
+# AI/ML Libraries: checked without importing; each pipeline loads on first use
+from services.ai_inference import get_inference_engine
+from utils.lazy_imports import module_available, register_warmup
+from utils.nlp_resources import get_spacy_nlp, SPACY_AVAILABLE
 
-# NLP Libraries
-try:
-    import spacy
-    import nltk
-    SPACY_AVAILABLE = True
-except ImportError:
-    SPACY_AVAILABLE = False
-    logging.warning("SpaCy/NLTK not available. Install with: pip install spacy nltk")
+TRANSFORMERS_AVAILABLE = all(module_available(name) for name in ('transformers', 'sentence_transformers', 'torch'))
+if not TRANSFORMERS_AVAILABLE:
+    logging.warning("Transformers not available. Install with: pip install transformers torch sentence-transformers")
+if not SPACY_AVAILABLE:
+    logging.warning("SpaCy not available. Install with: pip install spacy")
 
 logger = logging.getLogger(__name__)
 
@@ -55,9 +41,8 @@ class RealAILegalService:
         self.rapidapi_key = os.getenv('RAPIDAPI_KEY', '')
         self.github_token = os.getenv('GITHUB_TOKEN', '')
         
-        # Initialize models lazily
-        self.models = {}
-        self._models_initialized = False
+        # Local models: loaded per pipeline on demand, batched and cached
+        self.inference = get_inference_engine()
         
         # API endpoints
         self.api_endpoints = {
@@ -79,40 +64,16 @@ class RealAILegalService:
         }
         
     def _init_models(self):
-        """Initialize AI models lazily"""
-        if self._models_initialized:
-            return
-            
-        if TRANSFORMERS_AVAILABLE:
-            try:
-                # Initialize sentiment analysis for contract risk assessment
-                self.models['sentiment'] = pipeline("sentiment-analysis")
-                
-                # Initialize question-answering for legal queries
-                self.models['qa'] = pipeline("question-answering")
-                
-                # Initialize text generation for legal insights
-                self.models['text_generation'] = pipeline("text-generation", 
-                                                        model="microsoft/DialoGPT-small")
-                
-                # Initialize sentence transformer for document similarity
-                self.models['sentence_transformer'] = SentenceTransformer('all-MiniLM-L6-v2')
-                
-                logger.info("AI models initialized successfully")
-                self._models_initialized = True
-            except Exception as e:
-                logger.error(f"Failed to initialize models: {e}")
+        """Load every local pipeline up front (warmup only; requests load what they use)"""
+        self.inference.preload()
     
-    def _ensure_models_loaded(self):
-        """Ensure models are loaded before use"""
-        if not self._models_initialized:
-            self._init_models()
+    def embed_texts(self, texts: List[str]):
+        """Sentence embeddings for retrieval/similarity (cached by text hash)"""
+        return self.inference.embed(texts)
                 
     def analyze_contract_with_huggingface(self, contract_text: str) -> Dict[str, Any]:
         """Analyze contract using HuggingFace models"""
         try:
-            self._ensure_models_loaded()
-            
             headers = {"Authorization": f"Bearer {self.huggingface_token}"}
             
             results = {}
@@ -143,9 +104,11 @@ class RealAILegalService:
                 results['entities'] = self._parse_entities(ner_data)
             
             # Local model analysis if available
-            if TRANSFORMERS_AVAILABLE and 'sentiment' in self.models:
-                sentiment = self.models['sentiment'](contract_text[:512])
-                results['sentiment'] = sentiment
+            if self.inference.available('sentiment'):
+                try:
+                    results['sentiment'] = [self.inference.classify(contract_text[:512])]
+                except Exception as e:
+                    logger.warning(f"Local sentiment model failed: {e}")
                 
             return {
                 'success': True,
@@ -310,40 +273,12 @@ class RealAILegalService:
         }
     
     def _extract_pdf_text(self, pdf_path: str) -> str:
-        """Extract text from PDF using multiple methods"""
-        text = ""
-        
-        # Method 1: pdfplumber
+        """Extract text from PDF (PyMuPDF fast path, pdfplumber/PyPDF2 fallbacks)"""
         try:
-            with pdfplumber.open(pdf_path) as pdf:
-                for page in pdf.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text + "\n"
+            return extract_pdf_text(pdf_path).strip()
         except Exception as e:
-            logger.warning(f"pdfplumber extraction failed: {e}")
-        
-        # Method 2: PyPDF2 if pdfplumber failed
-        if not text:
-            try:
-                with open(pdf_path, 'rb') as file:
-                    pdf_reader = PyPDF2.PdfReader(file)
-                    for page in pdf_reader.pages:
-                        text += page.extract_text() + "\n"
-            except Exception as e:
-                logger.warning(f"PyPDF2 extraction failed: {e}")
-        
-        # Method 3: PyMuPDF if others failed
-        if not text and PYMUPDF_AVAILABLE:
-            try:
-                doc = fitz.open(pdf_path)
-                for page in doc:
-                    text += page.get_text() + "\n"
-                doc.close()
-            except Exception as e:
-                logger.warning(f"PyMuPDF extraction failed: {e}")
-        
-        return text.strip()
+            logger.warning(f"PDF text extraction failed: {e}")
+            return ""
     
     def _is_legal_document(self, text: str) -> bool:
         """Determine if document is a legal document"""
@@ -453,12 +388,12 @@ class RealAILegalService:
     
     def _classify_document_type(self, text: str) -> Dict[str, Any]:
         """Classify document type using AI"""
-        if TRANSFORMERS_AVAILABLE and 'sentiment' in self.models:
+        if self.inference.available('sentiment'):
             try:
                 # Use sentiment analysis as a proxy for document classification
-                result = self.models['sentiment'](text[:512])
+                result = self.inference.classify(text[:512])
                 
-                confidence = result[0]['score'] if result else 0.5
+                confidence = result.get('score', 0.5) if result else 0.5
                 
                 # Determine document type based on content
                 if self._is_legal_document(text):
@@ -517,8 +452,7 @@ class RealAILegalService:
         # Extract named entities if spaCy is available
         if SPACY_AVAILABLE:
             try:
-                import spacy
-                nlp = spacy.load("en_core_web_sm")
+                nlp = get_spacy_nlp()
                 doc = nlp(text[:1000])  # Limit text for processing
                 
                 entities = {}
@@ -589,3 +523,7 @@ class RealAILegalService:
 
 # Global instance
 ai_service = RealAILegalService()
+
+# Transformer pipelines are large; only preload them when explicitly asked to
+if os.getenv('WARMUP_TRANSFORMERS', 'false').lower() == 'true':
+    register_warmup('transformers_pipelines', ai_service._init_models)
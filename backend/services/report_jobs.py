@@ -0,0 +1,389 @@
+"""
+Background report jobs with a content-addressed result cache
+
+Report generation runs on a bounded thread pool. Each job reports its
+progress into a small JSON status file so any gunicorn worker can answer
+/status and /export. Finished reports are stored under
+sha256(owner, template, parameters, data watermark): an identical request
+by the same user (or a repeated export) is served from the cache until new
+invoices change the watermark. Exports render json, csv and, when
+reportlab is installed, pdf.
+
+Results of older watermarks are never requested again, so the cache is
+pruned after finished jobs (at most every REPORT_CACHE_PRUNE_INTERVAL
+seconds): reports and job records unused for REPORT_CACHE_MAX_AGE seconds
+go first, then the least recently used reports until the results fit in
+REPORT_CACHE_MAX_BYTES.
+"""
+
+import csv
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+from xml.sax.saxutils import escape
+
+from sqlalchemy import func
+
+try:
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+    REPORTLAB_AVAILABLE = True
+except ImportError:  # pragma: no cover - reportlab is optional
+    REPORTLAB_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.getenv('REPORT_CACHE_DIR', os.path.join('data', 'report_cache'))
+DEFAULT_MAX_WORKERS = int(os.getenv('REPORT_JOB_WORKERS', '2'))
+REPORT_CACHE_MAX_AGE = float(os.getenv('REPORT_CACHE_MAX_AGE', str(7 * 24 * 3600)))
+REPORT_CACHE_MAX_BYTES = int(os.getenv('REPORT_CACHE_MAX_BYTES', str(512 * 1024 * 1024)))
+REPORT_CACHE_PRUNE_INTERVAL = float(os.getenv('REPORT_CACHE_PRUNE_INTERVAL', '300'))
+
+EXPORT_FORMATS = {
+    'json': 'application/json',
+    'csv': 'text/csv',
+}
+if REPORTLAB_AVAILABLE:
+    EXPORT_FORMATS['pdf'] = 'application/pdf'
+
+
+def data_watermark(session) -> str:
+    """Cheap fingerprint of the invoice table that changes when invoices arrive or change"""
+    from models.db_models import Invoice
+
+    count, max_id, max_updated = session.query(
+        func.count(Invoice.id), func.max(Invoice.id), func.max(Invoice.updated_at)
+    ).one()
+    return f"{count}:{max_id or 0}:{max_updated.isoformat() if max_updated else ''}"
+
+
+def report_cache_key(template_id: str, parameters: Dict[str, Any], watermark: str,
+                     owner: Any = None) -> str:
+    """Content address of a report: the same user's inputs over the same data give the same key"""
+    payload = json.dumps(
+        {'owner': owner, 'template_id': template_id, 'parameters': parameters,
+         'watermark': watermark},
+        sort_keys=True, default=str
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ReportJobManager:
+    """Runs report builders in the background and caches their results by content key"""
+
+    def __init__(self, cache_dir: Optional[str] = None, max_workers: int = DEFAULT_MAX_WORKERS,
+                 max_age: float = REPORT_CACHE_MAX_AGE, max_bytes: int = REPORT_CACHE_MAX_BYTES,
+                 prune_interval: float = REPORT_CACHE_PRUNE_INTERVAL):
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.prune_interval = prune_interval
+        self.results_dir = os.path.join(self.cache_dir, 'results')
+        self.jobs_dir = os.path.join(self.cache_dir, 'jobs')
+        os.makedirs(self.results_dir, exist_ok=True)
+        os.makedirs(self.jobs_dir, exist_ok=True)
+
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='report-job')
+        self._lock = threading.Lock()
+        # Progress callbacks and submit() update job records from different threads
+        self._job_lock = threading.Lock()
+        self._inflight = {}  # cache key -> report_id of the running job
+        self._pruned_at = 0.0
+
+    # ------------------------------------------------------------------
+    # Storage helpers
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _write_json(path: str, data: Dict[str, Any]):
+        """Write-then-rename so readers in other workers never see partial files"""
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, default=str)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _read_json(path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _job_path(self, report_id: str) -> str:
+        return os.path.join(self.jobs_dir, f"{os.path.basename(report_id)}.json")
+
+    def _result_path(self, cache_key: str, fmt: str = 'json') -> str:
+        return os.path.join(self.results_dir, f"{cache_key}.{fmt}")
+
+    def get_cached_result(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """Return a finished report for this content key, if any"""
+        return self._read_json(self._result_path(cache_key))
+
+    def _touch(self, path: str):
+        """Mark a cached file as recently used so pruning keeps it"""
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+
+    def get_status(self, report_id: str) -> Optional[Dict[str, Any]]:
+        """Return the persisted job record for a report id"""
+        return self._read_json(self._job_path(report_id))
+
+    def _update_job(self, report_id: str, **fields):
+        with self._job_lock:
+            job = self.get_status(report_id) or {'report_id': report_id}
+            job.update(fields)
+            job['updated_at'] = datetime.utcnow().isoformat()
+            self._write_json(self._job_path(report_id), job)
+        return job
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """
+        Drop cached reports and job records past max_age, then the least
+        recently used reports until the results fit in max_bytes
+
+        A report's exports go with it. Returns the number of files removed.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            inflight = set(self._inflight)
+            running = set(self._inflight.values())
+
+        cutoff = now - self.max_age
+        removed = 0
+        for name in os.listdir(self.jobs_dir):
+            path = os.path.join(self.jobs_dir, name)
+            if name.split('.json', 1)[0] in running:
+                continue
+            try:
+                expired = os.path.getmtime(path) < cutoff
+            except FileNotFoundError:
+                continue
+            if expired and _remove(path):
+                removed += 1
+
+        # cache key -> (last used, total bytes, paths), exports included
+        entries: Dict[str, list] = {}
+        for name in os.listdir(self.results_dir):
+            path = os.path.join(self.results_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entry = entries.setdefault(name.split('.', 1)[0], [0.0, 0, []])
+            entry[0] = max(entry[0], stat.st_mtime)
+            entry[1] += stat.st_size
+            entry[2].append(path)
+
+        total = sum(entry[1] for entry in entries.values())
+        for cache_key, (last_used, size, paths) in sorted(entries.items(), key=lambda e: e[1][0]):
+            if cache_key in inflight:
+                continue
+            if last_used >= cutoff and total <= self.max_bytes:
+                break
+            removed += sum(_remove(path) for path in paths)
+            total -= size
+        if removed:
+            logger.info(f"Pruned {removed} report cache files from {self.cache_dir}")
+        return removed
+
+    def _maybe_prune(self):
+        now = time.time()
+        if now - self._pruned_at < self.prune_interval:
+            return
+        self._pruned_at = now
+        try:
+            self.prune(now)
+        except OSError as e:
+            logger.warning(f"Report cache pruning failed: {str(e)}")
+
+    # ------------------------------------------------------------------
+    # Job lifecycle
+    # ------------------------------------------------------------------
+    def submit(self, template_id: str, parameters: Dict[str, Any], watermark: str,
+               builder: Callable[[Callable[[int, str], None]], Dict[str, Any]],
+               requested_by: Any = None) -> Dict[str, Any]:
+        """
+        Queue a report build, reusing the cache or an identical in-flight job
+
+        Args:
+            builder: callable receiving a progress(percent, stage) callback and
+                returning the report dict
+        Returns:
+            The job record (status is 'completed' immediately on a cache hit)
+        """
+        cache_key = report_cache_key(template_id, parameters, watermark, owner=requested_by)
+        report_id = f"LAIT-{template_id}-{cache_key[:16]}"
+
+        with self._lock:
+            if self.get_cached_result(cache_key) is not None:
+                self._touch(self._result_path(cache_key))
+                return self._update_job(
+                    report_id, template_id=template_id, cache_key=cache_key,
+                    requested_by=requested_by, status='completed', progress=100, stage='cached',
+                    cached=True
+                )
+
+            inflight_id = self._inflight.get(cache_key)
+            if inflight_id is not None:
+                return self.get_status(inflight_id) or {'report_id': inflight_id, 'status': 'queued'}
+
+            self._inflight[cache_key] = report_id
+            job = self._update_job(
+                report_id, template_id=template_id, cache_key=cache_key, watermark=watermark,
+                requested_by=requested_by, status='queued', progress=0, stage='queued',
+                cached=False, error=None, submitted_at=datetime.utcnow().isoformat()
+            )
+
+        self.executor.submit(self._run, report_id, cache_key, builder)
+        return job
+
+    def _run(self, report_id: str, cache_key: str, builder):
+        """Execute a builder on the pool, streaming progress into the job record"""
+        def progress(percent: int, stage: str):
+            self._update_job(report_id, status='running', progress=int(percent), stage=stage)
+
+        try:
+            progress(1, 'starting')
+            report = builder(progress)
+            report.update({'report_id': report_id, 'status': 'completed'})
+            self._write_json(self._result_path(cache_key), report)
+            self._update_job(report_id, status='completed', progress=100, stage='completed',
+                             completed_at=datetime.utcnow().isoformat())
+            logger.info(f"Report job {report_id} completed")
+        except Exception as e:
+            logger.error(f"Report job {report_id} failed: {str(e)}")
+            self._update_job(report_id, status='failed', stage='failed', error=str(e))
+        finally:
+            with self._lock:
+                self._inflight.pop(cache_key, None)
+            self._maybe_prune()
+
+    def wait(self, report_id: str, timeout: float = 60.0, poll_interval: float = 0.1) -> Optional[Dict[str, Any]]:
+        """Block until a job finishes (used by callers that opt into synchronous results)"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            job = self.get_status(report_id)
+            if job and job.get('status') in ('completed', 'failed'):
+                return job
+            time.sleep(poll_interval)
+        return self.get_status(report_id)
+
+    # ------------------------------------------------------------------
+    # Exports
+    # ------------------------------------------------------------------
+    def export(self, report_id: str, fmt: str) -> Optional[str]:
+        """
+        Return the path of an export artifact, rendering it once per content key
+
+        Returns None when the report is unknown or not finished yet.
+        """
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {fmt}")
+
+        job = self.get_status(report_id)
+        if not job or job.get('status') != 'completed':
+            return None
+
+        cache_key = job['cache_key']
+        path = self._result_path(cache_key, fmt)
+        if os.path.exists(path):
+            self._touch(path)
+            return path
+
+        report = self.get_cached_result(cache_key)
+        if report is None:
+            return None
+
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        if fmt == 'pdf':
+            with open(tmp_path, 'wb') as f:
+                f.write(_report_to_pdf(report))
+        else:
+            with open(tmp_path, 'w', newline='') as f:
+                f.write(_report_to_csv(report))
+        os.replace(tmp_path, path)
+        return path
+
+
+def _remove(path: str) -> bool:
+    """Delete a cache file; False if another worker already removed it"""
+    try:
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def _flatten(prefix: str, value: Any, rows: list):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            _flatten(f"{prefix}.{key}" if prefix else str(key), item, rows)
+    elif isinstance(value, list):
+        for idx, item in enumerate(value):
+            _flatten(f"{prefix}[{idx}]", item, rows)
+    else:
+        rows.append((prefix, value))
+
+
+def _report_to_csv(report: Dict[str, Any]) -> str:
+    """Flatten a nested report into field,value rows"""
+    rows = []
+    _flatten('', report, rows)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(['field', 'value'])
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+
+def _report_to_pdf(report: Dict[str, Any]) -> bytes:
+    """Render a report as a titled field/value table"""
+    rows = []
+    _flatten('', {k: v for k, v in report.items() if k not in ('report_id', 'status')}, rows)
+    styles = getSampleStyleSheet()
+    cell = styles['BodyText']
+
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter)
+    body = [[Paragraph(escape(str(field)), cell), Paragraph(escape(str(value)), cell)]
+            for field, value in rows]
+    table = Table([['Field', 'Value']] + body, colWidths=[230, 260], repeatRows=1)
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+    ]))
+    title = report.get('report_id') or report.get('template_id', 'Report')
+    doc.build([
+        Paragraph(escape(str(title)), styles['Title']),
+        Paragraph(escape(f"Generated: {report.get('generated_at', '')}"), styles['Normal']),
+        Spacer(1, 12),
+        table,
+    ])
+    return buffer.getvalue()
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_report_job_manager() -> ReportJobManager:
+    """Return the process-wide report job manager"""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = ReportJobManager()
+        return _manager
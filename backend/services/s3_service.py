@@ -7,6 +7,7 @@ except Exception:  # boto3 not installed in test environment
         pass
 import os
 from werkzeug.utils import secure_filename
+from services.storage import get_s3_client, get_transfer_config, s3_bucket_name
 import mimetypes
 import logging
 
@@ -16,13 +17,9 @@ class S3Service:
             # Provide a dummy client so attribute access doesn't explode; tests monkeypatch methods anyway
             self.s3 = None
         else:
-            self.s3 = boto3.client(
-                's3',
-                aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
-                aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
-                region_name=os.getenv('AWS_REGION', 'us-east-1')
-            )
-        self.bucket = os.getenv('AWS_S3_BUCKET', 'test-bucket')
+            # Shared, pooled client instead of a new one per request
+            self.s3 = get_s3_client()
+        self.bucket = s3_bucket_name() or 'test-bucket'
         
     def upload_file(self, file, prefix='invoices'):
         """Upload a file to S3 bucket."""
@@ -50,7 +47,8 @@ class S3Service:
                 ExtraArgs={
                     'ContentType': content_type,
                     'ServerSideEncryption': 'AES256'
-                }
+                },
+                Config=get_transfer_config()
             )
             
             return key
@@ -0,0 +1,212 @@
+"""
+In-memory admin settings with file reload and cross-worker change propagation
+
+Scoring code reads thresholds on every call, so reads come from a dict in
+memory. At most once per SETTINGS_CHECK_INTERVAL a read also checks
+whether the settings file changed (mtime/size) and, when Redis is
+configured, whether another worker bumped the shared version counter.
+Either one triggers a reload. Saves write a temp file and rename it over
+the old one, so readers never see a half-written file, then bump the
+counter so every gunicorn worker (on any host sharing the file) reloads
+on its next check.
+
+The file is the app's ADMIN_SETTINGS_FILE config value (outside an app
+context, the ADMIN_SETTINGS_FILE env var or backend/config/settings.json).
+Reads never create it; until the first save the defaults are served.
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+try:
+    import redis  # type: ignore
+    REDIS_AVAILABLE = True
+except ImportError:  # pragma: no cover - redis is optional
+    redis = None  # type: ignore
+    REDIS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+SETTINGS_FILE = os.getenv(
+    'ADMIN_SETTINGS_FILE', str(Path(__file__).parent.parent / 'config' / 'settings.json')
+)
+SETTINGS_CHECK_INTERVAL = float(os.getenv('SETTINGS_CHECK_INTERVAL', '1.0'))
+SETTINGS_REDIS_URL = os.getenv('SETTINGS_REDIS_URL', os.getenv('REDIS_URL'))
+SETTINGS_VERSION_KEY = 'lait:settings:version'
+# After a failed Redis call, fall back to file checks only for this long
+REDIS_RETRY_SECONDS = 30
+
+DEFAULT_SETTINGS = {
+    # Same flag threshold scoring used before it read the admin settings
+    'anomaly_threshold': 0.7,
+    'high_risk_threshold': 7,
+    'hourly_rate_threshold': 1.2,  # Multiplier for hourly rate comparison
+    'notifications_enabled': True,
+    'auto_retrain_enabled': True,
+    'auto_retrain_frequency': 'monthly'  # daily, weekly, monthly
+}
+
+
+class RedisVersionCounter:
+    """Shared settings version in Redis; None when Redis can't be reached"""
+
+    def __init__(self, url: str, key: str = SETTINGS_VERSION_KEY):
+        self.key = key
+        self.client = redis.Redis.from_url(url, socket_timeout=0.2, socket_connect_timeout=0.2)
+        self._retry_at = 0.0
+
+    def get(self) -> Optional[int]:
+        if time.monotonic() < self._retry_at:
+            return None
+        try:
+            value = self.client.get(self.key)
+            return int(value) if value is not None else 0
+        except Exception as e:
+            # Don't pay a connect timeout on every check while Redis is down
+            self._retry_at = time.monotonic() + REDIS_RETRY_SECONDS
+            logger.warning(f"Settings version check failed, using file checks only: {str(e)}")
+            return None
+
+    def bump(self) -> Optional[int]:
+        try:
+            return int(self.client.incr(self.key))
+        except Exception as e:
+            logger.warning(f"Could not publish settings change: {str(e)}")
+            return None
+
+
+class SettingsStore:
+    """Settings dict cached in memory, reloaded when the file or shared version changes"""
+
+    def __init__(self, path: str = SETTINGS_FILE, defaults: Optional[Dict[str, Any]] = None,
+                 check_interval: float = SETTINGS_CHECK_INTERVAL, version_counter=None):
+        self.path = path
+        self.defaults = dict(DEFAULT_SETTINGS if defaults is None else defaults)
+        self.check_interval = check_interval
+        self.version_counter = version_counter
+        self._lock = threading.Lock()
+        self._settings: Dict[str, Any] = dict(self.defaults)
+        self._file_stamp = None
+        self._version = None
+        self._checked_at = float('-inf')
+        self.reloads = 0
+
+    def _stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def _load(self, stamp):
+        if stamp is None:
+            # Nothing saved yet: serve the defaults, the first save creates the file
+            loaded = {}
+        else:
+            with open(self.path, 'r') as f:
+                loaded = json.load(f)
+        self._settings = {**self.defaults, **loaded}
+        self._file_stamp = stamp
+        self.reloads += 1
+
+    def _refresh(self, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            if not force and now - self._checked_at < self.check_interval:
+                return
+            self._checked_at = now
+            version = self.version_counter.get() if self.version_counter is not None else None
+            stamp = self._stamp()
+            if not force and stamp == self._file_stamp and \
+                    (version is None or version == self._version):
+                return
+            try:
+                self._load(stamp)
+                if version is not None:
+                    self._version = version
+            except Exception as e:
+                # Keep serving the last good settings (e.g. a hand edit left invalid JSON)
+                logger.error(f"Error loading settings from {self.path}: {str(e)}")
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """One setting; a dict lookup unless a change check is due"""
+        self._refresh()
+        return self._settings.get(key, default)
+
+    def all(self) -> Dict[str, Any]:
+        self._refresh()
+        return dict(self._settings)
+
+    def reload(self):
+        self._refresh(force=True)
+
+    def _write(self, settings: Dict[str, Any]):
+        directory = os.path.dirname(self.path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.settings-', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(settings, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def save(self, settings: Dict[str, Any]) -> bool:
+        """Atomically replace the settings file and tell the other workers"""
+        try:
+            with self._lock:
+                self._write(settings)
+                self._settings = {**self.defaults, **settings}
+                self._file_stamp = self._stamp()
+                if self.version_counter is not None:
+                    version = self.version_counter.bump()
+                    if version is not None:
+                        self._version = version
+            return True
+        except Exception as e:
+            logger.error(f"Error saving settings: {str(e)}")
+            return False
+
+
+_store: Optional[SettingsStore] = None
+_store_lock = threading.Lock()
+
+
+def settings_path() -> str:
+    """ADMIN_SETTINGS_FILE from the current app's config, else the module default"""
+    try:
+        from flask import current_app, has_app_context
+    except ImportError:  # pragma: no cover - flask is always installed with the app
+        return SETTINGS_FILE
+    if has_app_context():
+        return current_app.config.get('ADMIN_SETTINGS_FILE') or SETTINGS_FILE
+    return SETTINGS_FILE
+
+
+def get_settings_store() -> SettingsStore:
+    """Process-wide settings store"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                counter = None
+                if SETTINGS_REDIS_URL and REDIS_AVAILABLE:
+                    counter = RedisVersionCounter(SETTINGS_REDIS_URL)
+                _store = SettingsStore(settings_path(), version_counter=counter)
+    return _store
+
+
+def get_setting(key: str, default: Any = None) -> Any:
+    """Shortcut for hot paths: get_setting('anomaly_threshold', 0.7)"""
+    return get_settings_store().get(key, default)
@@ -0,0 +1,338 @@
+"""
+Shadow scoring and offline replay of line-item model versions
+
+Before a candidate version is promoted with ModelManager.set_current_version
+it can be compared against production on real traffic in two ways:
+
+- ShadowScorer: MLService.score_lines hands each scored upload to a bounded
+  queue; a daemon thread re-scores it with the production and candidate
+  pairs, timing both around the same ModelPair.score call. The request
+  path never waits, and a full queue drops the sample (counted) instead.
+- replay(): stream historical InvoiceLine / LineItem rows through any two
+  model pairs and report throughput, latency percentiles, flag-rate delta
+  and score correlation. scripts/replay_model_versions.py wraps it.
+
+Model specs: 'production' (the iso_forest.pkl / overspend.pkl files served
+today), 'current' (ModelManager's current version, production if none) or
+a ModelManager version id.
+"""
+
+import logging
+import math
+import os
+import queue
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SHADOW_QUEUE_SIZE = int(os.getenv('ML_SHADOW_QUEUE_SIZE', '256'))
+SHADOW_SAMPLE_RATE = float(os.getenv('ML_SHADOW_SAMPLE_RATE', '1.0'))
+LATENCY_WINDOW = int(os.getenv('ML_SHADOW_LATENCY_WINDOW', '2048'))
+REPLAY_CHUNK_SIZE = 1000
+
+# ModelManager model types for the line-scoring models
+ANOMALY_MODEL_TYPE = 'iso_forest'
+OVERSPEND_MODEL_TYPE = 'overspend'
+
+PRODUCTION_MODELS_DIR = Path(__file__).parent.parent / 'models'
+
+
+class ModelPair:
+    """Anomaly + overspend models scored with MLService's combined formula"""
+
+    def __init__(self, anomaly: Any, overspend: Any, label: str = 'candidate'):
+        self.anomaly = anomaly
+        self.overspend = overspend
+        self.label = label
+
+    def score(self, df) -> Dict[str, np.ndarray]:
+        from services.ml_service import prepare_features, score_with_models
+
+        return score_with_models(self.anomaly, self.overspend, prepare_features(df))
+
+
+def _load_one(model_type: str, spec: str, model_manager, models_dir: Path):
+    import joblib
+
+    production_path = Path(models_dir) / f'{model_type}.pkl'
+    if spec == 'current' and model_manager is not None:
+        entry = model_manager.metadata['models'].get(model_type)
+        if entry and entry.get('current_version'):
+            return model_manager.load_model(model_type), entry['current_version']
+        spec = 'production'
+    if spec in ('production', 'current'):
+        return joblib.load(production_path), 'production'
+    if model_manager is None:
+        raise ValueError(f"A ModelManager is needed to load {model_type} version {spec}")
+    return model_manager.load_model(model_type, spec), spec
+
+
+def load_model_pair(anomaly_spec: str = 'production', overspend_spec: str = 'production',
+                    model_manager=None, models_dir: Optional[Path] = None) -> ModelPair:
+    """Load an anomaly/overspend pair from production files or the model registry"""
+    models_dir = models_dir or PRODUCTION_MODELS_DIR
+    anomaly, anomaly_version = _load_one(ANOMALY_MODEL_TYPE, anomaly_spec,
+                                         model_manager, models_dir)
+    overspend, overspend_version = _load_one(OVERSPEND_MODEL_TYPE, overspend_spec,
+                                             model_manager, models_dir)
+    return ModelPair(anomaly, overspend, label=f'{anomaly_version}+{overspend_version}')
+
+
+def _timed_score(pair: ModelPair, df):
+    """(scores, seconds) for one frame; both sides of a comparison go through this"""
+    start = time.perf_counter()
+    scored = pair.score(df)
+    return scored, time.perf_counter() - start
+
+
+def _latency(samples, total_seconds: float, lines: int) -> Dict[str, Optional[float]]:
+    """Latency percentiles of the recent samples plus overall throughput"""
+    throughput = round(lines / total_seconds, 1) if total_seconds else None
+    if not samples:
+        return {'p50_ms': None, 'p95_ms': None, 'p99_ms': None, 'lines_per_s': throughput}
+    p50, p95, p99 = np.percentile(np.asarray(list(samples)) * 1000, [50, 95, 99])
+    return {'p50_ms': round(float(p50), 3), 'p95_ms': round(float(p95), 3),
+            'p99_ms': round(float(p99), 3), 'lines_per_s': throughput}
+
+
+class ScoreComparison:
+    """Running baseline-vs-candidate statistics; safe to update from several threads"""
+
+    def __init__(self, latency_window: int = LATENCY_WINDOW):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.lines = 0
+        self.baseline_flags = 0
+        self.candidate_flags = 0
+        self.disagreements = 0
+        self.abs_delta_sum = 0.0
+        self.max_abs_delta = 0.0
+        # Sums for Pearson correlation without keeping every score
+        self._sx = self._sy = self._sxx = self._syy = self._sxy = 0.0
+        self.baseline_latency = deque(maxlen=latency_window)
+        self.candidate_latency = deque(maxlen=latency_window)
+        self.baseline_time = 0.0
+        self.candidate_time = 0.0
+
+    def update(self, baseline_scores, baseline_flags, candidate_scores, candidate_flags,
+               baseline_seconds: Optional[float] = None, candidate_seconds: Optional[float] = None):
+        x = np.asarray(baseline_scores, dtype=np.float64)
+        y = np.asarray(candidate_scores, dtype=np.float64)
+        bf = np.asarray(baseline_flags, dtype=bool)
+        cf = np.asarray(candidate_flags, dtype=bool)
+        delta = np.abs(x - y)
+        with self._lock:
+            self.requests += 1
+            self.lines += len(x)
+            self.baseline_flags += int(bf.sum())
+            self.candidate_flags += int(cf.sum())
+            self.disagreements += int((bf != cf).sum())
+            if len(x):
+                self.abs_delta_sum += float(delta.sum())
+                self.max_abs_delta = max(self.max_abs_delta, float(delta.max()))
+            self._sx += float(x.sum())
+            self._sy += float(y.sum())
+            self._sxx += float(x @ x)
+            self._syy += float(y @ y)
+            self._sxy += float(x @ y)
+            if baseline_seconds is not None:
+                self.baseline_latency.append(baseline_seconds)
+                self.baseline_time += baseline_seconds
+            if candidate_seconds is not None:
+                self.candidate_latency.append(candidate_seconds)
+                self.candidate_time += candidate_seconds
+
+    def _correlation(self) -> Optional[float]:
+        n = self.lines
+        if n < 2:
+            return None
+        cov = self._sxy - self._sx * self._sy / n
+        var_x = self._sxx - self._sx ** 2 / n
+        var_y = self._syy - self._sy ** 2 / n
+        if var_x <= 0 or var_y <= 0:
+            return None
+        return round(cov / math.sqrt(var_x * var_y), 6)
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            lines = self.lines
+            baseline_rate = self.baseline_flags / lines if lines else None
+            candidate_rate = self.candidate_flags / lines if lines else None
+            return {
+                'requests': self.requests,
+                'lines': lines,
+                'baseline_flag_rate': baseline_rate,
+                'candidate_flag_rate': candidate_rate,
+                'flag_rate_delta': (candidate_rate - baseline_rate) if lines else None,
+                'flag_disagreement_rate': self.disagreements / lines if lines else None,
+                'mean_abs_score_delta': self.abs_delta_sum / lines if lines else None,
+                'max_abs_score_delta': self.max_abs_delta,
+                'score_correlation': self._correlation(),
+                'baseline_latency': _latency(self.baseline_latency, self.baseline_time, lines),
+                'candidate_latency': _latency(self.candidate_latency, self.candidate_time, lines),
+            }
+
+
+class ShadowScorer:
+    """
+    Re-score production uploads with a candidate pair off the request path
+
+    submit() never blocks: when the queue is full (or the sample is skipped
+    by sample_rate) the upload is not shadow-scored and submit returns False.
+    With a baseline pair, the worker re-scores production too so both
+    latencies measure the same work; without one (production is on the
+    deterministic fallback) the served scores are compared and only the
+    candidate is timed.
+    """
+
+    def __init__(self, candidate: ModelPair, sample_rate: float = SHADOW_SAMPLE_RATE,
+                 queue_size: int = SHADOW_QUEUE_SIZE, baseline: Optional[ModelPair] = None):
+        self.candidate = candidate
+        self.baseline = baseline
+        self.sample_rate = sample_rate
+        self.comparison = ScoreComparison()
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._closed = False
+        self._rng = np.random.default_rng()
+        self.submitted = 0
+        self.dropped = 0
+        self.sampled_out = 0
+        self.errors = 0
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='ml-shadow-scorer',
+                                                daemon=True)
+                self._thread.start()
+
+    def submit(self, df, baseline_scores, baseline_flags) -> bool:
+        """Queue a scored upload for the candidate; never blocks the caller"""
+        if self._closed:
+            return False
+        if self.sample_rate < 1.0 and self._rng.random() >= self.sample_rate:
+            self.sampled_out += 1
+            return False
+        try:
+            self._queue.put_nowait((df, baseline_scores, baseline_flags))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.submitted += 1
+        self._ensure_worker()
+        return True
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                df, baseline_scores, baseline_flags = item
+                baseline_seconds = None
+                if self.baseline is not None:
+                    base, baseline_seconds = _timed_score(self.baseline, df)
+                    baseline_scores, baseline_flags = base['combined_score'], base['is_flagged']
+                scored, candidate_seconds = _timed_score(self.candidate, df)
+                self.comparison.update(baseline_scores, baseline_flags,
+                                       scored['combined_score'], scored['is_flagged'],
+                                       baseline_seconds, candidate_seconds)
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"Shadow scoring failed: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    def drain(self):
+        """Wait until every queued upload has been shadow-scored (tests, shutdown)"""
+        self._queue.join()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'candidate': self.candidate.label,
+            'baseline': self.baseline.label if self.baseline is not None else None,
+            'sample_rate': self.sample_rate,
+            'submitted': self.submitted,
+            'dropped': self.dropped,
+            'sampled_out': self.sampled_out,
+            'errors': self.errors,
+            'queue_depth': self._queue.qsize(),
+        }
+
+    def report(self) -> Dict[str, Any]:
+        return dict(self.comparison.report(), shadow=self.stats())
+
+
+def iter_request_frames(source: str = 'line_items', engine=None,
+                        chunk_size: int = REPLAY_CHUNK_SIZE,
+                        limit: Optional[int] = None) -> Iterator[Any]:
+    """
+    Stream historical lines as one DataFrame per invoice, in upload order
+
+    source='line_items' reads models.db_models.LineItem, 'invoice_lines' the
+    app_real InvoiceLine table; both are mapped to the columns score_lines
+    receives (description, billable_hours, rate, amount).
+    """
+    import pandas as pd
+    from sqlalchemy import column, select, table
+
+    if engine is None:
+        from db.database import engine
+    if source == 'line_items':
+        rows = table('line_items', column('id'), column('invoice_id'), column('description'),
+                     column('hours'), column('rate'), column('amount'))
+        amount = rows.c.amount
+    elif source == 'invoice_lines':
+        rows = table('invoice_lines', column('id'), column('invoice_id'), column('description'),
+                     column('hours'), column('rate'), column('line_total'))
+        amount = rows.c.line_total
+    else:
+        raise ValueError(f"Unknown replay source: {source}")
+
+    query = select(rows.c.invoice_id, rows.c.description, rows.c.hours.label('billable_hours'),
+                   rows.c.rate, amount.label('amount')).order_by(rows.c.invoice_id, rows.c.id)
+    if limit:
+        query = query.limit(limit)
+
+    columns = ['description', 'billable_hours', 'rate', 'amount']
+    current_id, pending = None, []
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(query)
+        for row in result:
+            if pending and row.invoice_id != current_id:
+                yield pd.DataFrame(pending, columns=columns)
+                pending = []
+            current_id = row.invoice_id
+            pending.append((row.description or '', row.billable_hours or 0,
+                            row.rate or 0, row.amount or 0))
+    if pending:
+        yield pd.DataFrame(pending, columns=columns)
+
+
+def replay(frames, baseline: ModelPair, candidate: ModelPair) -> Dict[str, Any]:
+    """Score every frame with both pairs and compare them"""
+    comparison = ScoreComparison(latency_window=None)
+    for df in frames:
+        base, base_seconds = _timed_score(baseline, df)
+        cand, cand_seconds = _timed_score(candidate, df)
+        comparison.update(base['combined_score'], base['is_flagged'],
+                          cand['combined_score'], cand['is_flagged'], base_seconds, cand_seconds)
+    return dict(comparison.report(), baseline=baseline.label, candidate=candidate.label)
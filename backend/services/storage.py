@@ -0,0 +1,399 @@
+"""
+Object storage backends for invoice PDFs and generated reports
+
+S3Backend shares one process-wide boto3 client (thread-safe, with a sized
+connection pool) and a tuned multipart TransferConfig. LocalBackend keeps
+objects under a directory with the same API, for on-prem installs and tests.
+Reads are range-aware and yield chunks, so Flask can stream an object
+without holding it in memory (see stream_response).
+
+    STORAGE_BACKEND            s3 | local (default: s3 when a bucket is set, else local)
+    S3_BUCKET / AWS_S3_BUCKET  bucket for the S3 backend
+    LOCAL_STORAGE_DIR          root directory for the local backend
+    S3_MULTIPART_THRESHOLD_MB  size at which uploads switch to multipart
+    S3_MULTIPART_CHUNKSIZE_MB  multipart part size
+    S3_MAX_CONCURRENCY         parallel part uploads/downloads per transfer
+    S3_MAX_POOL_CONNECTIONS    HTTP connections shared by all threads
+"""
+
+import logging
+import mimetypes
+import os
+import shutil
+import threading
+import uuid
+from typing import Dict, Iterator, Optional, Tuple
+
+try:
+    import boto3  # type: ignore
+    from boto3.s3.transfer import TransferConfig  # type: ignore
+    from botocore.config import Config  # type: ignore
+    from botocore.exceptions import ClientError  # type: ignore
+    BOTO3_AVAILABLE = True
+except Exception:  # boto3 is optional for local/on-prem installs
+    boto3 = None  # type: ignore
+    BOTO3_AVAILABLE = False
+
+    class ClientError(Exception):  # type: ignore
+        pass
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+STREAM_CHUNK_SIZE = int(os.getenv('STORAGE_STREAM_CHUNK_KB', '256')) * 1024
+LOCAL_STORAGE_DIR = os.getenv('LOCAL_STORAGE_DIR', os.path.join('data', 'storage'))
+
+ByteRange = Tuple[int, Optional[int]]  # (start, stop) with stop exclusive; start < 0 means suffix
+
+
+class StorageError(Exception):
+    pass
+
+
+class ObjectNotFound(StorageError):
+    pass
+
+
+class RangeNotSatisfiable(StorageError):
+    def __init__(self, size: int):
+        super().__init__(f"Range not satisfiable for object of {size} bytes")
+        self.size = size
+
+
+class StoredObject:
+    """An open (possibly partial) object: iterate it to get its bytes"""
+
+    def __init__(self, key: str, chunks: Iterator[bytes], length: int, size: int,
+                 start: int = 0, content_type: Optional[str] = None, partial: bool = False, close=None):
+        self.key = key
+        self.length = length
+        self.size = size
+        self.start = start
+        self.content_type = content_type or mimetypes.guess_type(key)[0] or 'application/octet-stream'
+        self.partial = partial
+        self._chunks = chunks
+        self._close = close
+
+    @property
+    def content_range(self) -> str:
+        return f"bytes {self.start}-{self.start + self.length - 1}/{self.size}"
+
+    def __iter__(self) -> Iterator[bytes]:
+        try:
+            yield from self._chunks
+        finally:
+            self.close()
+
+    def read(self) -> bytes:
+        return b''.join(self)
+
+    def close(self):
+        if self._close is not None:
+            self._close()
+            self._close = None
+
+
+def _resolve_range(byte_range: Optional[ByteRange], size: int) -> Optional[Tuple[int, int]]:
+    """Absolute (start, stop) for a requested range, None for the whole object"""
+    if byte_range is None:
+        return None
+    start, stop = byte_range
+    if start < 0:
+        start, stop = max(size + start, 0), size
+    stop = size if stop is None else min(stop, size)
+    if start >= size or start >= stop:
+        raise RangeNotSatisfiable(size)
+    return start, stop
+
+
+class StorageBackend:
+    """Common interface for object storage"""
+
+    name = 'base'
+
+    def upload_fileobj(self, fileobj, key: str, content_type: Optional[str] = None) -> str:
+        raise NotImplementedError
+
+    def upload_path(self, path: str, key: str, content_type: Optional[str] = None) -> str:
+        with open(path, 'rb') as f:
+            return self.upload_fileobj(f, key, content_type or mimetypes.guess_type(path)[0])
+
+    def open(self, key: str, byte_range: Optional[ByteRange] = None) -> StoredObject:
+        raise NotImplementedError
+
+    def size(self, key: str) -> int:
+        raise NotImplementedError
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.size(key)
+            return True
+        except ObjectNotFound:
+            return False
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def url(self, key: str, expiration: int = 3600) -> Optional[str]:
+        """Direct download URL if the backend has one (S3 presigned), else None"""
+        return None
+
+    def uri(self, key: str) -> str:
+        raise NotImplementedError
+
+
+_s3_client = None
+_s3_lock = threading.Lock()
+
+
+def get_s3_client():
+    """Process-wide boto3 S3 client; boto3 clients are safe to share across threads"""
+    global _s3_client
+    if not BOTO3_AVAILABLE:
+        raise StorageError("boto3 is not installed")
+    with _s3_lock:
+        if _s3_client is None:
+            _s3_client = boto3.client(
+                's3',
+                aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
+                aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
+                region_name=os.getenv('AWS_REGION', 'us-east-1'),
+                config=Config(
+                    max_pool_connections=int(os.getenv('S3_MAX_POOL_CONNECTIONS', '32')),
+                    retries={'max_attempts': 5, 'mode': 'adaptive'},
+                ),
+            )
+        return _s3_client
+
+
+def get_transfer_config():
+    """Multipart thresholds and concurrency for managed uploads/downloads"""
+    return TransferConfig(
+        multipart_threshold=int(os.getenv('S3_MULTIPART_THRESHOLD_MB', '16')) * MB,
+        multipart_chunksize=int(os.getenv('S3_MULTIPART_CHUNKSIZE_MB', '16')) * MB,
+        max_concurrency=int(os.getenv('S3_MAX_CONCURRENCY', '8')),
+        use_threads=True,
+    )
+
+
+def _s3_not_found(error: ClientError) -> bool:
+    code = str(getattr(error, 'response', {}).get('Error', {}).get('Code', ''))
+    return code in ('NoSuchKey', '404', 'NotFound')
+
+
+class S3Backend(StorageBackend):
+    name = 's3'
+
+    def __init__(self, bucket: Optional[str] = None, client=None):
+        self.bucket = bucket or s3_bucket_name()
+        if not self.bucket:
+            raise StorageError("S3 storage selected but no bucket configured (set S3_BUCKET)")
+        self.client = client or get_s3_client()
+
+    def upload_fileobj(self, fileobj, key: str, content_type: Optional[str] = None) -> str:
+        extra = {'ServerSideEncryption': 'AES256'}
+        if content_type:
+            extra['ContentType'] = content_type
+        self.client.upload_fileobj(fileobj, self.bucket, key, ExtraArgs=extra, Config=get_transfer_config())
+        return key
+
+    def upload_path(self, path: str, key: str, content_type: Optional[str] = None) -> str:
+        extra = {'ServerSideEncryption': 'AES256'}
+        content_type = content_type or mimetypes.guess_type(path)[0]
+        if content_type:
+            extra['ContentType'] = content_type
+        self.client.upload_file(path, self.bucket, key, ExtraArgs=extra, Config=get_transfer_config())
+        return key
+
+    def size(self, key: str) -> int:
+        try:
+            return int(self.client.head_object(Bucket=self.bucket, Key=key)['ContentLength'])
+        except ClientError as e:
+            if _s3_not_found(e):
+                raise ObjectNotFound(key) from e
+            raise
+
+    def open(self, key: str, byte_range: Optional[ByteRange] = None) -> StoredObject:
+        params = {'Bucket': self.bucket, 'Key': key}
+        if byte_range is not None:
+            start, stop = byte_range
+            if start < 0:
+                params['Range'] = f"bytes={start}"
+            else:
+                params['Range'] = f"bytes={start}-{'' if stop is None else stop - 1}"
+        try:
+            response = self.client.get_object(**params)
+        except ClientError as e:
+            if _s3_not_found(e):
+                raise ObjectNotFound(key) from e
+            if e.response.get('Error', {}).get('Code') == 'InvalidRange':
+                raise RangeNotSatisfiable(self.size(key)) from e
+            raise
+
+        body = response['Body']
+        length = int(response['ContentLength'])
+        content_range = response.get('ContentRange')
+        start, size = 0, length
+        if content_range:  # "bytes 0-99/1234"
+            span, total = content_range.split(' ', 1)[1].split('/')
+            start, size = int(span.split('-')[0]), int(total)
+        return StoredObject(key, body.iter_chunks(STREAM_CHUNK_SIZE), length, size, start,
+                            response.get('ContentType'), partial=bool(content_range), close=body.close)
+
+    def delete(self, key: str):
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    def url(self, key: str, expiration: int = 3600) -> Optional[str]:
+        return self.client.generate_presigned_url(
+            'get_object', Params={'Bucket': self.bucket, 'Key': key}, ExpiresIn=expiration
+        )
+
+    def uri(self, key: str) -> str:
+        return f"s3://{self.bucket}/{key}"
+
+
+class LocalBackend(StorageBackend):
+    """Objects as files under a root directory (on-prem installs and tests)"""
+
+    name = 'local'
+
+    def __init__(self, root: Optional[str] = None, bucket: Optional[str] = None):
+        base = os.path.abspath(root or LOCAL_STORAGE_DIR)
+        self.root = os.path.join(base, bucket) if bucket else base
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, key))
+        if os.path.commonpath([path, self.root]) != self.root or path == self.root:
+            raise StorageError(f"Invalid object key: {key}")
+        return path
+
+    def upload_fileobj(self, fileobj, key: str, content_type: Optional[str] = None) -> str:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                shutil.copyfileobj(fileobj, f, STREAM_CHUNK_SIZE)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return key
+
+    def size(self, key: str) -> int:
+        try:
+            return os.path.getsize(self._path(key))
+        except FileNotFoundError as e:
+            raise ObjectNotFound(key) from e
+
+    def open(self, key: str, byte_range: Optional[ByteRange] = None) -> StoredObject:
+        path = self._path(key)
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError as e:
+            raise ObjectNotFound(key) from e
+        size = os.fstat(f.fileno()).st_size
+        try:
+            resolved = _resolve_range(byte_range, size)
+        except RangeNotSatisfiable:
+            f.close()
+            raise
+        start, stop = resolved or (0, size)
+        f.seek(start)
+
+        def chunks():
+            remaining = stop - start
+            while remaining > 0:
+                chunk = f.read(min(STREAM_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+        return StoredObject(key, chunks(), stop - start, size, start, partial=resolved is not None, close=f.close)
+
+    def delete(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def uri(self, key: str) -> str:
+        return f"file://{self._path(key)}"
+
+
+_backends: Dict[Tuple[str, Optional[str]], StorageBackend] = {}
+_backends_lock = threading.Lock()
+
+
+def s3_bucket_name() -> Optional[str]:
+    """Configured bucket; docker-compose.prod.yml sets S3_BUCKET, older configs AWS_S3_BUCKET"""
+    return os.getenv('S3_BUCKET') or os.getenv('AWS_S3_BUCKET')
+
+
+def storage_backend_name() -> str:
+    """
+    STORAGE_BACKEND if set, else s3 whenever a bucket is configured. A configured
+    bucket without boto3 is an error (raised by get_storage), not a silent
+    fallback to container-local disk.
+    """
+    configured = os.getenv('STORAGE_BACKEND')
+    if configured:
+        return configured.lower()
+    return 's3' if s3_bucket_name() else 'local'
+
+
+def storage_configured() -> bool:
+    """True when a deployment has chosen somewhere to keep uploaded files"""
+    return bool(os.getenv('STORAGE_BACKEND') or s3_bucket_name())
+
+
+def get_storage(bucket: Optional[str] = None) -> StorageBackend:
+    """Return the configured backend (cached per bucket; S3 backends share one client)"""
+    name = storage_backend_name()
+    with _backends_lock:
+        backend = _backends.get((name, bucket))
+        if backend is None:
+            if name == 's3':
+                backend = S3Backend(bucket)
+            elif name == 'local':
+                backend = LocalBackend(bucket=bucket)
+            else:
+                raise StorageError(f"Unknown STORAGE_BACKEND: {name}")
+            _backends[(name, bucket)] = backend
+        return backend
+
+
+def reset_storage():
+    """Drop cached backends so the next get_storage() re-reads the environment"""
+    global _s3_client
+    with _backends_lock:
+        _backends.clear()
+    with _s3_lock:
+        _s3_client = None
+
+
+def stream_response(backend: StorageBackend, key: str, range_header=None, download_name: Optional[str] = None):
+    """
+    Flask response streaming an object in chunks, honouring a single-range
+    Range request (206 + Content-Range); multi-range requests get the whole object.
+    """
+    from flask import Response
+
+    byte_range = None
+    if range_header is not None and range_header.units == 'bytes' and len(range_header.ranges) == 1:
+        byte_range = range_header.ranges[0]
+
+    try:
+        obj = backend.open(key, byte_range)
+    except RangeNotSatisfiable as e:
+        return Response(status=416, headers={'Content-Range': f"bytes */{e.size}", 'Accept-Ranges': 'bytes'})
+
+    headers = {'Accept-Ranges': 'bytes', 'Content-Length': str(obj.length)}
+    if obj.partial:
+        headers['Content-Range'] = obj.content_range
+    if download_name:
+        headers['Content-Disposition'] = f'attachment; filename="{download_name}"'
+    return Response(iter(obj), status=206 if obj.partial else 200, headers=headers,
+                    mimetype=obj.content_type, direct_passthrough=True)
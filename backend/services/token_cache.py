@@ -0,0 +1,209 @@
+"""
+Bounded cache of verified JWT claims with per-user token versions
+
+Auth decorators and the rate-limit key function decode the same bearer
+token several times per request and again on every request after that.
+VerifiedTokenCache remembers the claims of tokens whose HS256 signature
+already checked out. Entries are keyed by (namespace, signature segment);
+the namespace is the signing secret, so a token verified under one key is
+never accepted under another. A hit skips signature verification and JSON
+parsing but still enforces:
+
+- exp: an entry is dropped as soon as the token expires
+- token versions: tokens carry a 'tv' claim, the user's version when the
+  token was issued. bump_token_version() (logout, password change) makes
+  every older token of that user invalid, cached or not.
+
+app_real decodes its tokens with PyJWT and serves them from this cache.
+Blueprint routes (dev_auth.verify_jwt_versioned) look their bearer token up
+here too and only fall back to flask-jwt-extended's verification on a miss;
+their entries live under a separate 'jwt-extended:' namespace.
+
+Versions are persisted on users.token_version, so they are shared by every
+worker and survive restarts. Each worker re-reads a user's version at most
+every TOKEN_VERSION_CHECK_INTERVAL seconds; bump() increments the column in
+one UPDATE and applies locally straight away.
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from sqlalchemy import func, select, update
+
+logger = logging.getLogger(__name__)
+
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', '10000'))
+TOKEN_VERSION_CHECK_INTERVAL = float(os.getenv('TOKEN_VERSION_CHECK_INTERVAL', '5.0'))
+VERSION_CLAIM = 'tv'
+
+
+def token_user_id(claims: Dict[str, Any]) -> Optional[str]:
+    """User id from app_real ('user_id') or flask-jwt-extended ('sub') claims"""
+    user_id = claims.get('user_id', claims.get('sub'))
+    return str(user_id) if user_id is not None else None
+
+
+def _default_session():
+    from db.database import get_db_session
+    return get_db_session()
+
+
+def _default_user_model():
+    from models.db_models import User
+    return User
+
+
+class TokenVersions:
+    """Per-user token versions stored on the users row, cached for check_interval seconds"""
+
+    def __init__(self, session_factory: Optional[Callable] = None, user_model=None,
+                 check_interval: float = TOKEN_VERSION_CHECK_INTERVAL):
+        self.session_factory = session_factory or _default_session
+        self.user_model = user_model
+        self.check_interval = check_interval
+        self._versions: Dict[str, int] = {}
+        self._checked_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _model(self):
+        return self.user_model if self.user_model is not None else _default_user_model()
+
+    def _stored(self, session, model, user_id: str):
+        return session.execute(select(model.token_version).where(model.id == int(user_id))).scalar()
+
+    def _remember(self, user_id: str, version: int) -> int:
+        with self._lock:
+            self._versions[user_id] = max(self._versions.get(user_id, 0), version)
+            self._checked_at[user_id] = time.monotonic()
+            return self._versions[user_id]
+
+    def get(self, user_id) -> int:
+        user_id = str(user_id)
+        if time.monotonic() - self._checked_at.get(user_id, float('-inf')) < self.check_interval:
+            return self._versions.get(user_id, 0)
+        try:
+            model = self._model()
+            session = self.session_factory()
+            try:
+                value = self._stored(session, model, user_id)
+            finally:
+                session.close()
+        except ValueError:
+            return 0
+        except Exception as e:
+            # Keep serving the last known version; retry on the next check
+            logger.warning(f"Token version lookup failed for user {user_id}: {str(e)}")
+            return self._versions.get(user_id, 0)
+        return self._remember(user_id, int(value or 0))
+
+    def bump(self, user_id) -> int:
+        """Increment the stored version; raises if it can't be persisted"""
+        user_id = str(user_id)
+        model = self._model()
+        session = self.session_factory()
+        try:
+            session.execute(
+                update(model)
+                .where(model.id == int(user_id))
+                .values(token_version=func.coalesce(model.token_version, 0) + 1)
+            )
+            session.commit()
+            value = self._stored(session, model, user_id)
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+        return self._remember(user_id, int(value or 0))
+
+
+class VerifiedTokenCache:
+    """LRU of verified token claims keyed by signature segment"""
+
+    def __init__(self, max_entries: int = TOKEN_CACHE_SIZE, versions: Optional[TokenVersions] = None):
+        self.max_entries = max_entries
+        self.versions = versions or TokenVersions()
+        # (namespace, signature) -> (token, claims, header)
+        self._entries: 'OrderedDict[Tuple[str, str], tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def is_revoked(self, claims: Dict[str, Any]) -> bool:
+        """Whether a user's token version moved past the one this token was issued with"""
+        user_id = token_user_id(claims)
+        if user_id is None:
+            return False
+        return int(claims.get(VERSION_CLAIM, 0)) < self.versions.get(user_id)
+
+    def get(self, token: str, namespace: str) -> Optional[Tuple[Dict[str, Any], Optional[Dict[str, Any]]]]:
+        """(claims, header) for a previously verified, unexpired, unrevoked token"""
+        key = (namespace, token.rpartition('.')[2])
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != token:
+                self.misses += 1
+                return None
+            exp = entry[1].get('exp')
+            if exp is not None and exp <= time.time():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+        if self.is_revoked(entry[1]):
+            return None
+        self.hits += 1
+        return entry[1], entry[2]
+
+    def put(self, token: str, namespace: str, claims: Dict[str, Any], header: Optional[Dict[str, Any]] = None):
+        """Remember claims of a token whose signature was just verified"""
+        key = (namespace, token.rpartition('.')[2])
+        with self._lock:
+            self._entries[key] = (token, claims, header)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_cache: Optional[VerifiedTokenCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_token_cache() -> VerifiedTokenCache:
+    """Process-wide verified token cache"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = VerifiedTokenCache()
+    return _cache
+
+
+def configure_token_versions(session_factory: Callable, user_model):
+    """Read and bump versions through another app's session and User model (app_real)"""
+    versions = get_token_cache().versions
+    versions.session_factory = session_factory
+    versions.user_model = user_model
+
+
+def token_version(user_id) -> int:
+    """Current version to embed as the 'tv' claim of new tokens"""
+    return get_token_cache().versions.get(user_id)
+
+
+def bump_token_version(user_id) -> int:
+    """Invalidate every token issued to user_id so far (logout, password change)"""
+    return get_token_cache().versions.bump(user_id)
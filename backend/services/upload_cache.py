@@ -0,0 +1,172 @@
+"""
+Content-addressed cache for invoice upload parsing and scoring
+
+Uploads are hashed (SHA-256 of the raw bytes) before any parsing. The
+parse/scoring result is stored on disk and in the upload_parse_cache table
+under (content_hash, parser_version, model_version), so resending an
+identical file skips PDF extraction and ML scoring entirely, and the row's
+invoice_id lets routes answer with an idempotent duplicate response. Bumping
+PARSER_VERSION or retraining a model changes the key and naturally
+invalidates old entries.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from sqlalchemy import select, update, insert
+from sqlalchemy.exc import IntegrityError
+
+from models.db_models import UploadParseCache
+
+logger = logging.getLogger(__name__)
+
+PARSER_VERSION = os.getenv('UPLOAD_PARSER_VERSION', '2')  # 2: shared services.pdf_extraction backend
+DEFAULT_CACHE_DIR = os.getenv('UPLOAD_CACHE_DIR', os.path.join('data', 'upload_cache'))
+MODELS_DIR = Path(__file__).parent.parent / "models"
+MODEL_FILE_SUFFIXES = ('.pkl', '.joblib')
+
+_table = UploadParseCache.__table__
+
+
+def file_sha256(data: bytes) -> str:
+    """SHA-256 hex digest of an uploaded file's bytes"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def model_version(models_dir: Optional[Path] = None) -> str:
+    """Fingerprint of the trained model files (name, size, mtime); changes on retrain"""
+    models_dir = Path(models_dir or MODELS_DIR)
+    digest = hashlib.sha256()
+    try:
+        for path in sorted(models_dir.iterdir()):
+            if path.suffix in MODEL_FILE_SUFFIXES:
+                stat = path.stat()
+                digest.update(f"{path.name}:{stat.st_size}:{stat.st_mtime_ns};".encode('utf-8'))
+    except FileNotFoundError:
+        pass
+    return digest.hexdigest()[:16]
+
+
+class UploadResultCache:
+    """Database- and disk-backed cache of upload results keyed by content hash"""
+
+    def __init__(self, cache_dir: Optional[str] = None, engine=None):
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self._engine = engine
+        self._table_ready = set()
+        self._lock = threading.Lock()
+
+    @property
+    def engine(self):
+        # Resolved lazily so rebind_engine() in tests is honoured
+        if self._engine is not None:
+            return self._engine
+        from db import database
+        return database.engine
+
+    def _ensure_table(self, engine):
+        if id(engine) not in self._table_ready:
+            with self._lock:
+                _table.create(engine, checkfirst=True)
+                self._table_ready.add(id(engine))
+
+    def _path(self, content_hash: str, parser_version: str, model_version: str) -> str:
+        variant = hashlib.sha256(f"{parser_version}|{model_version}".encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.cache_dir, content_hash[:2], f"{content_hash}.{variant}.json")
+
+    def get(self, content_hash: str, parser_version: str, model_version: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached upload result
+
+        The invoice link always comes from the database (it is only meaningful
+        there); the disk level still serves the parse result when the row is
+        missing, e.g. after the database was reset.
+
+        Returns:
+            {'result': ..., 'invoice_id': ...} or None on a miss
+        """
+        path = self._path(content_hash, parser_version, model_version)
+        row = None
+        try:
+            engine = self.engine
+            self._ensure_table(engine)
+            with engine.connect() as conn:
+                row = conn.execute(
+                    select(_table.c.result, _table.c.invoice_id).where(
+                        _table.c.content_hash == content_hash,
+                        _table.c.parser_version == parser_version,
+                        _table.c.model_version == model_version
+                    )
+                ).first()
+        except Exception as e:
+            logger.warning(f"Upload cache database lookup failed: {e}")
+
+        if row is not None:
+            if not os.path.exists(path):
+                self._write_disk(path, {'result': row.result})
+            return {'result': row.result, 'invoice_id': row.invoice_id}
+
+        try:
+            with open(path, 'r') as f:
+                return {'result': json.load(f).get('result'), 'invoice_id': None}
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def put(self, content_hash: str, parser_version: str, model_version: str,
+            result: Dict[str, Any], invoice_id: Optional[int] = None):
+        """Store (or replace) the result for a content hash on disk and in the database"""
+        self._write_disk(self._path(content_hash, parser_version, model_version), {'result': result})
+
+        key = (
+            _table.c.content_hash == content_hash,
+            _table.c.parser_version == parser_version,
+            _table.c.model_version == model_version
+        )
+        values = {'result': result, 'invoice_id': invoice_id, 'updated_at': datetime.utcnow()}
+        try:
+            engine = self.engine
+            self._ensure_table(engine)
+            with engine.begin() as conn:
+                updated = conn.execute(update(_table).where(*key).values(**values)).rowcount
+                if not updated:
+                    conn.execute(insert(_table).values(
+                        content_hash=content_hash, parser_version=parser_version,
+                        model_version=model_version, created_at=datetime.utcnow(), **values
+                    ))
+        except IntegrityError:
+            # A concurrent upload of the same file stored it first
+            pass
+        except Exception as e:
+            logger.warning(f"Upload cache database write failed: {e}")
+
+    @staticmethod
+    def _write_disk(path: str, entry: Dict[str, Any]):
+        """Write-then-rename so concurrent readers never see partial files"""
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(entry, f, default=str)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Upload cache disk write failed: {e}")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_upload_cache() -> UploadResultCache:
+    """Return the process-wide upload result cache"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = UploadResultCache()
+        return _cache
@@ -12,7 +12,7 @@ from flask import Flask, jsonify, request, make_response, Response
 from flask_cors import CORS
 from flask_socketio import SocketIO
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
-from werkzeug.security import generate_password_hash, check_password_hash
+from services.password_hashing import PasswordHasherBusy, busy_response, get_password_hasher
 from dotenv import load_dotenv
 import time
 
@@ -273,8 +273,15 @@ def create_app():
             session = get_db_session()
             user = session.query(User).filter_by(email=email).first()
             
-            if not user or not check_password_hash(user.password_hash, password):
+            if not user:
+                return None
+            ok, new_hash = get_password_hasher().verify(user.password_hash, password)
+            if not ok:
                 return None
+            if new_hash:
+                # Work factor changed since this hash was made
+                user.password_hash = new_hash
+                session.commit()
                 
             return {
                 'id': user.id,
@@ -283,6 +290,8 @@ def create_app():
                 'last_name': user.last_name,
                 'role': user.role
             }
+        except PasswordHasherBusy:
+            raise
         except Exception as e:
             logger.error(f"Authentication error: {e}")
             return None
@@ -318,6 +327,8 @@ def create_app():
                 'message': 'Login successful'
             })
             
+        except PasswordHasherBusy as e:
+            return busy_response(e)
         except Exception as e:
             logger.error(f"Login error: {str(e)}")
             return jsonify({'message': 'Login failed', 'error': str(e)}), 500
@@ -349,7 +360,7 @@ def create_app():
             # Create new user
             new_user = User(
                 email=email,
-                password_hash=generate_password_hash(password),
+                password_hash=get_password_hasher().hash(password),
                 first_name=first_name,
                 last_name=last_name,
                 role='user'
@@ -377,6 +388,8 @@ def create_app():
                 'user': user_data
             }), 201
             
+        except PasswordHasherBusy as e:
+            return busy_response(e)
         except Exception as e:
             logger.error(f"Registration error: {str(e)}")
             return jsonify({'message': 'Registration failed', 'error': str(e)}), 500
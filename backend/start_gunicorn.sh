@@ -54,6 +54,10 @@ except Exception as e:
     traceback.print_exc()
 "
 
+# NLP data and models, fetched once here rather than by every worker on first request
+echo "🔥 Warming up NLP resources..."
+python -m utils.nlp_resources || echo "⚠️  NLP warmup failed - requests fall back to basic tokenization"
+
 # Gunicorn production configuration
 WORKERS=2
 WORKER_CLASS=gthread  
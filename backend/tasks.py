@@ -3,15 +3,19 @@ from celery_worker import celery
 from models.invoice_analyzer import InvoiceAnalyzer
 from ml.models.risk_predictor import RiskPredictor
 from ml.models.vendor_analyzer import VendorAnalyzer
-from db.database import get_db_session, Invoice, Vendor, RiskFactor
+from db.database import get_db_session, Invoice, LineItem, Vendor, RiskFactor
 from services.notification_service import NotificationService
+from services.storage import StorageError, get_storage, s3_bucket_name, storage_configured
+from utils.lazy_imports import LazySingleton
 import time
 import os
 import logging
 from datetime import datetime, timedelta
 import io
-import boto3
 import tempfile
+import pandas as pd
+from celery import chord, group
+from sqlalchemy import delete, insert, select, update
 
 # Configure logging
 logging.basicConfig(
@@ -20,10 +24,15 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Initialize services
-invoice_analyzer = InvoiceAnalyzer()
-risk_predictor = RiskPredictor()
-vendor_analyzer = VendorAnalyzer()
+# Analyzers load models (and spaCy) on first use, not when the worker imports tasks
+invoice_analyzer = LazySingleton(InvoiceAnalyzer, 'InvoiceAnalyzer')
+risk_predictor = LazySingleton(RiskPredictor, 'RiskPredictor')
+vendor_analyzer = LazySingleton(VendorAnalyzer, 'VendorAnalyzer')
+# Invoices per scoring task; larger batches fan out across workers
+INVOICE_BATCH_CHUNK_SIZE = int(os.getenv('INVOICE_BATCH_CHUNK_SIZE', '500'))
+# Factor types written by InvoiceAnalyzer.score_batch (replaced on re-score)
+SCORED_FACTOR_TYPES = ('high_amount', 'excessive_hours', 'high_rate')
+
 # Defer notification service initialization as it requires socketio instance
 notification_service = None
 
@@ -51,7 +60,7 @@ def process_invoice(invoice_id):
             return {"status": "error", "message": "Invoice not found"}
         
         # Analyze invoice
-        analysis_result = invoice_analyzer.analyze_invoice(invoice)
+        analysis_result = invoice_analyzer.get().analyze_invoice(invoice)
         
         # Update invoice with analysis results
         invoice.risk_score = analysis_result.get('risk_score', 0)
@@ -93,23 +102,75 @@ def process_invoice(invoice_id):
     finally:
         session.close()
 
+def _forked_db():
+    """Drop connections inherited from the parent process (pool workers are forked)"""
+    from db import database
+    database.engine.dispose(close=False)
+
+
+def retrain_invoice_model(n_jobs=1, warm_start=False):
+    """Training job: invoice anomaly forest"""
+    _forked_db()
+    return InvoiceAnalyzer().retrain_model(warm_start=warm_start, n_jobs=n_jobs, refresh=False)
+
+
+def retrain_risk_model(n_jobs=1, warm_start=False):
+    """Training job: invoice risk regressor"""
+    # The ml.models predictor served by tasks has no retraining path; this one
+    # trains on the feature store and writes models/risk_prediction_model.joblib
+    from models.risk_predictor import RiskPredictor as RiskModelTrainer
+    _forked_db()
+    return RiskModelTrainer().retrain_model(warm_start=warm_start, n_jobs=n_jobs, refresh=False)
+
+
+def retrain_vendor_model(n_jobs=1, warm_start=False):
+    """Training job: vendor clustering (KMeans threads are capped by the orchestrator)"""
+    from models.vendor_analyzer import VendorAnalyzer as VendorClusterTrainer
+    _forked_db()
+    return VendorClusterTrainer().retrain_model(refresh=False)
+
+
 @celery.task(name="tasks.retrain_models")
-def retrain_models():
+def retrain_models(warm_start=None):
     """
     Periodically retrain ML models with new data
+
+    The three fits are independent and run in parallel under the training
+    CPU budget; with warm_start (TRAINING_WARM_START=1) the ensembles grow
+    trees on invoices added since their last fit instead of starting over.
     """
+    from ml.feature_store import get_feature_store
+    from ml.model_manager import ModelManager
+    from ml.training_orchestrator import TrainingJob, TrainingOrchestrator
+
+    if warm_start is None:
+        warm_start = os.getenv('TRAINING_WARM_START', '0') == '1'
     try:
-        # Retrain invoice anomaly detection model
-        invoice_analyzer.retrain_model()
-        
-        # Retrain risk prediction model
-        risk_predictor.retrain_model()
-        
-        # Retrain vendor clustering model
-        vendor_analyzer.retrain_model()
-        
+        # Catch the snapshot up once here; the jobs only read it
+        get_feature_store()
+
+        jobs = [
+            TrainingJob('invoice_analyzer', retrain_invoice_model, kwargs={'warm_start': warm_start},
+                        model_type='outlier_detector'),
+            TrainingJob('risk_predictor', retrain_risk_model, kwargs={'warm_start': warm_start},
+                        model_type='risk_predictor'),
+            TrainingJob('vendor_analyzer', retrain_vendor_model, model_type='vendor_cluster'),
+        ]
+        manager = ModelManager(os.getenv('MODEL_DIR', 'models'))
+        results = TrainingOrchestrator(model_manager=manager).run(jobs)
+
+        # Served analyzers reload the new artifacts on next use
+        for singleton in (invoice_analyzer, risk_predictor, vendor_analyzer):
+            singleton.reset()
+
+        summary = {name: {k: v for k, v in stats.items() if k != 'result'} for name, stats in results.items()}
+        errors = [name for name, stats in results.items() if stats['status'] == 'error']
+        if errors:
+            logger.error(f"Model retraining failed for: {', '.join(errors)}")
+            return {"status": "error", "message": f"Retraining failed for {', '.join(errors)}", "models": summary}
+
         logger.info("All models successfully retrained")
-        return {"status": "success"}
+        return {"status": "success", "warm_start": warm_start, "models": summary}
         
     except Exception as e:
         logger.error(f"Error retraining models: {str(e)}")
@@ -118,48 +179,199 @@ def retrain_models():
 @celery.task(name="tasks.upload_to_s3")
 def upload_to_s3(file_path, object_name=None):
     """
-    Upload a file to an S3 bucket
+    Upload a file to the report bucket (S3, or the local storage backend)
     """
     try:
         # If object_name not provided, use file_path's basename
         if object_name is None:
             object_name = os.path.basename(file_path)
             
-        # Get S3 bucket from config
-        s3_bucket = os.getenv('S3_BUCKET', 'legalspend-invoices')
-        
-        # Create S3 client
-        s3_client = boto3.client(
-            's3',
-            aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
-            aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
-            region_name=os.getenv('AWS_REGION', 'us-east-1')
-        )
-        
-        # Upload file
-        s3_client.upload_file(file_path, s3_bucket, object_name)
-        logger.info(f"File {file_path} uploaded to S3 bucket {s3_bucket} as {object_name}")
+        # Reports must not land on container-local disk unless local storage was chosen explicitly
+        if not storage_configured():
+            raise StorageError("No report storage configured: set S3_BUCKET (or STORAGE_BACKEND=local)")
+        # The backend reuses the process-wide client
+        storage = get_storage(s3_bucket_name() or 'legalspend-invoices')
+        storage.upload_path(file_path, object_name)
+        logger.info(f"File {file_path} uploaded to {storage.uri(object_name)}")
         
         return {
             "status": "success", 
-            "s3_path": f"s3://{s3_bucket}/{object_name}"
+            "s3_path": storage.uri(object_name)
         }
         
     except Exception as e:
         logger.error(f"Error uploading file to S3: {str(e)}")
         return {"status": "error", "message": str(e)}
 
+def _chunks(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+def score_invoices(invoice_ids, session=None):
+    """
+    Score a set of invoices in bulk: two reads (invoices, line items), one
+    vectorized model pass, then a bulk UPDATE of invoices and a bulk INSERT
+    of risk factors in a single commit. Returns one result per requested id.
+    """
+    owns_session = session is None
+    session = session or get_db_session()
+    try:
+        invoice_rows = session.execute(
+            select(Invoice.id, Invoice.amount, Invoice.hours, Invoice.rate, Invoice.analysis_result)
+            .where(Invoice.id.in_(invoice_ids))
+        ).all()
+        invoices = pd.DataFrame(invoice_rows, columns=['id', 'amount', 'hours', 'rate', 'analysis_result'])
+        line_items = pd.DataFrame(session.execute(
+            select(LineItem.invoice_id, LineItem.description, LineItem.hours, LineItem.rate,
+                   LineItem.timekeeper, LineItem.timekeeper_title)
+            .where(LineItem.invoice_id.in_(invoice_ids))
+        ).all(), columns=['invoice_id', 'description', 'hours', 'rate', 'timekeeper', 'timekeeper_title'])
+        
+        analyses = invoice_analyzer.get().score_batch(invoices, line_items) if len(invoices) else []
+        previous = dict(zip(invoices['id'], invoices['analysis_result']))
+        scored_at = datetime.utcnow()
+        
+        invoice_updates = []
+        risk_factors = []
+        for analysis in analyses:
+            invoice_id = analysis['invoice_id']
+            # Keep what other analyzers stored; replace this scorer's fields
+            analysis_result = dict(previous.get(invoice_id) or {})
+            analysis_result.update(risk_score=analysis['risk_score'], anomalies=analysis['anomalies'],
+                                   scored_at=scored_at.isoformat())
+            invoice_updates.append({'id': invoice_id, 'risk_score': analysis['risk_score'],
+                                    'analysis_result': analysis_result, 'processed': True,
+                                    'updated_at': scored_at})
+            risk_factors.extend({
+                'invoice_id': invoice_id,
+                'factor_type': anomaly['type'],
+                'description': anomaly['description'],
+                'severity': anomaly['severity'],
+                'impact_score': analysis['risk_score'],
+                'created_at': scored_at,
+            } for anomaly in analysis['anomalies'])
+        
+        if invoice_updates:
+            session.execute(update(Invoice), invoice_updates)
+            # Re-scoring replaces this scorer's factors instead of stacking duplicates
+            session.execute(
+                delete(RiskFactor)
+                .where(RiskFactor.invoice_id.in_([u['id'] for u in invoice_updates]),
+                       RiskFactor.factor_type.in_(SCORED_FACTOR_TYPES))
+                .execution_options(synchronize_session=False)
+            )
+            if risk_factors:
+                session.execute(insert(RiskFactor), risk_factors)
+            session.commit()
+        
+        by_id = {analysis['invoice_id']: analysis for analysis in analyses}
+        results = []
+        for invoice_id in invoice_ids:
+            analysis = by_id.get(invoice_id)
+            if analysis is None:
+                results.append({"invoice_id": invoice_id, "result": {"status": "error", "message": "Invoice not found"}})
+            else:
+                results.append({"invoice_id": invoice_id, "result": {
+                    "status": "success",
+                    "risk_score": analysis['risk_score'],
+                    "anomalies_count": len(analysis['anomalies'])
+                }})
+        return results
+    
+    except Exception:
+        session.rollback()
+        raise
+    
+    finally:
+        if owns_session:
+            session.close()
+
+def _batch_summary(results, errors=()):
+    processed = sum(1 for r in results if r["result"]["status"] == "success")
+    return {
+        "status": "completed" if not errors else "partial",
+        "processed": processed,
+        "not_found": len(results) - processed,
+        "errors": list(errors)
+    }
+
+@celery.task(name="tasks.score_invoice_chunk")
+def score_invoice_chunk(invoice_ids):
+    """
+    Score one chunk of a large batch (chord header task)
+    """
+    try:
+        return {"status": "success", "results": score_invoices(invoice_ids)}
+    except Exception as e:
+        logger.error(f"Error scoring invoice chunk of {len(invoice_ids)}: {str(e)}")
+        return {"status": "error", "invoice_ids": invoice_ids, "message": str(e)}
+
+@celery.task(name="tasks.summarize_invoice_batch")
+def summarize_invoice_batch(chunk_results):
+    """
+    Combine chunk results once every chunk has finished (chord callback)
+    """
+    results = []
+    errors = []
+    for chunk in chunk_results:
+        if chunk.get("status") == "success":
+            results.extend(chunk["results"])
+        else:
+            errors.append({"invoice_ids": chunk.get("invoice_ids", []), "message": chunk.get("message")})
+    summary = _batch_summary(results, errors)
+    summary["chunks"] = len(chunk_results)
+    
+    try:
+        get_notification_service().send_alert(
+            'invoice_batch_analyzed',
+            f"Scored {summary['processed']} invoices ({len(errors)} failed chunks)",
+            'warning' if errors else 'info'
+        )
+    except Exception as e:
+        logger.debug(f"Batch notification skipped: {str(e)}")
+    
+    logger.info(f"Invoice batch scored: {summary}")
+    return summary
+
 @celery.task(name="tasks.process_invoice_batch")
 def process_invoice_batch(invoice_ids):
     """
     Process a batch of invoices
+    
+    Up to INVOICE_BATCH_CHUNK_SIZE invoices are scored in this task. Larger
+    batches are split into a chord of score_invoice_chunk tasks that run
+    across workers, with summarize_invoice_batch as the callback.
     """
-    results = []
-    for invoice_id in invoice_ids:
-        result = process_invoice(invoice_id)
-        results.append({"invoice_id": invoice_id, "result": result})
+    invoice_ids = list(dict.fromkeys(int(i) for i in invoice_ids))
+    
+    if len(invoice_ids) <= INVOICE_BATCH_CHUNK_SIZE:
+        try:
+            results = score_invoices(invoice_ids)
+        except Exception as e:
+            logger.error(f"Error processing invoice batch: {str(e)}")
+            return {"status": "error", "message": str(e)}
+        summary = _batch_summary(results)
+        summary["results"] = results
+        return summary
+    
+    chunks = _chunks(invoice_ids, INVOICE_BATCH_CHUNK_SIZE)
+    result = chord(group(score_invoice_chunk.s(chunk) for chunk in chunks))(summarize_invoice_batch.s())
+    logger.info(f"Dispatched {len(invoice_ids)} invoices as {len(chunks)} chunks")
+    return {"status": "dispatched", "invoices": len(invoice_ids), "chunks": len(chunks), "chord_id": result.id}
+
+@celery.task(name="tasks.rescore_invoice_history")
+def rescore_invoice_history():
+    """
+    Re-score every invoice (nightly) as a parallel batch job
+    """
+    session = get_db_session()
+    try:
+        invoice_ids = session.execute(select(Invoice.id).order_by(Invoice.id)).scalars().all()
+    finally:
+        session.close()
     
-    return {"status": "completed", "results": results}
+    if not invoice_ids:
+        return {"status": "completed", "processed": 0, "not_found": 0, "errors": []}
+    return process_invoice_batch(invoice_ids)
 
 @celery.task(name="tasks.generate_monthly_report")
 def generate_monthly_report():
@@ -191,16 +403,18 @@ def generate_monthly_report():
         # Clean up temporary file
         os.unlink(tmp_path)
         
+        if upload_result.get("status") != "success":
+            return {"status": "error", "message": f"Report upload failed: {upload_result.get('message')}"}
+        
         # Send notification
-        if upload_result.get("status") == "success":
-            notification_service.send_notification(
-                'report_generated',
-                {
-                    'report_type': 'monthly',
-                    'report_date': date_str,
-                    'report_url': upload_result.get('s3_path')
-                }
-            )
+        notification_service.send_notification(
+            'report_generated',
+            {
+                'report_type': 'monthly',
+                'report_date': date_str,
+                'report_url': upload_result.get('s3_path')
+            }
+        )
         
         return {
             "status": "success", 
@@ -0,0 +1,67 @@
+import threading
+
+from services.ai_inference import InferenceCache, InferenceEngine, MicroBatcher
+
+
+def _stub_sentiment(calls):
+    """Local stand-in for the HF pipeline: records each batch it receives"""
+    def factory():
+        def run(texts):
+            calls.append(len(texts))
+            return [{'label': 'NEGATIVE' if 'breach' in text else 'POSITIVE', 'score': 0.9} for text in texts]
+        return run
+    return factory
+
+
+def _engine(tmp_path, calls, **kwargs):
+    engine = InferenceEngine(cache=InferenceCache(str(tmp_path)), **kwargs)
+    engine.register_pipeline('sentiment', _stub_sentiment(calls), version='stub')
+    return engine
+
+
+def test_concurrent_requests_share_batches(tmp_path):
+    calls = []
+    engine = _engine(tmp_path, calls, max_batch=32, max_wait_ms=50)
+    results = {}
+    barrier = threading.Barrier(16)
+
+    def worker(i):
+        barrier.wait()
+        results[i] = engine.classify(f'clause {i} breach' if i % 2 else f'clause {i}')
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sum(calls) == 16 and len(calls) < 16
+    assert results[1]['label'] == 'NEGATIVE' and results[2]['label'] == 'POSITIVE'
+    # Only the pipeline that was used got loaded
+    assert engine.loaded() == ['sentiment']
+
+
+def test_results_cached_in_memory_and_on_disk(tmp_path):
+    calls = []
+    engine = _engine(tmp_path, calls)
+    first = engine.run('sentiment', ['a', 'b', 'a'])
+    assert engine.run('sentiment', ['a', 'b']) == first[:2]
+    assert sum(calls) == 3
+
+    fresh_calls = []
+    fresh = _engine(tmp_path, fresh_calls)
+    assert fresh.run('sentiment', ['a', 'b', 'c'])[:2] == first[:2]
+    assert fresh_calls == [1] and fresh.cache.disk_hits == 2
+
+
+def test_batcher_propagates_errors():
+    def broken(inputs):
+        raise ValueError('model exploded')
+
+    future = MicroBatcher(broken, max_wait_ms=1).submit('x')
+    try:
+        future.result(timeout=5)
+    except ValueError as e:
+        assert 'exploded' in str(e)
+    else:
+        raise AssertionError('expected the batch error to reach the caller')
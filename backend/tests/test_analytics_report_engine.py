@@ -0,0 +1,181 @@
+"""
+Tests for the set-based analytics report engine against the per-row handlers it replaced
+"""
+from datetime import datetime
+
+from models.db_models import Invoice, LineItem, Vendor
+from models.enhanced_invoice_analyzer import (
+    EnhancedInvoiceAnalyzer, analyze_invoice_enhanced, analyze_invoices_enhanced
+)
+from services.analytics_report_engine import PRACTICE_AREA_KEYWORDS, AnalyticsReportEngine
+
+DATE_FROM, DATE_TO = '2031-01-01', '2031-12-31'
+
+
+def _seed(session):
+    """Invoices in 2031 over three vendors (plus one without) with distinct totals"""
+    vendors = [Vendor(name=name) for name in ('Alpha LLP', 'Beta & Co', 'Gamma Legal')]
+    session.add_all(vendors)
+    session.flush()
+    rows = [
+        # vendor, amount, risk_score, date, [(description, amount, hours, rate, timekeeper)]
+        (0, 12000.0, 85.0, datetime(2031, 1, 10), [
+            ('Trial preparation and court filings', 9000.0, 18.0, 500.0, 'Partner Smith'),
+            ('Lease review', 3000.0, 10.0, 300.0, 'Associate Jones'),
+        ]),
+        (0, 8000.0, 55.0, datetime(2031, 1, 28), [
+            ('Merger due diligence', 8000.0, 20.0, 400.0, 'Partner Lee'),
+        ]),
+        (1, 4500.0, 20.0, datetime(2031, 3, 5), [
+            ('Patent search', 2500.0, 10.0, 250.0, 'Associate Park'),
+            ('Employment policy advice', 2000.0, 8.0, 250.5, None),
+        ]),
+        (1, 2600.0, 0.0, datetime(2031, 4, 15), [
+            (None, 2600.0, 13.0, 0.0, 'Paralegal Diaz'),
+        ]),
+        (2, 950.0, None, datetime(2031, 4, 20), []),
+        (None, 1700.0, 75.0, datetime(2031, 6, 1), [
+            ('Tax compliance filing', 1700.0, 5.0, 340.0, 'Associate Jones'),
+        ]),
+    ]
+    for idx, (vendor, amount, risk, date, items) in enumerate(rows):
+        invoice = Invoice(invoice_number=f'ENG-{idx}', amount=amount, risk_score=risk, date=date,
+                          vendor_id=vendors[vendor].id if vendor is not None else None)
+        session.add(invoice)
+        session.flush()
+        session.add_all([
+            LineItem(invoice_id=invoice.id, description=description, amount=item_amount,
+                     hours=hours, rate=rate, timekeeper=timekeeper)
+            for description, item_amount, hours, rate, timekeeper in items
+        ])
+    # Outside the date range
+    session.add(Invoice(invoice_number='ENG-X', amount=99999.0, date=datetime(2030, 12, 31)))
+    session.commit()
+
+
+def _legacy_practice_area(description):
+    if not description:
+        return 'General'
+    lowered = description.lower()
+    for area, keywords in PRACTICE_AREA_KEYWORDS:
+        if any(word in lowered for word in keywords):
+            return area
+    return 'General'
+
+
+def _legacy_report(session):
+    """The per-invoice ORM loops generate_report ran before the engine"""
+    invoices = session.query(Invoice).filter(
+        Invoice.date >= datetime.strptime(DATE_FROM, '%Y-%m-%d'),
+        Invoice.date <= datetime.strptime(DATE_TO, '%Y-%m-%d')
+    ).all()
+    total_spend = sum(invoice.amount for invoice in invoices)
+
+    vendor_spend, practice_area_spend = {}, {}
+    all_rates, attorney_rates, monthly = [], {}, {}
+    for invoice in invoices:
+        vendor_name = invoice.vendor.name if invoice.vendor else 'Unknown'
+        vendor_spend[vendor_name] = vendor_spend.get(vendor_name, 0) + invoice.amount
+        monthly[invoice.date.strftime('%Y-%m')] = \
+            monthly.get(invoice.date.strftime('%Y-%m'), 0) + invoice.amount
+        for item in session.query(LineItem).filter(LineItem.invoice_id == invoice.id).all():
+            area = _legacy_practice_area(item.description)
+            practice_area_spend[area] = practice_area_spend.get(area, 0) + item.amount
+            if item.rate and item.rate > 0:
+                all_rates.append(item.rate)
+                attorney_rates.setdefault(item.timekeeper or 'Unknown', []).append(item.rate)
+
+    scored = [inv for inv in invoices if inv.risk_score]
+    high = [inv for inv in scored if inv.risk_score > 70]
+    attorneys = sorted(
+        ({'attorney': name, 'average_rate': sum(rates) / len(rates), 'rate_count': len(rates),
+          'rate_range': [min(rates), max(rates)]} for name, rates in attorney_rates.items()),
+        key=lambda a: a['average_rate'], reverse=True
+    )
+    top_vendors = sorted(vendor_spend.items(), key=lambda x: x[1], reverse=True)[:10]
+    return {
+        'summary': {
+            'total_spend': total_spend, 'invoice_count': len(invoices),
+            'average_invoice_amount': total_spend / len(invoices),
+            'unique_vendors': len(vendor_spend), 'report_type': 'comprehensive'
+        },
+        'vendor_analysis': {
+            'top_vendors': [{'name': name, 'spend': spend, 'percentage': spend / total_spend * 100}
+                            for name, spend in top_vendors],
+            'vendor_diversity': len(vendor_spend),
+            'concentration_risk': top_vendors[0][1] / total_spend * 100
+        },
+        'practice_area_analysis': {'breakdown': [
+            {'practice_area': area, 'spend': spend, 'percentage': spend / total_spend * 100}
+            for area, spend in sorted(practice_area_spend.items(), key=lambda x: x[1], reverse=True)
+        ]},
+        'risk_analysis': {
+            'high_risk_count': len(high),
+            'medium_risk_count': len([inv for inv in scored if 40 <= inv.risk_score <= 70]),
+            'low_risk_count': len([inv for inv in scored if inv.risk_score < 40]),
+            'high_risk_spend': sum(inv.amount for inv in high),
+            'average_risk_score': sum(inv.risk_score for inv in scored) / len(scored)
+        },
+        'rate_analysis': {
+            'average_rate': sum(all_rates) / len(all_rates),
+            'rate_range': [min(all_rates), max(all_rates)],
+            'total_rate_entries': len(all_rates),
+            'attorney_analysis': attorneys[:10]
+        },
+        'monthly_trends': [{'month': month, 'spend': spend}
+                           for month, spend in sorted(monthly.items())],
+        'ml_insights': {
+            insight
+            for invoice in invoices[:10]
+            for insight in analyze_invoice_enhanced({
+                'id': invoice.id, 'amount': invoice.amount,
+                'vendor': invoice.vendor.name if invoice.vendor else 'Unknown',
+                'date': invoice.date.isoformat(),
+                'line_items': [
+                    # The old loop passed NULL descriptions through and lost that invoice's
+                    # insights to an AttributeError; the engine analyzes it as ''
+                    {'description': item.description or '', 'amount': item.amount,
+                     'hours': item.hours or 0, 'rate': item.rate or 0,
+                     'attorney': item.timekeeper or 'Unknown'}
+                    for item in session.query(LineItem).filter(LineItem.invoice_id == invoice.id)
+                ]
+            }).get('insights') or []
+        },
+    }
+
+
+def test_engine_matches_per_row_report(session):
+    _seed(session)
+    report = AnalyticsReportEngine(session).generate(DATE_FROM, DATE_TO)
+    expected = _legacy_report(session)
+
+    assert set(report['ml_insights']) == expected.pop('ml_insights')
+    for section, value in expected.items():
+        assert _approx(report[section]) == _approx(value), section
+
+
+def _approx(value):
+    """Round floats so sums in a different order compare equal"""
+    if isinstance(value, dict):
+        return {key: _approx(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_approx(item) for item in value]
+    if isinstance(value, float):
+        return round(value, 6)
+    return value
+
+
+def test_one_bad_invoice_does_not_fail_the_batch():
+    analyzer = EnhancedInvoiceAnalyzer()
+    good = {'id': 1, 'amount': 1000, 'line_items': [
+        {'description': 'Court hearing', 'hours': 2, 'rate': 500, 'amount': 1000,
+         'attorney': 'Partner A'}
+    ]}
+    bad = {'id': 2, 'amount': 'n/a', 'line_items': []}
+
+    results = analyzer.analyze_invoices([good, bad, dict(good, id=3)])
+
+    assert [r.get('invoice_id') for r in results] == [1, None, 3]
+    assert 'error' in results[1] and 'error' not in results[0]
+    assert results[0]['insights'] == analyzer.analyze_invoice(good)['insights']
+    assert analyze_invoices_enhanced([]) == []
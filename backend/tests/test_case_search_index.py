@@ -0,0 +1,75 @@
+import sqlite3
+
+import pytest
+
+from services.case_search_index import CaseSearchIndex, build_match_query
+
+collector_module = pytest.importorskip('data_integration.real_data_collector')
+
+
+def _case(name, docket, court, filed, nature='Contract', attorneys=()):
+    return collector_module.LegalCase(
+        case_name=name, docket_number=docket, court=court, filed_date=filed,
+        case_type=nature, nature_of_suit=nature, parties=[], attorneys=list(attorneys),
+        law_firms=[], status='open'
+    )
+
+
+@pytest.fixture
+def collector(tmp_path):
+    return collector_module.RealDataCollector(data_dir=str(tmp_path))
+
+
+def test_collector_inserts_are_searchable_with_filters(collector):
+    collector._save_cases_to_db([
+        _case('Acme Corp v. Widget Inc', '1:24-cv-001', 'Southern District of New York',
+              '2024-03-01', 'Breach of contract dispute', ['Jane Doe']),
+        _case('Smith v. Jones', '2:23-cv-777', 'Northern District of California',
+              '2023-06-15', 'Contract dispute over licensing'),
+        _case('United States v. Doe', '3:22-cr-010', 'Southern District of New York',
+              '2022-01-10', 'Fraud'),
+    ])
+    index = CaseSearchIndex(str(collector.db_path))
+
+    results = index.search('contract dispute')
+    assert {r['title'] for r in results} == {'Acme Corp v. Widget Inc', 'Smith v. Jones'}
+    assert results[0]['relevance'] == 100 and '<mark>' in results[0]['excerpt']
+
+    by_court = index.search('contract', court='new york')
+    assert [r['title'] for r in by_court] == ['Acme Corp v. Widget Inc']
+    by_date = index.search('contract', date_to='2023-12-31')
+    assert [r['title'] for r in by_date] == ['Smith v. Jones']
+    # No case mentions both terms, so any-term matching kicks in
+    any_term = index.search('fraud licensing')
+    assert {r['title'] for r in any_term} == {'United States v. Doe', 'Smith v. Jones'}
+
+
+def test_replaced_rows_are_reindexed_not_duplicated(collector):
+    for nature in ('Antitrust', 'Patent'):
+        collector._save_cases_to_db([
+            _case('Acme Corp v. Widget Inc', '1:24-cv-001', 'SDNY', '2024-03-01', nature)
+        ])
+    index = CaseSearchIndex(str(collector.db_path))
+
+    assert index.search('antitrust') == []
+    [hit] = index.search('patent')
+    assert index.stats()['indexed'] == 1
+    assert index.get_case(hit['id'])['nature_of_suit'] == 'Patent'
+
+
+def test_existing_rows_indexed_on_first_use(tmp_path):
+    db_path = tmp_path / 'legal_data.db'
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE cases (id TEXT PRIMARY KEY, case_name TEXT, "
+                     "docket_number TEXT, court TEXT, filed_date TEXT, case_type TEXT, "
+                     "nature_of_suit TEXT, parties TEXT, attorneys TEXT, law_firms TEXT, "
+                     "status TEXT, estimated_value REAL, complexity_score INTEGER)")
+        conn.execute("INSERT INTO cases (id, case_name, court) "
+                     "VALUES ('c1', 'Doe v. Roe', 'Ninth Circuit')")
+
+    assert [r['id'] for r in CaseSearchIndex(str(db_path)).search('roe')] == ['c1']
+    assert CaseSearchIndex(str(tmp_path / 'missing.db')).search('roe') == []
+
+
+def test_match_query_quotes_user_syntax():
+    assert build_match_query('NEAR(a b) OR "x"*') == '"NEAR" AND "a" AND "b" AND "OR" AND "x"'
@@ -0,0 +1,66 @@
+import numpy as np
+
+from services.case_vector_index import CaseVectorIndex, HashingTfidfEncoder, VECTORS_FILE
+from services.courtlistener_service import CourtListenerClient
+
+TOPICS = [
+    ('patent infringement semiconductor wafer design', 'District of Delaware'),
+    ('securities fraud class action misleading statements', 'Southern District of New York'),
+    ('employment discrimination wrongful termination', 'Northern District of California'),
+    ('breach of software license agreement', 'District of Massachusetts'),
+]
+
+
+def _records(per_topic=50):
+    records = []
+    for t, (topic, court) in enumerate(TOPICS):
+        for i in range(per_topic):
+            records.append({
+                'id': f'{t}-{i}', 'case_name': f'Case {t}-{i}', 'court': court,
+                'text': f'{topic} filed by plaintiff {i} against defendant {t}'
+            })
+    return records
+
+
+def test_exact_search_ranks_topic_and_uses_memmap(tmp_path):
+    index = CaseVectorIndex(str(tmp_path))
+    meta = index.build(_records(), encoder=HashingTfidfEncoder(dim=8192), ivf=False)
+
+    assert meta['count'] == 200 and meta['dim'] == 8192
+    assert (tmp_path / VECTORS_FILE).stat().st_size == 200 * 8192 * 4
+    assert isinstance(index.matrix, np.memmap) and index.matrix.dtype == np.float32
+
+    results = index.search('semiconductor patent infringement claim', k=5)
+    assert len(results) == 5 and all(r['id'].startswith('0-') for r in results)
+    assert results[0]['score'] >= results[-1]['score'] > 0
+    assert index.search('zzzz qqqq') == []
+
+    filtered = index.search('patent claim against defendant', k=3, court='new york')
+    assert len(filtered) == 3 and all(r['court'] == 'Southern District of New York' for r in filtered)
+
+
+def test_ivf_matches_exact_top_hit(tmp_path):
+    index = CaseVectorIndex(str(tmp_path))
+    meta = index.build(_records(), encoder=HashingTfidfEncoder(dim=8192), ivf=True, nlist=4)
+    assert meta['ivf'] and meta['nlist'] == 4
+
+    query = 'wrongful termination discrimination lawsuit'
+    exact = index.search(query, k=3, mode='exact')
+    approx = index.search(query, k=3, mode='ivf', nprobe=2)
+    assert approx[0]['id'] == exact[0]['id']
+
+
+def test_reloads_after_rebuild_and_serves_similar_cases(tmp_path, monkeypatch):
+    index = CaseVectorIndex(str(tmp_path))
+    index.build(_records(5), encoder=HashingTfidfEncoder(dim=8192))
+    reader = CaseVectorIndex(str(tmp_path))
+    assert len(reader.search('software license', k=50)) == 5
+
+    index.build(_records(10), encoder=HashingTfidfEncoder(dim=8192))
+    assert len(reader.search('software license', k=50)) == 10 and reader.meta['count'] == 40
+
+    monkeypatch.setattr('services.courtlistener_service.get_case_vector_index', lambda: reader)
+    client = CourtListenerClient()
+    monkeypatch.setattr(client, '_make_request', lambda *a, **k: (_ for _ in ()).throw(AssertionError('network')))
+    cases = client.search_similar_cases('breach of software license', limit=3)
+    assert len(cases) == 3 and cases[0]['source'] == 'Local Index'
@@ -0,0 +1,67 @@
+"""
+Tests for parallel company-dataset filtering
+"""
+import pandas as pd
+
+from data_processing.company_data_processor import CompanyDataProcessor, csv_byte_ranges
+
+
+def _company_csv(path, rows=1200, multiline=False):
+    industries = ['law practice', 'software', 'legal services', 'retail', 'hospital & health care']
+    names = ['smith legal group', 'acme widgets', 'jones & co', 'counsel partners', 'blue sky inc']
+    df = pd.DataFrame({
+        'id': [f'co-{i}' for i in range(rows)],
+        'name': [f'{names[i % 5]} {i}' for i in range(rows)],
+        'industry': [industries[(i // 5) % 5] if i % 7 else None for i in range(rows)],
+        'country': ['united states' if i % 2 else 'canada' for i in range(rows)],
+        'size': ['1-10'] * rows,
+    })
+    if multiline:
+        # Quoted fields spanning lines, with escaped quotes inside
+        df['name'] = df['name'] + '\n"the" firm, est.\n' + df['id']
+    df.to_csv(path, index=False)
+    return str(path)
+
+
+def _serial(processor):
+    chunks = [chunk for _, chunk in processor.iter_legal_company_chunks(chunk_size=100)]
+    return pd.concat(chunks, ignore_index=True)
+
+
+def test_parallel_parquet_output_matches_serial_filter(tmp_path):
+    csv_path = _company_csv(tmp_path / 'companies.csv')
+    processor = CompanyDataProcessor(csv_path)
+    serial = _serial(processor)
+
+    columns, ranges = csv_byte_ranges(csv_path, 8)
+    assert columns == ['id', 'name', 'industry', 'country', 'size'] and len(ranges) > 1
+
+    summary = processor.filter_to_parquet(str(tmp_path / 'out'), chunk_size=100, max_workers=2)
+    parallel = pd.read_parquet(tmp_path / 'out').sort_values('id').reset_index(drop=True)
+    expected = serial.sort_values('id').reset_index(drop=True)
+
+    assert summary['rows'] == 1200 and summary['matched'] == len(serial) > 0
+    pd.testing.assert_frame_equal(parallel[serial.columns], expected)
+
+    processor.filter_to_parquet(str(tmp_path / 'by_country'), chunk_size=100, max_workers=2,
+                                partition_by='country')
+    partitioned = pd.read_parquet(tmp_path / 'by_country')
+    assert sorted(partitioned['id']) == sorted(serial['id'])
+
+    # A rerun into the same directory replaces the parts of the earlier run
+    processor.filter_to_parquet(str(tmp_path / 'out'), chunk_size=300, max_workers=2)
+    assert len(pd.read_parquet(tmp_path / 'out')) == len(serial)
+
+
+def test_quoted_multiline_fields_split_on_record_boundaries(tmp_path):
+    csv_path = _company_csv(tmp_path / 'companies.csv', rows=400, multiline=True)
+    processor = CompanyDataProcessor(csv_path)
+    serial = _serial(processor)
+
+    columns, ranges = csv_byte_ranges(csv_path, 16)
+    assert len(columns) == 5 and len(ranges) > 1
+
+    # The production entry point runs the parallel pipeline and keeps input order
+    parallel = processor.load_and_filter_legal_companies(max_workers=2)
+    assert len(serial) > 0
+    pd.testing.assert_frame_equal(parallel[serial.columns], serial)
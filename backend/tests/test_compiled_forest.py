@@ -0,0 +1,111 @@
+"""
+Parity tests: compiled node-array forests vs sklearn
+"""
+import logging
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import (ExtraTreesRegressor, GradientBoostingClassifier,
+                              GradientBoostingRegressor, IsolationForest, RandomForestClassifier,
+                              RandomForestRegressor)
+
+from ml.compiled_forest import CompiledGradientBoostingRegressor, compile_forest, fast_model
+from ml.training_orchestrator import warm_start_fit
+
+rng = np.random.default_rng(7)
+X = rng.normal(size=(2000, 6))
+X_test = np.vstack([rng.normal(size=(300, 6)) * 3, X[:20]])
+labels = (X[:, 0] > 0).astype(int) + (X[:, 1] > 1)
+
+
+TARGETS = {'labels': labels, 'values': X[:, 2]}
+
+
+@pytest.mark.parametrize('model, target, methods', [
+    (IsolationForest(random_state=0), None, ['score_samples', 'decision_function', 'predict']),
+    (IsolationForest(max_samples=500, max_features=0.5, contamination=0.05, random_state=0), None,
+     ['score_samples', 'predict']),
+    (RandomForestClassifier(n_estimators=40, random_state=0), 'labels',
+     ['predict_proba', 'predict']),
+    (RandomForestRegressor(n_estimators=25, max_depth=12, random_state=0), 'values', ['predict']),
+    (ExtraTreesRegressor(n_estimators=10, random_state=0), 'values', ['predict']),
+    (GradientBoostingRegressor(random_state=0), 'values', ['predict']),
+    (GradientBoostingRegressor(loss='huber', init='zero', learning_rate=0.3, subsample=0.7,
+                               max_depth=5, random_state=0), 'values', ['predict']),
+])
+def test_compiled_matches_sklearn_bit_for_bit(model, target, methods):
+    model.fit(X) if target is None else model.fit(X, TARGETS[target])
+    compiled = compile_forest(model)
+    for method in methods:
+        np.testing.assert_array_equal(getattr(compiled, method)(X_test),
+                                      getattr(model, method)(X_test))
+    # One-row scoring, the upload path
+    first, method = X_test[:1], methods[0]
+    np.testing.assert_array_equal(getattr(compiled, method)(first), getattr(model, method)(first))
+
+
+def test_fast_model_handles_names_refits_and_unsupported(caplog):
+    frame = pd.DataFrame(X, columns=list('abcdef'))
+    forest = IsolationForest(n_estimators=20, random_state=0).fit(frame)
+    compiled = fast_model(forest)
+    assert compiled is not forest and fast_model(forest) is compiled
+    shuffled = frame[list('fedcba')].head(5)
+    np.testing.assert_array_equal(compiled.score_samples(shuffled),
+                                  forest.score_samples(frame.head(5)))
+
+    # Warm start adds trees: the cached compilation is rebuilt
+    warm_start_fit(forest, frame.head(300), extra_trees=5)
+    assert fast_model(forest).n_estimators == 25
+    np.testing.assert_array_equal(fast_model(forest).score_samples(frame),
+                                  forest.score_samples(frame))
+
+    boosted = GradientBoostingClassifier(n_estimators=5).fit(X, labels)
+    with caplog.at_level(logging.INFO, logger='ml.compiled_forest'):
+        assert fast_model(boosted) is boosted
+    assert 'No compiled form for GradientBoostingClassifier' in caplog.text
+    with pytest.raises(ValueError):
+        compiled.score_samples(X[:, :3])
+
+
+def test_risk_predictor_scores_compiled_after_gradient_boosting_retrain(monkeypatch, tmp_path):
+    from sklearn import model_selection
+
+    from ml import feature_store
+    from ml.feature_store import RISK_FEATURE_COLUMNS
+    from models.risk_predictor import RiskPredictor
+
+    values = rng.normal(size=(120, len(RISK_FEATURE_COLUMNS)))
+    frame = pd.DataFrame(values, columns=RISK_FEATURE_COLUMNS)
+    frame['id'] = np.arange(1, 121)
+    frame['risk_score'] = frame['amount'] * 10 + frame['hours'] ** 2
+
+    class Store:
+        rows = 100
+
+        def invoice_training_frame(self):
+            return frame.head(self.rows)
+
+    store = Store()
+    monkeypatch.setattr(feature_store, 'get_feature_store', lambda refresh=True: store)
+    # Make gradient boosting win model selection
+    monkeypatch.setattr(model_selection, 'cross_val_score', lambda model, *args, **kwargs: np.array(
+        [0.0 if isinstance(model, GradientBoostingRegressor) else -1.0]))
+
+    predictor = RiskPredictor()
+    predictor.model_path = str(tmp_path / 'risk_model.joblib')
+    predictor.scaler_path = str(tmp_path / 'risk_scaler.joblib')
+
+    assert predictor.retrain_model()
+    assert isinstance(predictor.model, GradientBoostingRegressor)
+    scaled = predictor.scaler.transform(frame[RISK_FEATURE_COLUMNS].values)
+    compiled = fast_model(predictor.model)
+    assert isinstance(compiled, CompiledGradientBoostingRegressor)
+    np.testing.assert_array_equal(compiled.predict(scaled), predictor.model.predict(scaled))
+
+    # Warm start adds boosting stages: recompiled, still identical
+    store.rows = 120
+    assert predictor.retrain_model(warm_start=True)
+    compiled = fast_model(predictor.model)
+    assert compiled.n_estimators == predictor.model.n_estimators_ > 100
+    np.testing.assert_array_equal(compiled.predict(scaled), predictor.model.predict(scaled))
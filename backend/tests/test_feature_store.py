@@ -0,0 +1,104 @@
+"""
+Tests for the columnar training-data feature store
+"""
+from datetime import datetime
+
+from ml.feature_store import FeatureStore, INVOICE_FEATURE_COLUMNS, RISK_FEATURE_COLUMNS
+from models.db_models import Invoice, LineItem, RiskFactor, Vendor
+
+
+def _seed(session, vendor_name, invoice_number, amount):
+    vendor = Vendor(name=vendor_name, risk_profile=0.3)
+    session.add(vendor)
+    session.flush()
+    invoice = Invoice(invoice_number=invoice_number, vendor_id=vendor.id, amount=amount,
+                      hours=10.0, rate=amount / 10, description='Litigation support',
+                      risk_score=0.4, date=datetime(2025, 1, 15))
+    session.add(invoice)
+    session.flush()
+    session.add_all([
+        LineItem(invoice_id=invoice.id, description='Draft motion', hours=6.0,
+                 timekeeper='A. Smith', timekeeper_title='Partner'),
+        LineItem(invoice_id=invoice.id, description='Research', hours=4.0,
+                 timekeeper='B. Jones', timekeeper_title='Senior Associate'),
+        RiskFactor(invoice_id=invoice.id, factor_type='high_amount', severity='high'),
+    ])
+    session.commit()
+    return invoice
+
+
+def test_refresh_builds_invoice_training_frame(session, tmp_path):
+    invoice = _seed(session, 'Store Firm', 'FS-001', 5000.0)
+    store = FeatureStore(str(tmp_path))
+
+    appended = store.refresh(session)
+    assert appended['invoices'] == 1
+    assert appended['line_items'] == 2
+
+    df = store.invoice_training_frame()
+    row = df[df['id'] == invoice.id].iloc[0]
+    assert set(INVOICE_FEATURE_COLUMNS + RISK_FEATURE_COLUMNS) <= set(df.columns)
+    assert row['line_item_count'] == 2
+    assert row['unique_timekeepers'] == 2
+    assert row['partner_hours'] == 6.0
+    assert row['associate_ratio'] == 0.4
+    assert row['has_high_amount'] == 1
+    assert row['is_litigation'] == 1
+
+
+def test_refresh_is_incremental(session, tmp_path):
+    _seed(session, 'First Firm', 'FS-010', 1000.0)
+    store = FeatureStore(str(tmp_path))
+    store.refresh(session)
+    version = store.version
+
+    # Nothing new: no part written, version unchanged
+    assert not any(store.refresh(session).values())
+    assert store.version == version
+
+    _seed(session, 'Second Firm', 'FS-011', 2000.0)
+    appended = store.refresh(session)
+    assert appended['invoices'] == 1
+    assert store.version == version + 1
+    assert len(store.load('invoices')) == 2
+
+    # Reopening the store resumes from the persisted watermark
+    reopened = FeatureStore(str(tmp_path))
+    assert reopened.watermark('invoices') == store.watermark('invoices')
+    assert len(reopened.vendor_training_frame()) == 2
+
+
+def test_rescore_replaces_risk_factor_snapshot(session, tmp_path):
+    from tasks import score_invoices
+
+    invoice = _seed(session, 'Rescored Firm', 'FS-020', 250000.0)
+    untouched = _seed(session, 'Untouched Firm', 'FS-021', 3000.0)
+    store = FeatureStore(str(tmp_path))
+    store.refresh(session)
+    stale_ids = set(store.load('risk_factors')['id'])
+
+    # Re-scoring deletes and re-inserts this invoice's scored factors
+    score_invoices([invoice.id], session=session)
+    score_invoices([invoice.id], session=session)
+    appended = store.refresh(session)
+
+    current = {(rf.id, rf.factor_type, rf.impact_score)
+               for rf in session.query(RiskFactor).filter_by(invoice_id=invoice.id)}
+    # Only the re-scored invoice's rows are re-extracted, not the whole table
+    assert appended['risk_factors'] == len(current) and appended['line_items'] == 2
+    snapshot = store.load('risk_factors')
+    rescored = snapshot[snapshot['invoice_id'] == invoice.id]
+    assert set(zip(rescored['id'], rescored['factor_type'], rescored['impact_score'])) == current
+    assert not (stale_ids - {rf_id for rf_id, _, _ in current}) & set(rescored['id'])
+    assert len(snapshot[snapshot['invoice_id'] == untouched.id]) == 1
+
+    row = store.invoice_training_frame().set_index('id').loc[invoice.id]
+    assert row['risk_factor_count'] == len(current)
+
+    # An updated invoice left without line items drops its old ones
+    session.query(LineItem).filter_by(invoice_id=untouched.id).delete()
+    session.get(Invoice, untouched.id).status = 'reviewed'
+    session.commit()
+    store.refresh(session)
+    items = FeatureStore(str(tmp_path)).load('line_items')
+    assert set(items['invoice_id']) == {invoice.id} and items['id'].dtype == 'int64'
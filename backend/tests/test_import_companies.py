@@ -0,0 +1,84 @@
+"""
+Tests for the bulk, resumable company-dataset vendor import
+"""
+import pandas as pd
+
+from data_processing import import_companies
+from data_processing.import_companies import bulk_import_legal_companies
+from models.db_models import Vendor
+
+HEADER = 'id,name,industry,size,founded,country,region,locality,website,linkedin_url\n'
+
+
+def _import(session, tmp_path, name, rows):
+    csv_path = tmp_path / f'{name}.csv'
+    csv_path.write_text(HEADER + ''.join(f"{row}\n" for row in rows))
+    return bulk_import_legal_companies(str(csv_path), chunk_size=10, session=session,
+                                       checkpoint_path=str(tmp_path / f'{name}.json'))
+
+
+def test_import_inserts_then_updates_on_conflict(session, tmp_path):
+    summary = _import(session, tmp_path, 'first', [
+        'c-1,acme legal,law practice,11-50,1975,united states,ny,new york,acme.example,',
+        'c-2,beta ip,intellectual property,1-10,2001,united states,ca,san jose,,',
+    ])
+    assert (summary['imported'], summary['updated'], summary['skipped']) == (2, 0, 0)
+
+    acme = session.query(Vendor).filter_by(external_id='c-1').one()
+    acme.status = 'Active'
+    session.commit()
+
+    # Same external id again: refresh the company fields, keep LAIT's status
+    summary = _import(session, tmp_path, 'second', [
+        'c-1,acme legal,law practice,201-500,1975,united states,ny,new york,acme.example,',
+        'c-3,Beta IP,litigation,1-10,2010,united states,ca,oakland,,',
+    ])
+    assert (summary['imported'], summary['updated'], summary['skipped']) == (0, 1, 1)
+
+    session.expire_all()
+    acme = session.query(Vendor).filter_by(external_id='c-1').one()
+    assert acme.firm_size_category == 'Mid-Size Law Firm' and acme.status == 'Active'
+    assert session.query(Vendor).filter_by(external_id='c-3').first() is None
+
+
+def test_malformed_rows_do_not_abort_the_batch(session, tmp_path, monkeypatch):
+    build = import_companies.build_vendor_records
+
+    def build_with_unwritable_row(df):
+        records = build(df)
+        # A value the driver can't bind stands in for a row the database rejects
+        unbindable = pd.Series([{'bad': 1}], dtype=object).values
+        records.loc[records['external_id'] == 'm-3', 'city'] = unbindable
+        return records
+
+    monkeypatch.setattr(import_companies, 'build_vendor_records', build_with_unwritable_row)
+    summary = _import(session, tmp_path, 'bad', [
+        'm-1,good firm,law practice,11-50,not-a-year,united states,ny,albany,,',
+        'm-2,too,many,fields,in,this,line,for,the,header,x,y',
+        'm-3,broken firm,law practice,1-10,1999,united states,ny,buffalo,,',
+        'm-4,fine firm,legal services,1-10,1990,united states,ny,ithaca,,',
+    ])
+
+    assert summary['completed'] and summary['failed'] == 1 and summary['imported'] == 2
+    vendors = session.query(Vendor).filter(Vendor.external_id.like('m-%'))
+    imported = {v.external_id: v for v in vendors}
+    assert set(imported) == {'m-1', 'm-4'}
+    assert imported['m-1'].founded_year is None
+
+
+def test_raw_dataset_is_filtered_in_parallel_then_imported(session, tmp_path):
+    csv_path = tmp_path / 'raw.csv'
+    csv_path.write_text(HEADER + ''.join([
+        'r-1,"north\nlegal, llp",law practice,11-50,1980,united states,ny,albany,,\n',
+        'r-2,widget co,retail,1-10,1999,united states,ny,albany,,\n',
+        'r-3,south counsel,legal services,1-10,2005,united states,ca,fresno,,\n',
+    ]))
+    summary = bulk_import_legal_companies(str(csv_path), prefiltered=False, chunk_size=10,
+                                          session=session, max_workers=1,
+                                          checkpoint_path=str(tmp_path / 'raw.json'))
+
+    assert summary['completed'] and summary['filtered'] and summary['imported'] == 2
+    vendors = session.query(Vendor).filter(Vendor.external_id.like('r-%'))
+    names = {v.external_id: v.name for v in vendors}
+    assert names == {'r-1': 'North\nLegal, Llp', 'r-3': 'South Counsel'}
+    assert not (tmp_path / 'raw.csv.legal_parquet').exists()
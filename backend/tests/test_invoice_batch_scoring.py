@@ -0,0 +1,90 @@
+"""
+Tests for batch-native invoice scoring in tasks.process_invoice_batch
+"""
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import IsolationForest
+from sklearn.preprocessing import StandardScaler
+from sqlalchemy import event
+
+import tasks
+from ml.feature_store import INVOICE_FEATURE_COLUMNS
+from models.db_models import Invoice, LineItem, RiskFactor, Vendor
+from models.invoice_analyzer import InvoiceAnalyzer
+
+
+@pytest.fixture
+def analyzer(session, monkeypatch):
+    analyzer = InvoiceAnalyzer()
+    rng = np.random.default_rng(0)
+    train = pd.DataFrame(rng.uniform(1, 100, size=(200, len(INVOICE_FEATURE_COLUMNS))),
+                         columns=INVOICE_FEATURE_COLUMNS)
+    analyzer.scaler = StandardScaler().fit(train)
+    analyzer.isolation_forest = IsolationForest(random_state=0).fit(analyzer.scaler.transform(train))
+    monkeypatch.setattr(tasks.invoice_analyzer, 'get', lambda: analyzer)
+    return analyzer
+
+
+def _seed(session, count=6):
+    vendor = Vendor(name='Batch Firm')
+    session.add(vendor)
+    session.flush()
+    ids = []
+    for i in range(count):
+        amount = 120000.0 if i == 0 else 1000.0 * (i + 1)
+        invoice = Invoice(invoice_number=f'BATCH-{i}', vendor_id=vendor.id, amount=amount,
+                          date=datetime(2025, 1, 1), analysis_result={'upload': 'kept'})
+        session.add(invoice)
+        session.flush()
+        session.add_all([
+            LineItem(invoice_id=invoice.id, description='Draft brief', hours=5.0,
+                     rate=1200.0 if i == 0 else 300.0, timekeeper='A', timekeeper_title='Partner'),
+            LineItem(invoice_id=invoice.id, description='Research', hours=3.0, rate=200.0,
+                     timekeeper='B', timekeeper_title='Associate'),
+        ])
+        ids.append(invoice.id)
+    session.commit()
+    return ids
+
+
+def test_batch_scores_with_two_reads_and_one_commit(session, analyzer):
+    ids = _seed(session)
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement.split()[0].upper())
+    event.listen(session.get_bind(), 'before_cursor_execute', listener)
+    try:
+        result = tasks.process_invoice_batch(ids + [999999])
+    finally:
+        event.remove(session.get_bind(), 'before_cursor_execute', listener)
+
+    assert result['status'] == 'completed'
+    assert result['processed'] == 6 and result['not_found'] == 1
+    assert result['results'][-1]['result']['message'] == 'Invoice not found'
+    assert statements.count('SELECT') == 2
+
+    session.expire_all()
+    flagged = session.get(Invoice, ids[0])
+    assert flagged.processed and flagged.analysis_result['upload'] == 'kept'
+    assert flagged.risk_score > session.get(Invoice, ids[1]).risk_score
+    types = {rf.factor_type for rf in session.query(RiskFactor).filter_by(invoice_id=ids[0])}
+    assert types == {'high_amount', 'high_rate'}
+
+    # Re-scoring replaces the scorer's factors rather than duplicating them
+    tasks.process_invoice_batch(ids)
+    assert session.query(RiskFactor).filter_by(invoice_id=ids[0]).count() == 2
+
+
+def test_large_batch_fans_out_as_chord(session, analyzer, monkeypatch):
+    ids = _seed(session, count=5)
+    monkeypatch.setattr(tasks, 'INVOICE_BATCH_CHUNK_SIZE', 2)
+    monkeypatch.setitem(tasks.celery.conf, 'task_always_eager', True)
+
+    dispatched = tasks.process_invoice_batch(ids)
+    assert dispatched['status'] == 'dispatched' and dispatched['chunks'] == 3
+
+    summary = tasks.summarize_invoice_batch([tasks.score_invoice_chunk(chunk) for chunk in tasks._chunks(ids, 2)])
+    assert summary['processed'] == 5 and summary['chunks'] == 3 and not summary['errors']
+    assert session.query(Invoice).filter(Invoice.processed.is_(True)).count() == 5
@@ -0,0 +1,37 @@
+import sys
+
+from utils.lazy_imports import LazySingleton, lazy_import, register_warmup, warmup
+from utils import nlp_resources
+
+
+def test_lazy_import_defers_until_attribute_access():
+    sys.modules.pop('colorsys', None)
+    module = lazy_import('colorsys')
+    assert 'colorsys' not in sys.modules
+    assert module.rgb_to_hsv(0, 0, 0) == (0.0, 0.0, 0.0)
+    assert 'colorsys' in sys.modules
+
+
+def test_lazy_singleton_builds_once():
+    calls = []
+    holder = LazySingleton(lambda: calls.append(1) or object(), 'test')
+    assert not holder.loaded
+    first = holder.get()
+    assert holder.get() is first
+    assert calls == [1]
+    holder.reset()
+    assert holder.get() is not first
+
+
+def test_warmup_reports_failures_without_raising():
+    register_warmup('test_ok', lambda: None)
+    register_warmup('test_broken', lambda: 1 / 0)
+    report = warmup(['test_ok', 'test_broken', 'test_missing'])
+    assert report['test_ok']['ok']
+    assert not report['test_broken']['ok'] and 'division' in report['test_broken']['error']
+    assert report['test_missing']['error'] == 'unknown warmup step'
+
+
+def test_tokenize_and_stop_words_work_without_downloads():
+    assert nlp_resources.tokenize('Review 3 invoices') == ['Review', '3', 'invoices']
+    assert 'the' in nlp_resources.get_stop_words()
@@ -0,0 +1,45 @@
+"""
+Tests for the live data service timer wheel and insight cache
+"""
+import pytest
+
+pytest.importorskip('aiohttp')
+
+from services.live_data_service import RealTimeLegalDataService, TimerWheel, TTLCache
+
+
+def test_timer_wheel_fires_after_delay_across_rounds():
+    wheel = TimerWheel(tick=1.0, slots=4)
+    wheel.schedule('fast', 2)
+    wheel.schedule('slow', 9)
+
+    fired = {}
+    for tick in range(1, 10):
+        for key in wheel.advance():
+            fired[key] = tick
+    assert fired == {'fast': 2, 'slow': 9}
+    assert len(wheel) == 0
+
+
+def test_ttl_cache_bounds_entries_and_bytes():
+    cache = TTLCache(max_entries=2, max_bytes=10_000, ttl=60)
+    cache.set('a', {'x': 1})
+    cache.set('b', {'x': 2})
+    cache.get('a')
+    cache.set('c', {'x': 3})
+    assert 'b' not in cache and 'a' in cache and 'c' in cache
+    assert cache.stats()['bytes'] == sum(TTLCache._sizeof(v) for _, v in cache.items())
+
+    cache.set('expired', {'x': 4}, ttl=0)
+    assert cache.get('expired') is None
+
+
+def test_backoff_grows_and_resets():
+    service = RealTimeLegalDataService(jitter=0.0, base_backoff=10, max_backoff=1000)
+    source = service.data_sources[0]
+    source.update_frequency = 15
+    # A failing source is never polled sooner than a healthy one
+    assert [service._next_delay(source, False) for _ in range(4)] == [15, 20, 40, 80]
+    assert max(service._next_delay(source, False) for _ in range(10)) == 1000
+    assert service._next_delay(source, True) == 15
+    assert service._failures[source.name] == 0
@@ -0,0 +1,88 @@
+"""
+Tests for the bounded login throttle and atomic failed-login counters
+"""
+from types import SimpleNamespace
+
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+
+from models.db_models import User
+from services import login_throttle
+from services.login_throttle import InMemoryThrottleStore
+from user_management_adapter import SecurityManager
+
+
+def test_sliding_window_counters_are_bounded_and_expire(monkeypatch):
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(login_throttle, 'time', SimpleNamespace(time=lambda: clock.now, monotonic=lambda: clock.now))
+    store = InMemoryThrottleStore(max_keys=3)
+
+    for _ in range(4):
+        store.hit('a@example.com:login', window=100)
+    assert store.count('a@example.com:login', window=100) == 4
+
+    # Half of the previous window still overlaps, then it drops out entirely
+    clock.now = 1150.0
+    assert store.count('a@example.com:login', window=100) == 2
+    clock.now = 1300.0
+    assert store.count('a@example.com:login', window=100) == 0
+
+    for i in range(10):
+        store.hit(f'user{i}:login', window=100)
+    assert len(store) == 3 and store.count('user0:login', window=100) == 0
+
+
+def test_security_manager_throttles_with_single_updates(session):
+    session.add(User(email='throttle@example.com', password_hash=generate_password_hash('secret123')))
+    session.commit()
+    manager = SecurityManager(throttle_store=InMemoryThrottleStore())
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement.split()[0].upper())
+    event.listen(session.get_bind(), 'before_cursor_execute', listener)
+    try:
+        for _ in range(5):
+            assert manager.check_rate_limit('throttle@example.com', 'login')
+            manager.record_login_attempt('throttle@example.com', False, '127.0.0.1')
+        manager.record_login_attempt('nobody@example.com', False, '127.0.0.1')
+    finally:
+        event.remove(session.get_bind(), 'before_cursor_execute', listener)
+
+    assert statements == ['UPDATE'] * 6
+    assert not manager.check_rate_limit('throttle@example.com', 'login')
+    assert manager.check_rate_limit('nobody@example.com', 'login')
+    session.expire_all()
+    user = session.query(User).filter_by(email='throttle@example.com').one()
+    assert user.failed_login_attempts == 5 and user.last_failed_login is not None
+
+    manager.record_login_attempt('throttle@example.com', True, '127.0.0.1')
+    session.expire_all()
+    assert session.query(User).filter_by(email='throttle@example.com').one().failed_login_attempts == 0
+
+
+def test_lapsed_lockout_restarts_the_failure_count(session):
+    from datetime import datetime, timedelta
+
+    import pytest
+
+    from user_management_adapter import AuthenticationError, UserManager
+
+    session.add(User(email='lapsed@example.com', password_hash=generate_password_hash('secret123'),
+                     failed_login_attempts=5,
+                     last_failed_login=datetime.utcnow() - timedelta(minutes=31)))
+    session.commit()
+    manager = SecurityManager(throttle_store=InMemoryThrottleStore())
+    users = UserManager()
+
+    # The 30-minute lock has lapsed: one wrong password must not lock the account again
+    manager.record_login_attempt('lapsed@example.com', False, '127.0.0.1')
+    session.expire_all()
+    user = session.query(User).filter_by(email='lapsed@example.com').one()
+    assert user.failed_login_attempts == 1
+    assert users.authenticate_user('lapsed@example.com', 'secret123')['id'] == user.id
+
+    # Failures inside the window still add up to a lock
+    for _ in range(4):
+        manager.record_login_attempt('lapsed@example.com', False, '127.0.0.1')
+    with pytest.raises(AuthenticationError, match='locked'):
+        users.authenticate_user('lapsed@example.com', 'secret123')
@@ -0,0 +1,79 @@
+"""
+Tests for the bounded password hashing pool and rehash-on-login
+"""
+import threading
+from contextlib import contextmanager
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+from models.db_models import User
+from services import password_hashing
+from services.password_hashing import PasswordHasher, PasswordHasherBusy
+
+
+def test_verify_rehashes_when_work_factor_changes():
+    hasher = PasswordHasher(workers=1, queue_limit=1, method='pbkdf2:sha256:1000')
+    old_hash = generate_password_hash('Password123', method='pbkdf2:sha256:2000')
+
+    assert hasher.verify(old_hash, 'wrong') == (False, None)
+    ok, new_hash = hasher.verify(old_hash, 'Password123')
+    assert ok and new_hash.startswith('pbkdf2:sha256:1000$')
+    assert hasher.verify(new_hash, 'Password123') == (True, None)
+    assert hasher.stats()['rehashed'] == 1
+    hasher.close()
+
+
+CREDENTIALS = {'email': 'default@example.com', 'password': 'Password123'}
+
+
+@contextmanager
+def saturated(hasher):
+    """Occupy the hasher's only slot until the block exits"""
+    release = threading.Event()
+    blocker = threading.Thread(target=hasher._run, args=(release.wait,))
+    blocker.start()
+    try:
+        yield
+    finally:
+        release.set()
+        blocker.join()
+
+
+def test_saturated_pool_rejects_and_login_returns_503(client, session, monkeypatch):
+    hasher = PasswordHasher(workers=1, queue_limit=0, method='pbkdf2:sha256:1000')
+    monkeypatch.setattr(password_hashing, '_hasher', hasher)
+    with saturated(hasher):
+        with pytest.raises(PasswordHasherBusy):
+            hasher.hash('Password123')
+
+        response = client.post('/api/auth/login', json=CREDENTIALS)
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '1'
+
+    # Once the pool drains, login succeeds and upgrades the default scrypt hash
+    response = client.post('/api/auth/login', json=CREDENTIALS)
+    assert response.status_code == 200
+    session.expire_all()
+    stored = session.query(User).filter_by(email='default@example.com').one().password_hash
+    assert stored.startswith('pbkdf2:sha256:1000$')
+    hasher.close()
+
+
+def test_unified_app_and_adapter_logins_use_the_pool(client, session, monkeypatch):
+    from unified_app import create_app
+    from user_management_adapter import UserManager
+
+    hasher = PasswordHasher(workers=1, queue_limit=0, method='pbkdf2:sha256:1000')
+    monkeypatch.setattr(password_hashing, '_hasher', hasher)
+    unified = create_app().test_client()
+    with saturated(hasher):
+        response = unified.post('/api/auth/login', json=CREDENTIALS)
+        assert response.status_code == 503 and response.headers['Retry-After'] == '1'
+        with pytest.raises(PasswordHasherBusy):
+            UserManager().authenticate_user(*CREDENTIALS.values())
+
+    assert UserManager().authenticate_user(*CREDENTIALS.values())['email'] == CREDENTIALS['email']
+    assert unified.post('/api/auth/login', json=CREDENTIALS).status_code == 200
+    assert hasher.stats()['rehashed'] == 1
+    hasher.close()
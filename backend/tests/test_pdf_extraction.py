@@ -0,0 +1,45 @@
+"""
+Tests for the shared PDF extraction backend
+"""
+import pytest
+
+pytest.importorskip('pdfplumber')
+fitz = pytest.importorskip('fitz')
+
+from scripts.benchmark_pdf_extraction import build_sample_invoice
+from services.pdf_extraction import extract_pdf, extract_pdf_text
+
+
+@pytest.fixture
+def invoice_pdf(tmp_path):
+    path = tmp_path / 'invoice.pdf'
+    build_sample_invoice(str(path), pages=4)
+    return str(path)
+
+
+def test_fast_path_matches_pdfplumber_tables(invoice_pdf):
+    fast = extract_pdf(invoice_pdf, tables=True, engine='pymupdf')
+    reference = extract_pdf(invoice_pdf, tables=True, engine='pdfplumber')
+
+    assert fast.page_count == reference.page_count == 4
+    # Only the ruled pages (0 and 2) go through the table finder
+    assert [bool(page.tables) for page in fast.pages] == [True, False, True, False]
+    assert fast.tables == reference.tables
+    assert 'INV-2025-0000' in fast.text
+
+
+def test_bytes_source_and_text_only(invoice_pdf):
+    with open(invoice_pdf, 'rb') as f:
+        data = f.read()
+    result = extract_pdf(data, tables=False)
+    assert result.tables == []
+    assert extract_pdf_text(data) == result.text
+
+
+def test_parallel_page_ranges_preserve_order(invoice_pdf, monkeypatch):
+    import services.pdf_extraction as pdf_extraction
+    monkeypatch.setattr(pdf_extraction, 'PARALLEL_MIN_PAGES', 2)
+
+    result = extract_pdf(invoice_pdf, tables=True, max_workers=2)
+    assert [page.number for page in result.pages] == [0, 1, 2, 3]
+    assert len(result.tables) == 2
@@ -0,0 +1,73 @@
+import pytest
+
+from services.pii_redaction import PIIRedactor, apply_redactions, chunk_text, ner_only_disable
+
+spacy = pytest.importorskip('spacy')
+
+
+@pytest.fixture
+def ruler_nlp():
+    """Small real pipeline whose entity_ruler tags two names as PERSON"""
+    nlp = spacy.blank('en')
+    nlp.add_pipe('sentencizer')
+    ruler = nlp.add_pipe('entity_ruler')
+    ruler.add_patterns([
+        {'label': 'PERSON', 'pattern': 'Jane Doe'},
+        {'label': 'PERSON', 'pattern': 'John Smith'},
+    ])
+    return nlp
+
+
+def test_regex_mode_redacts_identifiers_in_one_pass():
+    text = ("Contact jane@firm.com or 555-123-4567. SSN 123-45-6789, "
+            "card 4111 1111 1111 1111. Total $1,250.00")
+    redacted = PIIRedactor(mode='regex').redact(text)
+    assert redacted == ("Contact [REDACTED] or [REDACTED]. SSN [REDACTED], "
+                        "card [REDACTED]. Total $1,250.00")
+
+
+def test_ner_mode_redacts_names_across_chunks(ruler_nlp):
+    paragraphs = [f"Paragraph {i}: reviewed by John Smith, call 555.987.6543." for i in range(50)]
+    text = '\n\n'.join(paragraphs) + '\n\nApproved by Jane Doe'
+    redactor = PIIRedactor(mode='ner', nlp=ruler_nlp, chunk_chars=300, batch_size=4)
+
+    redacted = redactor.redact(text)
+
+    assert 'John Smith' not in redacted and 'Jane Doe' not in redacted
+    assert '555.987.6543' not in redacted
+    assert redacted.count('[REDACTED]') == 101
+    assert redactor.redact(text, mode='regex').count('[REDACTED]') == 50
+
+
+def test_ner_only_disable_keeps_entity_components(ruler_nlp):
+    assert ner_only_disable(ruler_nlp) == ['sentencizer']
+
+
+def test_chunks_cover_text_and_overlapping_spans_merge():
+    text = ('word ' * 1000) + '\n\n' + ('tail ' * 10)
+    chunks = list(chunk_text(text, max_chars=700))
+    assert ''.join(chunk for _, chunk in chunks) == text
+    assert all(text[offset:offset + len(chunk)] == chunk for offset, chunk in chunks)
+    assert apply_redactions('abcdefgh', [(1, 3), (2, 5), (6, 7)]) == 'a[REDACTED]f[REDACTED]h'
+
+
+def test_ner_mode_fails_closed_without_a_spacy_model(monkeypatch, caplog, client):
+    from services import pii_redaction
+
+    def missing_model(*args, **kwargs):
+        raise OSError("Can't find model 'en_core_web_sm'")
+
+    monkeypatch.setattr(pii_redaction, 'get_spacy_nlp', missing_model)
+    redactor = PIIRedactor(mode='ner')
+    monkeypatch.setattr(pii_redaction, '_redactor', redactor)
+
+    with pytest.raises(pii_redaction.PIIRedactionUnavailable):
+        redactor.redact('Approved by Jane Doe, jane@firm.com')
+    assert any(r.levelname == 'ERROR' and 'PII_REDACTION_MODE=regex' in r.getMessage()
+               for r in caplog.records)
+    assert redactor.status() == {'mode': 'ner', 'ner_available': False, 'ready': False}
+    assert client.get('/api/health').json['pii_redaction']['ready'] is False
+
+    # Choosing regex mode explicitly still redacts identifiers
+    assert redactor.redact('jane@firm.com', mode='regex') == '[REDACTED]'
+    assert PIIRedactor(mode='regex').status()['ready'] is True
@@ -0,0 +1,114 @@
+"""
+Tests for ProductionLegalDataService scheduling and insight dedup
+"""
+import asyncio
+import sqlite3
+
+import pytest
+
+pytest.importorskip('aiohttp')
+
+from services.production_live_data_service import ProductionLegalDataService, insight_content_hash
+
+
+def _insight(title):
+    return {
+        'source': 'Test Source',
+        'title': title,
+        'content': 'Body',
+        'category': 'news',
+        'impact_score': 0.5,
+        'relevance_score': 0.5
+    }
+
+
+class _Response:
+    def __init__(self, status, headers=None):
+        self.status = status
+        self.headers = headers or {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def json(self):
+        return {}
+
+
+class _ConditionalSession:
+    """Answers 304 when the request carries the current ETag"""
+
+    def __init__(self):
+        self.requests = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.requests.append(headers)
+        etag = f'"{url}"'
+        if headers.get('If-None-Match') == etag:
+            return _Response(304)
+        return _Response(200, {'ETag': etag})
+
+
+def test_conditional_get_returns_304_and_stores_nothing(tmp_path):
+    service = ProductionLegalDataService(db_path=str(tmp_path / 'cache.sqlite'))
+    service.session = session = _ConditionalSession()
+    enabled = [s for s in service.data_sources if s.enabled]
+
+    async def fetch_twice():
+        return await service.fetch_live_data(force=True), await service.fetch_live_data(force=True)
+
+    first, second = asyncio.run(fetch_twice())
+    assert first and second == []
+    initial, conditional = session.requests[:len(enabled)], session.requests[len(enabled):]
+    assert all('If-None-Match' not in headers for headers in initial)
+    assert [headers['If-None-Match'] for headers in conditional] == [f'"{s.url}"' for s in enabled]
+    assert service.get_service_status()['total_insights'] == len(first)
+
+
+def test_init_backfills_content_hash_for_existing_rows(tmp_path):
+    db_path = str(tmp_path / 'cache.sqlite')
+    conn = sqlite3.connect(db_path)
+    conn.execute('''
+        CREATE TABLE legal_insights (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, source TEXT NOT NULL, title TEXT NOT NULL,
+            content TEXT, category TEXT, impact_score REAL DEFAULT 0.0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, relevance_score REAL DEFAULT 0.0
+        )
+    ''')
+    conn.executemany(
+        'INSERT INTO legal_insights (source, title, content, category) VALUES (?, ?, ?, ?)',
+        [(i['source'], i['title'], i['content'], i['category'])
+         for i in (_insight('A'), _insight('B'), _insight('A'))]
+    )
+    conn.commit()
+    conn.close()
+
+    service = ProductionLegalDataService(db_path=db_path)
+    rows = service._connection().execute('SELECT id, content_hash FROM legal_insights ORDER BY id')
+    assert rows.fetchall() == [
+        (1, insight_content_hash(_insight('A'))),
+        (2, insight_content_hash(_insight('B'))),
+    ]
+    assert service._store_insights([_insight('A'), _insight('C')]) == 1
+
+
+def test_store_insights_skips_duplicates(tmp_path):
+    service = ProductionLegalDataService(db_path=str(tmp_path / 'cache.sqlite'))
+
+    assert service._store_insights([_insight('A'), _insight('B'), _insight('A')]) == 2
+    assert service._store_insights([_insight('B'), _insight('C')]) == 1
+    assert service.get_service_status()['total_insights'] == 3
+
+
+def test_due_sources_respect_update_frequency(tmp_path):
+    service = ProductionLegalDataService(db_path=str(tmp_path / 'cache.sqlite'))
+    enabled = [s for s in service.data_sources if s.enabled]
+    assert len(service.due_sources(now=0.0)) == len(enabled)
+
+    for source in enabled:
+        source.last_fetched = 100.0
+    assert service.due_sources(now=101.0) == []
+    longest = max(s.update_frequency for s in enabled)
+    assert len(service.due_sources(now=100.0 + longest)) == len(enabled)
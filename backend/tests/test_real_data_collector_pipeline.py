@@ -0,0 +1,77 @@
+import asyncio
+import sqlite3
+import time
+
+import pytest
+
+pytest.importorskip('aiohttp')
+collector_module = pytest.importorskip('data_integration.real_data_collector')
+
+from data_integration.courtlistener_stub import StubCourtListener
+
+
+@pytest.fixture
+def stub():
+    with StubCourtListener(total=120) as server:
+        yield server
+
+
+def _collector(tmp_path, stub):
+    collector = collector_module.RealDataCollector(
+        data_dir=str(tmp_path), base_url=stub.base_url, rate_per_sec=1000, endpoint_concurrency=2
+    )
+    collector.retry_backoff = 0.01
+    return collector
+
+
+def _case_count(collector):
+    with sqlite3.connect(collector.db_path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM cases").fetchone()[0]
+
+
+def test_interrupted_run_resumes_from_checkpoint(tmp_path, stub):
+    collector = _collector(tmp_path, stub)
+    stub.fail(cursor=60, times=10)
+
+    first = asyncio.run(collector.collect_courtlistener_cases_async(limit=1000, page_size=20))
+    assert first['stored'] == 60 and len(first['failed']) == 1
+    [stream] = first['failed']
+    checkpoint = collector.get_checkpoint(stream)
+    assert checkpoint['status'] == 'failed' and 'cursor=60' in checkpoint['cursor']
+    assert checkpoint['pages'] == 3 and checkpoint['items'] == 60
+
+    stub.failures.clear()
+    stub.requests.clear()
+    second = asyncio.run(collector.collect_courtlistener_cases_async(limit=1000, page_size=20))
+    assert second['stored'] == 60 and not second['failed']
+    assert 'cursor=60' in stub.requests[0]
+    assert collector.get_checkpoint(stream)['status'] == 'complete'
+    assert _case_count(collector) == 120
+
+
+def test_concurrent_streams_respect_limit_and_upsert(tmp_path, stub):
+    collector = _collector(tmp_path, stub)
+    courts = ['nysd', 'cand', 'ca9']
+
+    cases = collector.collect_courtlistener_cases(limit=50, courts=courts)
+    assert len(cases) == 50 and _case_count(collector) == 50
+    assert cases[0].complexity_score >= 6  # court dict feeds the complexity score
+
+    collector.collect_courtlistener_cases(limit=1000, courts=courts)
+    assert _case_count(collector) == 120
+
+    # Finished streams start over; re-fetched dockets update rows in place
+    again = collector.collect_courtlistener_cases(limit=1000, courts=courts)
+    assert len(again) == 120 and _case_count(collector) == 120
+
+
+def test_token_bucket_limits_rate():
+    bucket = collector_module.TokenBucket(rate=50, capacity=1)
+
+    async def take(n):
+        for _ in range(n):
+            await bucket.acquire()
+
+    start = time.monotonic()
+    asyncio.run(take(6))
+    assert time.monotonic() - start >= 0.09
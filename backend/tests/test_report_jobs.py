@@ -0,0 +1,119 @@
+"""
+Tests for background report jobs and the content-addressed result cache
+"""
+from services import report_jobs
+from services.report_jobs import ReportJobManager, report_cache_key
+
+
+def _builder(calls):
+    def build(progress):
+        calls.append(1)
+        progress(50, 'generating')
+        return {'summary': {'total_spend': 1200.0}, 'vendors': [{'name': 'A'}]}
+    return build
+
+
+def test_cache_key_depends_on_watermark():
+    params = {'date_range': {'start': '2025-01-01'}}
+    key = report_cache_key('spend', params, '3:3:x')
+    assert key == report_cache_key('spend', dict(params), '3:3:x')
+    assert key != report_cache_key('spend', params, '4:4:y')
+    assert report_cache_key('spend', params, 'wm', owner='1') != \
+        report_cache_key('spend', params, 'wm', owner='2')
+
+
+def test_identical_request_served_from_cache(tmp_path):
+    manager = ReportJobManager(cache_dir=str(tmp_path), max_workers=1)
+    calls = []
+
+    job = manager.submit('spend', {'a': 1}, 'wm-1', _builder(calls))
+    finished = manager.wait(job['report_id'], timeout=5)
+    assert finished['status'] == 'completed'
+    assert finished['progress'] == 100
+
+    again = manager.submit('spend', {'a': 1}, 'wm-1', _builder(calls))
+    assert again['cached'] is True
+    assert again['report_id'] == job['report_id']
+    assert len(calls) == 1
+
+    # New data invalidates the cached result
+    fresh = manager.submit('spend', {'a': 1}, 'wm-2', _builder(calls))
+    manager.wait(fresh['report_id'], timeout=5)
+    assert len(calls) == 2
+
+
+def test_export_rendered_once(tmp_path):
+    manager = ReportJobManager(cache_dir=str(tmp_path), max_workers=1)
+    job = manager.submit('spend', {}, 'wm', _builder([]))
+    manager.wait(job['report_id'], timeout=5)
+
+    path = manager.export(job['report_id'], 'csv')
+    with open(path) as f:
+        assert 'summary.total_spend,1200.0' in f.read()
+    assert manager.export(job['report_id'], 'csv') == path
+
+
+def test_reports_routes_are_scoped_to_the_requesting_user(client, app, monkeypatch, tmp_path,
+                                                          admin_token, regular_token):
+    from routes import reports
+
+    manager = ReportJobManager(cache_dir=str(tmp_path), max_workers=1)
+    monkeypatch.setattr(report_jobs, '_manager', manager)
+    monkeypatch.setattr(reports, '_build_report', lambda template_id, parameters, user, progress:
+                        {'summary': {'total_spend': 1200.0, 'generated_for': user}})
+    monkeypatch.setitem(app.config, 'AUTO_AUTH_BYPASS', False)
+    body = {'template_id': 'real-time-spend-analysis', 'parameters': {}, 'wait': True}
+
+    admin, regular = {'Authorization': admin_token}, {'Authorization': regular_token}
+
+    mine = client.post('/api/reports/generate', json=body, headers=admin)
+    theirs = client.post('/api/reports/generate', json=body, headers=regular)
+    assert mine.status_code == theirs.status_code == 200
+    assert mine.json['report_id'] != theirs.json['report_id']
+    assert theirs.json['summary']['generated_for'] == '2'
+
+    report_id = mine.json['report_id']
+    pdf = client.get(f'/api/reports/export/{report_id}', headers=admin)
+    assert pdf.status_code == 200 and pdf.data.startswith(b'%PDF')
+    assert client.get(f'/api/reports/status/{report_id}', headers=regular).status_code == 404
+    csv_url = f'/api/reports/export/{report_id}?format=csv'
+    assert client.get(csv_url, headers=regular).status_code == 404
+
+
+def test_prune_evicts_expired_then_least_recently_used(tmp_path):
+    import os
+    import time
+
+    manager = ReportJobManager(cache_dir=str(tmp_path), max_workers=1, max_age=3600,
+                               max_bytes=10 ** 6, prune_interval=3600)
+    now = time.time()
+    jobs = {}
+    for name, age in (('old', 7200), ('warm', 600), ('hot', 60)):
+        jobs[name] = manager.submit('spend', {'name': name}, 'wm', _builder([]))
+        manager.wait(jobs[name]['report_id'], timeout=5)
+        manager.export(jobs[name]['report_id'], 'csv')
+        for path in (manager._result_path(jobs[name]['cache_key']),
+                     manager._result_path(jobs[name]['cache_key'], 'csv'),
+                     manager._job_path(jobs[name]['report_id'])):
+            os.utime(path, (now - age, now - age))
+
+    # Past max_age: the report, its export and its job record go
+    assert manager.prune(now) == 3
+    assert manager.get_status(jobs['old']['report_id']) is None
+    assert not os.path.exists(manager._result_path(jobs['old']['cache_key'], 'csv'))
+
+    # Over the size cap: least recently used first
+    manager.max_bytes = os.path.getsize(manager._result_path(jobs['hot']['cache_key'])) * 3
+    manager.prune(now)
+    assert manager.get_cached_result(jobs['warm']['cache_key']) is None
+    assert manager.get_cached_result(jobs['hot']['cache_key']) is not None
+
+
+def test_concurrent_job_updates_keep_every_field(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    manager = ReportJobManager(cache_dir=str(tmp_path), max_workers=1)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda i: manager._update_job('LAIT-job', **{f'field_{i}': i}), range(200)))
+    job = manager.get_status('LAIT-job')
+    assert all(job[f'field_{i}'] == i for i in range(200))
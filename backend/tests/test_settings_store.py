@@ -0,0 +1,104 @@
+"""
+Tests for the cached, file-watching admin settings store
+"""
+import json
+import os
+
+from services import settings_store
+from services.ml_service import score_with_models
+from services.settings_store import DEFAULT_SETTINGS, SettingsStore
+
+
+class SharedCounter:
+    """In-memory stand-in for the Redis version key"""
+
+    def __init__(self):
+        self.value = 0
+
+    def get(self):
+        return self.value
+
+    def bump(self):
+        self.value += 1
+        return self.value
+
+
+def test_store_reloads_changes_and_writes_atomically(tmp_path):
+    path = str(tmp_path / 'config' / 'settings.json')
+    counter = SharedCounter()
+    worker_a = SettingsStore(path, check_interval=0, version_counter=counter)
+    worker_b = SettingsStore(path, check_interval=3600, version_counter=counter)
+
+    # Missing file: defaults are served, reads don't create it
+    assert worker_a.get('anomaly_threshold') == DEFAULT_SETTINGS['anomaly_threshold']
+    assert worker_b.get('high_risk_threshold') == 7
+    assert not os.path.exists(os.path.dirname(path))
+
+    assert worker_a.save(dict(worker_a.all(), anomaly_threshold=0.9))
+    assert counter.value == 1 and os.listdir(os.path.dirname(path)) == ['settings.json']
+    # worker_b only checks hourly; a forced check picks up the new version
+    assert worker_b.get('anomaly_threshold') == DEFAULT_SETTINGS['anomaly_threshold']
+    worker_b.reload()
+    assert worker_b.get('anomaly_threshold') == 0.9
+
+    # Hand edits are picked up by mtime; broken JSON keeps the last good settings
+    with open(path, 'w') as f:
+        json.dump({'anomaly_threshold': 0.5}, f)
+    assert worker_a.get('anomaly_threshold') == 0.5 and worker_a.get('high_risk_threshold') == 7
+    with open(path, 'w') as f:
+        f.write('{"anomaly_threshold": ')
+    assert worker_a.get('anomaly_threshold') == 0.5
+
+
+def test_scoring_reads_flag_threshold_from_settings(tmp_path, monkeypatch):
+    import numpy as np
+    from sklearn.ensemble import IsolationForest, RandomForestClassifier
+
+    X = np.random.default_rng(0).normal(size=(100, 3))
+    iso = IsolationForest(n_estimators=10, random_state=0).fit(X)
+    clf = RandomForestClassifier(n_estimators=5, random_state=0).fit(X, X[:, 0] > 0)
+
+    store = SettingsStore(str(tmp_path / 'settings.json'), check_interval=0)
+    monkeypatch.setattr(settings_store, '_store', store)
+    store.save(dict(DEFAULT_SETTINGS, anomaly_threshold=-1))
+    assert score_with_models(iso, clf, X)['is_flagged'].all()
+    store.save(dict(DEFAULT_SETTINGS, anomaly_threshold=1))
+    assert not score_with_models(iso, clf, X)['is_flagged'].any()
+
+
+class _FixedScores:
+    """Model stub: fully anomalous rows with the given overspend probabilities"""
+
+    def __init__(self, overspend):
+        self.overspend = overspend
+
+    def decision_function(self, features):
+        import numpy as np
+        return np.full(len(self.overspend), -1.5)
+
+    def predict_proba(self, features):
+        import numpy as np
+        return np.column_stack([1 - np.array(self.overspend), self.overspend])
+
+
+def test_flag_threshold_defaults_to_0_7_without_saved_settings(tmp_path, monkeypatch):
+    # Scoring flagged combined scores above a hardcoded 0.7 before it read the admin
+    # settings; installs without a settings file must keep flagging the same rows
+    monkeypatch.setattr(settings_store, '_store', SettingsStore(str(tmp_path / 'settings.json')))
+    model = _FixedScores([0.0, 0.3, 0.6])  # combined 0.6, 0.72, 0.84
+
+    assert DEFAULT_SETTINGS['anomaly_threshold'] == 0.7
+    assert list(score_with_models(model, model, [[0], [0], [0]])['is_flagged']) == [
+        False, True, True
+    ]
+
+
+def test_store_path_comes_from_app_config(app, tmp_path, monkeypatch):
+    path = str(tmp_path / 'admin' / 'settings.json')
+    monkeypatch.setattr(settings_store, '_store', None)
+    monkeypatch.setitem(app.config, 'ADMIN_SETTINGS_FILE', path)
+    with app.app_context():
+        store = settings_store.get_settings_store()
+    assert store.path == path
+    assert settings_store.get_setting('anomaly_threshold') == DEFAULT_SETTINGS['anomaly_threshold']
+    assert not os.path.exists(path)
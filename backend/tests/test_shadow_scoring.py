@@ -0,0 +1,90 @@
+"""
+Tests for shadow scoring and offline replay of line-scoring model versions
+"""
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import IsolationForest, RandomForestClassifier
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from ml.model_manager import ModelManager
+from models.db_models import Base, LineItem
+from services.ml_service import MLService, prepare_features
+from services.shadow_scoring import (ANOMALY_MODEL_TYPE, OVERSPEND_MODEL_TYPE, ModelPair,
+                                     ShadowScorer, iter_request_frames, load_model_pair, replay)
+
+rng = np.random.default_rng(3)
+LINES = pd.DataFrame({
+    'description': ['Draft motion'] * 200,
+    'billable_hours': rng.uniform(0.5, 12, 200).round(1),
+    'rate': rng.uniform(150, 1200, 200).round(),
+})
+LINES['amount'] = LINES['billable_hours'] * LINES['rate']
+
+
+def fit_pair(seed, label):
+    features = prepare_features(LINES)
+    anomaly = IsolationForest(n_estimators=20, random_state=seed).fit(features)
+    overspend = RandomForestClassifier(n_estimators=10, random_state=seed)
+    overspend.fit(features, LINES['rate'] > 700)
+    return ModelPair(anomaly, overspend, label)
+
+
+def test_shadow_scores_uploads_off_the_request_path():
+    service = MLService()
+    production = fit_pair(0, 'production')
+    service.iso_forest_model, service.overspend_model = production.anomaly, production.overspend
+    service.models_loaded, service.fallback_mode = True, False
+    candidate = fit_pair(1, 'candidate')
+    service.shadow = ShadowScorer(candidate, sample_rate=1.0, queue_size=2, baseline=production)
+
+    for start in range(0, 40, 10):
+        service.score_lines(LINES.iloc[start:start + 10])
+    service.shadow.drain()
+    report = service.shadow_report()
+    shadow = report['shadow']
+    assert shadow['submitted'] + shadow['dropped'] == 4 and shadow['errors'] == 0
+    assert report['lines'] == shadow['submitted'] * 10
+    assert -1 <= report['score_correlation'] <= 1
+    # Both sides timed around the same ModelPair.score call on the shadow thread
+    assert report['baseline_latency']['p95_ms'] > 0 and report['candidate_latency']['p95_ms'] > 0
+    assert report['baseline_latency']['lines_per_s'] and shadow['baseline'] == 'production'
+    assert service.get_model_status()['shadow']['candidate'] == 'candidate'
+    service.disable_shadow()
+    assert service.shadow_report() is None
+
+
+def test_replay_compares_registry_versions(tmp_path):
+    # Version ids are timestamps, so each version gets its own registry here
+    managers, versions = [], []
+    for seed in (0, 1):
+        manager = ModelManager(str(tmp_path / f'registry{seed}'))
+        pair = fit_pair(seed, str(seed))
+        versions.append((manager.save_model(pair.anomaly, ANOMALY_MODEL_TYPE, {}),
+                         manager.save_model(pair.overspend, OVERSPEND_MODEL_TYPE, {})))
+        managers.append(manager)
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'replay.db'}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add_all([
+            LineItem(invoice_id=i // 7, description=row.description, hours=row.billable_hours,
+                     rate=row.rate, amount=row.amount)
+            for i, row in enumerate(LINES.itertuples())
+        ])
+        session.commit()
+
+    frames = list(iter_request_frames('line_items', engine, chunk_size=16))
+    assert sum(len(frame) for frame in frames) == 200 and len(frames) == 29
+
+    baseline = load_model_pair(*versions[0], model_manager=managers[0])
+    same = replay(frames, baseline, baseline)
+    assert same['flag_rate_delta'] == 0 and same['max_abs_score_delta'] == 0
+
+    report = replay(iter_request_frames('line_items', engine, limit=50), baseline,
+                    load_model_pair('current', 'current', model_manager=managers[1]))
+    assert report['lines'] == 50 and report['requests'] == 8
+    assert report['candidate'] == '+'.join(versions[1])
+    assert report['baseline_latency']['lines_per_s'] > 0
+    assert report['score_correlation'] is not None
+    engine.dispose()
@@ -0,0 +1,75 @@
+"""
+Tests for the verified JWT claims cache and per-user token versions
+"""
+import time
+
+from services import token_cache
+from services.token_cache import TokenVersions, VerifiedTokenCache
+
+
+def test_cache_respects_exp_versions_namespace_and_size(session):
+    cache = VerifiedTokenCache(max_entries=2, versions=TokenVersions())
+    now = time.time()
+    cache.put('h.p1.sig1', 'secret', {'user_id': 1, 'tv': 0, 'exp': now + 60})
+    cache.put('h.p2.sig2', 'secret', {'user_id': 2, 'tv': 0, 'exp': now - 1})
+
+    assert cache.get('h.p1.sig1', 'secret')[0]['user_id'] == 1
+    assert cache.get('h.p1.sig1', 'other-secret') is None
+    assert cache.get('h.forged.sig1', 'secret') is None
+    assert cache.get('h.p2.sig2', 'secret') is None and len(cache) == 1
+
+    cache.versions.bump(1)
+    assert cache.get('h.p1.sig1', 'secret') is None
+    assert cache.is_revoked({'user_id': 1, 'tv': 0}) and not cache.is_revoked({'user_id': 1, 'tv': 1})
+
+    # Versions are persisted: a fresh process sees the bump
+    assert TokenVersions().get(1) == 1
+
+    for i in range(3, 6):
+        cache.put(f'h.p.sig{i}', 'secret', {'user_id': i, 'exp': now + 60})
+    assert len(cache) == 2 and cache.get('h.p.sig3', 'secret') is None
+
+
+def test_blueprint_auth_checks_versions_and_logout_revokes(client, app, monkeypatch):
+    cache = VerifiedTokenCache(versions=TokenVersions())
+    monkeypatch.setattr(token_cache, '_cache', cache)
+    monkeypatch.setitem(app.config, 'AUTO_AUTH_BYPASS', False)
+
+    login = client.post('/api/auth/login', json={'email': 'default@example.com', 'password': 'Password123'})
+    headers = {'Authorization': f"Bearer {login.json['token']}"}
+    for _ in range(3):
+        assert client.get('/api/auth/me', headers=headers).status_code == 200
+
+    assert client.post('/api/auth/logout', headers=headers).status_code == 200
+    assert client.get('/api/auth/me', headers=headers).status_code == 401
+    fresh = client.post('/api/auth/login', json={'email': 'default@example.com', 'password': 'Password123'})
+    assert client.get('/api/auth/me', headers={'Authorization': f"Bearer {fresh.json['token']}"}).status_code == 200
+
+
+def test_blueprint_auth_verifies_signature_once_per_token(client, app, monkeypatch):
+    import dev_auth
+
+    cache = VerifiedTokenCache(versions=TokenVersions())
+    monkeypatch.setattr(token_cache, '_cache', cache)
+    monkeypatch.setitem(app.config, 'AUTO_AUTH_BYPASS', False)
+    verified = []
+    real_verify = dev_auth.verify_jwt_in_request
+
+    def counting_verify(*args, **kwargs):
+        verified.append(1)
+        return real_verify(*args, **kwargs)
+
+    monkeypatch.setattr(dev_auth, 'verify_jwt_in_request', counting_verify)
+
+    login = client.post(
+        '/api/auth/login', json={'email': 'default@example.com', 'password': 'Password123'}
+    )
+    headers = {'Authorization': f"Bearer {login.json['token']}"}
+    first = client.get('/api/auth/me', headers=headers)
+    for _ in range(3):
+        assert client.get('/api/auth/me', headers=headers).json == first.json
+    assert first.status_code == 200
+    assert len(verified) == 1 and cache.hits == 3
+
+    assert client.get('/api/auth/me', headers={'Authorization': 'Bearer x.y.z'}).status_code == 401
+    assert len(verified) == 2
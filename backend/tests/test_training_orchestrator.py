@@ -0,0 +1,99 @@
+"""
+Tests for the parallel, warm-started training orchestrator
+"""
+import numpy as np
+import pytest
+from sklearn.ensemble import IsolationForest, RandomForestRegressor
+
+from ml.model_manager import ModelManager
+from ml.training_orchestrator import (TrainingJob, TrainingOrchestrator, ensemble_params, for_serving,
+                                      warm_start_fit, warm_start_rows_needed)
+
+
+def fit_forest(rows, n_jobs=1):
+    X = np.random.default_rng(rows).normal(size=(rows, 4))
+    model = IsolationForest(**ensemble_params(IsolationForest, {'random_state': 0}, len(X), n_jobs))
+    return len(for_serving(model.fit(X)).estimators_)
+
+
+def failing_job(n_jobs=1):
+    raise RuntimeError('no data')
+
+
+def test_ensemble_params_and_warm_start():
+    params = ensemble_params(RandomForestRegressor, {'n_estimators': 10}, n_samples=100000, n_jobs=3)
+    assert params['n_jobs'] == 3 and 0 < params['max_samples'] < 1
+    assert ensemble_params(IsolationForest, {}, n_samples=100)['max_samples'] == 100
+
+    rng = np.random.default_rng(0)
+    X, y = rng.normal(size=(200, 3)), rng.normal(size=200)
+    model = RandomForestRegressor(n_estimators=10, random_state=0).fit(X, y)
+    first_tree = model.estimators_[0]
+
+    warm_start_fit(model, X[:30], y[:30], extra_trees=5)
+    assert len(model.estimators_) == 15 and model.estimators_[0] is first_tree
+
+
+def test_isolation_forest_warm_start_keeps_scores_stable():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(5000, 4))
+    params = ensemble_params(IsolationForest, {'n_estimators': 100, 'contamination': 0.1,
+                                               'random_state': 0}, len(X))
+    forest = IsolationForest(**params).fit(X)
+    probes = np.array([[0.0, 0.0, 0.0, 0.0], [4.0, 4.0, 4.0, 4.0]])
+    before = forest.score_samples(probes)
+    assert warm_start_rows_needed(forest) == forest.max_samples_ == 256
+
+    # A handful of new rows would shrink max_samples_ and rescale every score
+    with pytest.raises(ValueError):
+        warm_start_fit(forest, rng.normal(size=(12, 4)), extra_trees=25)
+    assert len(forest.estimators_) == 100
+    np.testing.assert_array_equal(forest.score_samples(probes), before)
+
+    warm_start_fit(forest, rng.normal(size=(300, 4)), extra_trees=25)
+    assert len(forest.estimators_) == 125 and forest.max_samples_ == 256
+    np.testing.assert_allclose(forest.score_samples(probes), before, atol=0.02)
+
+
+def test_orchestrator_runs_jobs_in_pool_and_records_stats(tmp_path):
+    manager = ModelManager(str(tmp_path))
+    orchestrator = TrainingOrchestrator(model_manager=manager, cpu_budget=4, max_workers=2)
+    jobs = [
+        TrainingJob('anomaly', fit_forest, args=(300,), model_type='outlier_detector'),
+        TrainingJob('big_anomaly', fit_forest, args=(600,)),
+        TrainingJob('broken', failing_job),
+    ]
+    assert orchestrator.plan(jobs) == {'anomaly': 2, 'big_anomaly': 2, 'broken': 2}
+
+    results = orchestrator.run(jobs)
+    assert results['anomaly']['status'] == 'success' and results['anomaly']['result'] == 100
+    assert results['broken']['status'] == 'error' and 'no data' in results['broken']['error']
+
+    stats = ModelManager(str(tmp_path)).get_training_stats('outlier_detector')
+    assert stats['wall_time_s'] > 0 and stats['peak_memory_mb'] > 0
+    assert stats['n_jobs'] == 2 and stats['parallel_workers'] == 2
+    assert manager.metadata['models']['big_anomaly']['training_history'][-1]['status'] == 'success'
+
+
+def test_retrain_failures_are_errors_not_skips(monkeypatch, tmp_path):
+    import pandas as pd
+
+    import tasks
+    from ml import feature_store, training_orchestrator
+
+    class BrokenStore:
+        def invoice_training_frame(self):
+            raise RuntimeError('snapshot unreadable')
+
+        def vendor_training_frame(self):
+            return pd.DataFrame()
+
+    monkeypatch.setattr(feature_store, 'get_feature_store', lambda refresh=True: BrokenStore())
+    monkeypatch.setattr(training_orchestrator, 'TRAINING_MAX_WORKERS', 1)
+    monkeypatch.setenv('MODEL_DIR', str(tmp_path))
+
+    result = tasks.retrain_models(warm_start=False)
+    assert result['status'] == 'error'
+    assert result['models']['risk_predictor']['status'] == 'error'
+    assert 'snapshot unreadable' in result['models']['invoice_analyzer']['error']
+    assert result['models']['vendor_analyzer']['status'] == 'skipped'
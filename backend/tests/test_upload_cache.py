@@ -0,0 +1,60 @@
+"""
+Tests for the content-hash upload result cache
+"""
+from sqlalchemy import create_engine
+
+from services.upload_cache import UploadResultCache, file_sha256
+
+
+def test_put_get_roundtrip_and_version_keying(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'cache.db'}")
+    cache = UploadResultCache(cache_dir=str(tmp_path / 'disk'), engine=engine)
+    content_hash = file_sha256(b'%PDF-1.4 identical invoice bytes')
+
+    assert cache.get(content_hash, 'parser/1', 'model-a') is None
+
+    cache.put(content_hash, 'parser/1', 'model-a', {'lines': [{'hours': 1.5}]}, invoice_id=7)
+    hit = cache.get(content_hash, 'parser/1', 'model-a')
+    assert hit == {'result': {'lines': [{'hours': 1.5}]}, 'invoice_id': 7}
+
+    # A new parser or model version is a different key
+    assert cache.get(content_hash, 'parser/2', 'model-a') is None
+    assert cache.get(content_hash, 'parser/1', 'model-b') is None
+
+    # Re-putting replaces rather than duplicating
+    cache.put(content_hash, 'parser/1', 'model-a', {'lines': []}, invoice_id=8)
+    assert cache.get(content_hash, 'parser/1', 'model-a')['invoice_id'] == 8
+
+
+def test_disk_level_survives_database_reset(tmp_path):
+    disk = str(tmp_path / 'disk')
+    content_hash = file_sha256(b'invoice')
+    UploadResultCache(cache_dir=disk, engine=create_engine(f"sqlite:///{tmp_path / 'a.db'}")).put(
+        content_hash, 'parser/1', 'model-a', {'lines': [1]}, invoice_id=3)
+
+    fresh = UploadResultCache(cache_dir=disk, engine=create_engine(f"sqlite:///{tmp_path / 'b.db'}"))
+    # Parse result is reused, but the invoice link belongs to the old database
+    assert fresh.get(content_hash, 'parser/1', 'model-a') == {'result': {'lines': [1]}, 'invoice_id': None}
+
+
+def test_duplicate_upload_is_scoped_to_uploader(client, app, monkeypatch):
+    from io import BytesIO
+    from routes import invoices
+
+    monkeypatch.setitem(app.config, 'AUTO_AUTH_BYPASS', False)
+    monkeypatch.setattr(invoices.PDFParserService, 'parse_pdf',
+                        lambda self, path: {'vendor_name': 'Dup Vendor', 'total_amount': 900, 'line_items': []})
+    tokens = []
+    for email in ('dup-a@example.com', 'dup-b@example.com'):
+        response = client.post('/api/auth/register', json={'email': email, 'password': 'StrongPass123'})
+        tokens.append({'Authorization': f"Bearer {response.get_json()['token']}"})
+
+    def upload(headers):
+        data = {'file': (BytesIO(b'%PDF-1.4 shared invoice bytes'), 'invoice.pdf'), 'amount': '900'}
+        return client.post('/api/invoices/upload', data=data, headers=headers,
+                           content_type='multipart/form-data').get_json()
+
+    first = upload(tokens[0])
+    assert upload(tokens[0])['duplicate'] is True
+    other = upload(tokens[1])
+    assert not other.get('duplicate') and other['invoice_id'] != first['invoice_id']
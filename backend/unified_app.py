@@ -16,7 +16,7 @@ from flask_cors import CORS
 from flask_socketio import SocketIO
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required
 from dotenv import load_dotenv
-from werkzeug.security import check_password_hash, generate_password_hash
+from services.password_hashing import PasswordHasherBusy, busy_response, get_password_hasher
 from sqlalchemy import func, desc
 
 # Load environment variables first
@@ -199,10 +199,18 @@ def create_app():
             if not user:
                 return None
                 
-            if not check_password_hash(user.password_hash, password):
+            ok, new_hash = get_password_hasher().verify(user.password_hash, password)
+            if not ok:
                 return None
+            if new_hash:
+                # Work factor changed since this hash was made
+                user.password_hash = new_hash
+                session.commit()
+                session.refresh(user)
                 
             return user
+        except PasswordHasherBusy:
+            raise
         except Exception as e:
             logger.error(f"Authentication error: {e}")
             return None
@@ -254,6 +262,8 @@ def create_app():
                 'user': user_data
             })
             
+        except PasswordHasherBusy as e:
+            return busy_response(e)
         except Exception as e:
             logger.error(f"Login error: {str(e)}")
             return jsonify({'message': 'Login failed', 'error': str(e)}), 500
@@ -285,7 +295,7 @@ def create_app():
             # Create new user
             new_user = User(
                 email=email,
-                password_hash=generate_password_hash(password),
+                password_hash=get_password_hasher().hash(password),
                 first_name=first_name,
                 last_name=last_name,
                 role='user'
@@ -314,6 +324,8 @@ def create_app():
                 'user': user_data
             }), 201
             
+        except PasswordHasherBusy as e:
+            return busy_response(e)
         except Exception as e:
             logger.error(f"Registration error: {str(e)}")
             return jsonify({'message': 'Registration failed', 'error': str(e)}), 500
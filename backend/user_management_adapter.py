@@ -5,8 +5,12 @@ Provides the interface needed for the enhanced authentication system
 
 import logging
 from datetime import datetime, timedelta, timezone
-from werkzeug.security import check_password_hash
 from db.database import get_db_session, User
+from services.password_hashing import get_password_hasher
+from services.token_cache import bump_token_version
+from services.login_throttle import (LOCKOUT_MINUTES, LOGIN_THROTTLE_MAX_ATTEMPTS,
+                                     LOGIN_THROTTLE_WINDOW, get_throttle_store,
+                                     record_failed_login, reset_failed_logins)
 
 logger = logging.getLogger(__name__)
 
@@ -49,22 +53,28 @@ class UserManager:
         return result['user']['id']
     
     def authenticate_user(self, email, password):
-        """Authenticate user and return user data"""
+        """Authenticate user and return user data (PasswordHasherBusy if hashing is saturated)"""
         with get_db_session() as session:
             user = session.query(User).filter(User.email == email.lower()).first()
             
             if not user:
                 raise AuthenticationError('Invalid credentials')
             
-            if not check_password_hash(user.password_hash, password):
+            ok, new_hash = get_password_hasher().verify(user.password_hash, password)
+            if not ok:
                 raise AuthenticationError('Invalid credentials')
+            if new_hash:
+                # Work factor changed since this hash was made
+                user.password_hash = new_hash
+                session.commit()
             
             # Check if email is verified (if applicable)
             if hasattr(user, 'active') and not user.active:
                 raise EmailNotVerifiedError('Email not verified')
             
-            # Check if account is locked
-            if hasattr(user, 'failed_login_attempts') and user.failed_login_attempts >= 5:
+            # Check if account is locked (lock lapses LOCKOUT_MINUTES after the last failure)
+            if (user.failed_login_attempts or 0) >= LOGIN_THROTTLE_MAX_ATTEMPTS and user.last_failed_login and \
+                    datetime.utcnow() - user.last_failed_login < timedelta(minutes=LOCKOUT_MINUTES):
                 raise AuthenticationError('Account temporarily locked due to too many failed attempts')
             
             return {
@@ -124,17 +134,18 @@ class UserManager:
             if not user:
                 return False
             
-            if not check_password_hash(user.password_hash, current_password):
+            hasher = get_password_hasher()
+            if not hasher.verify(user.password_hash, current_password)[0]:
                 return False
             
             # Validate new password
             if len(new_password) < 8:
                 raise ValidationError('Password must be at least 8 characters long')
             
-            from werkzeug.security import generate_password_hash
-            user.password_hash = generate_password_hash(new_password)
+            user.password_hash = hasher.hash(new_password)
             user.updated_at = datetime.now(timezone.utc)
             session.commit()
+            bump_token_version(user_id)
             
             return True
 
@@ -158,50 +169,26 @@ class EmailService:
 class SecurityManager:
     """Security operations like rate limiting"""
     
-    def __init__(self):
-        # Simple in-memory rate limiting (use Redis in production)
-        self.rate_limits = {}
+    def __init__(self, throttle_store=None):
+        # Shared across workers when Redis is configured; bounded either way
+        self.throttle = throttle_store or get_throttle_store()
     
-    def check_rate_limit(self, identifier, action_type, max_attempts=5, time_window=300):
+    def check_rate_limit(self, identifier, action_type, max_attempts=LOGIN_THROTTLE_MAX_ATTEMPTS,
+                         time_window=LOGIN_THROTTLE_WINDOW):
         """Check if action is rate limited"""
-        key = f"{identifier}:{action_type}"
-        now = datetime.now()
-        
-        if key not in self.rate_limits:
-            self.rate_limits[key] = []
-        
-        # Remove old attempts outside time window
-        cutoff = now - timedelta(seconds=time_window)
-        self.rate_limits[key] = [
-            attempt for attempt in self.rate_limits[key] 
-            if attempt > cutoff
-        ]
-        
-        # Check if under limit
-        return len(self.rate_limits[key]) < max_attempts
+        return self.throttle.count(f"{identifier}:{action_type}", time_window) < max_attempts
     
     def record_login_attempt(self, email, success, ip_address):
         """Record login attempt"""
         if not success:
             # Record failed attempt for rate limiting
-            key = f"{email}:login"
-            now = datetime.now()
-            
-            if key not in self.rate_limits:
-                self.rate_limits[key] = []
-            
-            self.rate_limits[key].append(now)
-            
-            # Also increment database counter if user exists
-            with get_db_session() as session:
-                user = session.query(User).filter(User.email == email.lower()).first()
-                if user and hasattr(user, 'failed_login_attempts'):
-                    user.failed_login_attempts = getattr(user, 'failed_login_attempts', 0) + 1
-                    session.commit()
-        else:
-            # Reset failed attempts on successful login
+            self.throttle.hit(f"{email}:login", LOGIN_THROTTLE_WINDOW)
+        try:
+            # One UPDATE either way; unknown emails simply match no row
             with get_db_session() as session:
-                user = session.query(User).filter(User.email == email.lower()).first()
-                if user and hasattr(user, 'failed_login_attempts'):
-                    user.failed_login_attempts = 0
-                    session.commit()
+                if not success:
+                    record_failed_login(session, User, email)
+                else:
+                    reset_failed_logins(session, User, email)
+        except Exception as e:
+            logger.error(f"Failed to record login attempt for {email}: {str(e)}")
@@ -0,0 +1,125 @@
+"""
+Lazy imports, lazy singletons and an explicit warmup phase
+
+Heavy dependencies (nltk, spaCy, transformers/torch) used to be imported,
+downloaded and loaded at module import, which made every gunicorn worker
+pay several seconds before serving its first request. Modules now declare
+them with lazy_import()/LazySingleton and register the expensive parts as
+warmup steps; warmup() runs them explicitly (deploy hook, preload, or
+`python -m utils.nlp_resources`) instead of as an import side effect.
+"""
+
+import importlib
+import importlib.util
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def module_available(name: str) -> bool:
+    """True if a module can be imported, without importing it"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+class LazyModule:
+    """Module proxy that performs the real import on first attribute access"""
+
+    def __init__(self, name: str):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+
+    def _load(self):
+        module = self.__dict__['_module']
+        if module is None:
+            start = time.perf_counter()
+            module = importlib.import_module(self.__dict__['_name'])
+            self.__dict__['_module'] = module
+            elapsed = time.perf_counter() - start
+            logger.debug(f"Lazy import of {self.__dict__['_name']} took {elapsed:.3f}s")
+        return module
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._load(), attr)
+
+    def __repr__(self) -> str:
+        state = 'loaded' if self.__dict__['_module'] is not None else 'not loaded'
+        return f"<lazy module '{self.__dict__['_name']}' ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    """Return a proxy for `name` that imports it on first use"""
+    return LazyModule(name)
+
+
+class LazySingleton:
+    """Thread-safe holder that builds its value on first get()"""
+
+    def __init__(self, factory: Callable[[], Any], name: Optional[str] = None):
+        self.factory = factory
+        self.name = name or getattr(factory, '__name__', 'singleton')
+        self._value = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def get(self) -> Any:
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    start = time.perf_counter()
+                    self._value = self.factory()
+                    self._loaded = True
+                    logger.info(f"Initialized {self.name} in {time.perf_counter() - start:.2f}s")
+        return self._value
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def reset(self):
+        with self._lock:
+            self._value = None
+            self._loaded = False
+
+
+_warmup_steps: 'OrderedDict[str, Callable[[], Any]]' = OrderedDict()
+
+
+def register_warmup(name: str, step: Callable[[], Any]):
+    """Register an expensive initialization step to run during warmup()"""
+    _warmup_steps[name] = step
+
+
+def registered_warmup_steps():
+    return list(_warmup_steps)
+
+
+def warmup(names: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Run registered warmup steps (all by default) and report their timings
+
+    Failures are logged and reported, never raised: a missing optional
+    model must not prevent a worker from starting.
+    """
+    selected = list(names) if names is not None else list(_warmup_steps)
+    report = {}
+    for name in selected:
+        step = _warmup_steps.get(name)
+        if step is None:
+            report[name] = {'ok': False, 'seconds': 0.0, 'error': 'unknown warmup step'}
+            continue
+        start = time.perf_counter()
+        try:
+            step()
+            report[name] = {'ok': True}
+        except Exception as e:
+            logger.warning(f"Warmup step {name} failed: {e}")
+            report[name] = {'ok': False, 'error': str(e)}
+        report[name]['seconds'] = round(time.perf_counter() - start, 3)
+    return report
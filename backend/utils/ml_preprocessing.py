@@ -3,22 +3,8 @@ import numpy as np
 from sklearn.preprocessing import StandardScaler, OneHotEncoder
 from collections import defaultdict
 import re
-import nltk
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
-from nltk.stem import WordNetLemmatizer
-
-# Download NLTK resources if not already available
-try:
-    nltk.download('punkt', quiet=True)
-    nltk.download('stopwords', quiet=True)
-    nltk.download('wordnet', quiet=True)
-except:
-    print("Warning: Could not download NLTK resources. Text preprocessing may be limited.")
-
-# Initialize lemmatizer
-lemmatizer = WordNetLemmatizer()
-stop_words = set(stopwords.words('english'))
+# nltk data is loaded lazily; downloads happen in the warmup phase (utils.nlp_resources)
+from utils.nlp_resources import get_lemmatizer, get_stop_words, tokenize
 
 def preprocess_text(text):
     """
@@ -34,10 +20,15 @@ def preprocess_text(text):
     text = re.sub(r'[^\w\s]', ' ', text)
     
     # Tokenize
-    tokens = word_tokenize(text)
+    tokens = tokenize(text)
     
     # Remove stopwords and lemmatize
-    tokens = [lemmatizer.lemmatize(token) for token in tokens if token not in stop_words]
+    stop_words = get_stop_words()
+    lemmatizer = get_lemmatizer()
+    if lemmatizer is not None:
+        tokens = [lemmatizer.lemmatize(token) for token in tokens if token not in stop_words]
+    else:
+        tokens = [token for token in tokens if token not in stop_words]
     
     return ' '.join(tokens)
 
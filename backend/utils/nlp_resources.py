@@ -0,0 +1,167 @@
+"""
+Shared, lazily loaded NLP resources (nltk data, spaCy pipelines,
+sentence-transformer models)
+
+Nothing here imports nltk or spaCy, downloads data or loads a model at
+import time. Request-path helpers degrade to regex tokenization and a
+basic stop-word list when the data has not been installed; the
+'nltk_data' and 'spacy_model' warmup steps do the downloads and loads.
+
+Run the warmup ahead of serving traffic with:
+    python -m utils.nlp_resources
+
+The Dockerfiles run it at build time and start_gunicorn.sh once more
+before Gunicorn forks its workers.
+"""
+
+import logging
+import os
+import re
+import threading
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from utils.lazy_imports import LazySingleton, lazy_import, module_available, register_warmup, warmup
+
+logger = logging.getLogger(__name__)
+
+nltk = lazy_import('nltk')
+spacy = lazy_import('spacy')
+sentence_transformers = lazy_import('sentence_transformers')
+
+NLTK_AVAILABLE = module_available('nltk')
+SPACY_AVAILABLE = module_available('spacy')
+
+SPACY_MODEL = os.getenv('SPACY_MODEL', 'en_core_web_sm')
+SENTENCE_MODEL = os.getenv('SENTENCE_MODEL', 'all-MiniLM-L6-v2')
+NLTK_PACKAGES = {
+    'punkt': 'tokenizers/punkt',
+    'stopwords': 'corpora/stopwords',
+    'wordnet': 'corpora/wordnet',
+}
+BASIC_STOP_WORDS = frozenset({
+    'a', 'an', 'the', 'and', 'or', 'but', 'to', 'of', 'in', 'on', 'for', 'with', 'at', 'by',
+    'from', 'as', 'is', 'was', 'are', 'were', 'be', 'been', 'it', 'this', 'that', 'these', 'those'
+})
+_TOKEN_RE = re.compile(r'\w+')
+
+
+@lru_cache(maxsize=None)
+def nltk_has(package: str) -> bool:
+    """True when an nltk data package is installed locally (no download)"""
+    if not NLTK_AVAILABLE:
+        return False
+    try:
+        nltk.data.find(NLTK_PACKAGES.get(package, package))
+        return True
+    except LookupError:
+        return False
+
+
+def download_nltk_data():
+    """Fetch any missing nltk data packages (warmup only)"""
+    if not NLTK_AVAILABLE:
+        return
+    for package in NLTK_PACKAGES:
+        if not nltk_has(package):
+            nltk.download(package, quiet=True)
+    # Data may have arrived after the request path fell back to basics
+    nltk_has.cache_clear()
+    _stop_words.reset()
+    _lemmatizer.reset()
+
+
+def _load_stop_words() -> frozenset:
+    if nltk_has('stopwords'):
+        return frozenset(nltk.corpus.stopwords.words('english'))
+    return BASIC_STOP_WORDS
+
+
+def _load_lemmatizer():
+    if nltk_has('wordnet'):
+        return nltk.stem.WordNetLemmatizer()
+    return None
+
+
+_stop_words = LazySingleton(_load_stop_words, 'stop words')
+_lemmatizer = LazySingleton(_load_lemmatizer, 'WordNet lemmatizer')
+
+
+def get_stop_words() -> frozenset:
+    return _stop_words.get()
+
+
+def get_lemmatizer():
+    """WordNetLemmatizer, or None when wordnet data is not installed"""
+    return _lemmatizer.get()
+
+
+def tokenize(text: str) -> List[str]:
+    """nltk word_tokenize when punkt is installed, regex word split otherwise"""
+    if nltk_has('punkt'):
+        try:
+            return nltk.tokenize.word_tokenize(text)
+        except LookupError:
+            pass
+    return _TOKEN_RE.findall(text)
+
+
+# ----------------------------------------------------------------------
+# spaCy and sentence-transformers
+# ----------------------------------------------------------------------
+_spacy_pipelines: Dict[Tuple[str, Tuple[str, ...]], LazySingleton] = {}
+_sentence_models: Dict[str, LazySingleton] = {}
+_models_lock = threading.Lock()
+
+
+def get_spacy_nlp(model: Optional[str] = None, disable: Tuple[str, ...] = ()):
+    """
+    Process-wide spaCy pipeline, loaded on first use
+
+    Raises OSError if the model package is not installed; run the warmup
+    (which downloads it) or install it in the image.
+    """
+    key = (model or SPACY_MODEL, tuple(disable))
+    with _models_lock:
+        holder = _spacy_pipelines.get(key)
+        if holder is None:
+            holder = LazySingleton(lambda: spacy.load(key[0], disable=list(key[1])),
+                                   f"spaCy {key[0]}")
+            _spacy_pipelines[key] = holder
+    return holder.get()
+
+
+def get_sentence_model(model: Optional[str] = None):
+    """Process-wide SentenceTransformer, loaded on first use and shared by all callers"""
+    name = model or SENTENCE_MODEL
+    with _models_lock:
+        holder = _sentence_models.get(name)
+        if holder is None:
+            holder = LazySingleton(lambda: sentence_transformers.SentenceTransformer(name),
+                                   f"SentenceTransformer {name}")
+            _sentence_models[name] = holder
+    return holder.get()
+
+
+def download_spacy_model(model: Optional[str] = None):
+    """Install the spaCy model if missing, then load it (warmup only)"""
+    if not SPACY_AVAILABLE:
+        return
+    model = model or SPACY_MODEL
+    if not module_available(model):
+        import subprocess
+        import sys
+        logger.warning(f"Downloading spaCy model {model}...")
+        subprocess.run([sys.executable, '-m', 'spacy', 'download', model], check=False)
+    get_spacy_nlp(model)
+
+
+register_warmup('nltk_data', download_nltk_data)
+register_warmup('spacy_model', download_spacy_model)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    for step, result in warmup().items():
+        status = 'ok' if result['ok'] else f"failed: {result.get('error')}"
+        print(f"{step:<24} {result['seconds']:>8.2f}s  {status}")